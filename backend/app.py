@@ -70,6 +70,70 @@ def create_app(config_name=None):
     with app.app_context():
         ensure_sqlite_schema_compat()
 
+    # Executado das faturas de cartão por delta e recálculo adiado de faturas
+    # (antes do resumo mensal: as faturas criadas no flush/commit entram nele)
+    try:
+        from backend.services.fatura_cartao_service import FaturaCartaoService
+    except ImportError:
+        from services.fatura_cartao_service import FaturaCartaoService
+    FaturaCartaoService.registrar_eventos()
+
+    # Manutenção incremental do resumo mensal materializado (dashboard)
+    try:
+        from backend.services.resumo_competencia_service import ResumoCompetenciaService
+    except ImportError:
+        from services.resumo_competencia_service import ResumoCompetenciaService
+    ResumoCompetenciaService.registrar_eventos()
+
+    # Watermark da materialização de recorrências descartado ao editar o item
+    try:
+        from backend.services.recorrencia_service import RecorrenciaService
+    except ImportError:
+        from services.recorrencia_service import RecorrenciaService
+    RecorrenciaService.registrar_eventos()
+
+    # Cache das linhas do tempo de vigências de seguro (financiamentos)
+    try:
+        from backend.services.seguro_vigencia_service import VigenciaTimeline
+    except ImportError:
+        from services.seguro_vigencia_service import VigenciaTimeline
+    VigenciaTimeline.registrar_eventos()
+
+    # Cache da projeção colunar das parcelas dos financiamentos (com ETag)
+    try:
+        from backend.services.projecao_financiamento_service import ProjecaoFinanciamento
+    except ImportError:
+        from services.projecao_financiamento_service import ProjecaoFinanciamento
+    ProjecaoFinanciamento.registrar_eventos()
+
+    # Cache das séries de indexadores (TR, IPCA...)
+    try:
+        from backend.services.indexador_service import SerieIndexador
+    except ImportError:
+        from services.indexador_service import SerieIndexador
+    SerieIndexador.registrar_eventos()
+
+    # Saldo das contas bancárias mantido por delta a cada movimento
+    try:
+        from backend.services.conta_bancaria_service import ContaBancariaService
+    except ImportError:
+        from services.conta_bancaria_service import ContaBancariaService
+    ContaBancariaService.registrar_eventos()
+
+    # Cache das vigências de orçamento das categorias dos cartões
+    try:
+        from backend.services.orcamento_vigencia_service import OrcamentoTimeline
+    except ImportError:
+        from services.orcamento_vigencia_service import OrcamentoTimeline
+    OrcamentoTimeline.registrar_eventos()
+
+    # Cache do resumo orçado x gasto dos cartões (por cartão e competência)
+    try:
+        from backend.services.resumo_cartao_service import ResumoCartaoService
+    except ImportError:
+        from services.resumo_cartao_service import ResumoCartaoService
+    ResumoCartaoService.registrar_eventos()
+
     # Registrar blueprints (rotas)
     register_blueprints(app)
 
@@ -260,6 +324,17 @@ if __name__ == '__main__':
         db.create_all()
         print("=> Tabelas do banco de dados criadas/verificadas com sucesso!")
 
+        # Materializar recorrências/faturas pendentes (idempotente, apenas o delta)
+        try:
+            try:
+                from backend.services.recorrencia_service import RecorrenciaService
+            except ImportError:
+                from services.recorrencia_service import RecorrenciaService
+            resultado = RecorrenciaService.materializar()
+            print(f"=> Recorrencias materializadas ate {resultado['ate']}")
+        except Exception as e:
+            print(f"=> [AVISO] Falha ao materializar recorrencias: {e}")
+
         # Iniciar scheduler de jobs automáticos (faturas mensais, etc.)
         # Comentado temporariamente - requer instalação do apscheduler
         # try:
@@ -0,0 +1,65 @@
+"""
+Job Diário: Materializar Despesas Recorrentes e Faturas de Cartão
+
+Gera as execuções (Conta / LancamentoAgregado) das despesas recorrentes e as
+faturas virtuais dos cartões ativos até o horizonte configurado, apenas para
+os meses ainda não materializados (watermark ItemDespesa.materializado_ate).
+
+Pode ser agendado via:
+- Cron (Linux/Mac): 10 0 * * * python backend/jobs/materializar_recorrencias.py
+- Task Scheduler (Windows)
+- APScheduler (backend/scheduler.py)
+
+Executar manualmente: python backend/jobs/materializar_recorrencias.py [YYYY-MM]
+"""
+import sys
+import os
+from datetime import date
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from backend.app import app
+    from backend.services.recorrencia_service import RecorrenciaService
+except ImportError:
+    from app import app
+    from services.recorrencia_service import RecorrenciaService
+
+
+def materializar_recorrencias(ate=None):
+    """
+    Materializa recorrências e faturas até o mês alvo (padrão: horizonte do serviço)
+    """
+    with app.app_context():
+        print("=" * 70)
+        print(f" JOB: Materializacao de Recorrencias - {date.today().strftime('%d/%m/%Y')}")
+        print("=" * 70)
+        print()
+
+        try:
+            resultado = RecorrenciaService.materializar(ate=ate)
+
+            print(f"OK - Materializado ate {resultado['ate']}")
+            print(f"  - Itens processados: {resultado['itens']}")
+            print(f"  - Contas geradas: {resultado['contas']}")
+            print(f"  - Lancamentos de cartao gerados: {resultado['lancamentos']}")
+            print(f"  - Faturas criadas: {resultado['faturas']}")
+
+            for erro in resultado['erros']:
+                print(f"  [AVISO] ItemDespesa {erro['item_despesa_id']}: {erro['erro']}")
+
+            print()
+            print("=" * 70)
+            print(" JOB CONCLUIDO COM SUCESSO")
+            print("=" * 70)
+
+        except Exception as e:
+            print(f"ERRO ao materializar recorrencias: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    materializar_recorrencias(sys.argv[1] if len(sys.argv) > 1 else None)
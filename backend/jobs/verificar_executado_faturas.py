@@ -0,0 +1,81 @@
+"""
+Job Diário: Verificar Executado das Faturas de Cartão
+
+Conta.valor_executado das faturas e o consumo por categoria
+(ConsumoAgregado) são mantidos por delta a cada lançamento
+(insert/edição/exclusão). Este job recomputa ambos a partir dos
+lançamentos e relata as divergências.
+
+Pode ser agendado via:
+- Cron (Linux/Mac): 10 3 * * * python backend/jobs/verificar_executado_faturas.py
+- Task Scheduler (Windows)
+- APScheduler (backend/scheduler.py)
+
+Executar manualmente: python backend/jobs/verificar_executado_faturas.py [--corrigir]
+Código de saída 2 quando há divergências não corrigidas.
+"""
+import sys
+import os
+from datetime import date
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from backend.app import app
+    from backend.models import db
+    from backend.services.fatura_cartao_service import FaturaCartaoService
+except ImportError:
+    from app import app
+    from models import db
+    from services.fatura_cartao_service import FaturaCartaoService
+
+
+def verificar_executado_faturas(corrigir=False):
+    """
+    Relata (e opcionalmente corrige) faturas e categorias com executado divergente
+    """
+    with app.app_context():
+        print("=" * 70)
+        print(f" JOB: Verificacao do Executado das Faturas - {date.today().strftime('%d/%m/%Y')}")
+        print("=" * 70)
+        print()
+
+        try:
+            resultado = FaturaCartaoService.verificar(corrigir=corrigir)
+            if resultado['corrigidas']:
+                db.session.commit()
+
+            print(f"OK - {resultado['faturas_verificadas']} faturas verificadas")
+            print(f"  - Faturas divergentes: {len(resultado['divergencias_faturas'])}")
+            print(f"  - Consumos divergentes: {len(resultado['divergencias_consumo'])}")
+
+            for d in resultado['divergencias_faturas']:
+                print(f"  [AVISO] Fatura {d['fatura_id']} (cartao {d['cartao_id']}, "
+                      f"{d['competencia'].strftime('%m/%Y')}): registrado {d['executado_registrado']}, "
+                      f"calculado {d['executado_calculado']} (diferenca {d['diferenca']})")
+
+            for d in resultado['divergencias_consumo']:
+                print(f"  [AVISO] Categoria {d['item_agregado_id']} ({d['mes'].strftime('%m/%Y')}): "
+                      f"registrado {d['consumo_registrado']}, calculado {d['consumo_calculado']}")
+
+            if resultado['corrigidas']:
+                print("  - Executado e consumo corrigidos")
+
+            print()
+            print("=" * 70)
+            print(" JOB CONCLUIDO")
+            print("=" * 70)
+
+        except Exception as e:
+            print(f"ERRO ao verificar executado: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+        if (resultado['divergencias_faturas'] or resultado['divergencias_consumo']) and not resultado['corrigidas']:
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    verificar_executado_faturas(corrigir='--corrigir' in sys.argv[1:])
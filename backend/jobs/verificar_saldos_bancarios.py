@@ -0,0 +1,79 @@
+"""
+Job Diário: Verificar Saldos das Contas Bancárias
+
+saldo_atual e os checkpoints mensais do extrato (SaldoBancarioMensal) são
+mantidos por delta a cada movimento (insert/edição/exclusão). Este job
+recomputa ambos a partir dos movimentos e relata as divergências.
+
+Pode ser agendado via:
+- Cron (Linux/Mac): 0 3 * * * python backend/jobs/verificar_saldos_bancarios.py
+- Task Scheduler (Windows)
+- APScheduler (backend/scheduler.py)
+
+Executar manualmente: python backend/jobs/verificar_saldos_bancarios.py [--corrigir]
+Código de saída 2 quando há divergências não corrigidas.
+"""
+import sys
+import os
+from datetime import date
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from backend.app import app
+    from backend.models import db
+    from backend.services.conta_bancaria_service import ContaBancariaService
+except ImportError:
+    from app import app
+    from models import db
+    from services.conta_bancaria_service import ContaBancariaService
+
+
+def verificar_saldos_bancarios(corrigir=False):
+    """
+    Relata (e opcionalmente corrige) contas com saldo_atual divergente
+    """
+    with app.app_context():
+        print("=" * 70)
+        print(f" JOB: Verificacao de Saldos Bancarios - {date.today().strftime('%d/%m/%Y')}")
+        print("=" * 70)
+        print()
+
+        try:
+            resultado = ContaBancariaService.verificar_saldos(corrigir=corrigir)
+            if resultado['corrigidas']:
+                db.session.commit()
+
+            print(f"OK - {resultado['contas_verificadas']} contas verificadas")
+            print(f"  - Divergencias: {len(resultado['divergencias'])}")
+            print(f"  - Checkpoints divergentes: {len(resultado['checkpoints_divergentes'])}")
+
+            for d in resultado['divergencias']:
+                print(f"  [AVISO] Conta {d['conta_bancaria_id']} ({d['nome']}): "
+                      f"registrado {d['saldo_registrado']}, calculado {d['saldo_calculado']} "
+                      f"(diferenca {d['diferenca']})")
+
+            for conta_id in resultado['checkpoints_divergentes']:
+                print(f"  [AVISO] Conta {conta_id}: checkpoints mensais divergentes")
+
+            if resultado['corrigidas']:
+                print("  - Saldos e checkpoints corrigidos")
+
+            print()
+            print("=" * 70)
+            print(" JOB CONCLUIDO")
+            print("=" * 70)
+
+        except Exception as e:
+            print(f"ERRO ao verificar saldos: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+        if (resultado['divergencias'] or resultado['checkpoints_divergentes']) and not resultado['corrigidas']:
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    verificar_saldos_bancarios(corrigir='--corrigir' in sys.argv[1:])
@@ -0,0 +1,32 @@
+"""Add purchase fingerprint to lancamento_agregado (idempotent CSV re-import)
+
+Revision ID: add_assinatura_compra
+Revises: add_saldo_bancario_mensal
+Create Date: 2026-10-17
+
+Lançamentos importados antes desta revisão ficam sem assinatura (NULL não
+colide no índice único).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_assinatura_compra'
+down_revision = 'add_saldo_bancario_mensal'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('lancamento_agregado', sa.Column('assinatura_compra', sa.String(length=64), nullable=True))
+    # 1 lançamento por compra importada/parcela
+    op.create_index(
+        'uq_lanc_assinatura_parcela', 'lancamento_agregado', ['assinatura_compra', 'numero_parcela'],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index('uq_lanc_assinatura_parcela', table_name='lancamento_agregado')
+    op.drop_column('lancamento_agregado', 'assinatura_compra')
@@ -0,0 +1,89 @@
+"""Add per-category monthly card consumption (kept by delta on lancamento writes)
+
+Revision ID: add_consumo_agregado
+Revises: add_idx_orcamento_vigencia
+Create Date: 2026-10-17
+
+Também alinha conta.valor_executado das faturas de cartão com a soma de
+todos os lançamentos do cartão na competência (daqui em diante mantido por
+delta).
+"""
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_consumo_agregado'
+down_revision = 'add_idx_orcamento_vigencia'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    consumo = op.create_table(
+        'consumo_agregado',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('item_agregado_id', sa.Integer(), sa.ForeignKey('item_agregado.id'), nullable=False),
+        sa.Column('mes', sa.Date(), nullable=False),
+        sa.Column('total', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.Column('atualizado_em', sa.DateTime()),
+    )
+    op.create_index('uq_consumo_agregado_item_mes', 'consumo_agregado',
+                    ['item_agregado_id', 'mes'], unique=True)
+
+    lancamento = sa.table(
+        'lancamento_agregado',
+        sa.column('cartao_id', sa.Integer),
+        sa.column('item_agregado_id', sa.Integer),
+        sa.column('mes_fatura', sa.Date),
+        sa.column('valor', sa.Numeric(10, 2)),
+    )
+    conta = sa.table(
+        'conta',
+        sa.column('id', sa.Integer),
+        sa.column('item_despesa_id', sa.Integer),
+        sa.column('is_fatura_cartao', sa.Boolean),
+        sa.column('cartao_competencia', sa.Date),
+        sa.column('valor_executado', sa.Numeric(10, 2)),
+    )
+    bind = op.get_bind()
+
+    executados = {}
+    consumos = {}
+    for cartao_id, item_id, mes_fatura, total in bind.execute(
+        sa.select(
+            lancamento.c.cartao_id,
+            lancamento.c.item_agregado_id,
+            lancamento.c.mes_fatura,
+            sa.func.sum(lancamento.c.valor),
+        ).group_by(lancamento.c.cartao_id, lancamento.c.item_agregado_id, lancamento.c.mes_fatura)
+    ):
+        mes = mes_fatura.replace(day=1)
+        total = Decimal(str(total or 0))
+        executados[(cartao_id, mes)] = executados.get((cartao_id, mes), Decimal('0')) + total
+        if item_id is not None:
+            consumos[(item_id, mes)] = consumos.get((item_id, mes), Decimal('0')) + total
+
+    if consumos:
+        op.bulk_insert(consumo, [
+            {'item_agregado_id': item_id, 'mes': mes, 'total': total}
+            for (item_id, mes), total in sorted(consumos.items())
+        ])
+
+    faturas = bind.execute(
+        sa.select(conta.c.id, conta.c.item_despesa_id, conta.c.cartao_competencia)
+        .where(conta.c.is_fatura_cartao == sa.true(), conta.c.cartao_competencia.isnot(None))
+    ).all()
+    for fatura_id, cartao_id, competencia in faturas:
+        bind.execute(
+            conta.update().where(conta.c.id == fatura_id).values(
+                valor_executado=executados.get((cartao_id, competencia.replace(day=1)), Decimal('0'))
+            )
+        )
+
+
+def downgrade():
+    op.drop_index('uq_consumo_agregado_item_mes', table_name='consumo_agregado')
+    op.drop_table('consumo_agregado')
@@ -0,0 +1,26 @@
+"""Add vigência index to orcamento_agregado (active budget of an item in a month)
+
+Revision ID: add_idx_orcamento_vigencia
+Revises: add_assinatura_compra
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_idx_orcamento_vigencia'
+down_revision = 'add_assinatura_compra'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Orçamento vigente: item + ativo + vigencia_inicio <= mês
+    op.create_index(
+        'idx_orc_agregado_vigencia', 'orcamento_agregado', ['item_agregado_id', 'ativo', 'vigencia_inicio']
+    )
+
+
+def downgrade():
+    op.drop_index('idx_orc_agregado_vigencia', table_name='orcamento_agregado')
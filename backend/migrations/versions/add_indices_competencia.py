@@ -0,0 +1,30 @@
+"""Add competence indexes (range filters on mes_referencia / mes_fatura)
+
+Revision ID: add_indices_competencia
+Revises: add_resumo_competencia
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_indices_competencia'
+down_revision = 'add_resumo_competencia'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dashboard: despesas comuns x faturas de cartão do mês
+    op.create_index('idx_conta_mes_fatura_cartao', 'conta', ['mes_referencia', 'is_fatura_cartao'])
+    # Executado da fatura: todos os lançamentos do cartão na competência
+    op.create_index('idx_lanc_agregado_cartao_fatura', 'lancamento_agregado', ['cartao_id', 'mes_fatura'])
+    # Receitas previstas do mês
+    op.create_index('idx_rec_orc_competencia', 'receita_orcamento', ['mes_referencia'])
+
+
+def downgrade():
+    op.drop_index('idx_rec_orc_competencia', table_name='receita_orcamento')
+    op.drop_index('idx_lanc_agregado_cartao_fatura', table_name='lancamento_agregado')
+    op.drop_index('idx_conta_mes_fatura_cartao', table_name='conta')
@@ -0,0 +1,25 @@
+"""Add materializado_ate (recurring materialization watermark) to item_despesa
+
+Revision ID: add_materializado_ate
+Revises: add_indices_competencia
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_materializado_ate'
+down_revision = 'add_indices_competencia'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Último mês (YYYY-MM-01) já materializado pelo RecorrenciaService
+    op.add_column('item_despesa', sa.Column('materializado_ate', sa.Date(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('item_despesa', 'materializado_ate')
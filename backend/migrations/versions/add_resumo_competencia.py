@@ -0,0 +1,40 @@
+"""Add materialized monthly summary for the dashboard (resumo_competencia)
+
+Revision ID: add_resumo_competencia
+Revises: add_cartao_id_lanc
+Create Date: 2026-10-17
+
+Tabela derivada: nasce vazia e os meses são materializados sob demanda pelo
+ResumoCompetenciaService na primeira leitura do dashboard.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_resumo_competencia'
+down_revision = 'add_cartao_id_lanc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resumo_competencia',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('mes_referencia', sa.Date(), nullable=False),
+        sa.Column('total_despesas_comuns', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('total_faturas', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('faturas_previsto', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('faturas_executado', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('receitas_realizadas', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('receitas_previstas', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('categorias_json', sa.Text()),
+        sa.Column('atualizado_em', sa.DateTime()),
+    )
+    op.create_index('idx_resumo_comp_mes', 'resumo_competencia', ['mes_referencia'], unique=True)
+
+
+def downgrade():
+    op.drop_index('idx_resumo_comp_mes', table_name='resumo_competencia')
+    op.drop_table('resumo_competencia')
@@ -0,0 +1,77 @@
+"""Add monthly bank balance checkpoints (statement running balance)
+
+Revision ID: add_saldo_bancario_mensal
+Revises: add_unique_recorrencia
+Create Date: 2026-10-17
+
+"""
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_saldo_bancario_mensal'
+down_revision = 'add_unique_recorrencia'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    saldo_mensal = op.create_table(
+        'saldo_bancario_mensal',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('conta_bancaria_id', sa.Integer(), sa.ForeignKey('conta_bancaria.id'), nullable=False),
+        sa.Column('mes', sa.Date(), nullable=False),
+        sa.Column('acumulado', sa.Numeric(15, 2), nullable=False, server_default='0'),
+        sa.Column('atualizado_em', sa.DateTime()),
+    )
+    op.create_index('uq_saldo_bancario_conta_mes', 'saldo_bancario_mensal',
+                    ['conta_bancaria_id', 'mes'], unique=True)
+    # Extrato paginado por conta em ordem de data
+    op.create_index('idx_movimento_conta_data', 'movimento_financeiro',
+                    ['conta_bancaria_id', 'data_movimento', 'id'])
+
+    # Checkpoints a partir dos movimentos existentes (acumulado de fechamento por mês)
+    movimento = sa.table(
+        'movimento_financeiro',
+        sa.column('conta_bancaria_id', sa.Integer),
+        sa.column('data_movimento', sa.Date),
+        sa.column('tipo', sa.String),
+        sa.column('valor', sa.Numeric(15, 2)),
+    )
+    totais = op.get_bind().execute(
+        sa.select(
+            movimento.c.conta_bancaria_id,
+            movimento.c.data_movimento,
+            sa.func.sum(sa.case(
+                (movimento.c.tipo == 'CREDITO', movimento.c.valor),
+                (movimento.c.tipo == 'DEBITO', -movimento.c.valor),
+                else_=0,
+            )),
+        ).group_by(
+            movimento.c.conta_bancaria_id, movimento.c.data_movimento
+        ).order_by(
+            movimento.c.conta_bancaria_id, movimento.c.data_movimento
+        )
+    )
+
+    linhas = []
+    for conta_bancaria_id, data_movimento, total in totais:
+        mes = data_movimento.replace(day=1)
+        anterior = linhas[-1] if linhas and linhas[-1]['conta_bancaria_id'] == conta_bancaria_id else None
+        acumulado = (anterior['acumulado'] if anterior else Decimal('0')) + Decimal(str(total or 0))
+        if anterior and anterior['mes'] == mes:
+            anterior['acumulado'] = acumulado
+        else:
+            linhas.append({'conta_bancaria_id': conta_bancaria_id, 'mes': mes, 'acumulado': acumulado})
+
+    if linhas:
+        op.bulk_insert(saldo_mensal, linhas)
+
+
+def downgrade():
+    op.drop_index('idx_movimento_conta_data', table_name='movimento_financeiro')
+    op.drop_index('uq_saldo_bancario_conta_mes', table_name='saldo_bancario_mensal')
+    op.drop_table('saldo_bancario_mensal')
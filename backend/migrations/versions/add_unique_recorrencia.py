@@ -0,0 +1,121 @@
+"""Add unique indexes for idempotent recurring generation
+
+Revision ID: add_unique_recorrencia
+Revises: add_materializado_ate
+Create Date: 2026-10-17
+
+O gerador antigo (GET) não era idempotente: antes de criar os índices, as
+duplicatas existentes são removidas, mantendo uma linha por chave:
+- conta(item_despesa_id, data_vencimento) fora de financiamentos: a paga
+  de menor id (senão a de menor id); movimentos financeiros e parcelas que
+  apontavam para as removidas passam a apontar para a mantida
+- lancamento_agregado(item_despesa_id, mes_fatura) recorrentes: a de menor id
+
+Os resumos materializados (resumo_competencia) são descartados se algo for
+removido (recalculados na leitura). O downgrade não restaura as duplicatas.
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_unique_recorrencia'
+down_revision = 'add_materializado_ate'
+branch_labels = None
+depends_on = None
+
+
+conta = sa.table(
+    'conta',
+    sa.column('id', sa.Integer),
+    sa.column('item_despesa_id', sa.Integer),
+    sa.column('data_vencimento', sa.Date),
+    sa.column('financiamento_parcela_id', sa.Integer),
+    sa.column('status_pagamento', sa.String),
+)
+lancamento = sa.table(
+    'lancamento_agregado',
+    sa.column('id', sa.Integer),
+    sa.column('item_despesa_id', sa.Integer),
+    sa.column('mes_fatura', sa.Date),
+    sa.column('is_recorrente', sa.Boolean),
+)
+
+# (tabela, coluna) com FK para conta.id
+REFERENCIAS_CONTA = (
+    ('movimento_financeiro', 'fatura_id'),
+    ('movimento_financeiro', 'conta_id'),
+    ('financiamento_parcela', 'conta_id'),
+)
+
+
+def _remover_duplicadas(bind, tabela, chave, filtro, preferencia, referencias=()):
+    """
+    Mantém uma linha por chave (menor preferencia, depois menor id), reaponta
+    as referências para ela e apaga as demais
+
+    Returns:
+        int: Linhas removidas
+    """
+    colunas = [tabela.c[c] for c in chave]
+    grupos = sa.select(*colunas).where(
+        filtro, *(coluna.isnot(None) for coluna in colunas)
+    ).group_by(*colunas).having(sa.func.count() > 1).subquery()
+
+    linhas = bind.execute(
+        sa.select(tabela.c.id, *colunas)
+        .select_from(tabela.join(grupos, sa.and_(*(coluna == grupos.c[coluna.name] for coluna in colunas))))
+        .where(filtro)
+        .order_by(*colunas, preferencia, tabela.c.id)
+    ).all()
+
+    removidas = 0
+    for _, grupo in groupby(linhas, key=lambda linha: tuple(linha[1:])):
+        mantida, *duplicadas = [linha[0] for linha in grupo]
+        for nome_tabela, nome_coluna in referencias:
+            ref = sa.table(nome_tabela, sa.column(nome_coluna, sa.Integer))
+            bind.execute(
+                ref.update().where(ref.c[nome_coluna].in_(duplicadas)).values({nome_coluna: mantida})
+            )
+        bind.execute(tabela.delete().where(tabela.c.id.in_(duplicadas)))
+        removidas += len(duplicadas)
+    return removidas
+
+
+def upgrade():
+    bind = op.get_bind()
+    removidas = _remover_duplicadas(
+        bind, conta, ('item_despesa_id', 'data_vencimento'),
+        conta.c.financiamento_parcela_id.is_(None),
+        sa.case((conta.c.status_pagamento == 'Pago', 0), else_=1),
+        REFERENCIAS_CONTA,
+    )
+    removidas += _remover_duplicadas(
+        bind, lancamento, ('item_despesa_id', 'mes_fatura'),
+        lancamento.c.is_recorrente == sa.true(),
+        sa.literal(0),
+    )
+    if removidas:
+        bind.execute(sa.text('DELETE FROM resumo_competencia'))
+
+    # 1 conta por item/vencimento (contas de parcelas de financiamento ficam de fora)
+    op.create_index(
+        'uq_conta_item_vencimento', 'conta', ['item_despesa_id', 'data_vencimento'],
+        unique=True,
+        postgresql_where=sa.text('financiamento_parcela_id IS NULL'),
+        sqlite_where=sa.text('financiamento_parcela_id IS NULL'),
+    )
+    # 1 lançamento recorrente por item/mês de fatura
+    op.create_index(
+        'uq_lanc_recorrente_item_mes', 'lancamento_agregado', ['item_despesa_id', 'mes_fatura'],
+        unique=True,
+        postgresql_where=sa.text('is_recorrente = true'),
+        sqlite_where=sa.text('is_recorrente = 1'),
+    )
+
+
+def downgrade():
+    op.drop_index('uq_lanc_recorrente_item_mes', table_name='lancamento_agregado')
+    op.drop_index('uq_conta_item_vencimento', table_name='conta')
@@ -74,6 +74,9 @@ class ItemDespesa(db.Model):
     cartao_id = db.Column(db.Integer, db.ForeignKey('item_despesa.id'), nullable=True)  # Obrigatório quando meio_pagamento='cartao'
     item_agregado_id = db.Column(db.Integer, db.ForeignKey('item_agregado.id'), nullable=True)  # Categoria do cartão (opcional)
 
+    # Watermark da materialização de recorrências/faturas (RecorrenciaService)
+    materializado_ate = db.Column(db.Date)  # Último mês (YYYY-MM-01) já gerado
+
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relacionamentos
@@ -276,6 +279,13 @@ class Conta(db.Model):
         db.Index('idx_conta_vencimento', 'data_vencimento'),
         db.Index('idx_conta_status', 'status_pagamento'),
         db.Index('idx_conta_item_mes', 'item_despesa_id', 'mes_referencia'),
+        # Filtros por competência do dashboard (despesas comuns x faturas de cartão)
+        db.Index('idx_conta_mes_fatura_cartao', 'mes_referencia', 'is_fatura_cartao'),
+        # Idempotência da geração de recorrências: 1 conta por item/vencimento
+        # (contas de parcelas de financiamento ficam de fora: seguem o cronograma)
+        db.Index('uq_conta_item_vencimento', 'item_despesa_id', 'data_vencimento', unique=True,
+                 sqlite_where=financiamento_parcela_id.is_(None),
+                 postgresql_where=financiamento_parcela_id.is_(None)),
     )
 
     def __repr__(self):
@@ -421,6 +431,8 @@ class OrcamentoAgregado(db.Model):
     # Índice composto
     __table_args__ = (
         db.Index('idx_orc_agregado_item_mes', 'item_agregado_id', 'mes_referencia'),
+        # Orçamento vigente do item: ativo=True AND vigencia_inicio <= mês (maior início primeiro)
+        db.Index('idx_orc_agregado_vigencia', 'item_agregado_id', 'ativo', 'vigencia_inicio'),
     )
 
     def __repr__(self):
@@ -469,7 +481,12 @@ class LancamentoAgregado(db.Model):
     # Identificador único da compra (para parcelamento)
     # Permite identificar que parcelas pertencem à mesma compra original
     # FASE 2: Idempotência robusta - todas as parcelas de uma compra compartilham o mesmo UUID
-    compra_id = db.Column(db.String(36), nullable=True, index=True)  # UUID v4
+    compra_id = db.Column(db.String(36), nullable=True, index=True)  # UUID v4 (importação CSV: UUID v5 da assinatura)
+
+    # Impressão digital da compra importada (SHA-256 de cartão, descrição normalizada,
+    # data da 1ª parcela, valor da parcela, total de parcelas e ocorrência no arquivo).
+    # Reimportar o mesmo extrato não duplica lançamentos (uq_lanc_assinatura_parcela)
+    assinatura_compra = db.Column(db.String(64), nullable=True)
 
     # Campos para importação CSV (FASE 6.2)
     descricao_original = db.Column(db.Text, nullable=True)  # Texto bruto do CSV (imutável)
@@ -495,6 +512,14 @@ class LancamentoAgregado(db.Model):
         db.Index('idx_lanc_agregado_data', 'data_compra'),
         db.Index('idx_lanc_agregado_fatura', 'mes_fatura'),
         db.Index('idx_lanc_agregado_item_fatura', 'item_agregado_id', 'mes_fatura'),
+        # Executado da fatura (todos os lançamentos do cartão na competência)
+        db.Index('idx_lanc_agregado_cartao_fatura', 'cartao_id', 'mes_fatura'),
+        # Idempotência da recorrência paga via cartão: 1 lançamento por item/mês
+        db.Index('uq_lanc_recorrente_item_mes', 'item_despesa_id', 'mes_fatura', unique=True,
+                 sqlite_where=is_recorrente == True,
+                 postgresql_where=is_recorrente == True),
+        # Idempotência da importação CSV: 1 lançamento por compra/parcela
+        db.Index('uq_lanc_assinatura_parcela', 'assinatura_compra', 'numero_parcela', unique=True),
     )
 
     def __repr__(self):
@@ -516,6 +541,31 @@ class LancamentoAgregado(db.Model):
         }
 
 
+class ConsumoAgregado(db.Model):
+    """
+    Consumo mensal de uma categoria do cartão (ItemAgregado)
+
+    Tabela DERIVADA: nunca é editada pelo usuário. É mantida pelo
+    FaturaCartaoService por delta a cada escrita de LancamentoAgregado.
+
+    total = soma de LancamentoAgregado.valor do item com mes_fatura no mês.
+    """
+    __tablename__ = 'consumo_agregado'
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_agregado_id = db.Column(db.Integer, db.ForeignKey('item_agregado.id'), nullable=False)
+    mes = db.Column(db.Date, nullable=False)  # Primeiro dia do mês (YYYY-MM-01)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_consumo_agregado_item_mes', 'item_agregado_id', 'mes', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<ConsumoAgregado item={self.item_agregado_id} {self.mes} {self.total}>'
+
+
 class ItemReceita(db.Model):
     """
     Fonte de receita com tipos bem definidos
@@ -604,6 +654,7 @@ class ReceitaOrcamento(db.Model):
     # Índice composto
     __table_args__ = (
         db.Index('idx_rec_orc_item_mes', 'item_receita_id', 'mes_referencia'),
+        db.Index('idx_rec_orc_competencia', 'mes_referencia'),
     )
 
     def __repr__(self):
@@ -699,6 +750,77 @@ class ReceitaRealizada(db.Model):
         return result
 
 
+class ResumoCompetencia(db.Model):
+    """
+    Resumo materializado de um mês de competência (leitura do dashboard)
+
+    Tabela DERIVADA: nunca é editada pelo usuário. É mantida pelo
+    ResumoCompetenciaService a partir de Conta, LancamentoAgregado,
+    OrcamentoAgregado, ReceitaOrcamento e ReceitaRealizada.
+
+    Regra soberana de fatura aplicada em total_faturas:
+    - Fatura paga → executado
+    - Fatura pendente → previsto
+    """
+    __tablename__ = 'resumo_competencia'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mes_referencia = db.Column(db.Date, nullable=False)  # Primeiro dia do mês (YYYY-MM-01)
+
+    # Despesas
+    total_despesas_comuns = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Conta sem fatura de cartão
+    total_faturas = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Faturas com regra soberana
+    faturas_previsto = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    faturas_executado = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    # Receitas
+    receitas_realizadas = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    receitas_previstas = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Apenas orçamentos NÃO confirmados
+
+    # Somas por categoria (JSON: {"categoria_id": valor})
+    categorias_json = db.Column(db.Text)
+
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_resumo_comp_mes', 'mes_referencia', unique=True),
+    )
+
+    @property
+    def total_despesas(self):
+        return (self.total_despesas_comuns or 0) + (self.total_faturas or 0)
+
+    @property
+    def total_receitas(self):
+        return (self.receitas_realizadas or 0) + (self.receitas_previstas or 0)
+
+    def categorias(self):
+        if not self.categorias_json:
+            return {}
+        try:
+            return {int(k): float(v) for k, v in json.loads(self.categorias_json).items()}
+        except Exception:
+            return {}
+
+    def __repr__(self):
+        return f'<ResumoCompetencia {self.mes_referencia} Desp:R${self.total_despesas}>'
+
+    def to_dict(self):
+        return {
+            'mes_referencia': self.mes_referencia.strftime('%Y-%m-%d'),
+            'total_despesas_comuns': float(self.total_despesas_comuns or 0),
+            'total_faturas': float(self.total_faturas or 0),
+            'faturas_previsto': float(self.faturas_previsto or 0),
+            'faturas_executado': float(self.faturas_executado or 0),
+            'total_despesas': float(self.total_despesas),
+            'receitas_realizadas': float(self.receitas_realizadas or 0),
+            'receitas_previstas': float(self.receitas_previstas or 0),
+            'total_receitas': float(self.total_receitas),
+            'categorias': self.categorias(),
+            'atualizado_em': self.atualizado_em.strftime('%Y-%m-%d %H:%M:%S') if self.atualizado_em else None
+        }
+
+
 # ============================================================================
 # MÓDULO 2: AUTOMAÇÃO (CONSÓRCIOS)
 # ============================================================================
@@ -935,23 +1057,17 @@ class Financiamento(db.Model):
         - FinanciamentoSeguroVigencia ou None
 
         Lança ValueError se não houver vigência cadastrada
+
+        Busca em memória na VigenciaTimeline do financiamento (sem consulta
+        por chamada quando a linha do tempo já está em cache).
         """
-        from sqlalchemy import and_
-
-        vigencia = FinanciamentoSeguroVigencia.query.filter(
-            and_(
-                FinanciamentoSeguroVigencia.financiamento_id == self.id,
-                FinanciamentoSeguroVigencia.competencia_inicio <= data_referencia,
-                db.or_(
-                    FinanciamentoSeguroVigencia.data_encerramento == None,
-                    FinanciamentoSeguroVigencia.data_encerramento >= data_referencia
-                )
-            )
-        ).order_by(
-            FinanciamentoSeguroVigencia.competencia_inicio.desc()
-        ).first()
-
-        return vigencia
+        try:
+            from backend.services.seguro_vigencia_service import VigenciaTimeline
+        except ImportError:
+            from services.seguro_vigencia_service import VigenciaTimeline
+
+        vigencia = VigenciaTimeline.do_financiamento(self.id).vigente_em(data_referencia)
+        return db.session.get(FinanciamentoSeguroVigencia, vigencia.id) if vigencia else None
 
     def to_dict(self):
         # ========================================================================
@@ -1312,6 +1428,7 @@ class MovimentoFinanceiro(db.Model):
         db.Index('idx_movimento_conta', 'conta_bancaria_id'),
         db.Index('idx_movimento_data', 'data_movimento'),
         db.Index('idx_movimento_fatura', 'fatura_id'),
+        db.Index('idx_movimento_conta_data', 'conta_bancaria_id', 'data_movimento', 'id'),  # Extrato paginado
     )
 
     def __repr__(self):
@@ -1335,6 +1452,33 @@ class MovimentoFinanceiro(db.Model):
         }
 
 
+class SaldoBancarioMensal(db.Model):
+    """
+    Checkpoint mensal do saldo de uma conta bancária (extrato)
+
+    Tabela DERIVADA: nunca é editada pelo usuário. É mantida pelo
+    ContaBancariaService a partir de MovimentoFinanceiro.
+
+    acumulado = créditos - débitos de todos os movimentos da conta até o fim
+    do mês. Saldo de fechamento do mês = saldo_inicial + acumulado.
+    Meses sem linha têm o mesmo acumulado do último mês anterior com linha.
+    """
+    __tablename__ = 'saldo_bancario_mensal'
+
+    id = db.Column(db.Integer, primary_key=True)
+    conta_bancaria_id = db.Column(db.Integer, db.ForeignKey('conta_bancaria.id'), nullable=False)
+    mes = db.Column(db.Date, nullable=False)  # Primeiro dia do mês (YYYY-MM-01)
+    acumulado = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_saldo_bancario_conta_mes', 'conta_bancaria_id', 'mes', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<SaldoBancarioMensal conta={self.conta_bancaria_id} {self.mes} {self.acumulado}>'
+
+
 # ============================================================================
 # MÓDULO 4: PREFERÊNCIAS E CONFIGURAÇÕES GERAIS
 # ============================================================================
@@ -4,9 +4,12 @@ Rotas para gerenciamento de Cartões de Crédito
 from flask import Blueprint, request, jsonify
 from backend.models import db, ItemDespesa, ConfigAgregador, ItemAgregado, OrcamentoAgregado, LancamentoAgregado, Categoria
 from backend.services.cartao_service import CartaoService
+from backend.services.resumo_cartao_service import ResumoCartaoService
+from backend.services.alerta_cartao_service import AlertaCartaoService
+from backend.services.fatura_cartao_service import FaturaCartaoService
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func, and_
+from sqlalchemy import and_
 
 cartoes_bp = Blueprint('cartoes', __name__, url_prefix='/api/cartoes')
 
@@ -710,47 +713,11 @@ def obter_resumo_cartao(cartao_id):
         if not cartao:
             return jsonify({'erro': 'Cartão não encontrado'}), 404
 
-        # Calcular EXECUTADO TOTAL do cartão (TODOS os lançamentos, com ou sem categoria)
-        total_gasto_cartao = db.session.query(func.sum(LancamentoAgregado.valor)).filter(
-            LancamentoAgregado.cartao_id == cartao_id,
-            LancamentoAgregado.mes_fatura == mes_ref_date
-        ).scalar() or 0
-        total_gasto_cartao = float(total_gasto_cartao)
-
-        # Buscar itens agregados ativos (categorias)
-        itens = ItemAgregado.query.filter_by(item_despesa_id=cartao_id, ativo=True).all()
-
-        resumo_itens = []
-        total_orcado = 0
-
-        for item in itens:
-            # Buscar orçamento do mês
-            orcamento = OrcamentoAgregado.query.filter_by(
-                item_agregado_id=item.id,
-                mes_referencia=mes_ref_date
-            ).first()
-
-            # Buscar gastos do mês (apenas lançamentos DESTA categoria)
-            gastos = LancamentoAgregado.query.filter_by(
-                item_agregado_id=item.id,
-                mes_fatura=mes_ref_date
-            ).all()
-
-            valor_orcado = float(orcamento.valor_teto) if orcamento else 0
-            valor_gasto = sum(float(g.valor) for g in gastos)
-
-            total_orcado += valor_orcado
-
-            resumo_itens.append({
-                'id': item.id,
-                'nome': item.nome,
-                'descricao': item.descricao,
-                'valor_orcado': valor_orcado,
-                'valor_gasto': valor_gasto,
-                'saldo': valor_orcado - valor_gasto,
-                'percentual_utilizado': round((valor_gasto / valor_orcado * 100) if valor_orcado > 0 else 0, 2),
-                'orcamento_id': orcamento.id if orcamento else None
-            })
+        # Orçado x gasto por categoria (consulta agrupada, em cache por cartão/mês)
+        resumo = ResumoCartaoService.obter(cartao_id, mes_ref_date)
+        total_orcado = resumo['total_orcado']
+        total_gasto_cartao = resumo['total_gasto']  # Todos os lançamentos, com ou sem categoria
+        resumo_itens = resumo['itens']
 
         resultado = {
             'cartao': cartao.to_dict(),
@@ -894,6 +861,56 @@ def obter_alertas():
         }), 500
 
 
+@cartoes_bp.route('/alertas/alteracoes', methods=['GET'])
+def obter_alteracoes_alertas():
+    """
+    Alertas de orçamento alterados desde a última consulta (polling)
+
+    Query params:
+        - desde (opcional): Cursor devolvido pela consulta anterior (ausente = lista completa;
+          cursor de outro worker ou de antes de um restart também recebe a lista completa)
+        - cartao_id (opcional): ID do cartão para filtrar
+        - mes_referencia (opcional): Mês no formato YYYY-MM (padrão: mês atual)
+
+    Returns:
+        {
+            'success': bool,
+            'data': {
+                'cursor': str,
+                'completo': bool,
+                'alteracoes': [{'cursor': str, 'acao': 'novo'|'alterado'|'resolvido', 'alerta': dict}]
+            }
+        }
+    """
+    try:
+        desde = request.args.get('desde', '')
+        cartao_id = request.args.get('cartao_id', type=int)
+        mes_referencia = request.args.get('mes_referencia')
+
+        # Converter mes_referencia para date
+        if mes_referencia:
+            competencia = datetime.strptime(mes_referencia + '-01', '%Y-%m-%d').date()
+        else:
+            competencia = None
+
+        alteracoes = AlertaCartaoService.alteracoes(
+            competencia=competencia,
+            desde=desde,
+            cartao_id=cartao_id
+        )
+
+        return jsonify({
+            'success': True,
+            'data': alteracoes
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'erro': str(e)
+        }), 500
+
+
 @cartoes_bp.route('/<int:cartao_id>/alertas', methods=['GET'])
 def obter_alertas_cartao(cartao_id):
     """
@@ -929,3 +946,50 @@ def obter_alertas_cartao(cartao_id):
             'erro': str(e)
         }), 500
 
+
+@cartoes_bp.route('/verificar-executado', methods=['GET', 'POST'])
+def verificar_executado():
+    """
+    Verificação administrativa: compara o executado das faturas e o consumo
+    por categoria (mantidos por delta) com a soma completa dos lançamentos.
+
+    GET: apenas relata as divergências.
+    POST: Body (JSON) {"corrigir": true} grava os valores recalculados.
+    """
+    try:
+        corrigir = request.method == 'POST' and bool((request.get_json(silent=True) or {}).get('corrigir'))
+        resultado = FaturaCartaoService.verificar(corrigir=corrigir)
+        if resultado['corrigidas']:
+            db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'faturas_verificadas': resultado['faturas_verificadas'],
+                'corrigidas': resultado['corrigidas'],
+                'divergencias_faturas': [
+                    {
+                        'fatura_id': d['fatura_id'],
+                        'cartao_id': d['cartao_id'],
+                        'competencia': d['competencia'].strftime('%Y-%m'),
+                        'executado_registrado': float(d['executado_registrado']),
+                        'executado_calculado': float(d['executado_calculado']),
+                        'diferenca': float(d['diferenca']),
+                    }
+                    for d in resultado['divergencias_faturas']
+                ],
+                'divergencias_consumo': [
+                    {
+                        'item_agregado_id': d['item_agregado_id'],
+                        'mes': d['mes'].strftime('%Y-%m'),
+                        'consumo_registrado': float(d['consumo_registrado']),
+                        'consumo_calculado': float(d['consumo_calculado']),
+                        'diferenca': float(d['diferenca']),
+                    }
+                    for d in resultado['divergencias_consumo']
+                ],
+            }
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'erro': str(e)}), 500
@@ -7,8 +7,10 @@ from dateutil.relativedelta import relativedelta
 
 try:
     from backend.models import db, ContratoConsorcio, ItemDespesa, ItemReceita, Categoria, Conta, ReceitaRealizada
+    from backend.services.resumo_competencia_service import ResumoCompetenciaService
 except ImportError:
     from models import db, ContratoConsorcio, ItemDespesa, ItemReceita, Categoria, Conta, ReceitaRealizada
+    from services.resumo_competencia_service import ResumoCompetenciaService
 
 consorcios_bp = Blueprint('consorcios', __name__, url_prefix='/api/consorcios')
 
@@ -334,13 +336,17 @@ def deletar_consorcio(id):
         parcela_ids = [p.id for p in parcelas]
 
         if parcela_ids:
-            ItemDespesa.query.filter(ItemDespesa.id.in_(parcela_ids)).update(
+            # Lotes com os meses marcados: o resumo recalcula só esses meses
+            ItemDespesa.query.filter(ItemDespesa.id.in_(parcela_ids)).execution_options(
+                resumo_competencia_marcado=True
+            ).update(
                 {'ativo': False},
                 synchronize_session=False
             )
-            Conta.query.filter(
-                Conta.item_despesa_id.in_(parcela_ids),
-                Conta.status_pagamento != 'Pago',
+            pendentes = (Conta.item_despesa_id.in_(parcela_ids), Conta.status_pagamento != 'Pago')
+            ResumoCompetenciaService.marcar_meses_contas(*pendentes)
+            Conta.query.filter(*pendentes).execution_options(
+                resumo_competencia_marcado=True
             ).delete(synchronize_session=False)
 
         db.session.commit()
@@ -394,8 +400,12 @@ def regenerar_parcelas(id):
         parcelas_antigas = parcelas_query.all()
         ids_antigos = [p.id for p in parcelas_antigas]
         if ids_antigos:
-            Conta.query.filter(Conta.item_despesa_id.in_(ids_antigos)).delete(synchronize_session=False)
-        parcelas_query.delete(synchronize_session=False)
+            ResumoCompetenciaService.marcar_meses_contas(Conta.item_despesa_id.in_(ids_antigos))
+            Conta.query.filter(Conta.item_despesa_id.in_(ids_antigos)).execution_options(
+                resumo_competencia_marcado=True
+            ).delete(synchronize_session=False)
+        # Sem contas vinculadas, a exclusão dos itens não altera o resumo
+        parcelas_query.execution_options(resumo_competencia_marcado=True).delete(synchronize_session=False)
 
         # Gerar novas parcelas
         parcelas = gerar_parcelas_consorcio(consorcio, categoria_id)
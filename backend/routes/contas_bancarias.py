@@ -7,11 +7,11 @@ Endpoints:
 - POST   /api/contas              - Criar nova conta
 - PUT    /api/contas/<id>         - Atualizar conta
 - DELETE /api/contas/<id>         - Inativar conta (não remove do BD)
+- GET/POST /api/contas/verificar-saldos - Conferir (e corrigir) saldos contra os movimentos
 """
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import func, case
 
 try:
     from backend.models import db, ContaBancaria, MovimentoFinanceiro
@@ -364,43 +364,11 @@ def listar_movimentos(id):
         movimentos_dict = [m.to_dict() for m in movimentos]
 
         if incluir_saldo:
-            # saldo base = saldo_inicial + movimentos antes do início (se houver)
-            saldo_base = Decimal(str(conta.saldo_inicial or 0))
-            if data_inicio:
-                anterior = db.session.query(
-                    func.coalesce(
-                        func.sum(case((MovimentoFinanceiro.tipo == 'CREDITO', MovimentoFinanceiro.valor), else_=0)),
-                        0,
-                    ).label('cred'),
-                    func.coalesce(
-                        func.sum(case((MovimentoFinanceiro.tipo == 'DEBITO', MovimentoFinanceiro.valor), else_=0)),
-                        0,
-                    ).label('deb'),
-                ).filter(
-                    MovimentoFinanceiro.conta_bancaria_id == id,
-                    MovimentoFinanceiro.data_movimento < data_inicio
-                ).first()
-                saldo_base = saldo_base + Decimal(str(anterior.cred or 0)) - Decimal(str(anterior.deb or 0))
-
-            # Movimentos do período em ordem asc para calcular saldo_apos
-            query_asc = MovimentoFinanceiro.query.filter_by(conta_bancaria_id=id)
-            if data_inicio:
-                query_asc = query_asc.filter(MovimentoFinanceiro.data_movimento >= data_inicio)
-            if data_fim:
-                query_asc = query_asc.filter(MovimentoFinanceiro.data_movimento <= data_fim)
-            movs_asc = query_asc.order_by(MovimentoFinanceiro.data_movimento.asc(), MovimentoFinanceiro.id.asc()).all()
-
-            saldo_corrente = saldo_base
-            saldo_map = {}
-            for m in movs_asc:
-                if m.tipo == 'CREDITO':
-                    saldo_corrente += Decimal(str(m.valor or 0))
-                elif m.tipo == 'DEBITO':
-                    saldo_corrente -= Decimal(str(m.valor or 0))
-                saldo_map[m.id] = float(saldo_corrente)
-
+            # Saldo corrente a partir do checkpoint mensal: só as linhas da página
+            saldos = ContaBancariaService.saldos_apos_movimentos(conta, movimentos)
             for md in movimentos_dict:
-                md['saldo_apos_movimento'] = saldo_map.get(md['id'])
+                saldo = saldos.get(md['id'])
+                md['saldo_apos_movimento'] = float(saldo) if saldo is not None else None
 
         return jsonify({'success': True, 'data': movimentos_dict}), 200
     except Exception as e:
@@ -428,7 +396,7 @@ def ajuste_saldo(id):
         data_movimento = ContaBancariaService.parse_data(data.get('data_movimento'))
         descricao = (data.get('descricao') or 'Ajuste manual de saldo').strip()
 
-        ContaBancariaService.recalcular_saldo_conta(id)
+        # saldo_atual é mantido por delta a cada movimento (ver verificar-saldos)
         saldo_atual = Decimal(str(conta.saldo_atual or 0))
 
         delta = None
@@ -496,7 +464,6 @@ def editar_movimento(conta_id, mov_id):
         if data.get('data_movimento') is not None:
             mov.data_movimento = ContaBancariaService.parse_data(data.get('data_movimento'))
 
-        ContaBancariaService.recalcular_saldo_conta(conta_id)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Movimento atualizado', 'data': mov.to_dict()}), 200
     except Exception as e:
@@ -518,7 +485,6 @@ def deletar_movimento(conta_id, mov_id):
             return jsonify({'success': False, 'error': 'Apenas movimentos de AJUSTE podem ser excluídos'}), 400
 
         db.session.delete(mov)
-        ContaBancariaService.recalcular_saldo_conta(conta_id)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Movimento excluído'}), 200
     except Exception as e:
@@ -562,3 +528,41 @@ def transferir():
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@contas_bancarias_bp.route('/verificar-saldos', methods=['GET', 'POST'])
+def verificar_saldos():
+    """
+    Verificação administrativa: compara saldo_atual (mantido por delta) com a
+    recomputação completa a partir dos movimentos.
+
+    GET: apenas relata as divergências.
+    POST: Body (JSON) {"corrigir": true} grava o saldo recalculado.
+    """
+    try:
+        corrigir = request.method == 'POST' and bool((request.get_json(silent=True) or {}).get('corrigir'))
+        resultado = ContaBancariaService.verificar_saldos(corrigir=corrigir)
+        if resultado['corrigidas']:
+            db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'contas_verificadas': resultado['contas_verificadas'],
+                'corrigidas': resultado['corrigidas'],
+                'checkpoints_divergentes': resultado['checkpoints_divergentes'],
+                'divergencias': [
+                    {
+                        'conta_bancaria_id': d['conta_bancaria_id'],
+                        'nome': d['nome'],
+                        'saldo_registrado': float(d['saldo_registrado']),
+                        'saldo_calculado': float(d['saldo_calculado']),
+                        'diferenca': float(d['diferenca']),
+                    }
+                    for d in resultado['divergencias']
+                ],
+            }
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -15,140 +15,76 @@ Endpoints:
 """
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from decimal import Decimal
 
 try:
-    from backend.models import db, Conta, Categoria, ItemDespesa, ConfigAgregador, ItemReceita, ReceitaRealizada, ContaBancaria, Financiamento, FinanciamentoParcela, ItemAgregado, ReceitaOrcamento, LancamentoAgregado, OrcamentoAgregado
+    from backend.models import db, Conta, Categoria, ItemDespesa, ConfigAgregador, ItemReceita, ContaBancaria, Financiamento, FinanciamentoParcela, ReceitaOrcamento
+    from backend.services.resumo_competencia_service import ResumoCompetenciaService
+    from backend.services.cartao_service import CartaoService
+    from backend.utils.competencia import filtro_competencia_mes_ano
 except ImportError:
-    from models import db, Conta, Categoria, ItemDespesa, ConfigAgregador, ItemReceita, ReceitaRealizada, ContaBancaria, Financiamento, FinanciamentoParcela, ItemAgregado, ReceitaOrcamento, LancamentoAgregado, OrcamentoAgregado
+    from models import db, Conta, Categoria, ItemDespesa, ConfigAgregador, ItemReceita, ContaBancaria, Financiamento, FinanciamentoParcela, ReceitaOrcamento
+    from services.resumo_competencia_service import ResumoCompetenciaService
+    from services.cartao_service import CartaoService
+    from utils.competencia import filtro_competencia_mes_ano
 
 # Criar blueprint
 dashboard_bp = Blueprint('dashboard', __name__)
 
 
-def decimal_to_float(value):
-    """Converte Decimal para float"""
-    if value is None:
-        return 0.0
-    return float(value) if isinstance(value, Decimal) else value
-
-
-def _calcular_totais_fatura_cartao(cartao_id, competencia):
+@dashboard_bp.after_request
+def persistir_resumos_materializados(response):
     """
-    Calcula (total_previsto, total_executado) para fatura de cartão.
+    Commita os meses de ResumoCompetencia materializados na leitura
 
-    LÓGICA IDÊNTICA ao despesas.py:
-    - total_executado = soma de TODOS LancamentoAgregado do mês
-    - total_previsto = total_executado + complemento de orçamentos não gastos
+    ResumoCompetenciaService.obter_intervalo só grava (flush); a transação
+    é da requisição: commit em respostas de sucesso, rollback nas de erro.
     """
-    comp = competencia.replace(day=1)
-
-    # Total executado = soma de todos os lançamentos do mês
-    total_executado = db.session.query(
-        func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-    ).filter(
-        LancamentoAgregado.cartao_id == cartao_id,
-        LancamentoAgregado.mes_fatura == comp
-    ).scalar()
-    total_executado = float(total_executado or 0)
-
-    # Itens (categorias) do cartão
-    itens = ItemAgregado.query.filter_by(item_despesa_id=cartao_id, ativo=True).all()
-    if not itens:
-        return total_executado, total_executado
-
-    itens_ids = [i.id for i in itens]
-
-    # Gastos por categoria
-    gastos_por_item = dict(
-        db.session.query(
-            LancamentoAgregado.item_agregado_id,
-            func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-        ).filter(
-            LancamentoAgregado.cartao_id == cartao_id,
-            LancamentoAgregado.mes_fatura == comp,
-            LancamentoAgregado.item_agregado_id.in_(itens_ids)
-        ).group_by(
-            LancamentoAgregado.item_agregado_id
-        ).all()
-    )
-
-    # Orçamentos por categoria
-    orcados_por_item = dict(
-        db.session.query(
-            OrcamentoAgregado.item_agregado_id,
-            func.coalesce(func.sum(OrcamentoAgregado.valor_teto), 0)
-        ).filter(
-            OrcamentoAgregado.mes_referencia == comp,
-            OrcamentoAgregado.item_agregado_id.in_(itens_ids)
-        ).group_by(
-            OrcamentoAgregado.item_agregado_id
-        ).all()
-    )
-
-    # Complemento: orçado que ainda não foi gasto
-    complemento_orcamento = 0.0
-    for item_id in itens_ids:
-        gasto = float(gastos_por_item.get(item_id, 0) or 0)
-        orcado = float(orcados_por_item.get(item_id, 0) or 0)
-        if orcado > gasto:
-            complemento_orcamento += (orcado - gasto)
+    if response.status_code < 400:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return response
 
-    total_previsto = total_executado + complemento_orcamento
 
-    return total_previsto, total_executado
+def decimal_to_float(value):
+    """Converte Decimal para float"""
+    if value is None:
+        return 0.0
+    return float(value) if isinstance(value, Decimal) else value
 
 
 def calcular_despesas_mes(mes, ano):
     """
-    Calcula total de despesas do mês aplicando a regra correta para faturas de cartão.
+    Total de despesas do mês aplicando a regra correta para faturas de cartão.
 
     Regra:
     - Despesas comuns: usa Conta.valor diretamente
     - Faturas de cartão:
-        - Se PAGO: usa total_executado (calculado dinamicamente)
-        - Se PENDENTE: usa total_previsto (calculado dinamicamente)
+        - Se PAGO: usa total_executado
+        - Se PENDENTE: usa total_previsto
 
-    Esta é a regra soberana consolidada no sistema (mesma de /api/despesas)
+    Esta é a regra soberana consolidada no sistema (mesma de /api/despesas).
+    Lida do resumo materializado (ResumoCompetencia).
     """
-    # Despesas comuns (não-cartão)
-    despesas_comuns = db.session.query(func.sum(Conta.valor)).filter(
-        extract('month', Conta.mes_referencia) == mes,
-        extract('year', Conta.mes_referencia) == ano,
-        db.or_(
-            Conta.is_fatura_cartao == False,
-            Conta.is_fatura_cartao.is_(None)
-        )
-    ).scalar() or 0
-
-    # Faturas de cartão
-    faturas = db.session.query(Conta).filter(
-        Conta.is_fatura_cartao == True,
-        extract('month', Conta.mes_referencia) == mes,
-        extract('year', Conta.mes_referencia) == ano
-    ).all()
-
-    total_faturas = 0
-    for fatura in faturas:
-        # Calcular valores dinamicamente (não usar campos do banco que podem estar zerados)
-        if getattr(fatura, 'cartao_competencia', None) and fatura.item_despesa_id:
-            total_previsto, total_executado = _calcular_totais_fatura_cartao(
-                cartao_id=fatura.item_despesa_id,
-                competencia=fatura.cartao_competencia
-            )
-        else:
-            # Fallback: usar campos do banco (pode estar zerado)
-            total_previsto = decimal_to_float(fatura.valor_planejado or fatura.valor or 0)
-            total_executado = decimal_to_float(fatura.valor_executado or fatura.valor or 0)
-
-        # Aplicar regra soberana
-        if fatura.status_pagamento == 'Pago':
-            total_faturas += total_executado
-        else:
-            total_faturas += total_previsto
-
-    return decimal_to_float(despesas_comuns) + total_faturas
+    resumo = ResumoCompetenciaService.obter_mes(date(ano, mes, 1))
+    return decimal_to_float(resumo.total_despesas)
+
+
+def _ultimos_meses(hoje, quantidade=6):
+    """Retorna os primeiros dias dos últimos N meses (mais antigo primeiro)"""
+    meses = []
+    for i in range(quantidade - 1, -1, -1):
+        ano = hoje.year
+        mes = hoje.month - i
+
+        if mes <= 0:
+            mes += 12
+            ano -= 1
+
+        meses.append(date(ano, mes, 1))
+    return meses
 
 
 # ============================================================================
@@ -169,42 +105,13 @@ def resumo_mes():
         mes_atual = hoje.month
         ano_atual = hoje.year
 
-        # 1. RECEITAS DO MÊS (Por mês de competência)
-        # Se houver ReceitaRealizada correspondente, usa o valor recebido
-        # Senão, usa o valor esperado do orçamento
-
-        # Buscar IDs dos orçamentos que JÁ TÊM receita realizada no mês
-        orcamentos_com_realizacao = db.session.query(ReceitaRealizada.orcamento_id).filter(
-            extract('month', ReceitaRealizada.mes_referencia) == mes_atual,
-            extract('year', ReceitaRealizada.mes_referencia) == ano_atual,
-            ReceitaRealizada.orcamento_id.isnot(None)
-        ).distinct().all()
-
-        ids_orcamentos_realizados = [o[0] for o in orcamentos_com_realizacao]
-
-        # Somar receitas REALIZADAS (confirmadas)
-        receitas_realizadas = db.session.query(func.sum(ReceitaRealizada.valor_recebido)).filter(
-            extract('month', ReceitaRealizada.mes_referencia) == mes_atual,
-            extract('year', ReceitaRealizada.mes_referencia) == ano_atual
-        ).scalar() or 0
-
-        # Somar receitas PREVISTAS (apenas as que NÃO foram confirmadas)
-        query_previstas = db.session.query(func.sum(ReceitaOrcamento.valor_esperado)).filter(
-            extract('month', ReceitaOrcamento.mes_referencia) == mes_atual,
-            extract('year', ReceitaOrcamento.mes_referencia) == ano_atual
-        )
-
-        if ids_orcamentos_realizados:
-            query_previstas = query_previstas.filter(~ReceitaOrcamento.id.in_(ids_orcamentos_realizados))
-
-        receitas_previstas = query_previstas.scalar() or 0
-
-        # Total = Realizadas + Previstas (que não foram realizadas)
-        receitas_mes = decimal_to_float(receitas_realizadas) + decimal_to_float(receitas_previstas)
-
-        # 2. DESPESAS DO MÊS (Por mês de competência)
-        # Usa função auxiliar que aplica regra correta para faturas de cartão
-        despesas_mes = calcular_despesas_mes(mes_atual, ano_atual)
+        # 1 e 2. RECEITAS e DESPESAS DO MÊS (Por mês de competência)
+        # Lidas do resumo materializado:
+        # - Receitas = realizadas + previstas NÃO confirmadas
+        # - Despesas = comuns + faturas de cartão (regra soberana)
+        resumo = ResumoCompetenciaService.obter_mes(date(ano_atual, mes_atual, 1))
+        receitas_mes = decimal_to_float(resumo.total_receitas)
+        despesas_mes = resumo.total_despesas
 
         # 3. SALDO LÍQUIDO
         despesas_float = decimal_to_float(despesas_mes)
@@ -258,8 +165,9 @@ def indicadores():
             Conta.mes_referencia < primeiro_dia_mes
         ).scalar() or 0
 
-        # Despesas do mês atual (usa função auxiliar que aplica regra correta)
-        despesas_mes_atual = calcular_despesas_mes(mes_atual, ano_atual)
+        # Despesas do mês atual (resumo materializado, regra soberana de faturas)
+        resumo = ResumoCompetenciaService.obter_mes(primeiro_dia_mes)
+        despesas_mes_atual = decimal_to_float(resumo.total_despesas)
 
         acima_media = despesas_mes_atual > (decimal_to_float(media_historica) * 1.1)
 
@@ -274,35 +182,12 @@ def indicadores():
         faturas_proximas = db.session.query(func.count(Conta.id)).filter(
             Conta.is_fatura_cartao == True,
             Conta.status_pagamento == 'Pendente',
-            extract('month', Conta.mes_referencia) == mes_atual,
-            extract('year', Conta.mes_referencia) == ano_atual
+            filtro_competencia_mes_ano(Conta.mes_referencia, mes_atual, ano_atual)
         ).scalar() or 0
 
         # 4. PORCENTAGEM POUPADA
-        # Usar mesma lógica do resumo-mes para calcular receitas (confirmadas + previstas não confirmadas)
-        orcamentos_com_realizacao = db.session.query(ReceitaRealizada.orcamento_id).filter(
-            extract('month', ReceitaRealizada.mes_referencia) == mes_atual,
-            extract('year', ReceitaRealizada.mes_referencia) == ano_atual,
-            ReceitaRealizada.orcamento_id.isnot(None)
-        ).distinct().all()
-
-        ids_orcamentos_realizados = [o[0] for o in orcamentos_com_realizacao]
-
-        receitas_realizadas = db.session.query(func.sum(ReceitaRealizada.valor_recebido)).filter(
-            extract('month', ReceitaRealizada.mes_referencia) == mes_atual,
-            extract('year', ReceitaRealizada.mes_referencia) == ano_atual
-        ).scalar() or 0
-
-        query_previstas = db.session.query(func.sum(ReceitaOrcamento.valor_esperado)).filter(
-            extract('month', ReceitaOrcamento.mes_referencia) == mes_atual,
-            extract('year', ReceitaOrcamento.mes_referencia) == ano_atual
-        )
-
-        if ids_orcamentos_realizados:
-            query_previstas = query_previstas.filter(~ReceitaOrcamento.id.in_(ids_orcamentos_realizados))
-
-        receitas_previstas = query_previstas.scalar() or 0
-        receitas_mes = decimal_to_float(receitas_realizadas) + decimal_to_float(receitas_previstas)
+        # Mesma lógica do resumo-mes (confirmadas + previstas não confirmadas)
+        receitas_mes = decimal_to_float(resumo.total_receitas)
 
         despesas_totais = decimal_to_float(despesas_mes_atual)
         receitas_totais = receitas_mes
@@ -345,33 +230,29 @@ def grafico_categorias():
         mes_atual = hoje.month
         ano_atual = hoje.year
 
-        # Agrupar despesas por categoria via ItemDespesa (por mês de competência)
-        resultado = db.session.query(
-            Categoria.nome,
-            Categoria.cor,
-            func.sum(Conta.valor).label('total')
-        ).outerjoin(
-            ItemDespesa, Conta.item_despesa_id == ItemDespesa.id
-        ).outerjoin(
-            Categoria, ItemDespesa.categoria_id == Categoria.id
-        ).filter(
-            extract('month', Conta.mes_referencia) == mes_atual,
-            extract('year', Conta.mes_referencia) == ano_atual,
-            Categoria.id.isnot(None)  # Apenas contas com categoria
-        ).group_by(
-            Categoria.id, Categoria.nome, Categoria.cor
-        ).order_by(
-            func.sum(Conta.valor).desc()
-        ).all()
+        # Somas por categoria (via ItemDespesa) lidas do resumo materializado
+        resumo = ResumoCompetenciaService.obter_mes(date(ano_atual, mes_atual, 1))
+        totais_por_categoria = resumo.categorias()
+
+        categorias_db = {}
+        if totais_por_categoria:
+            categorias_db = {
+                c.id: c for c in Categoria.query.filter(
+                    Categoria.id.in_(list(totais_por_categoria.keys()))
+                ).all()
+            }
 
         categorias = []
         valores = []
         cores = []
 
-        for cat_nome, cat_cor, total in resultado:
-            categorias.append(cat_nome)
+        for cat_id, total in sorted(totais_por_categoria.items(), key=lambda x: x[1], reverse=True):
+            categoria = categorias_db.get(cat_id)
+            if not categoria:
+                continue
+            categorias.append(categoria.nome)
             valores.append(decimal_to_float(total))
-            cores.append(cat_cor)
+            cores.append(categoria.cor)
 
         return jsonify({
             'success': True,
@@ -399,23 +280,13 @@ def grafico_evolucao():
         meses = []
         valores = []
 
-        # Últimos 6 meses
-        for i in range(5, -1, -1):
-            # Calcular o primeiro dia do mês i meses atrás
-            ano = hoje.year
-            mes = hoje.month - i
-
-            if mes <= 0:
-                mes += 12
-                ano -= 1
+        # Últimos 6 meses (uma consulta por faixa no resumo materializado)
+        competencias = _ultimos_meses(hoje)
+        resumos = ResumoCompetenciaService.obter_intervalo(competencias[0], competencias[-1])
 
-            # Usar função auxiliar que aplica regra correta para faturas de cartão
-            total_mes = calcular_despesas_mes(mes, ano)
-
-            # Formato do mês
-            data_ref = date(ano, mes, 1)
+        for data_ref in competencias:
             meses.append(data_ref.strftime('%b/%y'))
-            valores.append(total_mes)
+            valores.append(decimal_to_float(resumos[data_ref].total_despesas))
 
         return jsonify({
             'success': True,
@@ -450,49 +321,22 @@ def grafico_saldo():
         saldo_atual_float = decimal_to_float(saldo_atual)
 
         # Últimos 6 meses (simulação simplificada)
-        for i in range(5, -1, -1):
-            ano = hoje.year
-            mes = hoje.month - i
-
-            if mes <= 0:
-                mes += 12
-                ano -= 1
-
-            # Calcular diferencial de receitas - despesas desse mês
-            # Usar lógica condicional para receitas (confirmadas + previstas não confirmadas)
-            orcamentos_realizados = db.session.query(ReceitaRealizada.orcamento_id).filter(
-                extract('month', ReceitaRealizada.mes_referencia) == mes,
-                extract('year', ReceitaRealizada.mes_referencia) == ano,
-                ReceitaRealizada.orcamento_id.isnot(None)
-            ).distinct().all()
+        competencias = _ultimos_meses(hoje)
+        resumos = ResumoCompetenciaService.obter_intervalo(competencias[0], competencias[-1])
 
-            ids_realizados = [o[0] for o in orcamentos_realizados]
+        for posicao, data_ref in enumerate(competencias):
+            i = len(competencias) - 1 - posicao
+            resumo = resumos[data_ref]
 
-            receitas_realizadas_mes = db.session.query(func.sum(ReceitaRealizada.valor_recebido)).filter(
-                extract('month', ReceitaRealizada.mes_referencia) == mes,
-                extract('year', ReceitaRealizada.mes_referencia) == ano
-            ).scalar() or 0
-
-            query_prev = db.session.query(func.sum(ReceitaOrcamento.valor_esperado)).filter(
-                extract('month', ReceitaOrcamento.mes_referencia) == mes,
-                extract('year', ReceitaOrcamento.mes_referencia) == ano
-            )
-
-            if ids_realizados:
-                query_prev = query_prev.filter(~ReceitaOrcamento.id.in_(ids_realizados))
-
-            receitas_previstas_mes = query_prev.scalar() or 0
-            receitas_mes = decimal_to_float(receitas_realizadas_mes) + decimal_to_float(receitas_previstas_mes)
-
-            # Usar função auxiliar que aplica regra correta para faturas de cartão
-            despesas_mes = calcular_despesas_mes(mes, ano)
+            # Diferencial de receitas (confirmadas + previstas não confirmadas) - despesas
+            receitas_mes = decimal_to_float(resumo.total_receitas)
+            despesas_mes = decimal_to_float(resumo.total_despesas)
 
             diferencial = receitas_mes - despesas_mes
 
             # Projetar saldo (aproximação)
             saldo_mes = saldo_atual_float - (diferencial * (i + 1))
 
-            data_ref = date(ano, mes, 1)
             meses.append(data_ref.strftime('%b/%y'))
             saldos.append(round(saldo_mes, 2))
 
@@ -544,8 +388,7 @@ def alertas():
         ).filter(
             Conta.is_fatura_cartao == True,
             Conta.status_pagamento == 'Pendente',
-            extract('month', Conta.mes_referencia) == mes_atual,
-            extract('year', Conta.mes_referencia) == ano_atual
+            filtro_competencia_mes_ano(Conta.mes_referencia, mes_atual, ano_atual)
         ).limit(5).all()
 
         # 3. FINANCIAMENTOS ATIVOS
@@ -557,8 +400,7 @@ def alertas():
         receitas_previstas = db.session.query(ReceitaOrcamento).outerjoin(
             ItemReceita, ReceitaOrcamento.item_receita_id == ItemReceita.id
         ).filter(
-            extract('month', ReceitaOrcamento.mes_referencia) == mes_atual,
-            extract('year', ReceitaOrcamento.mes_referencia) == ano_atual
+            filtro_competencia_mes_ano(ReceitaOrcamento.mes_referencia, mes_atual, ano_atual)
         ).limit(10).all()
 
         # Formatar dados
@@ -573,13 +415,19 @@ def alertas():
                 'tipo': 'lancamento'
             })
 
+        totais_faturas = CartaoService.calcular_totais_faturas(
+            competencias=[f.cartao_competencia for f in cartoes_vencer],
+            cartao_ids=[f.item_despesa_id for f in cartoes_vencer]
+        )
+
         cartoes_lista = []
         for fatura in cartoes_vencer:
             # Calcular valor dinamicamente (mesma regra de calcular_despesas_mes)
             if getattr(fatura, 'cartao_competencia', None) and fatura.item_despesa_id:
-                total_previsto, total_executado = _calcular_totais_fatura_cartao(
-                    cartao_id=fatura.item_despesa_id,
-                    competencia=fatura.cartao_competencia
+                total_previsto, total_executado = (
+                    decimal_to_float(v) for v in totais_faturas[
+                        (fatura.item_despesa_id, fatura.cartao_competencia.replace(day=1))
+                    ]
                 )
             else:
                 # Fallback: usar campos do banco
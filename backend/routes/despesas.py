@@ -1,19 +1,23 @@
 """
 Rotas para gerenciamento de Despesas (Itens de Despesa)
 """
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from datetime import datetime
 from decimal import Decimal
 import json
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 try:
-    from backend.models import db, ItemDespesa, Categoria, LancamentoAgregado, ItemAgregado, OrcamentoAgregado, Conta
+    from backend.models import db, ItemDespesa, Categoria, Conta
     from backend.services.cartao_service import CartaoService
+    from backend.services.recorrencia_service import RecorrenciaService, gerar_execucao_despesa_recorrente
 except ImportError:
-    from models import db, ItemDespesa, Categoria, LancamentoAgregado, ItemAgregado, OrcamentoAgregado, Conta
+    from models import db, ItemDespesa, Categoria, Conta
     from services.cartao_service import CartaoService
+    from services.recorrencia_service import RecorrenciaService, gerar_execucao_despesa_recorrente
 
 despesas_bp = Blueprint('despesas', __name__, url_prefix='/api/despesas')
 
@@ -40,28 +44,6 @@ def _normalizar_meio_pagamento(value):
     return (value or '').strip().lower() or None
 
 
-def gerar_execucao_despesa_recorrente(item_despesa_id, meses_futuros=1, mes_referencia=None):
-    """
-    Orquestrador único de recorrência:
-    - Se meio_pagamento == 'cartao' → gera LancamentoAgregado
-    - Caso contrário → gera Conta
-
-    IMPORTANTE: esta função NÃO faz commit; o caller controla a transação.
-    """
-    item = ItemDespesa.query.get(item_despesa_id)
-    if not item:
-        raise ValueError('ItemDespesa não encontrado')
-    if not item.recorrente:
-        return []
-
-    if item.meio_pagamento == 'cartao':
-        if not item.cartao_id:
-            return []
-        return gerar_lancamentos_cartao_recorrente(item.id, meses_futuros=meses_futuros, mes_referencia=mes_referencia)
-
-    return gerar_contas_despesa_recorrente(item.id, meses_futuros=meses_futuros, mes_referencia=mes_referencia)
-
-
 def calcular_competencia(data_vencimento):
     """
     Calcula o mês de competência (mês do salário que paga a despesa)
@@ -85,67 +67,6 @@ def calcular_competencia(data_vencimento):
     return mes_competencia.strftime('%Y-%m')
 
 
-def _calcular_totais_fatura_cartao_previsto(cartao_id, competencia):
-    """
-    Retorna (total_previsto, total_executado) para a fatura de um cartão no mês.
-
-    Definição:
-    - total_executado = soma de TODOS os LancamentoAgregado do mês (com e sem categoria)
-    - total_previsto = total_executado + soma(max(0, orcado_categoria - gasto_categoria))
-      (equivalente a somar max(orcado, gasto) por categoria sem duplo-contar os gastos)
-    """
-    comp = competencia.replace(day=1)
-
-    total_executado = db.session.query(
-        func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-    ).filter(
-        LancamentoAgregado.cartao_id == cartao_id,
-        LancamentoAgregado.mes_fatura == comp
-    ).scalar()
-    total_executado = float(total_executado or 0)
-
-    itens = ItemAgregado.query.filter_by(item_despesa_id=cartao_id, ativo=True).all()
-    if not itens:
-        return total_executado, total_executado
-
-    itens_ids = [i.id for i in itens]
-
-    gastos_por_item = dict(
-        db.session.query(
-            LancamentoAgregado.item_agregado_id,
-            func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-        ).filter(
-            LancamentoAgregado.cartao_id == cartao_id,
-            LancamentoAgregado.mes_fatura == comp,
-            LancamentoAgregado.item_agregado_id.in_(itens_ids)
-        ).group_by(
-            LancamentoAgregado.item_agregado_id
-        ).all()
-    )
-
-    orcados_por_item = dict(
-        db.session.query(
-            OrcamentoAgregado.item_agregado_id,
-            func.coalesce(func.sum(OrcamentoAgregado.valor_teto), 0)
-        ).filter(
-            OrcamentoAgregado.mes_referencia == comp,
-            OrcamentoAgregado.item_agregado_id.in_(itens_ids)
-        ).group_by(
-            OrcamentoAgregado.item_agregado_id
-        ).all()
-    )
-
-    complemento_orcamento = 0.0
-    for item_id in itens_ids:
-        gasto = float(gastos_por_item.get(item_id, 0) or 0)
-        orcado = float(orcados_por_item.get(item_id, 0) or 0)
-        if orcado > gasto:
-            complemento_orcamento += (orcado - gasto)
-
-    total_previsto = total_executado + complemento_orcamento
-    return total_previsto, total_executado
-
-
 @despesas_bp.route('/', methods=['GET'])
 def listar_despesas():
     """
@@ -155,195 +76,306 @@ def listar_despesas():
     - Despesas tipo='Simples': aparecem individualmente
     - Despesas tipo='Agregador' (cartões): faturas virtuais (Conta.is_fatura_cartao=True)
       mostram valor_planejado (pendente) ou valor_executado (pago)
-    """
-    try:
-        # ✅ LAZY GENERATION: Preencher lacunas até o mês navegado + 1 mês futuro
-        # ⚠️ Dashboard NÃO deve passar mes_arg - apenas navegação explícita por mês
-        mes_arg = request.args.get('mes_referencia') or request.args.get('mes')
-
-        if mes_arg:
-            try:
-                mes_referencia = datetime.strptime(f"{mes_arg}-01", "%Y-%m-%d").date()
-                despesas_recorrentes = ItemDespesa.query.filter_by(recorrente=True).all()
-
-                for desp in despesas_recorrentes:
-                    if not desp.data_vencimento:
-                        continue
 
-                    # Calcular quantos meses entre o início da despesa e o mês navegado
-                    inicio = desp.data_vencimento.replace(day=1)
+    Query params (todos opcionais; sem eles retorna a lista completa):
+        mes_inicio / mes_fim: YYYY-MM - janela de competência (inclusiva)
+        limit: int - tamanho da página
+        cursor: YYYY-MM-DD:id - 'proximo_cursor' da página anterior
+        campos: lista separada por vírgula (ex: id,nome,valor,data_vencimento)
+        formato: json (padrão) ou ndjson (streaming, uma despesa por linha)
 
-                    # Calcular diferença em meses
-                    meses_diferenca = (mes_referencia.year - inicio.year) * 12 + \
-                                     (mes_referencia.month - inicio.month)
+    Ordenação: data_vencimento desc, id desc
 
-                    # Garantir que preencha ATÉ o mês navegado + 1 mês futuro (UX suave)
-                    # Se meses_diferenca < 0, a despesa é futura, então gerar apenas se for o mês
-                    # Se meses_diferenca >= 0, gerar até o mês navegado + 1
-                    if meses_diferenca >= 0:
-                        meses_futuros = meses_diferenca + 2  # Mês navegado + próximo mês
-                    else:
-                        meses_futuros = 1  # Despesa futura, gerar apenas se for o mês
-
-                    # Gerar todas as contas necessárias (preenchendo lacunas)
-                    # mes_referencia=None faz gerar a partir da data_vencimento
-                    gerar_execucao_despesa_recorrente(
-                        desp.id,
-                        meses_futuros=meses_futuros,
-                        mes_referencia=None
-                    )
+    Somente leitura: as recorrências e faturas são geradas pelo
+    RecorrenciaService (job agendado ou POST /api/despesas/materializar).
+    """
+    try:
+        # Janela de competência, paginação por cursor e seleção de campos
+        try:
+            mes_inicio = _parse_mes_param(request.args.get('mes_inicio'))
+            mes_fim = _parse_mes_param(request.args.get('mes_fim'))
+            cursor = _parse_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
-                # ✅ LAZY GENERATION (CARTÕES): garantir que a fatura exista
-                # mesmo sem lançamentos, para o mês navegado (+1 mês futuro)
-                competencias_fatura = [
-                    mes_referencia.replace(day=1),
-                    (mes_referencia + relativedelta(months=1)).replace(day=1),
-                ]
-                cartoes_ativos = ItemDespesa.query.filter_by(tipo='Agregador', ativo=True).all()
-                for cartao in cartoes_ativos:
-                    for comp in competencias_fatura:
-                        try:
-                            CartaoService.get_or_create_fatura(cartao.id, comp)
-                        except Exception:
-                            continue
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            limit = None
+        campos = [c.strip() for c in (request.args.get('campos') or '').split(',') if c.strip()]
+        formato = (request.args.get('formato') or 'json').lower()
+
+        # Query única (contas comuns + faturas de cartão), ordenada no banco
+        # por (data_vencimento, id) desc — mais recente primeiro
+        query = _query_despesas(mes_inicio, mes_fim, cursor)
+
+        if formato == 'ndjson':
+            # Streaming: uma despesa por linha, em lotes, para o frontend
+            # renderizar o primeiro mês sem esperar a lista inteira
+            def gerar_linhas():
+                ultima = None
+                proximo_cursor = None
+                for posicao, despesa in enumerate(_iterar_despesas(query, limit + 1 if limit else None), start=1):
+                    if limit and posicao > limit:
+                        proximo_cursor = _cursor_de(ultima)
+                        break
+                    ultima = despesa
+                    yield json.dumps(_selecionar_campos(despesa, campos), ensure_ascii=False) + '\n'
+                if limit:
+                    yield json.dumps({'paginacao': {'limit': limit, 'proximo_cursor': proximo_cursor}}) + '\n'
+
+            return Response(stream_with_context(gerar_linhas()), mimetype='application/x-ndjson')
+
+        resultado = list(_iterar_despesas(query, limit + 1 if limit else None))
+
+        resposta = {
+            'success': True
+        }
+        if limit:
+            pagina = resultado[:limit]
+            resposta['paginacao'] = {
+                'limit': limit,
+                'proximo_cursor': _cursor_de(pagina[-1]) if len(resultado) > limit else None
+            }
+            resultado = pagina
 
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                # Continuar mesmo com erro (modo degradado - lista apenas o que existe)
-                pass
+        resposta['data'] = [_selecionar_campos(d, campos) for d in resultado]
+        return jsonify(resposta)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        resultado = []
-
-        # 1. Buscar CONTAS que NÃO são faturas de cartão de crédito
-        # (Despesas simples, consórcios, financiamentos, etc)
-        from sqlalchemy import extract, or_
-
-        # Buscar contas que:
-        # - NÃO são fatura de cartão (is_fatura_cartao = False ou NULL)
-        # IMPORTANTE: Não filtrar por ItemDespesa.ativo pois consórcios/financiamentos
-        # podem ter ItemDespesa inativo mas geram Contas ativas
-        contas_nao_cartao = db.session.query(Conta).outerjoin(
-            ItemDespesa, Conta.item_despesa_id == ItemDespesa.id
-        ).outerjoin(
-            Categoria, ItemDespesa.categoria_id == Categoria.id
-        ).filter(
-            or_(
-                Conta.is_fatura_cartao == False,
-                Conta.is_fatura_cartao.is_(None)
-            )
-        ).order_by(
-            Conta.data_vencimento.desc()
-        ).all()
 
-        # Converter cada conta para formato do frontend
-        for conta in contas_nao_cartao:
-            item = conta.item_despesa
-            categoria = item.categoria if item else None
+@despesas_bp.route('/materializar', methods=['POST'])
+def materializar_recorrencias():
+    """
+    Materializa sob demanda as despesas recorrentes e faturas de cartão
 
-            conta_dict = {
-                'id': conta.id,
-                'nome': conta.descricao,
-                'descricao': conta.observacoes or '',
-                'tipo': item.tipo if item else 'Simples',
-                'valor': float(conta.valor),
-                'conta_bancaria_id': getattr(conta, 'conta_bancaria_id', None),
-                'financiamento_parcela_id': conta.financiamento_parcela_id,
-                'categoria_id': categoria.id if categoria else None,
-                'categoria': categoria.to_dict() if categoria else None,
-                'data_vencimento': conta.data_vencimento.isoformat(),
-                'data_pagamento': conta.data_pagamento.isoformat() if conta.data_pagamento else None,
-                'pago': (conta.status_pagamento == 'Pago'),
-                'status_pagamento': conta.status_pagamento,
-                'mes_competencia': conta.mes_referencia.strftime('%Y-%m'),
-                'recorrente': item.recorrente if item else False,
-                'tipo_recorrencia': item.tipo_recorrencia if item else None,
-                'debito_automatico': conta.debito_automatico,
-                'numero_parcela': conta.numero_parcela,
-                'total_parcelas': conta.total_parcelas,
-                'agrupado': False,
-                'ativo': True,
-                'is_fatura_cartao': False
-            }
-            resultado.append(conta_dict)
-
-        # 2. Buscar FATURAS VIRTUAIS de cartão de crédito (Conta.is_fatura_cartao = True)
-        faturas_cartao = db.session.query(Conta).outerjoin(
-            ItemDespesa, Conta.item_despesa_id == ItemDespesa.id
-        ).outerjoin(
-            Categoria, ItemDespesa.categoria_id == Categoria.id
-        ).filter(
-            Conta.is_fatura_cartao == True
-        ).order_by(
-            Conta.data_vencimento.desc()
-        ).all()
-
-        # Converter cada fatura de cartão para formato do frontend
-        for fatura in faturas_cartao:
-            item = fatura.item_despesa
-            categoria = item.categoria if item else None
-
-            # REGRA: Card da fatura:
-            # - Se PENDENTE → exibe TOTAL PREVISTO da fatura
-            # - Se PAGA → exibe TOTAL EXECUTADO
-            total_previsto = float(fatura.valor_planejado or fatura.valor or 0)
-            total_executado = float(fatura.valor_executado or 0)
-
-            if getattr(fatura, 'cartao_competencia', None) and fatura.item_despesa_id:
-                total_previsto_calc, total_executado_calc = _calcular_totais_fatura_cartao_previsto(
-                    cartao_id=fatura.item_despesa_id,
-                    competencia=fatura.cartao_competencia
-                )
-                total_previsto = total_previsto_calc
-                total_executado = total_executado_calc  # Sempre usar valor recalculado (fonte da verdade: LancamentoAgregado)
-
-            valor_exibido = total_executado if fatura.status_pagamento == 'Pago' else total_previsto
-
-            fatura_dict = {
-                'id': fatura.id,
-                'nome': fatura.descricao,
-                'descricao': fatura.observacoes or '',
-                'tipo': 'cartao',  # ← CORRIGIDO: era 'Agregador', mas frontend espera 'cartao'
-                'valor': valor_exibido,
-                'conta_bancaria_id': getattr(fatura, 'conta_bancaria_id', None),
-                'financiamento_parcela_id': None,
-                'valor_fatura': valor_exibido,  # ← ADICIONADO: campo que frontend espera ler
-                'valor_planejado': total_previsto,
-                'valor_executado': total_executado,
-                'estouro_orcamento': fatura.estouro_orcamento or False,
-                'categoria_id': categoria.id if categoria else None,
-                'categoria': categoria.to_dict() if categoria else None,
-                'data_vencimento': fatura.data_vencimento.isoformat(),
-                'data_pagamento': fatura.data_pagamento.isoformat() if fatura.data_pagamento else None,
-                'pago': (fatura.status_pagamento == 'Pago'),
-                'status_pagamento': fatura.status_pagamento,
-                'mes_competencia': fatura.cartao_competencia.strftime('%Y-%m'),
-                'recorrente': False,
-                'tipo_recorrencia': None,
-                'debito_automatico': fatura.debito_automatico,
-                'numero_parcela': None,
-                'total_parcelas': None,
-                'agrupado': True,  # Flag para indicar que é fatura de cartão
-                'ativo': True,
-                'is_fatura_cartao': True,
-                'cartao_id': item.id if item else None
-            }
-            resultado.append(fatura_dict)
+    Idempotente: gera apenas os meses após o watermark de cada item.
 
-        # Ordenar por data de vencimento (mais recente primeiro)
-        resultado.sort(key=lambda x: x.get('data_vencimento', ''), reverse=True)
+    Body (opcional):
+        ate: YYYY-MM - mês alvo (padrão: mês atual + horizonte do serviço)
+    """
+    try:
+        dados = _ler_payload_request()
+        ate = _parse_mes_param(dados.get('ate'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
 
+    try:
+        resultado = RecorrenciaService.materializar(ate=ate)
         return jsonify({
             'success': True,
             'data': resultado
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 
+# Tamanho do lote de leitura de listar_despesas (contas por consulta)
+LOTE_LISTAGEM_DESPESAS = 500
+
+
+def _parse_mes_param(valor):
+    """Converte 'YYYY-MM' (ou 'YYYY-MM-DD') no primeiro dia do mês; None se vazio"""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor[:7] + '-01', '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Mês inválido: {valor} (use YYYY-MM)')
+
+
+def _parse_cursor(valor):
+    """
+    Cursor de paginação: 'YYYY-MM-DD:id' da última despesa recebida
+
+    Returns:
+        tuple(date, int) ou None
+    """
+    if not valor:
+        return None
+    try:
+        data_str, id_str = valor.split(':', 1)
+        return datetime.strptime(data_str, '%Y-%m-%d').date(), int(id_str)
+    except ValueError:
+        raise ValueError(f'Cursor inválido: {valor}')
+
+
+def _cursor_de(despesa):
+    return f"{despesa['data_vencimento']}:{despesa['id']}"
+
+
+def _selecionar_campos(despesa, campos):
+    if not campos:
+        return despesa
+    return {campo: despesa[campo] for campo in campos if campo in despesa}
+
+
+def _query_despesas(mes_inicio=None, mes_fim=None, cursor=None):
+    """
+    Query base da listagem: todas as Contas (comuns e faturas de cartão)
+
+    - Filtro por competência [mes_inicio, mes_fim] (inclusivo, por mês)
+    - Keyset (data_vencimento, id) < cursor para a próxima página
+    - item_despesa e categoria carregados junto (sem consulta por linha)
+
+    IMPORTANTE: Não filtrar por ItemDespesa.ativo pois consórcios/financiamentos
+    podem ter ItemDespesa inativo mas geram Contas ativas
+    """
+    query = Conta.query.options(
+        joinedload(Conta.item_despesa).joinedload(ItemDespesa.categoria)
+    )
+
+    if mes_inicio:
+        query = query.filter(Conta.mes_referencia >= mes_inicio)
+    if mes_fim:
+        query = query.filter(Conta.mes_referencia < mes_fim + relativedelta(months=1))
+
+    if cursor:
+        query = query.filter(_filtro_apos_cursor(cursor))
+
+    return query.order_by(Conta.data_vencimento.desc(), Conta.id.desc())
+
+
+def _filtro_apos_cursor(cursor):
+    """Keyset: despesas depois do cursor na ordem (data_vencimento, id) desc"""
+    data_cursor, id_cursor = cursor
+    return or_(
+        Conta.data_vencimento < data_cursor,
+        and_(Conta.data_vencimento == data_cursor, Conta.id < id_cursor)
+    )
+
+
+def _iterar_despesas(query, limit=None):
+    """
+    Gera as despesas já no formato do frontend, lendo em lotes
+
+    Cada lote faz: 1 consulta de contas (com item/categoria) +
+    CartaoService.calcular_totais_faturas para as faturas do lote.
+    """
+    entregues = 0
+    cursor_lote = None
+    while limit is None or entregues < limit:
+        tamanho = LOTE_LISTAGEM_DESPESAS if limit is None else min(LOTE_LISTAGEM_DESPESAS, limit - entregues)
+
+        lote_query = query.filter(_filtro_apos_cursor(cursor_lote)) if cursor_lote else query
+        contas = lote_query.limit(tamanho).all()
+        if not contas:
+            break
+
+        faturas = [c for c in contas if c.is_fatura_cartao]
+        # Totais das faturas do lote (executado e consumo mantidos por delta)
+        totais_faturas = CartaoService.calcular_totais_faturas(
+            competencias=[f.cartao_competencia for f in faturas],
+            cartao_ids=[f.item_despesa_id for f in faturas]
+        )
+
+        for conta in contas:
+            if conta.is_fatura_cartao:
+                yield _serializar_fatura_cartao(conta, totais_faturas)
+            else:
+                yield _serializar_conta(conta)
+
+        entregues += len(contas)
+        cursor_lote = (contas[-1].data_vencimento, contas[-1].id)
+        if len(contas) < tamanho:
+            break
+
+
+def _serializar_conta(conta):
+    """Conta comum (despesa simples, consórcio, financiamento...) no formato do frontend"""
+    item = conta.item_despesa
+    categoria = item.categoria if item else None
+
+    return {
+        'id': conta.id,
+        'nome': conta.descricao,
+        'descricao': conta.observacoes or '',
+        'tipo': item.tipo if item else 'Simples',
+        'valor': float(conta.valor),
+        'conta_bancaria_id': getattr(conta, 'conta_bancaria_id', None),
+        'financiamento_parcela_id': conta.financiamento_parcela_id,
+        'categoria_id': categoria.id if categoria else None,
+        'categoria': categoria.to_dict() if categoria else None,
+        'data_vencimento': conta.data_vencimento.isoformat(),
+        'data_pagamento': conta.data_pagamento.isoformat() if conta.data_pagamento else None,
+        'pago': (conta.status_pagamento == 'Pago'),
+        'status_pagamento': conta.status_pagamento,
+        'mes_competencia': conta.mes_referencia.strftime('%Y-%m'),
+        'recorrente': item.recorrente if item else False,
+        'tipo_recorrencia': item.tipo_recorrencia if item else None,
+        'debito_automatico': conta.debito_automatico,
+        'numero_parcela': conta.numero_parcela,
+        'total_parcelas': conta.total_parcelas,
+        'agrupado': False,
+        'ativo': True,
+        'is_fatura_cartao': False
+    }
+
+
+def _serializar_fatura_cartao(fatura, totais_faturas):
+    """Fatura virtual de cartão (Conta.is_fatura_cartao = True) no formato do frontend"""
+    item = fatura.item_despesa
+    categoria = item.categoria if item else None
+
+    # REGRA: Card da fatura:
+    # - Se PENDENTE → exibe TOTAL PREVISTO da fatura
+    # - Se PAGA → exibe TOTAL EXECUTADO
+    total_previsto = float(fatura.valor_planejado or fatura.valor or 0)
+    total_executado = float(fatura.valor_executado or 0)
+
+    if getattr(fatura, 'cartao_competencia', None) and fatura.item_despesa_id:
+        total_previsto_calc, total_executado_calc = totais_faturas[
+            (fatura.item_despesa_id, fatura.cartao_competencia.replace(day=1))
+        ]
+        total_previsto = float(total_previsto_calc)
+        total_executado = float(total_executado_calc)  # Executado mantido por delta (Conta.valor_executado)
+
+    valor_exibido = total_executado if fatura.status_pagamento == 'Pago' else total_previsto
+
+    return {
+        'id': fatura.id,
+        'nome': fatura.descricao,
+        'descricao': fatura.observacoes or '',
+        'tipo': 'cartao',  # ← CORRIGIDO: era 'Agregador', mas frontend espera 'cartao'
+        'valor': valor_exibido,
+        'conta_bancaria_id': getattr(fatura, 'conta_bancaria_id', None),
+        'financiamento_parcela_id': None,
+        'valor_fatura': valor_exibido,  # ← ADICIONADO: campo que frontend espera ler
+        'valor_planejado': total_previsto,
+        'valor_executado': total_executado,
+        'estouro_orcamento': fatura.estouro_orcamento or False,
+        'categoria_id': categoria.id if categoria else None,
+        'categoria': categoria.to_dict() if categoria else None,
+        'data_vencimento': fatura.data_vencimento.isoformat(),
+        'data_pagamento': fatura.data_pagamento.isoformat() if fatura.data_pagamento else None,
+        'pago': (fatura.status_pagamento == 'Pago'),
+        'status_pagamento': fatura.status_pagamento,
+        'mes_competencia': fatura.cartao_competencia.strftime('%Y-%m'),
+        'recorrente': False,
+        'tipo_recorrencia': None,
+        'debito_automatico': fatura.debito_automatico,
+        'numero_parcela': None,
+        'total_parcelas': None,
+        'agrupado': True,  # Flag para indicar que é fatura de cartão
+        'ativo': True,
+        'is_fatura_cartao': True,
+        'cartao_id': item.id if item else None
+    }
+
+
 @despesas_bp.route('/<int:id>', methods=['GET'])
 def obter_despesa(id):
     """Obtém uma conta específica"""
@@ -636,6 +668,14 @@ def atualizar_despesa(id):
             'message': 'Despesa atualizada com sucesso'
         })
 
+    except IntegrityError:
+        # uq_conta_item_vencimento: 1 conta por item/vencimento (fora as de financiamento)
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Já existe uma conta desta despesa com este vencimento'
+        }), 409
+
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -968,10 +1008,8 @@ def marcar_como_pago(id):
         if conta_bancaria_id:
             try:
                 from backend.models import ContaBancaria, MovimentoFinanceiro
-                from backend.services.conta_bancaria_service import ContaBancariaService
             except ImportError:
                 from models import ContaBancaria, MovimentoFinanceiro
-                from services.conta_bancaria_service import ContaBancariaService
 
             conta_bancaria = ContaBancaria.query.get(conta_bancaria_id)
             if not conta_bancaria:
@@ -989,8 +1027,7 @@ def marcar_como_pago(id):
                 origem='DESPESA',
                 ajustavel=False
             )
-            db.session.add(movimento)
-            ContaBancariaService.recalcular_saldo_conta(conta_bancaria_id)
+            db.session.add(movimento)  # saldo da conta atualizado por delta no flush
 
         db.session.commit()
 
@@ -1028,241 +1065,3 @@ def marcar_como_pago(id):
             'success': False,
             'error': str(e)
         }), 500
-
-
-# ============================================================================
-# FUNÇÕES AUXILIARES PARA DESPESAS RECORRENTES
-# ============================================================================
-
-def normalizar_dias_semana(dias):
-    """
-    Recebe lista ou string e retorna lista padronizada sem acentos:
-    ['segunda','terca','quarta','quinta','sexta','sabado','domingo']
-    """
-    if not dias:
-        return []
-    if isinstance(dias, str):
-        try:
-            import json
-            parsed = json.loads(dias)
-            if isinstance(parsed, list):
-                dias = parsed
-            else:
-                dias = [d.strip() for d in dias.split(",") if d.strip()]
-        except Exception:
-            dias = [d.strip() for d in dias.split(",") if d.strip()]
-    nomes = {
-        'segunda': 'segunda', 'seg': 'segunda', '1': 'segunda',
-        'terca': 'terca', 'ter': 'terca', '2': 'terca',
-        'quarta': 'quarta', 'qua': 'quarta', '3': 'quarta',
-        'quinta': 'quinta', 'qui': 'quinta', '4': 'quinta',
-        'sexta': 'sexta', 'sex': 'sexta', '5': 'sexta',
-        'sabado': 'sabado', 'sab': 'sabado', '6': 'sabado',
-        'domingo': 'domingo', 'dom': 'domingo', '0': 'domingo'
-    }
-    resultado = []
-    for d in dias:
-        chave = str(d).strip().lower()
-        if chave in nomes:
-            resultado.append(nomes[chave])
-    return resultado
-
-def gerar_contas_despesa_recorrente(item_despesa_id, meses_futuros=12, mes_referencia=None):
-    """Gera contas reais para despesas recorrentes (mensal, anual, semanal, a_cada_2_semanas ou dias_semana)."""
-    item = ItemDespesa.query.get(item_despesa_id)
-    if not item:
-        raise ValueError('ItemDespesa nao encontrado')
-    if not item.recorrente:
-        raise ValueError('ItemDespesa nao e recorrente')
-    if not item.data_vencimento:
-        raise ValueError('ItemDespesa recorrente precisa ter data_vencimento')
-
-    tipo_recorrencia = item.tipo_recorrencia or 'mensal'
-    data_inicio = item.data_vencimento
-    inicio_geracao = data_inicio.replace(day=1)
-    mes_ref_base = mes_referencia.replace(day=1) if mes_referencia else None
-    inicio_janela = max(inicio_geracao, mes_ref_base) if mes_ref_base else inicio_geracao
-    data_fim_base = (inicio_janela + relativedelta(months=meses_futuros)) - timedelta(days=1)
-
-    contas_criadas = []
-
-    def criar_conta(data_venc, descricao_custom=None):
-        mes_ref = data_venc.replace(day=1)
-        existente = Conta.query.filter_by(
-            item_despesa_id=item_despesa_id,
-            data_vencimento=data_venc
-        ).first()
-        if existente:
-            return
-        nova = Conta(
-            item_despesa_id=item_despesa_id,
-            mes_referencia=mes_ref,
-            descricao=descricao_custom or item.nome,
-            valor=item.valor,
-            data_vencimento=data_venc,
-            status_pagamento='Pendente',
-            observacoes=item.descricao or ''
-        )
-        db.session.add(nova)
-        contas_criadas.append(nova)
-
-    if tipo_recorrencia == 'mensal':
-        data_venc = data_inicio
-        while data_venc < inicio_janela:
-            data_venc += relativedelta(months=1)
-        while data_venc <= data_fim_base:
-            criar_conta(data_venc)
-            data_venc += relativedelta(months=1)
-
-    elif tipo_recorrencia == 'anual':
-        data_ref = data_inicio
-        while data_ref < inicio_janela:
-            data_ref += relativedelta(years=1)
-        while data_ref <= data_fim_base:
-            criar_conta(data_ref)
-            data_ref += relativedelta(years=1)
-
-    elif tipo_recorrencia == 'semanal' or tipo_recorrencia.startswith('semanal_') or tipo_recorrencia == 'a_cada_2_semanas':
-        intervalo = 1 if tipo_recorrencia == "semanal" else 2
-        dia_semana_alvo = None
-        if tipo_recorrencia.startswith("semanal_"):
-            partes = tipo_recorrencia.split("_")
-            if len(partes) > 1:
-                try:
-                    intervalo = int(partes[1])
-                except Exception:
-                    intervalo = max(intervalo, 1)
-            if len(partes) > 2:
-                try:
-                    dia_semana_alvo = int(partes[2])
-                except Exception:
-                    dia_semana_alvo = None
-
-        data_atual = max(data_inicio, inicio_janela)
-        if dia_semana_alvo is not None:
-            dias_ate_alvo = (dia_semana_alvo - data_atual.weekday()) % 7
-            data_atual += timedelta(days=dias_ate_alvo)
-
-        while data_atual <= data_fim_base:
-            if data_atual >= inicio_geracao:
-                criar_conta(data_atual, descricao_custom=f"{item.nome} - {data_atual.strftime('%d/%m')}")
-            data_atual += timedelta(weeks=intervalo)
-
-    elif tipo_recorrencia == 'dias_semana':
-        dias_lista = normalizar_dias_semana(getattr(item, 'dias_semana', None))
-        frequencia = getattr(item, 'frequencia_semanal', '') or 'toda_semana'
-        mapa_num = {
-            'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6
-        }
-        dias_alvo = [mapa_num[d] for d in dias_lista if d in mapa_num]
-        data_atual = inicio_janela
-        while data_atual <= data_fim_base:
-            if dias_alvo and data_atual.weekday() in dias_alvo:
-                if frequencia == 'alternado' and data_atual.isocalendar()[1] % 2 != 0:
-                    data_atual += timedelta(days=1)
-                    continue
-                criar_conta(data_atual, descricao_custom=f"{item.nome} - {data_atual.strftime('%d/%m')}")
-            data_atual += timedelta(days=1)
-
-    return contas_criadas
-
-
-def gerar_lancamentos_cartao_recorrente(item_despesa_id, meses_futuros=12, mes_referencia=None):
-    """
-    Gera lançamentos automaticamente para despesas recorrentes pagas via cartão de crédito.
-    
-    Diferença da geração de Conta:
-    - Gera LancamentoAgregado ao invés de Conta
-    - Aparece na fatura do cartão
-    - Classificado como "Despesas Fixas"
-    
-    Garante idempotência: 1 recorrência = 1 lançamento/mês
-    """
-    from datetime import date
-
-    item = ItemDespesa.query.get(item_despesa_id)
-    if not item:
-        raise ValueError('ItemDespesa não encontrado')
-    if not item.recorrente:
-        raise ValueError('ItemDespesa não é recorrente')
-    if item.meio_pagamento != 'cartao':
-        raise ValueError('ItemDespesa não é pago via cartão')
-    if not item.cartao_id:
-        raise ValueError('ItemDespesa recorrente pago via cartão precisa ter cartao_id')
-    if not item.categoria_id:
-        raise ValueError('ItemDespesa recorrente precisa ter categoria_id')
-
-    tipo_recorrencia = item.tipo_recorrencia or 'mensal'
-
-    # Fallback obrigatório para conseguir inferir mes_fatura quando não há data_vencimento/mes_competencia
-    if item.data_vencimento:
-        data_base = item.data_vencimento
-    elif item.mes_competencia:
-        if isinstance(item.mes_competencia, str):
-            # Aceitar "YYYY-MM" ou "YYYY-MM-DD"
-            try:
-                data_base = datetime.strptime(item.mes_competencia + '-01', '%Y-%m-%d').date()
-            except ValueError:
-                data_base = datetime.strptime(item.mes_competencia, '%Y-%m-%d').date()
-        else:
-            data_base = item.mes_competencia
-    else:
-        data_base = date.today()
-
-    data_inicio = data_base
-    inicio_geracao = data_inicio.replace(day=1)
-    mes_ref_base = mes_referencia.replace(day=1) if mes_referencia else None
-    inicio_janela = max(inicio_geracao, mes_ref_base) if mes_ref_base else inicio_geracao
-    data_fim_base = (inicio_janela + relativedelta(months=meses_futuros)) - timedelta(days=1)
-    
-    lancamentos_criados = []
-    
-    def criar_lancamento(data_compra):
-        """Cria LancamentoAgregado se ainda não existe para esta competência"""
-        mes_fatura = data_compra.replace(day=1)
-        
-        # Verificar se já existe lançamento deste item_despesa para este mês (idempotência)
-        existente = LancamentoAgregado.query.filter_by(
-            item_despesa_id=item_despesa_id,
-            mes_fatura=mes_fatura,
-            is_recorrente=True
-        ).first()
-        
-        if existente:
-            return  # Já existe, não cria duplicado
-        
-        novo = LancamentoAgregado(
-            cartao_id=item.cartao_id,
-            item_agregado_id=item.item_agregado_id,  # Opcional - categoria do cartão
-            categoria_id=item.categoria_id,  # Categoria analítica obrigatória
-            descricao=item.nome,
-            valor=item.valor,
-            data_compra=data_compra,
-            mes_fatura=mes_fatura,
-            numero_parcela=1,
-            total_parcelas=1,
-            observacoes=item.descricao or '',
-            is_recorrente=True,  # Marca como recorrente para aparecer em "Despesas Fixas"
-            item_despesa_id=item_despesa_id  # Referência à despesa recorrente
-        )
-        db.session.add(novo)
-        lancamentos_criados.append(novo)
-    
-    # Gerar lançamentos conforme tipo de recorrência (apenas mensal por enquanto)
-    if tipo_recorrencia == 'mensal':
-        data_ref = data_inicio
-        while data_ref < inicio_janela:
-            data_ref += relativedelta(months=1)
-        while data_ref <= data_fim_base:
-            criar_lancamento(data_ref)
-            data_ref += relativedelta(months=1)
-    
-    elif tipo_recorrencia == 'anual':
-        data_ref = data_inicio
-        while data_ref < inicio_janela:
-            data_ref += relativedelta(years=1)
-        while data_ref <= data_fim_base:
-            criar_lancamento(data_ref)
-            data_ref += relativedelta(years=1)
-    
-    return lancamentos_criados
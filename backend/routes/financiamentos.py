@@ -8,15 +8,17 @@ Endpoints organizados em 4 grupos:
 4. Relatórios e Demonstrativos
 5. Indexadores (TR, IPCA)
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime
 
 try:
     from backend.models import db, Financiamento, FinanciamentoParcela, IndexadorMensal, FinanciamentoSeguroVigencia, FinanciamentoAmortizacaoExtra
     from backend.services.financiamento_service import FinanciamentoService
+    from backend.services.projecao_financiamento_service import ProjecaoFinanciamento
 except ImportError:
     from models import db, Financiamento, FinanciamentoParcela, IndexadorMensal, FinanciamentoSeguroVigencia, FinanciamentoAmortizacaoExtra
     from services.financiamento_service import FinanciamentoService
+    from services.projecao_financiamento_service import ProjecaoFinanciamento
 
 # Criar blueprint
 financiamentos_bp = Blueprint('financiamentos', __name__)
@@ -26,6 +28,53 @@ financiamentos_bp = Blueprint('financiamentos', __name__)
 # FUNÇÕES AUXILIARES
 # ============================================================================
 
+def _resposta_com_etag(etag, montar_dados):
+    """
+    Resposta JSON com ETag (dados da ProjecaoFinanciamento)
+
+    Se o cliente já tem esta versão (If-None-Match), responde 304 sem montar
+    nem serializar os dados.
+    """
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+    else:
+        resposta = jsonify({
+            'success': True,
+            'data': montar_dados()
+        })
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+
+def _serializar_reindexacao(resultado):
+    """Relatório de FinanciamentoService.reindexar em JSON"""
+    return {**resultado, 'a_partir_de': resultado['a_partir_de'].isoformat()}
+
+
+def _serializar_simulacao(resultado):
+    """Resultado de FinanciamentoService.simular_amortizacoes em JSON"""
+    atual = resultado['atual']
+    cenarios = []
+    for cenario in resultado['cenarios']:
+        cenario = {**cenario, 'data': cenario['data'].isoformat()}
+        if 'curva' in cenario:
+            cenario['data_ultima_parcela'] = cenario['data_ultima_parcela'].isoformat()
+            cenario['curva'] = {
+                **cenario['curva'],
+                'data_vencimento': [d.isoformat() for d in cenario['curva']['data_vencimento']],
+            }
+        cenarios.append(cenario)
+    return {
+        **resultado,
+        'atual': {
+            **atual,
+            'data_ultima_parcela': atual['data_ultima_parcela'].isoformat() if atual['data_ultima_parcela'] else None,
+        },
+        'cenarios': cenarios,
+    }
+
+
 def _obter_info_vigencia_para_edicao(financiamento):
     """
     Obtém informações sobre vigências de seguro para pré-preencher tela de edição
@@ -160,42 +209,46 @@ def buscar_financiamento(id):
     Args:
         id: ID do financiamento
 
+    Query params:
+        limit: int (opcional) - parcelas por página (padrão: todas)
+        offset: int (opcional, default 0) - parcelas a pular
+
     Returns:
-        JSON com dados do financiamento e suas parcelas
+        JSON com dados do financiamento e suas parcelas (ETag; 304 se inalterado)
     """
     try:
-        financiamento = Financiamento.query.get(id)
+        projecao = ProjecaoFinanciamento.obter(id)
 
-        if not financiamento:
+        if projecao is None:
             return jsonify({
                 'success': False,
                 'error': 'Financiamento não encontrado'
             }), 404
 
-        # Buscar parcelas
-        parcelas = FinanciamentoParcela.query.filter_by(
-            financiamento_id=id
-        ).order_by(FinanciamentoParcela.numero_parcela).all()
-
-        # Contar parcelas pagas
-        parcelas_pagas = FinanciamentoParcela.query.filter_by(
-            financiamento_id=id,
-            status='pago'
-        ).count()
-
-        # Buscar informações de vigência de seguro (para edição)
-        vigencia_info = _obter_info_vigencia_para_edicao(financiamento)
-
-        return jsonify({
-            'success': True,
-            'data': {
-                **financiamento.to_dict(),
-                'parcelas_pagas': parcelas_pagas,
-                'parcelas': [p.to_dict() for p in parcelas],
-                'total_parcelas': len(parcelas),
-                'vigencia_seguro_info': vigencia_info
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            limit = None
+        offset = max(request.args.get('offset', default=0, type=int), 0)
+
+        def montar_dados():
+            dados = {
+                **projecao.contrato,
+                'parcelas_pagas': projecao.parcelas_pagas,
+                'parcelas': projecao.parcelas(offset, limit),
+                'total_parcelas': projecao.total_parcelas,
+                # Buscar informações de vigência de seguro (para edição)
+                'vigencia_seguro_info': _obter_info_vigencia_para_edicao(db.session.get(Financiamento, id))
             }
-        }), 200
+            if limit is not None or offset:
+                proximo = offset + limit if limit is not None and offset + limit < projecao.total_parcelas else None
+                dados['paginacao'] = {
+                    'limit': limit,
+                    'offset': offset,
+                    'proximo_offset': proximo
+                }
+            return dados
+
+        return _resposta_com_etag(projecao.etag, montar_dados)
 
     except Exception as e:
         return jsonify({
@@ -440,7 +493,8 @@ def regenerar_parcelas(id):
         }
 
     Returns:
-        JSON com confirmação
+        JSON com confirmação e as linhas tocadas (parcelas/contas inseridas,
+        atualizadas e removidas)
     """
     try:
         financiamento = Financiamento.query.get(id)
@@ -452,11 +506,12 @@ def regenerar_parcelas(id):
             }), 404
 
         # Regenerar parcelas usando as configurações do financiamento
-        FinanciamentoService.gerar_parcelas(financiamento)
+        linhas = FinanciamentoService.gerar_parcelas(financiamento)
 
         return jsonify({
             'success': True,
-            'message': 'Parcelas regeneradas com sucesso'
+            'message': 'Parcelas regeneradas com sucesso',
+            'data': linhas
         }), 200
 
     except Exception as e:
@@ -603,6 +658,76 @@ def registrar_amortizacao_extra(id):
         }), 500
 
 
+@financiamentos_bp.route('/<int:id>/simular', methods=['POST'])
+def simular_amortizacoes(id):
+    """
+    Simula amortizações extraordinárias sem gravar nada
+
+    Compara cenários (ex: reduzir prazo x reduzir parcela, valores diferentes)
+    sobre as parcelas pendentes atuais; nenhum registro é criado ou alterado.
+
+    Args:
+        id: ID do financiamento
+
+    Body (JSON):
+        {
+            "cenarios": [
+                {
+                    "data": "YYYY-MM-DD" (obrigatório),
+                    "valor": float (obrigatório),
+                    "tipo": "reduzir_parcela|reduzir_prazo" (obrigatório),
+                    "rotulo": "string" (opcional)
+                }
+            ]
+        }
+
+    Returns:
+        JSON com total de juros, novo prazo e curva de parcelas de cada cenário
+    """
+    try:
+        data = request.get_json() or {}
+        cenarios = data.get('cenarios')
+
+        if not isinstance(cenarios, list) or not cenarios:
+            return jsonify({
+                'success': False,
+                'error': 'cenarios é obrigatório (lista)'
+            }), 400
+
+        for posicao, cenario in enumerate(cenarios, 1):
+            if not isinstance(cenario, dict):
+                return jsonify({
+                    'success': False,
+                    'error': f'Cenário {posicao}: formato inválido'
+                }), 400
+            for campo in ['data', 'valor', 'tipo']:
+                if campo not in cenario:
+                    return jsonify({
+                        'success': False,
+                        'error': f'Cenário {posicao}: {campo} é obrigatório'
+                    }), 400
+
+        resultado = FinanciamentoService.simular_amortizacoes(id, cenarios)
+
+        return jsonify({
+            'success': True,
+            'data': _serializar_simulacao(resultado)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @financiamentos_bp.route('/<int:id>/vigencias-seguro', methods=['POST'])
 def adicionar_vigencia_seguro(id):
     """
@@ -766,7 +891,7 @@ def demonstrativo_anual(id):
         ano: Ano (obrigatório)
 
     Returns:
-        JSON com demonstrativo consolidado por mês
+        JSON com demonstrativo consolidado por mês (ETag; 304 se inalterado)
     """
     try:
         ano = request.args.get('ano', type=int)
@@ -777,12 +902,13 @@ def demonstrativo_anual(id):
                 'error': 'Parâmetro ano é obrigatório'
             }), 400
 
-        demonstrativo = FinanciamentoService.get_demonstrativo_anual(id, ano)
+        projecao = ProjecaoFinanciamento.obter(id)
+        if projecao is None:
+            raise ValueError('Financiamento não encontrado')
 
-        return jsonify({
-            'success': True,
-            'data': demonstrativo
-        }), 200
+        return _resposta_com_etag(
+            projecao.etag, lambda: FinanciamentoService.get_demonstrativo_anual(id, ano)
+        )
 
     except ValueError as e:
         return jsonify({
@@ -806,15 +932,17 @@ def evolucao_saldo(id):
         id: ID do financiamento
 
     Returns:
-        JSON com evolução mês a mês
+        JSON com evolução mês a mês (ETag; 304 se inalterado)
     """
     try:
-        evolucao = FinanciamentoService.get_evolucao_saldo(id)
+        projecao = ProjecaoFinanciamento.obter(id)
+        if projecao is None:
+            return jsonify({
+                'success': True,
+                'data': []
+            }), 200
 
-        return jsonify({
-            'success': True,
-            'data': evolucao
-        }), 200
+        return _resposta_com_etag(projecao.etag, lambda: FinanciamentoService.get_evolucao_saldo(id))
 
     except Exception as e:
         return jsonify({
@@ -880,11 +1008,13 @@ def criar_indexador():
         {
             "nome": "TR|IPCA|..." (obrigatório),
             "data_referencia": "YYYY-MM-01" (obrigatório),
-            "valor": float (obrigatório) - percentual (ex: 0.0015 = 0,15%)
+            "valor": float (obrigatório) - percentual (ex: 0.0015 = 0,15%),
+            "reindexar": bool (opcional) - recalcula em seguida as parcelas
+                pendentes dos financiamentos com este indexador
         }
 
     Returns:
-        JSON com o indexador criado
+        JSON com o indexador criado (e o relatório da reindexação, se pedida)
     """
     try:
         data = request.get_json()
@@ -935,12 +1065,68 @@ def criar_indexador():
             db.session.commit()
             mensagem = 'Indexador criado com sucesso'
 
-        return jsonify({
+        resposta = {
             'success': True,
             'message': mensagem,
             'data': indexador.to_dict()
-        }), 201
+        }
+        if data.get('reindexar'):
+            resposta['reindexacao'] = _serializar_reindexacao(
+                FinanciamentoService.reindexar(data['nome'], data_ref)
+            )
+
+        return jsonify(resposta), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
+
+@financiamentos_bp.route('/indexadores/<nome>/reindexar', methods=['POST'])
+def reindexar_financiamentos(nome):
+    """
+    Recalcula em lote as parcelas pendentes de todos os financiamentos
+    corrigidos pelo indexador, a partir do mês alterado
+
+    Body (JSON):
+        {
+            "a_partir_de": "YYYY-MM-DD" (obrigatório) - primeiro mês com valor novo,
+            "processos": int (opcional) - processos de cálculo (1 = sem pool)
+        }
+
+    Returns:
+        JSON com o relatório (tempo por contrato, parcelas atualizadas)
+    """
+    try:
+        data = request.get_json() or {}
+
+        if not data.get('a_partir_de'):
+            return jsonify({
+                'success': False,
+                'error': 'a_partir_de é obrigatório'
+            }), 400
+
+        a_partir_de = datetime.strptime(data['a_partir_de'], '%Y-%m-%d').date()
+        processos = data.get('processos')
+
+        resultado = FinanciamentoService.reindexar(
+            nome, a_partir_de, processos=int(processos) if processos else None
+        )
+
+        return jsonify({
+            'success': True,
+            'data': _serializar_reindexacao(resultado)
+        }), 200
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({
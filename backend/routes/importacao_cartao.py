@@ -4,13 +4,16 @@ Rotas para Importação Assistida de Fatura de Cartão (CSV)
 FASE 6.2
 
 Endpoints:
-- POST /api/importacao-cartao/upload - Upload e análise do CSV
+- POST /api/importacao-cartao/upload - Upload e análise do CSV (abre sessão de upload)
 - POST /api/importacao-cartao/processar - Processar linhas mapeadas e persistir
+- GET /api/importacao-cartao/jobs/<job_id> - Progresso de uma importação assíncrona
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from backend.services.importacao_cartao_service import ImportacaoCartaoService
+from backend.services.importacao_job_service import ImportacaoJobService
+from backend.services.upload_sessao_service import UploadSessaoService
 from backend.models import db, ItemDespesa, Categoria, ItemAgregado
 
 bp = Blueprint('importacao_cartao', __name__, url_prefix='/api/importacao-cartao')
@@ -21,9 +24,14 @@ def upload_csv():
     """
     Recebe CSV, detecta delimitador, retorna colunas e amostra
 
+    O arquivo é lido em streaming e guardado em uma sessão de upload;
+    /processar usa o upload_id em vez de receber todas as linhas de volta.
+
     Returns:
         {
             'success': bool,
+            'upload_id': str,
+            'expira_em': int (timestamp Unix),
             'delimitador': str,
             'colunas': [str],
             'linhas_amostra': [[str]],
@@ -42,21 +50,16 @@ def upload_csv():
         if not arquivo.filename.endswith('.csv'):
             return jsonify({'success': False, 'message': 'Apenas arquivos CSV são permitidos'}), 400
 
-        # Ler e analisar CSV
-        delimitador, colunas, linhas_amostra = ImportacaoCartaoService.ler_csv(arquivo)
-
-        # Ler total de linhas
-        arquivo.seek(0)
-        total_linhas = len(arquivo.read().decode('utf-8', errors='ignore').split('\n')) - 1  # -1 cabeçalho
+        # Ler, analisar e contar em uma passada (guardado na sessão de upload)
+        sessao = UploadSessaoService.criar(arquivo.stream, arquivo.filename)
 
         return jsonify({
             'success': True,
-            'delimitador': delimitador,
-            'colunas': colunas,
-            'linhas_amostra': linhas_amostra,
-            'total_linhas': total_linhas
+            **sessao
         })
 
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -66,7 +69,19 @@ def processar_importacao():
     """
     Processa linhas mapeadas e persiste lançamentos
 
-    Payload:
+    Payload (linhas da sessão de upload):
+        {
+            'cartao_id': int,
+            'competencia': 'YYYY-MM-DD',
+            'upload_id': str,
+            'mapeamento': {'data_compra': int, 'descricao': int, 'valor': int, 'parcela': int (opcional)},
+            'categoria_id': int (padrão das linhas),
+            'item_agregado_id': int (opcional),
+            'ajustes': {índice da linha: {'categoria_id', 'item_agregado_id', 'descricao_exibida'}} (opcional),
+            'assincrono': bool (opcional)
+        }
+
+    Payload (linhas enviadas no corpo):
         {
             'cartao_id': int,
             'competencia': 'YYYY-MM-DD',
@@ -88,7 +103,17 @@ def processar_importacao():
             'success': bool,
             'inseridos': int,
             'duplicados': int,
-            'erros': []
+            'erros': [],
+            'lotes': [{'linhas': int, 'ms': float}]  (tempo de cada INSERT em lote)
+        }
+
+    Com 'assincrono': true, enfileira um job (processado em blocos, com
+    commit por bloco) e retorna 202:
+        {
+            'success': bool,
+            'job_id': str,
+            'status': 'pendente',
+            'status_url': '/api/importacao-cartao/jobs/<job_id>'
         }
     """
     try:
@@ -96,6 +121,7 @@ def processar_importacao():
 
         cartao_id = data.get('cartao_id')
         competencia_str = data.get('competencia')
+        upload_id = data.get('upload_id')
         linhas = data.get('linhas', [])
 
         # Validações
@@ -105,7 +131,28 @@ def processar_importacao():
         if not competencia_str:
             return jsonify({'success': False, 'message': 'competencia obrigatória'}), 400
 
-        if not linhas:
+        if upload_id:
+            mapeamento = data.get('mapeamento') or {}
+            if not all(mapeamento.get(campo) not in (None, '') for campo in ('data_compra', 'descricao', 'valor')):
+                return jsonify({'success': False, 'message': 'mapeamento de data_compra, descricao e valor obrigatório'}), 400
+
+            if not data.get('categoria_id'):
+                return jsonify({'success': False, 'message': 'categoria_id obrigatória'}), 400
+
+            if UploadSessaoService.obter(upload_id) is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Sessão de upload expirada ou inexistente. Envie o arquivo novamente.'
+                }), 404
+
+            linhas = ImportacaoCartaoService.mapear_linhas(
+                UploadSessaoService.linhas(upload_id),
+                mapeamento,
+                data.get('categoria_id'),
+                item_agregado_id=data.get('item_agregado_id'),
+                ajustes=data.get('ajustes')
+            )
+        elif not linhas:
             return jsonify({'success': False, 'message': 'Nenhuma linha para processar'}), 400
 
         # Verificar se cartão existe
@@ -116,12 +163,26 @@ def processar_importacao():
         # Parsear competência
         competencia = datetime.strptime(competencia_str, '%Y-%m-%d').date().replace(day=1)
 
+        if data.get('assincrono'):
+            job = ImportacaoJobService.iniciar(
+                current_app._get_current_object(), cartao_id, competencia, linhas, upload_id=upload_id
+            )
+            return jsonify({
+                'success': True,
+                'job_id': job['job_id'],
+                'status': job['status'],
+                'status_url': f"{bp.url_prefix}/jobs/{job['job_id']}"
+            }), 202
+
         # Processar linhas
         lancamentos = ImportacaoCartaoService.processar_linhas_mapeadas(linhas, cartao_id, competencia)
 
         # Persistir
         resultado = ImportacaoCartaoService.persistir_lancamentos(lancamentos)
 
+        if upload_id:
+            UploadSessaoService.remover(upload_id)
+
         return jsonify({
             'success': True,
             **resultado
@@ -132,6 +193,36 @@ def processar_importacao():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def status_job(job_id):
+    """
+    Progresso de uma importação assíncrona
+
+    Returns:
+        {
+            'success': bool,
+            'job': {
+                'job_id': str,
+                'status': 'pendente' | 'executando' | 'concluido' | 'erro',
+                'linhas_lidas': int,
+                'linhas_invalidas': int,
+                'inseridos': int,
+                'duplicados': int,
+                'erros': int,
+                'blocos': int,
+                'linhas_por_segundo': float,
+                'mensagem': str | None,
+                ...
+            }
+        }
+    """
+    job = ImportacaoJobService.obter(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job não encontrado'}), 404
+
+    return jsonify({'success': True, 'job': job})
+
+
 @bp.route('/categorias', methods=['GET'])
 def listar_categorias():
     """Lista categorias de despesas disponíveis"""
@@ -4,12 +4,21 @@ Rotas para gerenciamento de Indexadores Mensais (TR, IPCA, etc.)
 
 from flask import Blueprint, request, jsonify, render_template
 from backend.models import db, IndexadorMensal
+from backend.services.financiamento_service import FinanciamentoService
+from backend.services.indexador_service import SerieIndexador
+from backend.utils.competencia import filtro_ano
 from datetime import datetime, date
 from decimal import Decimal
 
 indexadores_bp = Blueprint('indexadores', __name__)
 
 
+def _reindexar(nome, data_ref):
+    """Recalcula as parcelas pendentes dos financiamentos corrigidos pelo indexador"""
+    resultado = FinanciamentoService.reindexar(nome, data_ref)
+    return {**resultado, 'a_partir_de': resultado['a_partir_de'].isoformat()}
+
+
 @indexadores_bp.route('/indexadores')
 def pagina_indexadores():
     """Página de gerenciamento de indexadores"""
@@ -43,9 +52,7 @@ def listar_indexadores():
             data_ref = date(ano, mes, 1)
             query = query.filter_by(data_referencia=data_ref)
         elif ano:
-            query = query.filter(
-                db.extract('year', IndexadorMensal.data_referencia) == ano
-            )
+            query = query.filter(filtro_ano(IndexadorMensal.data_referencia, ano))
 
         # Ordenar por data (mais recentes primeiro)
         indexadores = query.order_by(IndexadorMensal.data_referencia.desc()).all()
@@ -80,7 +87,9 @@ def criar_indexador():
         "nome": "TR",
         "ano": 2026,
         "mes": 1,
-        "valor": 0.15
+        "valor": 0.15,
+        "reindexar": true  (opcional) - recalcula em seguida as parcelas
+                           pendentes dos financiamentos com este indexador
     }
     """
     try:
@@ -126,15 +135,20 @@ def criar_indexador():
             mensagem = f'Indexador {dados["nome"]} de {mes:02d}/{ano} criado'
 
         db.session.commit()
+        SerieIndexador.invalidar(dados['nome'])
 
-        return jsonify({
+        resposta = {
             'mensagem': mensagem,
             'indexador': {
                 'nome': dados['nome'],
                 'data_referencia': data_ref.strftime('%Y-%m-%d'),
                 'valor': float(dados['valor'])
             }
-        }), 201
+        }
+        if dados.get('reindexar'):
+            resposta['reindexacao'] = _reindexar(dados['nome'], data_ref)
+
+        return jsonify(resposta), 201
 
     except ValueError as e:
         return jsonify({'erro': f'Valor inválido: {str(e)}'}), 400
@@ -150,7 +164,9 @@ def atualizar_indexador(indexador_id):
 
     Body:
     {
-        "valor": 0.20
+        "valor": 0.20,
+        "reindexar": true  (opcional) - recalcula em seguida as parcelas
+                           pendentes dos financiamentos com este indexador
     }
     """
     try:
@@ -167,8 +183,9 @@ def atualizar_indexador(indexador_id):
             indexador.valor = Decimal(str(dados['valor']))
 
         db.session.commit()
+        SerieIndexador.invalidar(indexador.nome)
 
-        return jsonify({
+        resposta = {
             'mensagem': 'Indexador atualizado com sucesso',
             'indexador': {
                 'id': indexador.id,
@@ -176,7 +193,11 @@ def atualizar_indexador(indexador_id):
                 'data_referencia': indexador.data_referencia.strftime('%Y-%m-%d'),
                 'valor': float(indexador.valor)
             }
-        }), 200
+        }
+        if dados.get('reindexar'):
+            resposta['reindexacao'] = _reindexar(indexador.nome, indexador.data_referencia)
+
+        return jsonify(resposta), 200
 
     except ValueError as e:
         return jsonify({'erro': f'Valor inválido: {str(e)}'}), 400
@@ -194,8 +215,10 @@ def deletar_indexador(indexador_id):
         if not indexador:
             return jsonify({'erro': 'Indexador não encontrado'}), 404
 
+        nome = indexador.nome
         db.session.delete(indexador)
         db.session.commit()
+        SerieIndexador.invalidar(nome)
 
         return jsonify({'mensagem': 'Indexador deletado com sucesso'}), 200
 
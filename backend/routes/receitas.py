@@ -652,12 +652,8 @@ def atualizar_realizada(id):
             from services.conta_bancaria_service import ContaBancariaService
             from models import MovimentoFinanceiro
 
+        # Saldos das contas envolvidas são atualizados por delta no flush
         mov = MovimentoFinanceiro.query.filter_by(receita_realizada_id=receita.id, origem='RECEITA').first()
-        contas_recalc = set()
-        if receita_antes.conta_bancaria_id:
-            contas_recalc.add(receita_antes.conta_bancaria_id)
-        if receita.conta_bancaria_id:
-            contas_recalc.add(receita.conta_bancaria_id)
 
         if receita.conta_bancaria_id:
             if mov:
@@ -681,11 +677,8 @@ def atualizar_realizada(id):
                 )
         else:
             if mov:
-                contas_recalc.add(mov.conta_bancaria_id)
                 db.session.delete(mov)
 
-        for cid in contas_recalc:
-            ContaBancariaService.recalcular_saldo_conta(cid)
         db.session.commit()
 
         return jsonify({
@@ -916,10 +909,8 @@ def deletar_realizada(id):
         JSON com confirmação
     """
     try:
-        from backend.services.conta_bancaria_service import ContaBancariaService
         from backend.models import MovimentoFinanceiro
     except ImportError:
-        from services.conta_bancaria_service import ContaBancariaService
         from models import MovimentoFinanceiro
 
     try:
@@ -931,15 +922,12 @@ def deletar_realizada(id):
                 'error': 'Receita não encontrada'
             }), 404
 
-        # Remover movimento financeiro vinculado (se existir) e recalcular saldo
+        # Remover movimento financeiro vinculado (se existir); saldo atualizado por delta no flush
         movimentos = MovimentoFinanceiro.query.filter_by(receita_realizada_id=receita.id, origem='RECEITA').all()
-        contas_para_recalcular = {m.conta_bancaria_id for m in movimentos}
         for m in movimentos:
             db.session.delete(m)
 
         db.session.delete(receita)
-        for cid in contas_para_recalcular:
-            ContaBancariaService.recalcular_saldo_conta(cid)
         db.session.commit()
 
         return jsonify({
@@ -3,6 +3,9 @@ Agendador de Jobs Automáticos
 
 Executa tarefas periódicas do sistema:
 - Geração de faturas mensais de cartões
+- Materialização diária de despesas recorrentes
+- Verificação diária dos saldos das contas bancárias
+- Verificação diária do executado das faturas de cartão
 - Outros jobs futuros
 
 Para usar:
@@ -28,6 +31,69 @@ def job_gerar_faturas_mensais():
     except Exception as e:
         print(f"ERRO no job de faturas: {str(e)}")
 
+def job_materializar_recorrencias():
+    """
+    Job executado diariamente às 00:10
+
+    Gera apenas os meses ainda não materializados (watermark por ItemDespesa)
+    """
+    try:
+        from backend.app import app
+        from backend.services.recorrencia_service import RecorrenciaService
+        print("Executando job: Materializacao de recorrencias...")
+        with app.app_context():
+            resultado = RecorrenciaService.materializar()
+        print(f"OK - {resultado['contas']} contas, {resultado['lancamentos']} lancamentos, "
+              f"{resultado['faturas']} faturas (ate {resultado['ate']})")
+    except Exception as e:
+        print(f"ERRO no job de recorrencias: {str(e)}")
+
+def job_verificar_saldos_bancarios():
+    """
+    Job executado diariamente às 03:00
+
+    Confere o saldo mantido por delta contra a recomputação completa (apenas relata)
+    """
+    try:
+        from backend.app import app
+        from backend.services.conta_bancaria_service import ContaBancariaService
+        print("Executando job: Verificacao de saldos bancarios...")
+        with app.app_context():
+            resultado = ContaBancariaService.verificar_saldos()
+        for d in resultado['divergencias']:
+            print(f"[AVISO] Conta {d['conta_bancaria_id']} ({d['nome']}): registrado {d['saldo_registrado']}, "
+                  f"calculado {d['saldo_calculado']} (diferenca {d['diferenca']})")
+        for conta_id in resultado['checkpoints_divergentes']:
+            print(f"[AVISO] Conta {conta_id}: checkpoints mensais divergentes")
+        print(f"OK - {resultado['contas_verificadas']} contas verificadas, "
+              f"{len(resultado['divergencias'])} divergencias")
+    except Exception as e:
+        print(f"ERRO no job de saldos bancarios: {str(e)}")
+
+def job_verificar_executado_faturas():
+    """
+    Job executado diariamente às 03:10
+
+    Confere o executado das faturas e o consumo por categoria (mantidos por
+    delta) contra a soma completa dos lançamentos (apenas relata)
+    """
+    try:
+        from backend.app import app
+        from backend.services.fatura_cartao_service import FaturaCartaoService
+        print("Executando job: Verificacao do executado das faturas...")
+        with app.app_context():
+            resultado = FaturaCartaoService.verificar()
+        for d in resultado['divergencias_faturas']:
+            print(f"[AVISO] Fatura {d['fatura_id']} (cartao {d['cartao_id']}): registrado "
+                  f"{d['executado_registrado']}, calculado {d['executado_calculado']}")
+        for d in resultado['divergencias_consumo']:
+            print(f"[AVISO] Categoria {d['item_agregado_id']} ({d['mes']}): registrado "
+                  f"{d['consumo_registrado']}, calculado {d['consumo_calculado']}")
+        print(f"OK - {resultado['faturas_verificadas']} faturas verificadas, "
+              f"{len(resultado['divergencias_faturas']) + len(resultado['divergencias_consumo'])} divergencias")
+    except Exception as e:
+        print(f"ERRO no job de executado das faturas: {str(e)}")
+
 # Agendar jobs
 scheduler.add_job(
     func=job_gerar_faturas_mensais,
@@ -37,6 +103,30 @@ scheduler.add_job(
     replace_existing=True
 )
 
+scheduler.add_job(
+    func=job_materializar_recorrencias,
+    trigger=CronTrigger(hour=0, minute=10),  # Diário, 00:10
+    id='materializar_recorrencias',
+    name='Materializar despesas recorrentes e faturas',
+    replace_existing=True
+)
+
+scheduler.add_job(
+    func=job_verificar_saldos_bancarios,
+    trigger=CronTrigger(hour=3, minute=0),  # Diário, 03:00
+    id='verificar_saldos_bancarios',
+    name='Verificar saldos das contas bancarias',
+    replace_existing=True
+)
+
+scheduler.add_job(
+    func=job_verificar_executado_faturas,
+    trigger=CronTrigger(hour=3, minute=10),  # Diário, 03:10
+    id='verificar_executado_faturas',
+    name='Verificar executado das faturas de cartao',
+    replace_existing=True
+)
+
 # Garantir que o scheduler pare ao encerrar a aplicação
 atexit.register(lambda: scheduler.shutdown())
 
@@ -54,3 +144,6 @@ def start_scheduler():
         scheduler.start()
         print("Scheduler de jobs iniciado!")
         print("Job agendado: Gerar faturas mensais (dia 1, 00:01)")
+        print("Job agendado: Materializar recorrencias (diario, 00:10)")
+        print("Job agendado: Verificar saldos bancarios (diario, 03:00)")
+        print("Job agendado: Verificar executado das faturas (diario, 03:10)")
@@ -0,0 +1,160 @@
+"""
+Serviço de Alertas de Cartão - Feed incremental "alterados desde"
+
+A interface consulta os alertas de orçamento periodicamente. Em vez de
+devolver a lista inteira a cada consulta, o feed guarda (por competência) o
+último conjunto de alertas avaliado e o histórico de alterações:
+- 'novo': alerta que passou a existir
+- 'alterado': mesmo item/grupo com valores ou nível diferentes
+- 'resolvido': alerta que deixou de existir (traz a última versão)
+
+Cada alteração tem um cursor ('<época>:<sequência>'). O cliente envia o
+último cursor recebido em 'desde' e recebe apenas o que mudou depois dele.
+
+O histórico fica na memória do processo. A época identifica o processo que
+emitiu o cursor: um cursor de outro worker (ou de antes de um restart) não
+corresponde a este histórico, e a resposta é a lista completa (completo=True).
+
+Os alertas só são reavaliados quando os dados de cartão do mês mudaram
+(ResumoCartaoService.versao) ou após RESUMO_CARTAO_TTL_SEGUNDOS; uma
+consulta sem escritas no meio não toca o banco.
+"""
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date
+
+try:
+    from backend.services.cartao_service import CartaoService
+    from backend.services.resumo_cartao_service import ResumoCartaoService, RESUMO_CARTAO_TTL_SEGUNDOS
+except ImportError:
+    from services.cartao_service import CartaoService
+    from services.resumo_cartao_service import ResumoCartaoService, RESUMO_CARTAO_TTL_SEGUNDOS
+
+# Alterações guardadas por competência (cursores mais antigos recebem a lista completa)
+ALERTAS_HISTORICO_MAX = 500
+
+# Identifica o histórico deste processo nos cursores emitidos
+_EPOCA = uuid.uuid4().hex[:12]
+
+_lock = threading.Lock()
+
+
+def _ler_cursor(desde):
+    """Sequência do cursor (None se vazio, inválido ou de outro processo)"""
+    epoca, _, sequencia = str(desde or '').partition(':')
+    if epoca != _EPOCA or not sequencia.isdigit():
+        return None
+    return int(sequencia)
+
+
+def _chave(alerta):
+    if alerta['tipo'] == 'LOCAL':
+        return 'LOCAL', alerta['item_agregado_id']
+    return 'GLOBAL', alerta['grupo_agregador_id']
+
+
+def _do_cartao(alerta, cartao_id):
+    if alerta['tipo'] == 'LOCAL':
+        return alerta['cartao_id'] == cartao_id
+    return any(item['cartao_id'] == cartao_id for item in alerta['itens'])
+
+
+class AlertaCartaoService:
+    """
+    Feed de alterações dos alertas de orçamento (locais e globais)
+    """
+
+    _estados = {}
+    _ultimo_cursor = 0
+
+    @staticmethod
+    def _novo_cursor():
+        AlertaCartaoService._ultimo_cursor += 1
+        return AlertaCartaoService._ultimo_cursor
+
+    @staticmethod
+    def _atualizar(competencia):
+        """Reavalia os alertas do mês se os dados mudaram e registra as diferenças"""
+        estado = AlertaCartaoService._estados.get(competencia)
+        versao = ResumoCartaoService.versao(competencia)
+        if estado is not None and estado['versao'] == versao and \
+                time.monotonic() - estado['avaliado_em'] < RESUMO_CARTAO_TTL_SEGUNDOS:
+            return estado
+
+        resultado = CartaoService.obter_todos_alertas(competencia=competencia)
+        atuais = {_chave(a): a for a in resultado['locais'] + resultado['globais']}
+
+        if estado is None:
+            cursor = AlertaCartaoService._novo_cursor()
+            estado = AlertaCartaoService._estados[competencia] = {
+                'alertas': atuais,
+                'historico': deque(maxlen=ALERTAS_HISTORICO_MAX),
+                'cursor': cursor,
+                'cursor_minimo': cursor,
+            }
+        else:
+            anteriores = estado['alertas']
+            alteracoes = []
+            for chave, alerta in atuais.items():
+                if chave not in anteriores:
+                    alteracoes.append(('novo', alerta))
+                elif anteriores[chave] != alerta:
+                    alteracoes.append(('alterado', alerta))
+            for chave, alerta in anteriores.items():
+                if chave not in atuais:
+                    alteracoes.append(('resolvido', alerta))
+
+            for acao, alerta in alteracoes:
+                cursor = AlertaCartaoService._novo_cursor()
+                if len(estado['historico']) == estado['historico'].maxlen:
+                    estado['cursor_minimo'] = estado['historico'][0][0]
+                estado['historico'].append((cursor, acao, alerta))
+                estado['cursor'] = cursor
+            estado['alertas'] = atuais
+
+        estado['versao'] = versao
+        estado['avaliado_em'] = time.monotonic()
+        return estado
+
+    @staticmethod
+    def alteracoes(competencia=None, desde=0, cartao_id=None):
+        """
+        Alertas alterados desde um cursor
+
+        Args:
+            competencia (date, opcional): Mês de referência (padrão: mês atual)
+            desde (str): Último cursor recebido (vazio = lista completa)
+            cartao_id (int, opcional): Apenas alertas do cartão (globais: grupos com itens dele)
+
+        Returns:
+            dict: {
+                'cursor': str (enviar em 'desde' na próxima consulta),
+                'completo': bool (True = 'alteracoes' é a lista atual inteira, como 'novo';
+                    também quando o cursor é de outro processo),
+                'alteracoes': [{'cursor': str, 'acao': str, 'alerta': dict}]
+            }
+        """
+        competencia = (competencia or date.today()).replace(day=1)
+        desde = _ler_cursor(desde)
+
+        with _lock:
+            estado = AlertaCartaoService._atualizar(competencia)
+            completo = desde is None or desde < estado['cursor_minimo']
+            if completo:
+                itens = [(estado['cursor'], 'novo', alerta) for alerta in estado['alertas'].values()]
+            else:
+                itens = [item for item in estado['historico'] if item[0] > desde]
+            cursor = estado['cursor']
+
+        if cartao_id:
+            itens = [item for item in itens if _do_cartao(item[2], cartao_id)]
+
+        return {
+            'cursor': f'{_EPOCA}:{cursor}',
+            'completo': completo,
+            'alteracoes': [
+                {'cursor': f'{_EPOCA}:{c}', 'acao': acao, 'alerta': alerta} for c, acao, alerta in itens
+            ]
+        }
@@ -11,15 +11,21 @@ Este serviço implementa:
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
-from sqlalchemy import func, and_
+from sqlalchemy import func
 import uuid
 
 try:
-    from backend.models import (db, Conta, ItemDespesa, ItemAgregado,
-                                OrcamentoAgregado, LancamentoAgregado, ConfigAgregador)
+    from backend.models import (db, Conta, ItemDespesa, ItemAgregado, GrupoAgregador,
+                                OrcamentoAgregado, LancamentoAgregado, ConsumoAgregado)
+    from backend.services.fatura_cartao_service import FaturaCartaoService
+    from backend.services.orcamento_vigencia_service import OrcamentoTimeline
+    from backend.utils.competencia import filtro_competencia
 except ImportError:
-    from models import (db, Conta, ItemDespesa, ItemAgregado,
-                       OrcamentoAgregado, LancamentoAgregado, ConfigAgregador)
+    from models import (db, Conta, ItemDespesa, ItemAgregado, GrupoAgregador,
+                       OrcamentoAgregado, LancamentoAgregado, ConsumoAgregado)
+    from services.fatura_cartao_service import FaturaCartaoService
+    from services.orcamento_vigencia_service import OrcamentoTimeline
+    from utils.competencia import filtro_competencia
 
 
 class CartaoService:
@@ -32,16 +38,18 @@ class CartaoService:
     # ========================================================================
 
     @staticmethod
-    def get_or_create_fatura(cartao_id, competencia):
+    def get_or_create_fatura(cartao_id, competencia, commit=True):
         """
         Busca ou cria uma fatura virtual para o cartão + mês
 
         A fatura sempre existe, mesmo sem lançamentos.
-        Valor inicial = soma dos orçamentos das categorias do cartão
+        Valor inicial = soma dos orçamentos das categorias do cartão;
+        executado inicial = lançamentos já gravados no mês (depois, por delta)
 
         Args:
             cartao_id (int): ID do ItemDespesa (tipo 'Agregador')
             competencia (date): Mês de referência (YYYY-MM-01)
+            commit (bool): False = apenas flush (o caller controla a transação)
 
         Returns:
             Conta: Fatura do cartão (planejado ou executado)
@@ -59,39 +67,19 @@ class CartaoService:
         if fatura:
             return fatura
 
-        # Criar nova fatura virtual
-        cartao = ItemDespesa.query.get(cartao_id)
-        if not cartao or cartao.tipo != 'Agregador':
-            raise ValueError(f'ItemDespesa {cartao_id} não é um cartão de crédito')
-
-        # Buscar configuração do cartão
-        config = ConfigAgregador.query.filter_by(item_despesa_id=cartao_id).first()
-        if not config:
-            raise ValueError(f'Cartão {cartao_id} sem configuração de fechamento/vencimento')
-
-        # Calcular valor planejado (soma dos orçamentos)
-        valor_planejado = CartaoService.calcular_planejado(cartao_id, comp_primeiro_dia)
-
-        # Calcular data de vencimento baseada no dia de vencimento configurado
-        data_vencimento = comp_primeiro_dia.replace(day=config.dia_vencimento)
-
-        # Criar fatura
-        fatura = Conta(
-            item_despesa_id=cartao_id,
-            mes_referencia=comp_primeiro_dia,
-            descricao=f'Fatura {cartao.nome} - {comp_primeiro_dia.strftime("%m/%Y")}',
-            valor=valor_planejado,  # Inicialmente = planejado
-            valor_planejado=valor_planejado,
-            valor_executado=Decimal('0'),  # Será calculado ao pagar
-            data_vencimento=data_vencimento,
-            status_pagamento='Pendente',
-            is_fatura_cartao=True,
-            cartao_competencia=comp_primeiro_dia,
-            estouro_orcamento=False
+        # Criar nova fatura virtual (valida cartão e configuração de vencimento)
+        FaturaCartaoService.dados_cartao(cartao_id)
+        fatura = FaturaCartaoService.nova_fatura(
+            cartao_id, comp_primeiro_dia,
+            valor_planejado=CartaoService.calcular_planejado(cartao_id, comp_primeiro_dia),
+            valor_executado=CartaoService.calcular_executado(cartao_id, comp_primeiro_dia)
         )
 
         db.session.add(fatura)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
 
         return fatura
 
@@ -107,36 +95,16 @@ class CartaoService:
         Returns:
             Decimal: Valor total orçado
         """
-        comp_primeiro_dia = competencia.replace(day=1)
-
-        # Buscar todos os itens agregados (categorias) do cartão
-        itens_agregados = ItemAgregado.query.filter_by(
-            item_despesa_id=cartao_id
-        ).all()
-
-        total_planejado = Decimal('0')
-
-        for item in itens_agregados:
-            # Buscar orçamento vigente para essa categoria nessa competência
-            orcamento = OrcamentoAgregado.query.filter(
-                and_(
-                    OrcamentoAgregado.item_agregado_id == item.id,
-                    OrcamentoAgregado.ativo == True,
-                    OrcamentoAgregado.vigencia_inicio <= comp_primeiro_dia,
-                    (OrcamentoAgregado.vigencia_fim == None) |
-                    (OrcamentoAgregado.vigencia_fim >= comp_primeiro_dia)
-                )
-            ).first()
-
-            if orcamento:
-                total_planejado += orcamento.valor_teto
-
-        return total_planejado
+        # Vigências de orçamento de todas as categorias do cartão (em cache)
+        return OrcamentoTimeline.do_cartao(cartao_id).total(competencia.replace(day=1))
 
     @staticmethod
     def calcular_executado(cartao_id, competencia):
         """
-        Calcula valor executado da fatura = soma real dos lançamentos
+        Calcula valor executado da fatura = soma real dos lançamentos do cartão
+
+        Recomputação completa (criação da fatura e conferência); depois disso
+        Conta.valor_executado é mantido por delta (FaturaCartaoService).
 
         Args:
             cartao_id (int): ID do cartão
@@ -145,27 +113,127 @@ class CartaoService:
         Returns:
             Decimal: Valor total gasto
         """
-        comp_primeiro_dia = competencia.replace(day=1)
-
-        # Buscar todos os itens agregados do cartão
-        itens_agregados_ids = [item.id for item in ItemAgregado.query.filter_by(
-            item_despesa_id=cartao_id
-        ).all()]
-
-        if not itens_agregados_ids:
-            return Decimal('0')
-
-        # Somar lançamentos do mês
-        # Usar STRFTIME para compatibilidade com SQLite
+        # Somar lançamentos do mês, com e sem categoria (usa idx_lanc_agregado_cartao_fatura)
         total_executado = db.session.query(
             func.coalesce(func.sum(LancamentoAgregado.valor), 0)
         ).filter(
-            LancamentoAgregado.item_agregado_id.in_(itens_agregados_ids),
-            func.strftime('%Y-%m', LancamentoAgregado.mes_fatura) == comp_primeiro_dia.strftime('%Y-%m')
+            LancamentoAgregado.cartao_id == cartao_id,
+            filtro_competencia(LancamentoAgregado.mes_fatura, competencia.replace(day=1))
         ).scalar()
 
         return Decimal(str(total_executado or 0))
 
+    @staticmethod
+    def calcular_totais_faturas(competencias, cartao_ids):
+        """
+        Calcula previsto/executado de várias faturas de uma vez (consultas agrupadas)
+
+        Regra (a mesma de /api/despesas e do dashboard):
+        - executado = soma de TODOS os LancamentoAgregado do mês (com e sem categoria)
+        - previsto = executado + soma(max(0, orcado_categoria - gasto_categoria))
+          considerando apenas as categorias (ItemAgregado) ativas do cartão
+
+        Executado e gasto por categoria são leituras de linhas mantidas por
+        delta (Conta.valor_executado e ConsumoAgregado), não agregações sobre
+        os lançamentos; só pares sem fatura somam os lançamentos.
+
+        Args:
+            competencias (iterable[date]): Meses de referência
+            cartao_ids (iterable[int]): IDs dos cartões (ItemDespesa tipo Agregador)
+
+        Returns:
+            dict: {(cartao_id, competencia): (previsto, executado)} em Decimal,
+                  para todo par do produto cartao_ids x competencias
+        """
+        competencias = {c.replace(day=1) for c in competencias if c}
+        cartao_ids = {c for c in cartao_ids if c}
+        if not competencias or not cartao_ids:
+            return {}
+
+        # 1. Executado por (cartão, mês): gravado na fatura
+        executado = {
+            (cartao_id, mes): Decimal(str(total or 0))
+            for cartao_id, mes, total in db.session.query(
+                Conta.item_despesa_id,
+                Conta.cartao_competencia,
+                Conta.valor_executado
+            ).filter(
+                Conta.is_fatura_cartao == True,
+                Conta.item_despesa_id.in_(cartao_ids),
+                Conta.cartao_competencia.in_(competencias)
+            ).all()
+        }
+
+        # Pares sem fatura: soma dos lançamentos
+        sem_fatura = {(c, m) for c in cartao_ids for m in competencias} - set(executado)
+        if sem_fatura:
+            for cartao_id, mes, total in db.session.query(
+                LancamentoAgregado.cartao_id,
+                LancamentoAgregado.mes_fatura,
+                func.sum(LancamentoAgregado.valor)
+            ).filter(
+                LancamentoAgregado.cartao_id.in_({c for c, _ in sem_fatura}),
+                LancamentoAgregado.mes_fatura.in_({m for _, m in sem_fatura})
+            ).group_by(
+                LancamentoAgregado.cartao_id,
+                LancamentoAgregado.mes_fatura
+            ).all():
+                if (cartao_id, mes) in sem_fatura:
+                    executado[(cartao_id, mes)] = Decimal(str(total or 0))
+
+        # 2. Categorias ativas de cada cartão
+        itens_por_cartao = {}
+        for item_id, cartao_id in db.session.query(
+            ItemAgregado.id, ItemAgregado.item_despesa_id
+        ).filter(
+            ItemAgregado.item_despesa_id.in_(cartao_ids),
+            ItemAgregado.ativo == True
+        ).all():
+            itens_por_cartao.setdefault(cartao_id, []).append(item_id)
+
+        # 3. Gasto (ConsumoAgregado) e orçado por (categoria, mês)
+        itens_ids = [i for ids in itens_por_cartao.values() for i in ids]
+        gastos = {}
+        orcados = {}
+        if itens_ids:
+            for item_id, mes, total in db.session.query(
+                ConsumoAgregado.item_agregado_id,
+                ConsumoAgregado.mes,
+                ConsumoAgregado.total
+            ).filter(
+                ConsumoAgregado.item_agregado_id.in_(itens_ids),
+                ConsumoAgregado.mes.in_(competencias)
+            ).all():
+                gastos[(item_id, mes)] = Decimal(str(total or 0))
+
+            for item_id, mes, total in db.session.query(
+                OrcamentoAgregado.item_agregado_id,
+                OrcamentoAgregado.mes_referencia,
+                func.sum(OrcamentoAgregado.valor_teto)
+            ).filter(
+                OrcamentoAgregado.item_agregado_id.in_(itens_ids),
+                OrcamentoAgregado.mes_referencia.in_(competencias)
+            ).group_by(
+                OrcamentoAgregado.item_agregado_id,
+                OrcamentoAgregado.mes_referencia
+            ).all():
+                orcados[(item_id, mes)] = Decimal(str(total or 0))
+
+        # 4. Complemento: orçado que ainda não foi gasto
+        resultado = {}
+        for cartao_id in cartao_ids:
+            for mes in competencias:
+                total_executado = executado.get((cartao_id, mes), Decimal('0'))
+                complemento = Decimal('0')
+                for item_id in itens_por_cartao.get(cartao_id, []):
+                    gasto = gastos.get((item_id, mes), Decimal('0'))
+                    orcado = orcados.get((item_id, mes), Decimal('0'))
+                    if orcado > gasto:
+                        complemento += orcado - gasto
+                resultado[(cartao_id, mes)] = (total_executado + complemento, total_executado)
+
+        return resultado
+
     # ==========================================================
     # FUTURO (FASE 3): Pagamento parcial de fatura
     #
@@ -194,26 +262,10 @@ class CartaoService:
         Returns:
             Conta: Fatura atualizada
         """
-        fatura = CartaoService.get_or_create_fatura(cartao_id, competencia)
-
-        # Se já foi paga, não recalcular
-        if fatura.status_pagamento == 'Pago':
-            return fatura
-
-        # Recalcular planejado (pode ter mudado o orçamento)
-        fatura.valor_planejado = CartaoService.calcular_planejado(cartao_id, competencia)
-
-        # Calcular executado atual
-        fatura.valor_executado = CartaoService.calcular_executado(cartao_id, competencia)
-
-        # Verificar estouro
-        if fatura.valor_executado > fatura.valor_planejado:
-            fatura.estouro_orcamento = True
-        else:
-            fatura.estouro_orcamento = False
-
-        # Valor exibido = planejado (enquanto não paga)
-        fatura.valor = fatura.valor_planejado
+        # Planejado (pode ter mudado o orçamento) e estouro; fatura paga não
+        # é recalculada. O executado já está atualizado (mantido por delta).
+        FaturaCartaoService.agendar([(cartao_id, competencia)])
+        fatura = FaturaCartaoService.processar_pendentes()[(cartao_id, competencia.replace(day=1))]
 
         db.session.commit()
         return fatura
@@ -288,12 +340,7 @@ class CartaoService:
                 origem='FATURA',
                 ajustavel=False
             )
-            db.session.add(movimento)
-            try:
-                from backend.services.conta_bancaria_service import ContaBancariaService
-            except ImportError:
-                from services.conta_bancaria_service import ContaBancariaService
-            ContaBancariaService.recalcular_saldo_conta(conta_bancaria_id)
+            db.session.add(movimento)  # saldo da conta atualizado por delta no flush
             fatura.conta_bancaria_id = conta_bancaria_id
 
         # Atualizar fatura
@@ -366,12 +413,27 @@ class CartaoService:
 
         data_compra_inicial = dados_lancamento['data_compra']
 
+        # Faturas do intervalo em uma consulta (o mês seguinte cobre o redirecionamento)
+        faturas = FaturaCartaoService.faturas(
+            [cartao_id],
+            [mes_fatura_inicial + relativedelta(months=n) for n in range(total_parcelas + 1)]
+        )
+
+        # FASE 2: IDEMPOTÊNCIA ROBUSTA
+        # Parcelas já existentes da compra (compra_id = UUID único), em uma consulta
+        # Muito mais seguro que usar descrição (texto livre)
+        parcelas_existentes = {
+            lancamento.numero_parcela: lancamento
+            for lancamento in LancamentoAgregado.query.filter_by(compra_id=compra_uuid).all()
+        }
+
         # Lista para armazenar lançamentos criados
         lancamentos_criados = []
-        primeira_fatura = None
+        mes_primeira_fatura = None
         faturas_afetadas_set = set()  # Armazena meses de faturas afetadas (considerando redirecionamento)
+        novos = []
 
-        # Criar uma parcela para cada mês
+        # Planejar uma parcela para cada mês
         for n in range(1, total_parcelas + 1):
             # Calcular data da parcela (incrementa mês a cada parcela)
             data_parcela = data_compra_inicial + relativedelta(months=n-1)
@@ -379,29 +441,22 @@ class CartaoService:
 
             # REGRA DE FECHAMENTO DE FATURA:
             # Se a fatura do mês estiver PAGA, redirecionar para a próxima fatura
-            fatura_mes = CartaoService.get_or_create_fatura(cartao_id, mes_fatura_parcela)
-            if fatura_mes.status_fatura == 'PAGA':
-                # Buscar próxima fatura em aberto
+            fatura_mes = faturas.get((cartao_id, mes_fatura_parcela))
+            if fatura_mes is not None and fatura_mes.status_fatura == 'PAGA':
                 mes_fatura_parcela = mes_fatura_parcela + relativedelta(months=1)
-                fatura_mes = CartaoService.get_or_create_fatura(cartao_id, mes_fatura_parcela)
+
+            # Guardar mês da primeira fatura para retornar
+            if n == 1:
+                mes_primeira_fatura = mes_fatura_parcela
 
             # Calcular valor desta parcela (distribui centavos do resto nas primeiras parcelas)
             centavos_parcela = centavos_base + (1 if n <= centavos_resto else 0)
             valor_parcela = Decimal(centavos_parcela) / 100
 
-            # FASE 2: IDEMPOTÊNCIA ROBUSTA
-            # Verifica se parcela já existe usando compra_id (UUID único)
-            # Muito mais seguro que usar descrição (texto livre)
-            lancamento_existente = LancamentoAgregado.query.filter_by(
-                compra_id=compra_uuid,
-                numero_parcela=n
-            ).first()
-
-            if lancamento_existente:
+            if n in parcelas_existentes:
                 # Parcela já existe, pular
                 if n == 1:
-                    lancamentos_criados.append(lancamento_existente)
-                    primeira_fatura = fatura_mes
+                    lancamentos_criados.append(parcelas_existentes[n])
                 continue
 
             # Criar lançamento da parcela
@@ -419,22 +474,24 @@ class CartaoService:
                 is_recorrente=False,  # Parcelamento NÃO é recorrência
                 compra_id=compra_uuid  # ← FASE 2: UUID único da compra
             )
-
-            db.session.add(lancamento)
-            lancamentos_criados.append(lancamento)
-
-            # Guardar primeira fatura para retornar
-            if n == 1:
-                primeira_fatura = fatura_mes
+            novos.append(lancamento)
 
             # Registrar fatura afetada (mês real usado, após possível redirecionamento)
             faturas_afetadas_set.add(mes_fatura_parcela)
 
+        # Faturas afetadas (e a da primeira parcela): criadas/recalculadas uma
+        # única vez, em conjunto, no flush. Cartão inválido falha aqui (ValueError)
+        FaturaCartaoService.agendar(
+            (cartao_id, mes) for mes in faturas_afetadas_set | {mes_primeira_fatura}
+        )
+
+        db.session.add_all(novos)
+        lancamentos_criados.extend(novos)
         db.session.flush()
 
-        # Recalcular TODAS as faturas afetadas (considerando redirecionamentos por status PAGA)
-        for mes_fatura_afetada in faturas_afetadas_set:
-            CartaoService.recalcular_fatura(cartao_id, mes_fatura_afetada)
+        primeira_fatura = FaturaCartaoService.faturas([cartao_id], [mes_primeira_fatura])[
+            (cartao_id, mes_primeira_fatura)
+        ]
 
         db.session.commit()
 
@@ -467,32 +524,25 @@ class CartaoService:
         # Verificar estouros por categoria
         categorias_estouro = []
         itens_agregados = ItemAgregado.query.filter_by(item_despesa_id=cartao_id).all()
+        timeline = OrcamentoTimeline.do_cartao(cartao_id)
+
+        # Gasto de cada categoria do cartão no mês (linhas de ConsumoAgregado)
+        gastos = dict(db.session.query(
+            ConsumoAgregado.item_agregado_id,
+            ConsumoAgregado.total
+        ).filter(
+            ConsumoAgregado.item_agregado_id.in_([item.id for item in itens_agregados]),
+            ConsumoAgregado.mes == competencia.replace(day=1)
+        ).all()) if itens_agregados else {}
 
         for item in itens_agregados:
             # Orçamento da categoria
-            orcamento = OrcamentoAgregado.query.filter(
-                and_(
-                    OrcamentoAgregado.item_agregado_id == item.id,
-                    OrcamentoAgregado.ativo == True,
-                    OrcamentoAgregado.vigencia_inicio <= competencia,
-                    (OrcamentoAgregado.vigencia_fim == None) |
-                    (OrcamentoAgregado.vigencia_fim >= competencia)
-                )
-            ).first()
+            orcamento = timeline.vigente(item.id, competencia.replace(day=1))
 
             if not orcamento:
                 continue
 
-            # Gasto da categoria
-            # Usar STRFTIME para compatibilidade com SQLite
-            gasto = db.session.query(
-                func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-            ).filter(
-                LancamentoAgregado.item_agregado_id == item.id,
-                func.strftime('%Y-%m', LancamentoAgregado.mes_fatura) == competencia.strftime('%Y-%m')
-            ).scalar()
-
-            gasto_decimal = Decimal(str(gasto or 0))
+            gasto_decimal = Decimal(str(gastos.get(item.id) or 0))
 
             if gasto_decimal > orcamento.valor_teto:
                 categorias_estouro.append({
@@ -545,197 +595,213 @@ class CartaoService:
     # ========================================================================
 
     @staticmethod
-    def calcular_alerta_local(item_agregado_id, competencia):
+    def dados_alertas(competencia, item_agregado_id=None, grupo_agregador_id=None):
         """
-        Calcula alerta LOCAL para um ItemAgregado específico
+        Consumo e orçamento aplicável de todos os itens ativos da competência
 
-        Verifica se o consumo real ultrapassou o orçamento da categoria
-
-        IMPORTANTE: Alertas NÃO bloqueiam lançamentos, são apenas informativos
+        Duas consultas, independentemente do número de itens e grupos:
+        1. Itens ativos + grupo
+        2. Consumo do mês por item (linhas de ConsumoAgregado, mantidas por delta)
+        O orçamento vigente vem da OrcamentoTimeline dos cartões (em cache;
+        uma consulta para os cartões ainda não carregados).
 
         Args:
-            item_agregado_id (int): ID do ItemAgregado (categoria do cartão)
             competencia (date): Mês de referência
+            item_agregado_id (int, opcional): Restringir a um item
+            grupo_agregador_id (int, opcional): Restringir aos itens de um grupo
 
         Returns:
-            dict ou None: Alerta estruturado ou None se não houver estouro
+            list[dict]: Um dict por item ativo (ordem de id), com 'orcado'
+                (Decimal ou None se não houver orçamento vigente) e 'consumo' (Decimal)
         """
         comp_primeiro_dia = competencia.replace(day=1)
 
-        # Buscar item agregado
-        item = ItemAgregado.query.get(item_agregado_id)
-        if not item or not item.ativo:
-            return None
-
-        # Buscar orçamento vigente
-        orcamento = OrcamentoAgregado.query.filter(
-            and_(
-                OrcamentoAgregado.item_agregado_id == item_agregado_id,
-                OrcamentoAgregado.ativo == True,
-                OrcamentoAgregado.vigencia_inicio <= comp_primeiro_dia,
-                (OrcamentoAgregado.vigencia_fim == None) |
-                (OrcamentoAgregado.vigencia_fim >= comp_primeiro_dia)
-            )
-        ).first()
-
-        if not orcamento:
-            return None
-
-        # Calcular consumo real (lançamentos do mês)
-        consumo = db.session.query(
-            func.coalesce(func.sum(LancamentoAgregado.valor), 0)
+        filtros_item = [ItemAgregado.ativo == True]
+        if item_agregado_id is not None:
+            filtros_item.append(ItemAgregado.id == item_agregado_id)
+        if grupo_agregador_id is not None:
+            filtros_item.append(ItemAgregado.grupo_agregador_id == grupo_agregador_id)
+
+        itens = db.session.query(
+            ItemAgregado.id,
+            ItemAgregado.item_despesa_id,
+            ItemAgregado.nome,
+            ItemAgregado.grupo_agregador_id,
+            GrupoAgregador.nome,
+            GrupoAgregador.descricao,
+            GrupoAgregador.ativo
+        ).outerjoin(
+            GrupoAgregador, GrupoAgregador.id == ItemAgregado.grupo_agregador_id
+        ).filter(*filtros_item).order_by(ItemAgregado.id).all()
+
+        if not itens:
+            return []
+
+        consumos = dict(db.session.query(
+            ConsumoAgregado.item_agregado_id,
+            ConsumoAgregado.total
         ).filter(
-            LancamentoAgregado.item_agregado_id == item_agregado_id,
-            func.strftime('%Y-%m', LancamentoAgregado.mes_fatura) == comp_primeiro_dia.strftime('%Y-%m')
-        ).scalar()
+            ConsumoAgregado.item_agregado_id.in_(
+                db.session.query(ItemAgregado.id).filter(*filtros_item)
+            ),
+            ConsumoAgregado.mes == comp_primeiro_dia
+        ).all())
+
+        orcamentos = OrcamentoTimeline.resolver((item[0], comp_primeiro_dia) for item in itens)
+
+        return [{
+            'id': item_id,
+            'cartao_id': cartao_id,
+            'nome': nome,
+            'grupo_agregador_id': grupo_id,
+            'grupo_nome': grupo_nome,
+            'grupo_descricao': grupo_descricao,
+            'grupo_ativo': grupo_ativo,
+            'orcado': orcamentos[(item_id, comp_primeiro_dia)].valor_teto
+            if orcamentos[(item_id, comp_primeiro_dia)] else None,
+            'consumo': Decimal(str(consumos.get(item_id) or 0))
+        } for item_id, cartao_id, nome, grupo_id, grupo_nome, grupo_descricao, grupo_ativo in itens]
 
-        consumo_decimal = Decimal(str(consumo or 0))
-        orcado = orcamento.valor_teto
+    @staticmethod
+    def _nivel_alerta(percentual):
+        """Nível do alerta pelo percentual consumido do orçamento"""
+        if percentual >= 150:
+            return 'CRITICO'
+        if percentual >= 120:
+            return 'ALTO'
+        return 'MODERADO'
 
-        # Verificar estouro
-        if consumo_decimal > orcado:
-            excedente = consumo_decimal - orcado
-            percentual = (float(consumo_decimal) / float(orcado) * 100) if orcado > 0 else 0
+    @staticmethod
+    def alertas_locais(dados, competencia):
+        """
+        Alertas LOCAIS (consumo > orçamento do item) a partir de dados_alertas
 
-            # Determinar nível de alerta
-            if percentual >= 150:
-                nivel = 'CRITICO'
-            elif percentual >= 120:
-                nivel = 'ALTO'
-            else:
-                nivel = 'MODERADO'
+        IMPORTANTE: Alertas NÃO bloqueiam lançamentos, são apenas informativos
+        """
+        alertas = []
+        for item in dados:
+            orcado = item['orcado']
+            consumo = item['consumo']
+            if orcado is None or consumo <= orcado:
+                continue
 
-            return {
+            percentual = (float(consumo) / float(orcado) * 100) if orcado > 0 else 0
+            alertas.append({
                 'tipo': 'LOCAL',
-                'cartao_id': item.item_despesa_id,
-                'item_agregado_id': item.id,
-                'nome': item.nome,
+                'cartao_id': item['cartao_id'],
+                'item_agregado_id': item['id'],
+                'nome': item['nome'],
                 'valor_orcado': float(orcado),
-                'valor_executado': float(consumo_decimal),
-                'excedente': float(excedente),
+                'valor_executado': float(consumo),
+                'excedente': float(consumo - orcado),
                 'percentual': round(percentual, 2),
-                'nivel': nivel,
-                'competencia': comp_primeiro_dia.strftime('%Y-%m')
-            }
-
-        return None
+                'nivel': CartaoService._nivel_alerta(percentual),
+                'competencia': competencia.strftime('%Y-%m')
+            })
+        return alertas
 
     @staticmethod
-    def calcular_alerta_global(grupo_agregador_id, competencia):
+    def alertas_globais(dados, competencia):
         """
-        Calcula alerta GLOBAL para um GrupoAgregador
+        Alertas GLOBAIS por GrupoAgregador a partir de dados_alertas
 
-        Verifica se a soma dos consumos de todas as categorias do grupo
-        (em diferentes cartões) ultrapassou a soma dos orçamentos
-
-        IMPORTANTE:
         - Grupos NÃO possuem orçamento próprio
         - O limite é a soma dos orçamentos dos itens vinculados
-        - Permite acompanhamento familiar/casal
+        - O consumo é a soma de todos os itens ativos do grupo
+        """
+        grupos = {}
+        for item in dados:
+            if item['grupo_agregador_id'] is None or not item['grupo_ativo']:
+                continue
+            grupo = grupos.setdefault(item['grupo_agregador_id'], {
+                'nome': item['grupo_nome'],
+                'descricao': item['grupo_descricao'],
+                'total_orcado': Decimal('0'),
+                'total_consumo': Decimal('0'),
+                'itens': []
+            })
+            grupo['total_consumo'] += item['consumo']
+            if item['orcado'] is not None:
+                grupo['total_orcado'] += item['orcado']
+                grupo['itens'].append({
+                    'item_id': item['id'],
+                    'cartao_id': item['cartao_id'],
+                    'nome': item['nome'],
+                    'orcado': float(item['orcado']),
+                    'consumo': float(item['consumo'])
+                })
+
+        alertas = []
+        for grupo_id in sorted(grupos):
+            grupo = grupos[grupo_id]
+            total_orcado = grupo['total_orcado']
+            total_consumo = grupo['total_consumo']
+            if total_consumo <= total_orcado:
+                continue
+
+            percentual = (float(total_consumo) / float(total_orcado) * 100) if total_orcado > 0 else 0
+            alertas.append({
+                'tipo': 'GLOBAL',
+                'grupo_agregador_id': grupo_id,
+                'nome': grupo['nome'],
+                'descricao': grupo['descricao'],
+                'valor_orcado_total': float(total_orcado),
+                'valor_executado_total': float(total_consumo),
+                'excedente': float(total_consumo - total_orcado),
+                'percentual': round(percentual, 2),
+                'nivel': CartaoService._nivel_alerta(percentual),
+                'competencia': competencia.strftime('%Y-%m'),
+                'itens': grupo['itens']
+            })
+        return alertas
+
+    @staticmethod
+    def calcular_alerta_local(item_agregado_id, competencia):
+        """
+        Calcula alerta LOCAL para um ItemAgregado específico
+
+        Verifica se o consumo real ultrapassou o orçamento da categoria
 
         Args:
-            grupo_agregador_id (int): ID do GrupoAgregador
+            item_agregado_id (int): ID do ItemAgregado (categoria do cartão)
             competencia (date): Mês de referência
 
         Returns:
             dict ou None: Alerta estruturado ou None se não houver estouro
         """
         comp_primeiro_dia = competencia.replace(day=1)
+        dados = CartaoService.dados_alertas(comp_primeiro_dia, item_agregado_id=item_agregado_id)
+        alertas = CartaoService.alertas_locais(dados, comp_primeiro_dia)
+        return alertas[0] if alertas else None
 
-        # Buscar grupo
-        try:
-            from backend.models import GrupoAgregador
-        except ImportError:
-            from models import GrupoAgregador
-
-        grupo = GrupoAgregador.query.get(grupo_agregador_id)
-        if not grupo or not grupo.ativo:
-            return None
-
-        # Buscar todos os itens agregados do grupo (apenas ativos)
-        itens_do_grupo = ItemAgregado.query.filter_by(
-            grupo_agregador_id=grupo_agregador_id,
-            ativo=True
-        ).all()
-
-        if not itens_do_grupo:
-            return None
-
-        # Calcular soma dos orçamentos e consumos
-        total_orcado = Decimal('0')
-        total_consumo = Decimal('0')
-        detalhes_itens = []
-
-        for item in itens_do_grupo:
-            # Buscar orçamento vigente
-            orcamento = OrcamentoAgregado.query.filter(
-                and_(
-                    OrcamentoAgregado.item_agregado_id == item.id,
-                    OrcamentoAgregado.ativo == True,
-                    OrcamentoAgregado.vigencia_inicio <= comp_primeiro_dia,
-                    (OrcamentoAgregado.vigencia_fim == None) |
-                    (OrcamentoAgregado.vigencia_fim >= comp_primeiro_dia)
-                )
-            ).first()
-
-            if orcamento:
-                total_orcado += orcamento.valor_teto
-
-            # Buscar consumo real
-            consumo = db.session.query(
-                func.coalesce(func.sum(LancamentoAgregado.valor), 0)
-            ).filter(
-                LancamentoAgregado.item_agregado_id == item.id,
-                func.strftime('%Y-%m', LancamentoAgregado.mes_fatura) == comp_primeiro_dia.strftime('%Y-%m')
-            ).scalar()
-
-            consumo_decimal = Decimal(str(consumo or 0))
-            total_consumo += consumo_decimal
-
-            # Guardar detalhes do item
-            if orcamento:
-                detalhes_itens.append({
-                    'item_id': item.id,
-                    'cartao_id': item.item_despesa_id,
-                    'nome': item.nome,
-                    'orcado': float(orcamento.valor_teto),
-                    'consumo': float(consumo_decimal)
-                })
-
-        # Verificar estouro global
-        if total_consumo > total_orcado:
-            excedente = total_consumo - total_orcado
-            percentual = (float(total_consumo) / float(total_orcado) * 100) if total_orcado > 0 else 0
+    @staticmethod
+    def calcular_alerta_global(grupo_agregador_id, competencia):
+        """
+        Calcula alerta GLOBAL para um GrupoAgregador
 
-            # Determinar nível de alerta
-            if percentual >= 150:
-                nivel = 'CRITICO'
-            elif percentual >= 120:
-                nivel = 'ALTO'
-            else:
-                nivel = 'MODERADO'
+        Verifica se a soma dos consumos de todas as categorias do grupo
+        (em diferentes cartões) ultrapassou a soma dos orçamentos
 
-            return {
-                'tipo': 'GLOBAL',
-                'grupo_agregador_id': grupo.id,
-                'nome': grupo.nome,
-                'descricao': grupo.descricao,
-                'valor_orcado_total': float(total_orcado),
-                'valor_executado_total': float(total_consumo),
-                'excedente': float(excedente),
-                'percentual': round(percentual, 2),
-                'nivel': nivel,
-                'competencia': comp_primeiro_dia.strftime('%Y-%m'),
-                'itens': detalhes_itens
-            }
+        Args:
+            grupo_agregador_id (int): ID do GrupoAgregador
+            competencia (date): Mês de referência
 
-        return None
+        Returns:
+            dict ou None: Alerta estruturado ou None se não houver estouro
+        """
+        comp_primeiro_dia = competencia.replace(day=1)
+        dados = CartaoService.dados_alertas(comp_primeiro_dia, grupo_agregador_id=grupo_agregador_id)
+        alertas = CartaoService.alertas_globais(dados, comp_primeiro_dia)
+        return alertas[0] if alertas else None
 
     @staticmethod
     def obter_todos_alertas(cartao_id=None, competencia=None):
         """
         Retorna todos os alertas (locais e globais) para um cartão ou mês
 
+        Consumo e orçamentos de todos os itens saem de dados_alertas (duas
+        consultas); os alertas locais e globais são derivados em memória.
+
         Args:
             cartao_id (int, opcional): ID do cartão (se None, busca todos)
             competencia (date, opcional): Mês de referência (se None, usa mês atual)
@@ -752,44 +818,17 @@ class CartaoService:
         else:
             competencia = competencia.replace(day=1)
 
-        alertas_locais = []
-        alertas_globais = []
+        dados = CartaoService.dados_alertas(competencia)
+        alertas_locais = CartaoService.alertas_locais(dados, competencia)
+        alertas_globais = CartaoService.alertas_globais(dados, competencia)
 
-        # Determinar quais itens agregados verificar
+        # Se cartao_id foi especificado: itens do cartão e grupos que contêm itens dele
         if cartao_id:
-            itens = ItemAgregado.query.filter_by(
-                item_despesa_id=cartao_id,
-                ativo=True
-            ).all()
-        else:
-            itens = ItemAgregado.query.filter_by(ativo=True).all()
-
-        # Calcular alertas locais
-        for item in itens:
-            alerta = CartaoService.calcular_alerta_local(item.id, competencia)
-            if alerta:
-                alertas_locais.append(alerta)
-
-        # Calcular alertas globais (buscar todos os grupos ativos)
-        try:
-            from backend.models import GrupoAgregador
-        except ImportError:
-            from models import GrupoAgregador
-
-        grupos = GrupoAgregador.query.filter_by(ativo=True).all()
-
-        for grupo in grupos:
-            alerta = CartaoService.calcular_alerta_global(grupo.id, competencia)
-            if alerta:
-                # Se cartao_id foi especificado, verificar se o grupo contém itens desse cartão
-                if cartao_id:
-                    tem_item_do_cartao = any(
-                        item['cartao_id'] == cartao_id for item in alerta.get('itens', [])
-                    )
-                    if tem_item_do_cartao:
-                        alertas_globais.append(alerta)
-                else:
-                    alertas_globais.append(alerta)
+            alertas_locais = [a for a in alertas_locais if a['cartao_id'] == cartao_id]
+            alertas_globais = [
+                a for a in alertas_globais
+                if any(item['cartao_id'] == cartao_id for item in a['itens'])
+            ]
 
         return {
             'locais': alertas_locais,
@@ -5,51 +5,413 @@ from decimal import Decimal
 from typing import Optional
 import uuid
 
-from sqlalchemy import func, case
+from sqlalchemy import and_, delete, event, func, case, insert, inspect as sa_inspect, or_, select, update
 
 try:
-    from backend.models import db, ContaBancaria, MovimentoFinanceiro
+    from backend.models import db, ContaBancaria, MovimentoFinanceiro, SaldoBancarioMensal
+    from backend.utils.sessao_orm import executar_e_ler_atingidas, registrar_historico, valores_anteriores
 except ImportError:
-    from models import db, ContaBancaria, MovimentoFinanceiro
+    from models import db, ContaBancaria, MovimentoFinanceiro, SaldoBancarioMensal
+    from utils.sessao_orm import executar_e_ler_atingidas, registrar_historico, valores_anteriores
+
+
+# ============================================================================
+# MANUTENÇÃO INCREMENTAL DO SALDO (eventos de sessão)
+#
+# saldo_atual = saldo_inicial + créditos - débitos. Em vez de varrer todos os
+# movimentos da conta a cada escrita, cada flush aplica apenas o delta dos
+# movimentos inseridos/alterados/excluídos, com um UPDATE atômico
+# (saldo_atual = saldo_atual + delta). A recomputação completa fica em
+# verificar_saldos (endpoint administrativo e job periódico).
+#
+# O mesmo delta, agrupado por mês, atualiza os checkpoints mensais
+# (SaldoBancarioMensal) usados pelo extrato para calcular o saldo corrente
+# sem percorrer o histórico inteiro da conta.
+# ============================================================================
+
+CAMPOS_SALDO = ('conta_bancaria_id', 'tipo', 'valor', 'data_movimento')
+
+_CHAVE_RECALCULAR = 'saldo_bancario_recalcular'
+_CHAVE_CHECKPOINTS = 'saldo_bancario_checkpoints'
+
+
+def _valor_assinado(tipo, valor) -> Decimal:
+    if tipo == 'CREDITO':
+        return Decimal(str(valor or 0))
+    if tipo == 'DEBITO':
+        return -Decimal(str(valor or 0))
+    return Decimal('0')
+
+
+def _antes_do_flush(session, flush_context, instances):
+    deltas = {}
+    deltas_mes = session.info.setdefault(_CHAVE_CHECKPOINTS, {})
+
+    def somar(conta_bancaria_id, tipo, valor, data_movimento, sinal):
+        if conta_bancaria_id is None:
+            return
+        valor = sinal * _valor_assinado(tipo, valor)
+        deltas[conta_bancaria_id] = deltas.get(conta_bancaria_id, Decimal('0')) + valor
+        if data_movimento is not None:
+            chave = (conta_bancaria_id, data_movimento.replace(day=1))
+            deltas_mes[chave] = deltas_mes.get(chave, Decimal('0')) + valor
+
+    for obj in session.new:
+        if isinstance(obj, MovimentoFinanceiro):
+            somar(obj.conta_bancaria_id, obj.tipo, obj.valor, obj.data_movimento, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, MovimentoFinanceiro):
+            somar(*valores_anteriores(obj, CAMPOS_SALDO), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, MovimentoFinanceiro):
+            continue
+        estado = sa_inspect(obj)
+        if not any(estado.attrs[c].history.has_changes() for c in CAMPOS_SALDO):
+            continue
+        somar(*valores_anteriores(obj, CAMPOS_SALDO), -1)
+        somar(obj.conta_bancaria_id, obj.tipo, obj.valor, obj.data_movimento, 1)
+
+    for conta_bancaria_id, delta in deltas.items():
+        if delta == 0:
+            continue
+        conta = session.get(ContaBancaria, conta_bancaria_id)
+        if conta is None or conta in session.deleted:
+            continue
+        if sa_inspect(conta).attrs.saldo_atual.history.added:
+            # Saldo atribuído em memória nesta transação: somar ao valor atribuído
+            conta.saldo_atual = Decimal(str(conta.saldo_atual or 0)) + delta
+        else:
+            conta.saldo_atual = ContaBancaria.saldo_atual + delta
+
+
+def _apos_flush(session, flush_context):
+    deltas_mes = session.info.pop(_CHAVE_CHECKPOINTS, None)
+    if deltas_mes:
+        _aplicar_checkpoints(session.connection(), deltas_mes)
+
+
+def _aplicar_checkpoints(conexao, deltas_mes):
+    """
+    Propaga o delta de cada (conta, mês) para o checkpoint do mês e os posteriores.
+
+    Um UPDATE por faixa (mes >= mês do movimento); se o mês ainda não tem
+    linha, ela é criada a partir do último checkpoint anterior.
+    """
+    tabela = SaldoBancarioMensal.__table__
+    agora = datetime.utcnow()
+    for (conta_bancaria_id, mes), delta in sorted(deltas_mes.items()):
+        if delta == 0:
+            continue
+        conexao.execute(
+            update(tabela)
+            .where(tabela.c.conta_bancaria_id == conta_bancaria_id, tabela.c.mes >= mes)
+            .values(acumulado=tabela.c.acumulado + delta, atualizado_em=agora)
+        )
+        anterior = conexao.execute(
+            select(tabela.c.mes, tabela.c.acumulado)
+            .where(tabela.c.conta_bancaria_id == conta_bancaria_id, tabela.c.mes <= mes)
+            .order_by(tabela.c.mes.desc())
+            .limit(1)
+        ).first()
+        if anterior is None or anterior.mes != mes:
+            conexao.execute(insert(tabela).values(
+                conta_bancaria_id=conta_bancaria_id,
+                mes=mes,
+                acumulado=(Decimal(str(anterior.acumulado)) if anterior else Decimal('0')) + delta,
+                atualizado_em=agora,
+            ))
+
+
+def _acumulados_por_mes(conexao, conta_ids=None):
+    """
+    Recalcula, a partir dos movimentos, o acumulado de fechamento de cada mês com movimento.
+
+    Returns:
+        dict: {conta_bancaria_id: [(mes, acumulado), ...]} em ordem de mês
+    """
+    consulta = select(
+        MovimentoFinanceiro.conta_bancaria_id,
+        MovimentoFinanceiro.data_movimento,
+        _saldo_calculado_expr(),
+    ).group_by(
+        MovimentoFinanceiro.conta_bancaria_id, MovimentoFinanceiro.data_movimento
+    ).order_by(
+        MovimentoFinanceiro.conta_bancaria_id, MovimentoFinanceiro.data_movimento
+    )
+    if conta_ids is not None:
+        consulta = consulta.where(MovimentoFinanceiro.conta_bancaria_id.in_(conta_ids))
+
+    acumulados = {}
+    for conta_bancaria_id, data_movimento, total in conexao.execute(consulta):
+        meses = acumulados.setdefault(conta_bancaria_id, [])
+        mes = data_movimento.replace(day=1)
+        acumulado = (meses[-1][1] if meses else Decimal('0')) + Decimal(str(total or 0))
+        if meses and meses[-1][0] == mes:
+            meses[-1] = (mes, acumulado)
+        else:
+            meses.append((mes, acumulado))
+    return acumulados
+
+
+def _normalizar_checkpoints(meses):
+    """Remove meses sem variação (mesma função degrau de acumulado por mês)"""
+    normalizados = []
+    anterior = Decimal('0.00')
+    for mes, acumulado in meses:
+        acumulado = Decimal(str(acumulado or 0)).quantize(Decimal('0.01'))
+        if acumulado != anterior:
+            normalizados.append((mes, acumulado))
+            anterior = acumulado
+    return normalizados
+
+
+def _execucao_orm(orm_execute_state):
+    """UPDATE/DELETE/INSERT em lote de movimentos não passam pelo flush → recalcular as contas atingidas no commit"""
+    if orm_execute_state.is_select:
+        return None
+    if orm_execute_state.execution_options.get('saldo_bancario_marcado'):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not MovimentoFinanceiro:
+        return None
+    resultado, atingidas = executar_e_ler_atingidas(
+        orm_execute_state, (MovimentoFinanceiro.__table__.c.conta_bancaria_id,)
+    )
+    contas = orm_execute_state.session.info.setdefault(_CHAVE_RECALCULAR, set())
+    contas.update(conta_id for conta_id, in atingidas if conta_id is not None)
+    return resultado
+
+
+def _antes_do_commit(session):
+    if session.info.get(_CHAVE_RECALCULAR):
+        session.flush()
+        # Saldos e checkpoints só das contas atingidas
+        ContaBancariaService.verificar_saldos(corrigir=True, conta_ids=session.info.pop(_CHAVE_RECALCULAR))
+
+
+def _apos_rollback(session):
+    session.info.pop(_CHAVE_RECALCULAR, None)
+    session.info.pop(_CHAVE_CHECKPOINTS, None)
+
+
+def _saldo_calculado_expr():
+    """Expressão SUM(±valor) dos movimentos (créditos positivos, débitos negativos)"""
+    return func.coalesce(
+        func.sum(
+            case(
+                (MovimentoFinanceiro.tipo == 'CREDITO', MovimentoFinanceiro.valor),
+                (MovimentoFinanceiro.tipo == 'DEBITO', -MovimentoFinanceiro.valor),
+                else_=0,
+            )
+        ),
+        0,
+    )
 
 
 class ContaBancariaService:
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que mantêm saldo_atual incrementalmente.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        alvos = (
+            (db.session, 'before_flush', _antes_do_flush),
+            (db.session, 'after_flush', _apos_flush),
+            (db.session, 'do_orm_execute', _execucao_orm),
+            (db.session, 'before_commit', _antes_do_commit),
+            (db.session, 'after_rollback', _apos_rollback),
+        )
+        for alvo, nome, funcao in alvos:
+            if not event.contains(alvo, nome, funcao):
+                event.listen(alvo, nome, funcao)
+
+        registrar_historico(MovimentoFinanceiro, CAMPOS_SALDO)
+
     @staticmethod
     def recalcular_saldo_conta(conta_id: int) -> Decimal:
-        conta = ContaBancaria.query.get(conta_id)
+        """
+        Recalcula saldo_atual a partir de todos os movimentos da conta (O(N)).
+
+        Escritas de movimentos já mantêm o saldo por delta; use apenas para
+        correção pontual (ex: alteração de saldo_inicial).
+        """
+        conta = db.session.get(ContaBancaria, conta_id)
         if not conta:
             raise ValueError('Conta bancária não encontrada')
 
-        total_creditos = db.session.query(
-            func.coalesce(
-                func.sum(
-                    case(
-                        (MovimentoFinanceiro.tipo == 'CREDITO', MovimentoFinanceiro.valor),
-                        else_=0,
-                    )
-                ),
-                0,
-            )
-        ).filter(MovimentoFinanceiro.conta_bancaria_id == conta_id).scalar()
-
-        total_debitos = db.session.query(
-            func.coalesce(
-                func.sum(
-                    case(
-                        (MovimentoFinanceiro.tipo == 'DEBITO', MovimentoFinanceiro.valor),
-                        else_=0,
-                    )
-                ),
-                0,
-            )
-        ).filter(MovimentoFinanceiro.conta_bancaria_id == conta_id).scalar()
+        total = db.session.query(_saldo_calculado_expr()).filter(
+            MovimentoFinanceiro.conta_bancaria_id == conta_id
+        ).scalar()
 
         saldo_inicial = Decimal(str(conta.saldo_inicial or 0))
-        saldo = saldo_inicial + Decimal(str(total_creditos or 0)) - Decimal(str(total_debitos or 0))
+        saldo = saldo_inicial + Decimal(str(total or 0))
         conta.saldo_atual = saldo
         db.session.flush()
         return saldo
 
+    @staticmethod
+    def verificar_saldos(corrigir: bool = False, conta_ids=None) -> dict:
+        """
+        Confere saldo_atual e os checkpoints mensais das contas contra a
+        recomputação completa a partir dos movimentos.
+
+        Uma consulta agrupada por conta (saldo_inicial + créditos - débitos) e
+        uma por conta/dia para os checkpoints.
+
+        Args:
+            corrigir: Se True, grava o saldo recalculado nas contas divergentes
+                e reconstrói os checkpoints divergentes (sem commit; o chamador decide)
+            conta_ids: Contas a verificar (None = todas)
+
+        Returns:
+            dict: {'contas_verificadas', 'divergencias': [...],
+                   'checkpoints_divergentes': [conta_id, ...], 'corrigidas'}
+        """
+        consulta = db.session.query(
+            ContaBancaria.id,
+            ContaBancaria.nome,
+            ContaBancaria.saldo_inicial,
+            ContaBancaria.saldo_atual,
+            _saldo_calculado_expr().label('movimentos'),
+        ).outerjoin(
+            MovimentoFinanceiro, MovimentoFinanceiro.conta_bancaria_id == ContaBancaria.id
+        )
+        if conta_ids is not None:
+            conta_ids = list(conta_ids)
+            consulta = consulta.filter(ContaBancaria.id.in_(conta_ids))
+        linhas = consulta.group_by(
+            ContaBancaria.id, ContaBancaria.nome, ContaBancaria.saldo_inicial, ContaBancaria.saldo_atual
+        ).order_by(ContaBancaria.id).all()
+
+        centavo = Decimal('0.01')
+        divergencias = []
+        for conta_id, nome, saldo_inicial, saldo_atual, movimentos in linhas:
+            registrado = Decimal(str(saldo_atual or 0)).quantize(centavo)
+            calculado = (Decimal(str(saldo_inicial or 0)) + Decimal(str(movimentos or 0))).quantize(centavo)
+            if registrado != calculado:
+                divergencias.append({
+                    'conta_bancaria_id': conta_id,
+                    'nome': nome,
+                    'saldo_registrado': registrado,
+                    'saldo_calculado': calculado,
+                    'diferenca': registrado - calculado,
+                })
+
+        conexao = db.session.connection()
+        calculados = _acumulados_por_mes(conexao, conta_ids)
+        checkpoints = select(
+            SaldoBancarioMensal.conta_bancaria_id, SaldoBancarioMensal.mes, SaldoBancarioMensal.acumulado
+        ).order_by(SaldoBancarioMensal.conta_bancaria_id, SaldoBancarioMensal.mes)
+        if conta_ids is not None:
+            checkpoints = checkpoints.where(SaldoBancarioMensal.conta_bancaria_id.in_(conta_ids))
+        registrados = {}
+        for conta_id, mes, acumulado in conexao.execute(checkpoints):
+            registrados.setdefault(conta_id, []).append((mes, acumulado))
+
+        checkpoints_divergentes = [
+            conta_id for conta_id, *_ in linhas
+            if _normalizar_checkpoints(registrados.get(conta_id, ())) !=
+            _normalizar_checkpoints(calculados.get(conta_id, ()))
+        ]
+
+        if corrigir and divergencias:
+            contas = {c.id: c for c in ContaBancaria.query.filter(
+                ContaBancaria.id.in_([d['conta_bancaria_id'] for d in divergencias])
+            ).all()}
+            for divergencia in divergencias:
+                contas[divergencia['conta_bancaria_id']].saldo_atual = divergencia['saldo_calculado']
+            db.session.flush()
+
+        if corrigir and checkpoints_divergentes:
+            ContaBancariaService.reconstruir_checkpoints(checkpoints_divergentes)
+
+        return {
+            'contas_verificadas': len(linhas),
+            'divergencias': divergencias,
+            'checkpoints_divergentes': checkpoints_divergentes,
+            'corrigidas': bool(corrigir and (divergencias or checkpoints_divergentes)),
+        }
+
+    @staticmethod
+    def reconstruir_checkpoints(conta_ids=None, conexao=None) -> int:
+        """
+        Reconstrói os checkpoints mensais (SaldoBancarioMensal) a partir dos movimentos.
+
+        Args:
+            conta_ids: Contas a reconstruir (None = todas)
+            conexao: Conexão a usar (padrão: a da sessão atual)
+
+        Returns:
+            int: Número de checkpoints gravados
+        """
+        conexao = conexao if conexao is not None else db.session.connection()
+        tabela = SaldoBancarioMensal.__table__
+
+        apagar = delete(tabela)
+        if conta_ids is not None:
+            apagar = apagar.where(tabela.c.conta_bancaria_id.in_(conta_ids))
+        conexao.execute(apagar)
+
+        agora = datetime.utcnow()
+        linhas = [
+            {'conta_bancaria_id': conta_id, 'mes': mes, 'acumulado': acumulado, 'atualizado_em': agora}
+            for conta_id, meses in _acumulados_por_mes(conexao, conta_ids).items()
+            for mes, acumulado in meses
+        ]
+        if linhas:
+            conexao.execute(insert(tabela), linhas)
+        return len(linhas)
+
+    @staticmethod
+    def saldos_apos_movimentos(conta: ContaBancaria, movimentos) -> dict:
+        """
+        Saldo corrente após cada movimento de uma página contígua do extrato.
+
+        Parte do checkpoint do mês anterior ao movimento mais antigo da página
+        e soma apenas os movimentos desse mês que o antecedem; o restante é
+        acumulado sobre as próprias linhas da página. A página deve conter
+        todos os movimentos entre o mais antigo e o mais recente (ordem
+        data_movimento, id), como no extrato paginado.
+
+        Returns:
+            dict: {movimento_id: Decimal}
+        """
+        if not movimentos:
+            return {}
+
+        ordenados = sorted(movimentos, key=lambda m: (m.data_movimento, m.id))
+        primeiro = ordenados[0]
+        mes = primeiro.data_movimento.replace(day=1)
+
+        acumulado = db.session.query(SaldoBancarioMensal.acumulado).filter(
+            SaldoBancarioMensal.conta_bancaria_id == conta.id,
+            SaldoBancarioMensal.mes < mes,
+        ).order_by(SaldoBancarioMensal.mes.desc()).limit(1).scalar()
+
+        parcial = db.session.query(_saldo_calculado_expr()).filter(
+            MovimentoFinanceiro.conta_bancaria_id == conta.id,
+            MovimentoFinanceiro.data_movimento >= mes,
+            or_(
+                MovimentoFinanceiro.data_movimento < primeiro.data_movimento,
+                and_(
+                    MovimentoFinanceiro.data_movimento == primeiro.data_movimento,
+                    MovimentoFinanceiro.id < primeiro.id,
+                ),
+            ),
+        ).scalar()
+
+        saldo = (Decimal(str(conta.saldo_inicial or 0)) + Decimal(str(acumulado or 0))
+                 + Decimal(str(parcial or 0)))
+        saldos = {}
+        for movimento in ordenados:
+            saldo += _valor_assinado(movimento.tipo, movimento.valor)
+            saldos[movimento.id] = saldo
+        return saldos
+
     @staticmethod
     def criar_movimento(
         conta_bancaria_id: int,
@@ -86,8 +448,7 @@ class ContaBancariaService:
             transferencia_id=transferencia_id,
         )
         db.session.add(movimento)
-        db.session.flush()
-        ContaBancariaService.recalcular_saldo_conta(conta_bancaria_id)
+        db.session.flush()  # saldo_atual atualizado por delta (_antes_do_flush)
         return movimento
 
     @staticmethod
@@ -0,0 +1,394 @@
+"""
+Motor de Cronograma de Financiamentos - Cálculo puro (sem banco de dados)
+
+Calcula a tabela de amortização completa (SAC, PRICE, SIMPLES) a partir do
+contrato e de entradas já carregadas em memória:
+- Série do indexador (ex: TR) → SerieIndexador (ou dict {primeiro dia do mês: percentual})
+- Vigências de seguro → VigenciaTimeline (busca binária por data)
+- Amortizações extraordinárias → [(data, valor, tipo)]
+
+O resultado é colunar (uma lista por campo, alinhadas por posição), pronto
+para ser persistido com um único INSERT em lote pelo FinanciamentoService.
+Nenhuma consulta é feita durante o cálculo.
+
+recalcular() reencadeia apenas as parcelas pendentes a partir de um saldo
+(recálculo de parcelas futuras e após amortização extraordinária), em tempo
+linear: as parcelas restantes de cada posição são pré-calculadas.
+recalcular_prazo() é o equivalente para 'reduzir_prazo' (amortização mantida,
+prazo encurtado).
+
+calcular_contrato() e simular_amortizacao() são as entradas para lotes
+(reindexação de contratos, cenários de simulação): funções de módulo com
+argumentos serializáveis, executáveis em um ProcessPoolExecutor.
+"""
+import time
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+
+
+# Colunas do cronograma (mesmos nomes de FinanciamentoParcela)
+COLUNAS_CRONOGRAMA = (
+    'numero_parcela',
+    'data_vencimento',
+    'valor_amortizacao',
+    'valor_juros',
+    'valor_seguro',
+    'valor_taxa_adm',
+    'valor_previsto_total',
+    'saldo_devedor_apos_pagamento',
+)
+
+SALDO_RESIDUAL = Decimal('0.01')
+
+
+class CronogramaFinanciamento:
+    """
+    Motor de cálculo da tabela de amortização
+    """
+
+    @staticmethod
+    def calcular(sistema, valor_financiado, prazo, taxa_mensal, data_primeira_parcela,
+                 taxa_adm=None, serie_indexador=None, vigencias_seguro=None, amortizacoes=()):
+        """
+        Calcula o cronograma completo do contrato
+
+        Args:
+            sistema (str): SAC, PRICE ou SIMPLES
+            valor_financiado (Decimal): Valor financiado
+            prazo (int): Prazo total em meses
+            taxa_mensal (Decimal): Taxa mensal já em decimal (ex: 0.006827)
+            data_primeira_parcela (date): Vencimento da 1ª parcela
+            taxa_adm (Decimal): Taxa administrativa fixa mensal
+            serie_indexador (SerieIndexador|dict): Percentual por mês do indexador do saldo (apenas SAC)
+            vigencias_seguro (VigenciaTimeline): Linha do tempo do seguro do financiamento
+            amortizacoes (list): [(data, valor, tipo)] ordenadas por data (apenas SAC)
+
+        Returns:
+            dict: {coluna: list} com as colunas de COLUNAS_CRONOGRAMA
+
+        Raises:
+            ValueError: Se faltar vigência de seguro para algum vencimento
+        """
+        cronograma = {coluna: [] for coluna in COLUNAS_CRONOGRAMA}
+        taxa_adm = taxa_adm if taxa_adm is not None else Decimal('0')
+
+        if sistema == 'SAC':
+            passos = CronogramaFinanciamento._passos_sac(
+                valor_financiado, prazo, taxa_mensal, data_primeira_parcela,
+                serie_indexador or {}, amortizacoes
+            )
+        elif sistema == 'PRICE':
+            passos = CronogramaFinanciamento._passos_price(
+                valor_financiado, prazo, taxa_mensal, data_primeira_parcela
+            )
+        elif sistema == 'SIMPLES':
+            passos = CronogramaFinanciamento._passos_simples(
+                valor_financiado, prazo, taxa_mensal, data_primeira_parcela
+            )
+        else:
+            return cronograma
+
+        for num_parcela, data_vencimento, amortizacao, juros, saldo_apos in passos:
+            valor_seguro = CronogramaFinanciamento.seguro_na_data(vigencias_seguro, data_vencimento)
+
+            cronograma['numero_parcela'].append(num_parcela)
+            cronograma['data_vencimento'].append(data_vencimento)
+            cronograma['valor_amortizacao'].append(amortizacao)
+            cronograma['valor_juros'].append(juros)
+            cronograma['valor_seguro'].append(valor_seguro)
+            cronograma['valor_taxa_adm'].append(taxa_adm)
+            cronograma['valor_previsto_total'].append(amortizacao + juros + valor_seguro + taxa_adm)
+            cronograma['saldo_devedor_apos_pagamento'].append(
+                saldo_apos if saldo_apos > SALDO_RESIDUAL else Decimal('0')
+            )
+
+        return cronograma
+
+    @staticmethod
+    def linhas(cronograma):
+        """Converte o cronograma colunar em dicts por parcela (para INSERT em lote)"""
+        return [dict(zip(COLUNAS_CRONOGRAMA, valores))
+                for valores in zip(*(cronograma[c] for c in COLUNAS_CRONOGRAMA))]
+
+    @staticmethod
+    def seguro_na_data(vigencias_seguro, data_referencia):
+        """Valor do seguro vigente na data (ValueError se não houver vigência)"""
+        vigencia = vigencias_seguro.vigente_em(data_referencia) if vigencias_seguro is not None else None
+        if vigencia is not None:
+            return vigencia.valor_mensal
+
+        raise ValueError(
+            f"Seguro não configurado para a data {data_referencia.strftime('%d/%m/%Y')}. "
+            f"Cadastre uma vigência de seguro antes de gerar as parcelas."
+        )
+
+    # ========================================================================
+    # RECÁLCULO DE PARCELAS PENDENTES
+    # ========================================================================
+
+    @staticmethod
+    def parcelas_restantes(numeros):
+        """
+        Quantidade de parcelas com número >= o de cada posição, em uma passada
+
+        Args:
+            numeros (list[int]): Números das parcelas em ordem crescente
+
+        Returns:
+            list[int]: restantes[i] = parcelas com número >= numeros[i] (empates contam juntos)
+        """
+        total = len(numeros)
+        restantes = []
+        inicio_grupo = 0
+        for posicao, numero in enumerate(numeros):
+            if posicao and numero != numeros[posicao - 1]:
+                inicio_grupo = posicao
+            restantes.append(total - inicio_grupo)
+        return restantes
+
+    @staticmethod
+    def recalcular(sistema, saldo_inicial, parcelas, taxa_mensal, vigencias_seguro, juros_fixos=None):
+        """
+        Recalcula parcelas pendentes reencadeando o saldo a partir de saldo_inicial
+
+        - SAC (e SIMPLES): amortização = saldo / parcelas restantes
+        - PRICE: PMT sobre o saldo e as parcelas restantes; amortização = PMT - juros
+        - Juros sobre o saldo (ou juros_fixos, quando informados)
+
+        Args:
+            sistema (str): SAC, PRICE ou SIMPLES
+            saldo_inicial (Decimal): Saldo devedor antes da primeira parcela
+            parcelas (list[tuple]): (numero_parcela, data_vencimento, taxa_adm) em ordem de número
+            taxa_mensal (Decimal): Taxa mensal já em decimal
+            vigencias_seguro (VigenciaTimeline): Linha do tempo do seguro do financiamento
+            juros_fixos (Decimal, opcional): Juros constantes por parcela (SIMPLES)
+
+        Returns:
+            dict: {coluna: list} com as colunas de COLUNAS_CRONOGRAMA (saldo sem arredondamento residual)
+
+        Raises:
+            ValueError: Se faltar vigência de seguro para algum vencimento
+        """
+        cronograma = {coluna: [] for coluna in COLUNAS_CRONOGRAMA}
+        restantes = CronogramaFinanciamento.parcelas_restantes([parcela[0] for parcela in parcelas])
+        saldo_devedor = saldo_inicial
+
+        for (num_parcela, data_vencimento, taxa_adm), n in zip(parcelas, restantes):
+            juros = saldo_devedor * taxa_mensal
+
+            if sistema == 'PRICE':
+                if taxa_mensal > 0:
+                    fator = (Decimal('1') + taxa_mensal) ** Decimal(str(n))
+                    pmt = saldo_devedor * taxa_mensal * fator / (fator - Decimal('1'))
+                else:
+                    pmt = saldo_devedor / Decimal(str(n))
+                amortizacao = pmt - juros
+            else:
+                amortizacao = saldo_devedor / Decimal(str(n))
+                if juros_fixos is not None:
+                    juros = juros_fixos
+
+            valor_seguro = CronogramaFinanciamento.seguro_na_data(vigencias_seguro, data_vencimento)
+            taxa_adm = taxa_adm if taxa_adm is not None else Decimal('0')
+            saldo_apos = saldo_devedor - amortizacao
+
+            cronograma['numero_parcela'].append(num_parcela)
+            cronograma['data_vencimento'].append(data_vencimento)
+            cronograma['valor_amortizacao'].append(amortizacao)
+            cronograma['valor_juros'].append(juros)
+            cronograma['valor_seguro'].append(valor_seguro)
+            cronograma['valor_taxa_adm'].append(taxa_adm)
+            cronograma['valor_previsto_total'].append(amortizacao + juros + valor_seguro + taxa_adm)
+            cronograma['saldo_devedor_apos_pagamento'].append(saldo_apos)
+
+            saldo_devedor = saldo_apos
+
+        return cronograma
+
+    @staticmethod
+    def recalcular_prazo(saldo_inicial, parcelas, amortizacao, taxa_mensal, vigencias_seguro):
+        """
+        Recalcula parcelas pendentes mantendo a amortização e encurtando o prazo
+
+        - Juros sobre o saldo; a última parcela amortiza o saldo que restar
+        - Para quando o saldo é quitado: as parcelas excedentes ficam fora do resultado
+
+        Args:
+            saldo_inicial (Decimal): Saldo devedor antes da primeira parcela
+            parcelas (list[tuple]): (numero_parcela, data_vencimento, taxa_adm) em ordem de número
+            amortizacao (Decimal): Amortização mantida por parcela
+            taxa_mensal (Decimal): Taxa mensal já em decimal
+            vigencias_seguro (VigenciaTimeline): Linha do tempo do seguro do financiamento
+
+        Returns:
+            dict: {coluna: list} com as colunas de COLUNAS_CRONOGRAMA (apenas as parcelas mantidas)
+
+        Raises:
+            ValueError: Se faltar vigência de seguro para algum vencimento
+        """
+        cronograma = {coluna: [] for coluna in COLUNAS_CRONOGRAMA}
+        saldo_devedor = saldo_inicial
+
+        for num_parcela, data_vencimento, taxa_adm in parcelas:
+            juros = saldo_devedor * taxa_mensal
+            valor_amortizacao = amortizacao if saldo_devedor > amortizacao else saldo_devedor
+
+            valor_seguro = CronogramaFinanciamento.seguro_na_data(vigencias_seguro, data_vencimento)
+            taxa_adm = taxa_adm if taxa_adm is not None else Decimal('0')
+            saldo_apos = saldo_devedor - valor_amortizacao
+
+            cronograma['numero_parcela'].append(num_parcela)
+            cronograma['data_vencimento'].append(data_vencimento)
+            cronograma['valor_amortizacao'].append(valor_amortizacao)
+            cronograma['valor_juros'].append(juros)
+            cronograma['valor_seguro'].append(valor_seguro)
+            cronograma['valor_taxa_adm'].append(taxa_adm)
+            cronograma['valor_previsto_total'].append(valor_amortizacao + juros + valor_seguro + taxa_adm)
+            cronograma['saldo_devedor_apos_pagamento'].append(saldo_apos)
+
+            saldo_devedor = saldo_apos
+            if saldo_devedor <= SALDO_RESIDUAL:
+                break
+
+        return cronograma
+
+    # ========================================================================
+    # SISTEMAS DE AMORTIZAÇÃO
+    # Cada gerador produz (numero, vencimento, amortização, juros, saldo após)
+    # ========================================================================
+
+    @staticmethod
+    def _passos_sac(valor_financiado, prazo, taxa_mensal, data_vencimento, serie_indexador, amortizacoes):
+        """
+        Sistema de Amortização Constante (SAC) com Modelo de Fases
+
+        - Amortização fixa (saldo / prazo), juros sobre o saldo corrigido
+        - Amortização extraordinária antes do vencimento (a partir da 2ª parcela):
+          'reduzir_parcela' recalcula a amortização fixa sobre as parcelas
+          restantes; 'reduzir_prazo' mantém a amortização e encurta o prazo
+        - Indexador (TR) corrige o saldo uma vez por mês, antes dos juros
+        """
+        amortizacao_fixa = valor_financiado / Decimal(str(prazo))
+        saldo_devedor = valor_financiado
+        proxima_amortizacao = 0
+
+        for num_parcela in range(1, prazo + 1):
+            # Amortizações extraordinárias anteriores a este vencimento (cada uma aplicada uma vez)
+            if num_parcela > 1:
+                while (proxima_amortizacao < len(amortizacoes) and
+                       amortizacoes[proxima_amortizacao][0] < data_vencimento):
+                    _, valor, tipo = amortizacoes[proxima_amortizacao]
+                    proxima_amortizacao += 1
+
+                    saldo_devedor = saldo_devedor - valor
+                    if saldo_devedor < 0:
+                        saldo_devedor = Decimal('0')
+                        break
+
+                    if tipo == 'reduzir_parcela':
+                        parcelas_restantes = prazo - num_parcela + 1
+                        amortizacao_fixa = saldo_devedor / Decimal(str(parcelas_restantes))
+
+            # Se saldo zerou, parar de gerar parcelas
+            if saldo_devedor <= SALDO_RESIDUAL:
+                break
+
+            taxa_indexador = serie_indexador.get(data_vencimento.replace(day=1), Decimal('0'))
+            saldo_corrigido = saldo_devedor * (Decimal('1') + taxa_indexador / Decimal('100'))
+
+            juros = saldo_corrigido * taxa_mensal
+            amortizacao = min(amortizacao_fixa, saldo_corrigido)
+            saldo_apos = saldo_corrigido - amortizacao
+
+            yield num_parcela, data_vencimento, amortizacao, juros, saldo_apos
+
+            saldo_devedor = saldo_apos
+            data_vencimento = data_vencimento + relativedelta(months=1)
+
+    @staticmethod
+    def _passos_price(valor_financiado, prazo, taxa_mensal, data_vencimento):
+        """Tabela PRICE: parcela fixa (PMT), juros decrescentes, amortização crescente"""
+        if taxa_mensal == Decimal('0'):
+            pmt = valor_financiado / Decimal(str(prazo))
+        else:
+            fator = (Decimal('1') + taxa_mensal) ** Decimal(str(prazo))
+            pmt = valor_financiado * taxa_mensal * fator / (fator - Decimal('1'))
+
+        saldo_devedor = valor_financiado
+        for num_parcela in range(1, prazo + 1):
+            juros = saldo_devedor * taxa_mensal
+            amortizacao = pmt - juros
+            saldo_apos = saldo_devedor - amortizacao
+
+            yield num_parcela, data_vencimento, amortizacao, juros, saldo_apos
+
+            saldo_devedor = saldo_apos
+            data_vencimento = data_vencimento + relativedelta(months=1)
+
+    @staticmethod
+    def _passos_simples(valor_financiado, prazo, taxa_mensal, data_vencimento):
+        """Juros simples: juros fixos sobre o valor inicial, amortização constante"""
+        juros_mensais = valor_financiado * taxa_mensal
+        amortizacao = valor_financiado / Decimal(str(prazo))
+
+        saldo_devedor = valor_financiado
+        for num_parcela in range(1, prazo + 1):
+            saldo_apos = saldo_devedor - amortizacao
+
+            yield num_parcela, data_vencimento, amortizacao, juros_mensais, saldo_apos
+
+            saldo_devedor = saldo_apos
+            data_vencimento = data_vencimento + relativedelta(months=1)
+
+
+def calcular_contrato(contrato):
+    """
+    Calcula o cronograma de um contrato de um lote (executável em outro processo)
+
+    Args:
+        contrato (tuple): (financiamento_id, dict de argumentos de CronogramaFinanciamento.calcular)
+
+    Returns:
+        tuple: (financiamento_id, cronograma ou None, mensagem de erro ou None, ms de cálculo)
+    """
+    financiamento_id, argumentos = contrato
+    inicio = time.perf_counter()
+    try:
+        cronograma, erro = CronogramaFinanciamento.calcular(**argumentos), None
+    except ValueError as e:
+        cronograma, erro = None, str(e)
+    return financiamento_id, cronograma, erro, (time.perf_counter() - inicio) * 1000
+
+
+def simular_amortizacao(cenario):
+    """
+    Recalcula as parcelas pendentes para uma amortização extraordinária
+    hipotética (executável em outro processo; nada é gravado)
+
+    Args:
+        cenario (tuple): (índice, dict) com 'tipo' ('reduzir_parcela' ou
+            'reduzir_prazo'), 'sistema', 'saldo' (já descontada a amortização),
+            'parcelas' [(numero, vencimento, taxa_adm)], 'amortizacao' (mantida no
+            reduzir_prazo), 'taxa_mensal' e 'vigencias_seguro'
+
+    Returns:
+        tuple: (índice, cronograma ou None, mensagem de erro ou None, ms de cálculo)
+    """
+    indice, dados = cenario
+    inicio = time.perf_counter()
+    try:
+        if dados['tipo'] == 'reduzir_prazo':
+            cronograma = CronogramaFinanciamento.recalcular_prazo(
+                dados['saldo'], dados['parcelas'], dados['amortizacao'],
+                dados['taxa_mensal'], dados['vigencias_seguro']
+            )
+        else:
+            cronograma = CronogramaFinanciamento.recalcular(
+                dados['sistema'], dados['saldo'], dados['parcelas'],
+                dados['taxa_mensal'], dados['vigencias_seguro']
+            )
+        erro = None
+    except ValueError as e:
+        cronograma, erro = None, str(e)
+    return indice, cronograma, erro, (time.perf_counter() - inicio) * 1000
@@ -0,0 +1,658 @@
+"""
+Serviço de Faturas de Cartão - Executado incremental e recálculo adiado
+
+Executado e consumo por categoria:
+- Conta.valor_executado (fatura) = soma de TODOS os LancamentoAgregado do
+  cartão na competência (com e sem categoria), a mesma regra de
+  calcular_totais_faturas
+- ConsumoAgregado.total = soma dos lançamentos da categoria (ItemAgregado) no mês
+
+Ambos são mantidos por delta a cada insert/edição (inclusive troca de mês ou
+de categoria)/exclusão de lançamento, em vez de um SUM sobre o mês inteiro a
+cada escrita. A recomputação completa fica em verificar (endpoint
+administrativo e job periódico).
+
+Recálculo adiado (unidade de trabalho):
+- agendar() registra na sessão as faturas (cartão, mês) a criar/recalcular,
+  sem duplicatas
+- No flush (ou no commit, se não houver nada para flush) as faturas agendadas
+  são processadas de uma vez: uma consulta para as existentes, uma para o
+  executado inicial das que serão criadas, planejado pela OrcamentoTimeline
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import bindparam, case, delete, event, func, insert, select, update
+from sqlalchemy import inspect as sa_inspect
+
+try:
+    from backend.models import db, Conta, ConfigAgregador, ConsumoAgregado, ItemDespesa, LancamentoAgregado
+    from backend.services.orcamento_vigencia_service import OrcamentoTimeline
+    from backend.services.resumo_cartao_service import ResumoCartaoService
+    from backend.utils.competencia import filtro_competencia
+    from backend.utils.sessao_orm import executar_e_ler_atingidas, registrar_historico, valores_anteriores
+except ImportError:
+    from models import db, Conta, ConfigAgregador, ConsumoAgregado, ItemDespesa, LancamentoAgregado
+    from services.orcamento_vigencia_service import OrcamentoTimeline
+    from services.resumo_cartao_service import ResumoCartaoService
+    from utils.competencia import filtro_competencia
+    from utils.sessao_orm import executar_e_ler_atingidas, registrar_historico, valores_anteriores
+
+
+# ============================================================================
+# MANUTENÇÃO INCREMENTAL DO EXECUTADO (eventos de sessão)
+#
+# before_flush calcula o delta de cada (cartão, mês) e (categoria, mês) a
+# partir dos lançamentos novos/alterados/excluídos; after_flush_postexec
+# aplica os deltas com UPDATEs atômicos em lote (valor = valor + delta).
+# INSERT em lote (importação CSV, recorrências) aplica o delta a partir dos
+# parâmetros do próprio INSERT. UPDATE/DELETE em lote → as chaves (cartão, mês)
+# e (categoria, mês) atingidas são lidas pelo WHERE do comando e recalculadas
+# no commit (só elas; a varredura completa fica para verificar).
+# ============================================================================
+
+CAMPOS_CONSUMO = ('cartao_id', 'item_agregado_id', 'valor', 'mes_fatura')
+
+_CHAVE_DELTAS = 'fatura_cartao_deltas'
+_CHAVE_RECALCULAR = 'fatura_cartao_recalcular'
+_CHAVE_FATURAS = 'fatura_cartao_pendentes'
+_CHAVE_CARTOES = 'fatura_cartao_cartoes'
+
+_CENTAVO = Decimal('0.01')
+
+
+def _somar(deltas, cartao_id, item_agregado_id, valor, mes_fatura, sinal):
+    if mes_fatura is None or valor is None:
+        return
+    deltas_fatura, deltas_consumo = deltas
+    mes = mes_fatura.replace(day=1)
+    valor = sinal * Decimal(str(valor))
+    if cartao_id is not None:
+        deltas_fatura[(cartao_id, mes)] = deltas_fatura.get((cartao_id, mes), Decimal('0')) + valor
+    if item_agregado_id is not None:
+        deltas_consumo[(item_agregado_id, mes)] = deltas_consumo.get((item_agregado_id, mes), Decimal('0')) + valor
+
+
+def _antes_do_flush(session, flush_context, instances):
+    deltas = session.info.setdefault(_CHAVE_DELTAS, ({}, {}))
+
+    for obj in session.new:
+        if isinstance(obj, LancamentoAgregado):
+            _somar(deltas, obj.cartao_id, obj.item_agregado_id, obj.valor, obj.mes_fatura, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, LancamentoAgregado):
+            _somar(deltas, *valores_anteriores(obj, CAMPOS_CONSUMO), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, LancamentoAgregado):
+            continue
+        estado = sa_inspect(obj)
+        if not any(estado.attrs[c].history.has_changes() for c in CAMPOS_CONSUMO):
+            continue
+        _somar(deltas, *valores_anteriores(obj, CAMPOS_CONSUMO), -1)
+        _somar(deltas, obj.cartao_id, obj.item_agregado_id, obj.valor, obj.mes_fatura, 1)
+
+    # Faturas agendadas: criadas com o executado do banco (antes deste
+    # flush); o delta dos lançamentos deste flush entra em _apos_flush
+    _processar_faturas(session)
+
+
+def _apos_flush(session, flush_context):
+    deltas = session.info.pop(_CHAVE_DELTAS, None)
+    if deltas:
+        _aplicar_deltas(session, *deltas)
+
+
+def _aplicar_deltas(session, deltas_fatura, deltas_consumo):
+    """
+    Aplica os deltas com UPDATEs em lote (executemany) e expira as faturas
+    afetadas que estão carregadas na sessão.
+    """
+    conexao = session.connection()
+    agora = datetime.utcnow()
+
+    deltas_fatura = {chave: delta for chave, delta in deltas_fatura.items() if delta}
+    if deltas_fatura:
+        conta = Conta.__table__
+        executado = func.coalesce(conta.c.valor_executado, 0) + bindparam('delta', type_=conta.c.valor_executado.type)
+        conexao.execute(
+            update(conta).where(
+                conta.c.item_despesa_id == bindparam('b_cartao'),
+                conta.c.is_fatura_cartao == True,
+                conta.c.cartao_competencia == bindparam('b_mes')
+            ).values(
+                valor_executado=executado,
+                # Estouro acompanha o executado enquanto a fatura não é paga
+                estouro_orcamento=case(
+                    (conta.c.status_pagamento == 'Pago', conta.c.estouro_orcamento),
+                    else_=executado > func.coalesce(conta.c.valor_planejado, 0)
+                )
+            ),
+            [{'b_cartao': cartao_id, 'b_mes': mes, 'delta': delta}
+             for (cartao_id, mes), delta in sorted(deltas_fatura.items())]
+        )
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, Conta):
+                dados = sa_inspect(obj).dict
+                if (dados.get('item_despesa_id'), dados.get('cartao_competencia')) in deltas_fatura:
+                    session.expire(obj, ['valor_executado', 'estouro_orcamento'])
+
+    deltas_consumo = {chave: delta for chave, delta in deltas_consumo.items() if delta}
+    if deltas_consumo:
+        tabela = ConsumoAgregado.__table__
+        existentes = {
+            (item_id, mes) for item_id, mes in conexao.execute(
+                select(tabela.c.item_agregado_id, tabela.c.mes).where(
+                    tabela.c.item_agregado_id.in_({item_id for item_id, _ in deltas_consumo}),
+                    tabela.c.mes.in_({mes for _, mes in deltas_consumo})
+                )
+            )
+        }
+        atualizar = [
+            {'b_item': item_id, 'b_mes': mes, 'delta': delta}
+            for (item_id, mes), delta in sorted(deltas_consumo.items()) if (item_id, mes) in existentes
+        ]
+        inserir = [
+            {'item_agregado_id': item_id, 'mes': mes, 'total': delta, 'atualizado_em': agora}
+            for (item_id, mes), delta in sorted(deltas_consumo.items()) if (item_id, mes) not in existentes
+        ]
+        if atualizar:
+            conexao.execute(
+                update(tabela).where(
+                    tabela.c.item_agregado_id == bindparam('b_item'),
+                    tabela.c.mes == bindparam('b_mes')
+                ).values(total=tabela.c.total + bindparam('delta', type_=tabela.c.total.type), atualizado_em=agora),
+                atualizar
+            )
+        if inserir:
+            conexao.execute(insert(tabela), inserir)
+
+
+def _reexecutar_escopado(orm_execute_state):
+    """
+    UPDATE/DELETE (ou INSERT sem parâmetros) em lote: executa o comando e
+    agenda para o commit o recálculo só das chaves atingidas (antes e depois)
+    """
+    tabela = LancamentoAgregado.__table__
+    resultado, atingidas = executar_e_ler_atingidas(
+        orm_execute_state, (tabela.c.cartao_id, tabela.c.item_agregado_id, tabela.c.mes_fatura)
+    )
+    chaves_fatura, chaves_consumo = orm_execute_state.session.info.setdefault(_CHAVE_RECALCULAR, (set(), set()))
+    for cartao_id, item_id, mes_fatura in atingidas:
+        if mes_fatura is None:
+            continue
+        mes = mes_fatura.replace(day=1)
+        if cartao_id is not None:
+            chaves_fatura.add((cartao_id, mes))
+        if item_id is not None:
+            chaves_consumo.add((item_id, mes))
+    return resultado
+
+
+def _execucao_orm(orm_execute_state):
+    """INSERT em lote: delta a partir dos parâmetros; UPDATE/DELETE em lote → recalcular as chaves atingidas no commit"""
+    if orm_execute_state.is_select:
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not LancamentoAgregado:
+        return None
+
+    parametros = orm_execute_state.parameters
+    if isinstance(parametros, dict):
+        parametros = [parametros]
+    if not orm_execute_state.is_insert or not parametros:
+        return _reexecutar_escopado(orm_execute_state)
+
+    deltas = ({}, {})
+    for linha in parametros:
+        _somar(deltas, linha.get('cartao_id'), linha.get('item_agregado_id'),
+               linha.get('valor'), linha.get('mes_fatura'), 1)
+
+    resultado = orm_execute_state.invoke_statement()
+    _aplicar_deltas(orm_execute_state.session, *deltas)
+    return resultado
+
+
+def _antes_do_commit(session):
+    if session.info.get(_CHAVE_FATURAS):
+        _processar_faturas(session)  # Nada pendente de flush: processar agora
+    if session.info.get(_CHAVE_RECALCULAR):
+        session.flush()
+        FaturaCartaoService.recalcular(*session.info.pop(_CHAVE_RECALCULAR))
+
+
+def _apos_commit(session):
+    session.info.pop(_CHAVE_CARTOES, None)
+
+
+def _apos_rollback(session):
+    for chave in (_CHAVE_DELTAS, _CHAVE_RECALCULAR, _CHAVE_FATURAS, _CHAVE_CARTOES):
+        session.info.pop(chave, None)
+
+
+# ============================================================================
+# RECÁLCULO ADIADO DE FATURAS
+# ============================================================================
+
+def _processar_faturas(session):
+    """
+    Cria/recalcula de uma vez as faturas agendadas na sessão
+
+    Returns:
+        dict: {(cartao_id, mês): Conta} das faturas agendadas que existem
+    """
+    pendentes = session.info.pop(_CHAVE_FATURAS, None)
+    if not pendentes:
+        return {}
+
+    cartao_ids = {cartao_id for cartao_id, _ in pendentes}
+    faturas = FaturaCartaoService.faturas(cartao_ids, {mes for _, mes in pendentes}, session=session)
+    timelines = OrcamentoTimeline.dos_cartoes(cartao_ids)
+
+    criar = sorted(chave for chave, criar in pendentes.items() if criar and chave not in faturas)
+    if criar:
+        executados = _executados(session, criar)
+        for cartao_id, mes in criar:
+            fatura = FaturaCartaoService.nova_fatura(
+                cartao_id, mes,
+                valor_planejado=timelines[cartao_id].total(mes),
+                valor_executado=executados.get((cartao_id, mes), Decimal('0')),
+                session=session
+            )
+            session.add(fatura)
+            faturas[(cartao_id, mes)] = fatura
+
+    for chave in pendentes:
+        fatura = faturas.get(chave)
+        if fatura is None or fatura in session.new or fatura.status_pagamento == 'Pago':
+            continue
+        planejado = timelines[chave[0]].total(chave[1])
+        fatura.valor_planejado = planejado
+        fatura.valor = planejado  # Valor exibido = planejado (enquanto não paga)
+        fatura.estouro_orcamento = Decimal(str(fatura.valor_executado or 0)) > planejado
+
+    return {chave: faturas[chave] for chave in pendentes if chave in faturas}
+
+
+def _executados(session, chaves):
+    """Soma dos lançamentos de cada (cartão, mês) em uma consulta agrupada"""
+    inicio, fim = min(mes for _, mes in chaves), max(mes for _, mes in chaves)
+    executados = {}
+    for cartao_id, mes_fatura, total in session.query(
+        LancamentoAgregado.cartao_id,
+        LancamentoAgregado.mes_fatura,
+        func.sum(LancamentoAgregado.valor)
+    ).filter(
+        LancamentoAgregado.cartao_id.in_({cartao_id for cartao_id, _ in chaves}),
+        filtro_competencia(
+            LancamentoAgregado.mes_fatura, inicio,
+            meses=(fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+        )
+    ).group_by(LancamentoAgregado.cartao_id, LancamentoAgregado.mes_fatura).all():
+        chave = (cartao_id, mes_fatura.replace(day=1))
+        executados[chave] = executados.get(chave, Decimal('0')) + Decimal(str(total or 0))
+    return executados
+
+
+class FaturaCartaoService:
+    """
+    Faturas virtuais de cartão: criação/recálculo em lote e executado por delta
+    """
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que mantêm o executado e processam as
+        faturas agendadas.
+
+        Idempotente: pode ser chamado a cada create_app(). Registrar antes do
+        ResumoCompetenciaService (as faturas criadas no flush/commit precisam
+        ser vistas pelos listeners do resumo).
+        """
+        alvos = (
+            (db.session, 'before_flush', _antes_do_flush),
+            (db.session, 'after_flush_postexec', _apos_flush),
+            (db.session, 'do_orm_execute', _execucao_orm),
+            (db.session, 'before_commit', _antes_do_commit),
+            (db.session, 'after_commit', _apos_commit),
+            (db.session, 'after_rollback', _apos_rollback),
+        )
+        for alvo, nome, funcao in alvos:
+            if not event.contains(alvo, nome, funcao):
+                event.listen(alvo, nome, funcao)
+
+        registrar_historico(LancamentoAgregado, CAMPOS_CONSUMO)
+
+    @staticmethod
+    def agendar(chaves, criar=True):
+        """
+        Agenda faturas para criação/recálculo no próximo flush (ou commit)
+
+        Args:
+            chaves (iterable[tuple[int, date]]): (cartao_id, competência)
+            criar (bool): Criar as faturas inexistentes (False = só recalcular as existentes)
+
+        Raises:
+            ValueError: criar=True e o cartão não é Agregador ou não tem configuração
+        """
+        pendentes = db.session.info.setdefault(_CHAVE_FATURAS, {})
+        for cartao_id, competencia in chaves:
+            if criar:
+                FaturaCartaoService.dados_cartao(cartao_id)  # Valida já, não no flush
+            chave = (cartao_id, competencia.replace(day=1))
+            pendentes[chave] = pendentes.get(chave, False) or criar
+
+    @staticmethod
+    def processar_pendentes():
+        """
+        Processa já as faturas agendadas (sem esperar o flush) e faz o flush
+
+        Returns:
+            dict: {(cartao_id, mês): Conta} das faturas agendadas que existem
+        """
+        faturas = _processar_faturas(db.session)
+        db.session.flush()
+        return faturas
+
+    @staticmethod
+    def faturas(cartao_ids, competencias, session=None):
+        """
+        Faturas existentes dos cartões nas competências (uma consulta)
+
+        Returns:
+            dict: {(cartao_id, mês): Conta}
+        """
+        session = session if session is not None else db.session
+        cartao_ids = set(cartao_ids)
+        competencias = {c.replace(day=1) for c in competencias}
+        if not cartao_ids or not competencias:
+            return {}
+        return {
+            (fatura.item_despesa_id, fatura.cartao_competencia): fatura
+            for fatura in session.query(Conta).filter(
+                Conta.is_fatura_cartao == True,
+                Conta.item_despesa_id.in_(cartao_ids),
+                Conta.cartao_competencia.in_(competencias)
+            ).all()
+        }
+
+    @staticmethod
+    def dados_cartao(cartao_id, session=None):
+        """
+        Nome e dia de vencimento do cartão (validados; em cache na transação)
+
+        Raises:
+            ValueError: Não é um cartão (Agregador) ou não tem configuração
+        """
+        session = session if session is not None else db.session
+        cartoes = session.info.setdefault(_CHAVE_CARTOES, {})
+        if cartao_id not in cartoes:
+            cartao = session.get(ItemDespesa, cartao_id)
+            if not cartao or cartao.tipo != 'Agregador':
+                raise ValueError(f'ItemDespesa {cartao_id} não é um cartão de crédito')
+
+            config = session.query(ConfigAgregador).filter_by(item_despesa_id=cartao_id).first()
+            if not config:
+                raise ValueError(f'Cartão {cartao_id} sem configuração de fechamento/vencimento')
+
+            cartoes[cartao_id] = (cartao.nome, config.dia_vencimento)
+        return cartoes[cartao_id]
+
+    @staticmethod
+    def nova_fatura(cartao_id, competencia, valor_planejado, valor_executado, session=None):
+        """
+        Monta (sem adicionar à sessão) a fatura virtual do cartão no mês
+
+        Args:
+            valor_planejado (Decimal): Soma dos orçamentos das categorias
+            valor_executado (Decimal): Soma dos lançamentos já gravados no mês
+
+        Returns:
+            Conta: Fatura pendente
+        """
+        nome, dia_vencimento = FaturaCartaoService.dados_cartao(cartao_id, session=session)
+        comp_primeiro_dia = competencia.replace(day=1)
+        return Conta(
+            item_despesa_id=cartao_id,
+            mes_referencia=comp_primeiro_dia,
+            descricao=f'Fatura {nome} - {comp_primeiro_dia.strftime("%m/%Y")}',
+            valor=valor_planejado,  # Inicialmente = planejado
+            valor_planejado=valor_planejado,
+            valor_executado=valor_executado,  # Mantido por delta a partir daqui
+            data_vencimento=comp_primeiro_dia.replace(day=dia_vencimento),
+            status_pagamento='Pendente',
+            is_fatura_cartao=True,
+            cartao_competencia=comp_primeiro_dia,
+            estouro_orcamento=valor_executado > valor_planejado
+        )
+
+    # ========================================================================
+    # VERIFICAÇÃO (recomputação completa)
+    # ========================================================================
+
+    @staticmethod
+    def verificar(corrigir=False):
+        """
+        Confere o executado das faturas e o consumo por categoria contra a
+        soma completa dos lançamentos.
+
+        Duas consultas agrupadas (por cartão/mês e por categoria/mês) e a
+        leitura dos valores gravados.
+
+        Args:
+            corrigir: Se True, grava os valores recalculados nas faturas e no
+                consumo divergentes (sem commit; o chamador decide)
+
+        Returns:
+            dict: {'faturas_verificadas', 'divergencias_faturas': [...],
+                   'divergencias_consumo': [...], 'corrigidas'}
+        """
+        conexao = db.session.connection()
+        executados, consumos = _somas_lancamentos(conexao)
+
+        divergencias_faturas = []
+        faturas = conexao.execute(
+            select(Conta.id, Conta.item_despesa_id, Conta.cartao_competencia, Conta.valor_executado)
+            .where(Conta.is_fatura_cartao == True, Conta.cartao_competencia.isnot(None))
+            .order_by(Conta.id)
+        ).all()
+        for fatura_id, cartao_id, competencia, valor_executado in faturas:
+            registrado = Decimal(str(valor_executado or 0)).quantize(_CENTAVO)
+            calculado = executados.get((cartao_id, competencia.replace(day=1)), Decimal('0')).quantize(_CENTAVO)
+            if registrado != calculado:
+                divergencias_faturas.append({
+                    'fatura_id': fatura_id,
+                    'cartao_id': cartao_id,
+                    'competencia': competencia,
+                    'executado_registrado': registrado,
+                    'executado_calculado': calculado,
+                    'diferenca': registrado - calculado,
+                })
+
+        registrados = {
+            (item_id, mes): Decimal(str(total or 0)).quantize(_CENTAVO)
+            for item_id, mes, total in conexao.execute(
+                select(ConsumoAgregado.item_agregado_id, ConsumoAgregado.mes, ConsumoAgregado.total)
+            )
+        }
+        divergencias_consumo = []
+        for chave in sorted(set(registrados) | set(consumos)):
+            registrado = registrados.get(chave, Decimal('0.00'))
+            calculado = consumos.get(chave, Decimal('0')).quantize(_CENTAVO)
+            if registrado != calculado:
+                divergencias_consumo.append({
+                    'item_agregado_id': chave[0],
+                    'mes': chave[1],
+                    'consumo_registrado': registrado,
+                    'consumo_calculado': calculado,
+                    'diferenca': registrado - calculado,
+                })
+
+        if corrigir and divergencias_faturas:
+            conta = Conta.__table__
+            conexao.execute(
+                update(conta).where(conta.c.id == bindparam('b_id')).values(
+                    valor_executado=bindparam('b_executado', type_=conta.c.valor_executado.type)
+                ),
+                [{'b_id': d['fatura_id'], 'b_executado': d['executado_calculado']} for d in divergencias_faturas]
+            )
+            for obj in list(db.session.identity_map.values()):
+                if isinstance(obj, Conta) and obj.id in {d['fatura_id'] for d in divergencias_faturas}:
+                    db.session.expire(obj, ['valor_executado'])
+
+        if corrigir and divergencias_consumo:
+            _gravar_consumo(conexao, {
+                (d['item_agregado_id'], d['mes']): d['consumo_calculado'] for d in divergencias_consumo
+            })
+
+        corrigidas = bool(corrigir and (divergencias_faturas or divergencias_consumo))
+        if corrigidas:
+            ResumoCartaoService.invalidar()
+
+        return {
+            'faturas_verificadas': len(faturas),
+            'divergencias_faturas': divergencias_faturas,
+            'divergencias_consumo': divergencias_consumo,
+            'corrigidas': corrigidas,
+        }
+
+    @staticmethod
+    def recalcular(chaves_fatura, chaves_consumo):
+        """
+        Recomputa a partir dos lançamentos só o executado das faturas e o
+        consumo por categoria informados (após UPDATE/DELETE em lote)
+
+        Args:
+            chaves_fatura (set[tuple[int, date]]): (cartao_id, mês)
+            chaves_consumo (set[tuple[int, date]]): (item_agregado_id, mês)
+        """
+        conexao = db.session.connection()
+
+        if chaves_fatura:
+            executados = _executados(db.session, chaves_fatura)
+            conta = Conta.__table__
+            executado = bindparam('b_executado', type_=conta.c.valor_executado.type)
+            conexao.execute(
+                update(conta).where(
+                    conta.c.item_despesa_id == bindparam('b_cartao'),
+                    conta.c.is_fatura_cartao == True,
+                    conta.c.cartao_competencia == bindparam('b_mes')
+                ).values(
+                    valor_executado=executado,
+                    estouro_orcamento=case(
+                        (conta.c.status_pagamento == 'Pago', conta.c.estouro_orcamento),
+                        else_=executado > func.coalesce(conta.c.valor_planejado, 0)
+                    )
+                ),
+                [{'b_cartao': cartao_id, 'b_mes': mes, 'b_executado': executados.get((cartao_id, mes), Decimal('0'))}
+                 for cartao_id, mes in sorted(chaves_fatura)]
+            )
+            for obj in list(db.session.identity_map.values()):
+                if isinstance(obj, Conta):
+                    dados = sa_inspect(obj).dict
+                    if (dados.get('item_despesa_id'), dados.get('cartao_competencia')) in chaves_fatura:
+                        db.session.expire(obj, ['valor_executado', 'estouro_orcamento'])
+
+        if chaves_consumo:
+            inicio = min(mes for _, mes in chaves_consumo)
+            fim = max(mes for _, mes in chaves_consumo)
+            consumos = dict.fromkeys(chaves_consumo, Decimal('0'))
+            for item_id, mes_fatura, total in conexao.execute(
+                select(LancamentoAgregado.item_agregado_id, LancamentoAgregado.mes_fatura, func.sum(LancamentoAgregado.valor))
+                .where(
+                    LancamentoAgregado.item_agregado_id.in_({item_id for item_id, _ in chaves_consumo}),
+                    filtro_competencia(
+                        LancamentoAgregado.mes_fatura, inicio,
+                        meses=(fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+                    )
+                ).group_by(LancamentoAgregado.item_agregado_id, LancamentoAgregado.mes_fatura)
+            ):
+                chave = (item_id, mes_fatura.replace(day=1))
+                if chave in consumos:
+                    consumos[chave] += Decimal(str(total or 0))
+            _gravar_consumo(conexao, consumos)
+
+        ResumoCartaoService.invalidar({mes for _, mes in chaves_fatura} | {mes for _, mes in chaves_consumo})
+
+    @staticmethod
+    def reconstruir(conexao=None):
+        """
+        Reconstrói o consumo por categoria e o executado de todas as faturas a
+        partir dos lançamentos (carga inicial).
+
+        Args:
+            conexao: Conexão a usar (padrão: a da sessão atual)
+
+        Returns:
+            int: Número de linhas de consumo gravadas
+        """
+        conexao = conexao if conexao is not None else db.session.connection()
+        executados, consumos = _somas_lancamentos(conexao)
+
+        conta = Conta.__table__
+        faturas = conexao.execute(
+            select(conta.c.id, conta.c.item_despesa_id, conta.c.cartao_competencia)
+            .where(conta.c.is_fatura_cartao == True, conta.c.cartao_competencia.isnot(None))
+        ).all()
+        if faturas:
+            conexao.execute(
+                update(conta).where(conta.c.id == bindparam('b_id')).values(
+                    valor_executado=bindparam('b_executado', type_=conta.c.valor_executado.type)
+                ),
+                [{'b_id': fatura_id,
+                  'b_executado': executados.get((cartao_id, competencia.replace(day=1)), Decimal('0'))}
+                 for fatura_id, cartao_id, competencia in faturas]
+            )
+
+        conexao.execute(delete(ConsumoAgregado.__table__))
+        return _gravar_consumo(conexao, consumos)
+
+
+def _somas_lancamentos(conexao):
+    """
+    Soma completa dos lançamentos por (cartão, mês) e por (categoria, mês)
+
+    Returns:
+        tuple: ({(cartao_id, mês): Decimal}, {(item_agregado_id, mês): Decimal})
+    """
+    executados = {}
+    consumos = {}
+    for cartao_id, item_id, mes_fatura, total in conexao.execute(
+        select(
+            LancamentoAgregado.cartao_id,
+            LancamentoAgregado.item_agregado_id,
+            LancamentoAgregado.mes_fatura,
+            func.sum(LancamentoAgregado.valor)
+        ).group_by(
+            LancamentoAgregado.cartao_id,
+            LancamentoAgregado.item_agregado_id,
+            LancamentoAgregado.mes_fatura
+        )
+    ):
+        mes = mes_fatura.replace(day=1)
+        total = Decimal(str(total or 0))
+        executados[(cartao_id, mes)] = executados.get((cartao_id, mes), Decimal('0')) + total
+        if item_id is not None:
+            consumos[(item_id, mes)] = consumos.get((item_id, mes), Decimal('0')) + total
+    return executados, consumos
+
+
+def _gravar_consumo(conexao, valores):
+    """Substitui as linhas de consumo dos (categoria, mês) informados"""
+    if not valores:
+        return 0
+    tabela = ConsumoAgregado.__table__
+    conexao.execute(
+        delete(tabela).where(
+            tabela.c.item_agregado_id == bindparam('b_item'),
+            tabela.c.mes == bindparam('b_mes')
+        ),
+        [{'b_item': item_id, 'b_mes': mes} for item_id, mes in valores]
+    )
+    agora = datetime.utcnow()
+    conexao.execute(insert(tabela), [
+        {'item_agregado_id': item_id, 'mes': mes, 'total': total, 'atualizado_em': agora}
+        for (item_id, mes), total in sorted(valores.items())
+    ])
+    return len(valores)
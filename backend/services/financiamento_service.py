@@ -9,18 +9,116 @@ Este serviço implementa:
 5. Integração com contas a pagar
 6. Demonstrativos e relatórios
 """
-from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
-from sqlalchemy import func, extract, and_
-from decimal import Decimal
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from sqlalchemy import func, extract, and_, delete, insert, select, update
+from decimal import Decimal, InvalidOperation
 import math
+import os
+import time
 
 try:
     from backend.models import (db, Financiamento, FinanciamentoParcela,
-                                FinanciamentoAmortizacaoExtra, IndexadorMensal, Conta)
+                                FinanciamentoAmortizacaoExtra, Conta)
+    from backend.services.cronograma_financiamento import CronogramaFinanciamento, calcular_contrato, simular_amortizacao
+    from backend.services.indexador_service import SerieIndexador
+    from backend.services.projecao_financiamento_service import ProjecaoFinanciamento
+    from backend.services.resumo_competencia_service import ResumoCompetenciaService
+    from backend.services.seguro_vigencia_service import VigenciaTimeline
 except ImportError:
     from models import (db, Financiamento, FinanciamentoParcela,
-                       FinanciamentoAmortizacaoExtra, IndexadorMensal, Conta)
+                       FinanciamentoAmortizacaoExtra, Conta)
+    from services.cronograma_financiamento import CronogramaFinanciamento, calcular_contrato, simular_amortizacao
+    from services.indexador_service import SerieIndexador
+    from services.projecao_financiamento_service import ProjecaoFinanciamento
+    from services.resumo_competencia_service import ResumoCompetenciaService
+    from services.seguro_vigencia_service import VigenciaTimeline
+
+# Reindexação em lote: processos de cálculo e mínimo de contratos para usar o pool
+REINDEXACAO_PROCESSOS = min(4, os.cpu_count() or 1)
+REINDEXACAO_MIN_CONTRATOS_PARALELO = 4
+
+# Simulação de amortizações: processos de cálculo, mínimo de cenários para usar
+# o pool e máximo de cenários por requisição
+SIMULACAO_PROCESSOS = min(4, os.cpu_count() or 1)
+SIMULACAO_MIN_CENARIOS_PARALELO = 4
+SIMULACAO_MAX_CENARIOS = 20
+
+# Colunas de valores de FinanciamentoParcela calculadas pelo cronograma
+CAMPOS_VALORES_PARCELA = (
+    'valor_amortizacao',
+    'valor_juros',
+    'valor_seguro',
+    'valor_taxa_adm',
+    'valor_previsto_total',
+    'saldo_devedor_apos_pagamento',
+)
+
+_CENTAVO = Decimal('0.01')
+
+
+def _centavos(valor):
+    return Decimal(str(valor or 0)).quantize(_CENTAVO)
+
+
+# Pool da simulação: criado no primeiro lote paralelo e mantido entre requisições
+# (a criação dos processos custaria mais que o próprio cálculo)
+_pool_simulacao = None
+
+
+def _obter_pool_simulacao():
+    global _pool_simulacao
+    if _pool_simulacao is None:
+        _pool_simulacao = ProcessPoolExecutor(max_workers=SIMULACAO_PROCESSOS)
+    return _pool_simulacao
+
+
+def _descartar_pool_simulacao():
+    """Descarta o pool quebrado (processo morto); o próximo lote cria outro"""
+    global _pool_simulacao
+    _pool_simulacao = None
+
+
+def _valores_padrao(modelo, ignorar):
+    """
+    Valores de uma linha recém-inserida do modelo (default escalar ou None)
+
+    Ignora a chave primária, as colunas informadas e as de default calculado
+    (datas de criação), que uma regravação não deve alterar.
+    """
+    padrao = {}
+    for coluna in modelo.__table__.columns:
+        if coluna.primary_key or coluna.name in ignorar or coluna.onupdate is not None:
+            continue
+        if coluna.default is None:
+            padrao[coluna.name] = None
+        elif coluna.default.is_scalar:
+            padrao[coluna.name] = coluna.default.arg
+    return padrao
+
+
+def _agrupar_por_colunas(linhas):
+    """Ordena UPDATEs por conjunto de colunas (um executemany por conjunto, não por troca de conjunto)"""
+    return sorted(linhas, key=lambda linha: sorted(linha))
+
+
+def _alteracoes(modelo, objeto, valores):
+    """{coluna: novo valor} das colunas cujo valor persistido difere (Numeric comparado na escala da coluna)"""
+    colunas = modelo.__table__.columns
+    alteracoes = {}
+    for nome, novo in valores.items():
+        atual = getattr(objeto, nome)
+        escala = getattr(colunas[nome].type, 'scale', None)
+        if escala is not None and atual is not None and novo is not None:
+            quantum = Decimal(1).scaleb(-escala)
+            igual = Decimal(str(atual)).quantize(quantum) == Decimal(str(novo)).quantize(quantum)
+        else:
+            igual = atual == novo
+        if not igual:
+            alteracoes[nome] = novo
+    return alteracoes
 
 
 class FinanciamentoService:
@@ -503,8 +601,10 @@ class FinanciamentoService:
 
             if parcelas_pendentes_ids:
                 # Remover contas vinculadas a parcelas pendentes
-                Conta.query.filter(
-                    Conta.financiamento_parcela_id.in_(parcelas_pendentes_ids)
+                condicao = Conta.financiamento_parcela_id.in_(parcelas_pendentes_ids)
+                ResumoCompetenciaService.marcar_meses_contas(condicao)
+                Conta.query.filter(condicao).execution_options(
+                    resumo_competencia_marcado=True
                 ).delete(synchronize_session=False)
 
         db.session.commit()
@@ -574,8 +674,10 @@ class FinanciamentoService:
         try:
             # Excluir despesas vinculadas (1 parcela = 1 despesa)
             if financiamento.item_despesa_id:
-                Conta.query.filter(
-                    Conta.item_despesa_id == financiamento.item_despesa_id
+                condicao = Conta.item_despesa_id == financiamento.item_despesa_id
+                ResumoCompetenciaService.marcar_meses_contas(condicao)
+                Conta.query.filter(condicao).execution_options(
+                    resumo_competencia_marcado=True
                 ).delete(synchronize_session=False)
 
             # Excluir parcelas
@@ -604,7 +706,6 @@ class FinanciamentoService:
         Returns:
             int: Número de parcelas recalculadas
         """
-        from backend.services.seguro_vigencia_service import SeguroVigenciaService
         import logging
         logger = logging.getLogger(__name__)
 
@@ -670,74 +771,29 @@ class FinanciamentoService:
         logger.info(f"[RECALC] Sistema: {sistema}")
         logger.info(f"[RECALC] Total de parcelas pendentes: {len(parcelas_pendentes)}")
 
-        # Recalcular cada parcela pendente
-        for idx, parcela in enumerate(parcelas_pendentes, 1):
-            logger.info(f"[RECALC] --- Recalculando parcela #{parcela.numero_parcela} ({idx}/{len(parcelas_pendentes)}) ---")
-            # Calcular juros sobre saldo atual
-            juros = saldo_devedor * taxa_mensal
-
-            # Calcular amortização baseada no sistema
-            if sistema == 'SAC':
-                # Amortização constante = saldo / parcelas restantes
-                num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
-            elif sistema == 'PRICE':
-                # Recalcular PMT com saldo e parcelas restantes
-                n = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                if taxa_mensal > 0:
-                    fator = (Decimal('1') + taxa_mensal) ** Decimal(str(n))
-                    pmt = saldo_devedor * taxa_mensal * fator / (fator - Decimal('1'))
-                else:
-                    pmt = saldo_devedor / Decimal(str(n))
-                amortizacao = pmt - juros
-            else:  # SIMPLES
-                num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
-                # Juros simples fixos
-                juros = financiamento.valor_financiado * taxa_mensal
-
-            # ========================================================================
-            # 🔥 CORREÇÃO CRÍTICA: Buscar seguro por VIGÊNCIA baseada na DATA da parcela
-            # NÃO usar modelo antigo (seguro_tipo, valor_seguro_mensal)
-            # ========================================================================
-            logger.info(f"[RECALC] Buscando vigência para data: {parcela.data_vencimento}")
-            vigencia = SeguroVigenciaService.obter_vigencia_por_data(
-                financiamento_id=financiamento.id,
-                data_referencia=parcela.data_vencimento
-            )
+        # Reencadeamento em tempo linear (CronogramaFinanciamento.recalcular):
+        # seguro por VIGÊNCIA na data de cada parcela; SIMPLES com juros fixos
+        # sobre o valor financiado
+        recalculado = CronogramaFinanciamento.recalcular(
+            sistema,
+            saldo_devedor,
+            [(p.numero_parcela, p.data_vencimento, financiamento.taxa_administracao_fixa) for p in parcelas_pendentes],
+            taxa_mensal,
+            VigenciaTimeline.do_financiamento(financiamento.id),
+            juros_fixos=financiamento.valor_financiado * taxa_mensal if sistema not in ('SAC', 'PRICE') else None
+        )
 
-            if not vigencia:
-                logger.error(f"[RECALC] ERRO: Nenhuma vigência encontrada para {parcela.data_vencimento}")
-                raise ValueError(
-                    f'Nenhuma vigência de seguro encontrada para a data {parcela.data_vencimento.strftime("%Y-%m-%d")}. '
-                    f'Cadastre uma vigência válida antes de gerar/recalcular parcelas.'
+        detalhar = logger.isEnabledFor(logging.DEBUG)
+        for parcela, valores in zip(parcelas_pendentes, CronogramaFinanciamento.linhas(recalculado)):
+            for campo in CAMPOS_VALORES_PARCELA:
+                setattr(parcela, campo, valores[campo])
+            if detalhar:
+                logger.debug(
+                    f"[RECALC] Parcela #{parcela.numero_parcela}: juros R$ {parcela.valor_juros}, "
+                    f"amortização R$ {parcela.valor_amortizacao}, seguro R$ {parcela.valor_seguro}, "
+                    f"total R$ {parcela.valor_previsto_total}, saldo após R$ {parcela.saldo_devedor_apos_pagamento}"
                 )
 
-            valor_seguro = vigencia.valor_mensal
-            logger.info(f"[RECALC] Vigência encontrada: inicio={vigencia.competencia_inicio}, valor=R$ {valor_seguro}")
-
-            # Taxa administrativa (valor fixo)
-            valor_taxa_adm = financiamento.taxa_administracao_fixa
-
-            # Atualizar parcela
-            parcela.valor_amortizacao = amortizacao
-            parcela.valor_juros = juros
-            parcela.valor_seguro = valor_seguro  # ✅ AGORA USA VIGÊNCIA CORRETA
-            parcela.valor_taxa_adm = valor_taxa_adm
-            parcela.valor_previsto_total = amortizacao + juros + valor_seguro + valor_taxa_adm
-            parcela.saldo_devedor_apos_pagamento = saldo_devedor - amortizacao  # ✅ REENCADEAMENTO CORRETO
-
-            logger.info(f"[RECALC] Saldo atual: R$ {saldo_devedor}")
-            logger.info(f"[RECALC] Juros: R$ {juros}")
-            logger.info(f"[RECALC] Amortização: R$ {amortizacao}")
-            logger.info(f"[RECALC] Seguro: R$ {valor_seguro}")
-            logger.info(f"[RECALC] Taxa ADM: R$ {valor_taxa_adm}")
-            logger.info(f"[RECALC] TOTAL: R$ {parcela.valor_previsto_total}")
-            logger.info(f"[RECALC] Saldo após: R$ {parcela.saldo_devedor_apos_pagamento}")
-
-            # Atualizar saldo para próxima iteração (✅ REENCADEAMENTO)
-            saldo_devedor = saldo_devedor - amortizacao
-
         db.session.commit()
         logger.info(f"[RECALC] ========== FIM RECÁLCULO - {len(parcelas_pendentes)} parcelas atualizadas ==========")
         return len(parcelas_pendentes)
@@ -760,7 +816,6 @@ class FinanciamentoService:
         Raises:
             ValueError: Se faltar vigência para alguma data (fail-fast)
         """
-        from backend.services.seguro_vigencia_service import SeguroVigenciaService
         import logging
         logger = logging.getLogger(__name__)
 
@@ -794,10 +849,7 @@ class FinanciamentoService:
         # Atualizar SOMENTE o componente seguro
         for parcela in parcelas_pendentes:
             # Buscar vigência por data da parcela
-            vigencia = SeguroVigenciaService.obter_vigencia_por_data(
-                financiamento_id=financiamento.id,
-                data_referencia=parcela.data_vencimento
-            )
+            vigencia = VigenciaTimeline.do_financiamento(financiamento.id).vigente_em(parcela.data_vencimento)
 
             if not vigencia:
                 logger.error(f"[SEGURO-ONLY] ERRO: Nenhuma vigência para {parcela.data_vencimento}")
@@ -836,367 +888,399 @@ class FinanciamentoService:
         """
         Gera tabela de amortização completa usando configurações do próprio financiamento
 
-        Calcula seguro de duas formas:
-        - Tipo 'fixo': valor_seguro_mensal constante
-        - Tipo 'percentual_saldo': saldo_devedor * seguro_percentual
+        O cronograma é calculado em memória (CronogramaFinanciamento) e
+        comparado com o persistido por numero_parcela, em vez de apagar e
+        reinserir tudo:
+        - Parcelas/contas existentes: UPDATE em lote só dos campos alterados
+        - Parcelas além do novo prazo (e suas contas): DELETE
+        - Parcelas novas e parcelas sem conta: INSERT em lote
+
+        O estado final é o mesmo de uma tabela recém-gerada (parcelas
+        'pendente', contas 'Pendente'), mas os ids das linhas mantidas são
+        preservados e linhas iguais não são regravadas.
 
         Args:
             financiamento (Financiamento): Objeto do financiamento com todas configurações
-        """
-        parcelas_existentes = FinanciamentoParcela.query.filter_by(financiamento_id=financiamento.id).all()
-        ids_antigos = [p.id for p in parcelas_existentes]
-        if ids_antigos:
-            Conta.query.filter(Conta.financiamento_parcela_id.in_(ids_antigos)).delete(synchronize_session=False)
-
-        # Deletar parcelas existentes
-        FinanciamentoParcela.query.filter_by(financiamento_id=financiamento.id).delete()
-
-        sistema = financiamento.sistema_amortizacao
-
-        if sistema == 'SAC':
-            FinanciamentoService._gerar_parcelas_sac(financiamento)
-        elif sistema == 'PRICE':
-            FinanciamentoService._gerar_parcelas_price(financiamento)
-        elif sistema == 'SIMPLES':
-            FinanciamentoService._gerar_parcelas_simples(financiamento)
-
-        db.session.commit()
 
-        # Criar contas (despesas) para as parcelas
-        if financiamento.item_despesa_id:
-            FinanciamentoService.sincronizar_contas(financiamento.id)
+        Returns:
+            dict: Linhas tocadas ('parcelas_inseridas', 'parcelas_atualizadas',
+                  'parcelas_removidas', 'parcelas_inalteradas', 'contas_inseridas',
+                  'contas_atualizadas', 'contas_removidas')
 
-    @staticmethod
-    def _criar_conta_da_parcela(financiamento, parcela):
-        """
-        Cria ou atualiza uma Conta para a parcela, garantindo idempotência.
+        Raises:
+            ValueError: Se faltar vigência de seguro para algum vencimento
         """
-        if not financiamento.item_despesa_id:
-            return
+        # Calcular antes de gravar: sem vigência de seguro, nada é alterado
+        linhas = CronogramaFinanciamento.linhas(FinanciamentoService.calcular_cronograma(financiamento))
+        novas = {}
+        for linha in linhas:
+            linha['status'] = 'pendente'
+            novas[linha['numero_parcela']] = linha
+
+        # Parcelas persistidas (repetidas no mesmo número: a primeira fica, as demais saem)
+        existentes = {}
+        remover_parcelas = []
+        for parcela in FinanciamentoParcela.query.filter_by(
+            financiamento_id=financiamento.id
+        ).order_by(FinanciamentoParcela.id):
+            if parcela.numero_parcela in novas and parcela.numero_parcela not in existentes:
+                existentes[parcela.numero_parcela] = parcela
+            else:
+                remover_parcelas.append(parcela)
+        ids_removidos = {parcela.id for parcela in remover_parcelas}
+
+        # Contas persistidas: uma por parcela mantida (a vinculada em conta_id, se houver)
+        vinculadas = {parcela.id: parcela.conta_id for parcela in existentes.values()}
+        contas_existentes = Conta.query.filter(
+            Conta.financiamento_parcela_id.in_(
+                select(FinanciamentoParcela.id).where(FinanciamentoParcela.financiamento_id == financiamento.id)
+            )
+        ).order_by(Conta.id).all()
+        mantidas = {}
+        if financiamento.item_despesa_id:
+            for conta in contas_existentes:
+                parcela_id = conta.financiamento_parcela_id
+                if parcela_id not in vinculadas:
+                    continue
+                atual = mantidas.get(parcela_id)
+                if atual is None or (conta.id == vinculadas[parcela_id] and atual.id != conta.id):
+                    mantidas[parcela_id] = conta
+        remover_contas = [conta for conta in contas_existentes
+                          if mantidas.get(conta.financiamento_parcela_id) is not conta]
+
+        # Diferenças das parcelas mantidas
+        padrao_parcela = _valores_padrao(FinanciamentoParcela, ('financiamento_id', 'numero_parcela'))
+        padrao_conta = _valores_padrao(Conta, ())
+        atualizar_parcelas = []
+        atualizar_contas = []
+        inserir = []
+        meses = set()
+        for numero, linha in novas.items():
+            parcela = existentes.get(numero)
+            if parcela is None:
+                inserir.append(dict(linha, financiamento_id=financiamento.id))
+                continue
+
+            conta = mantidas.get(parcela.id)
+            alteracoes = _alteracoes(FinanciamentoParcela, parcela, {
+                **padrao_parcela, **linha, 'conta_id': conta.id if conta is not None else None
+            })
+            if alteracoes:
+                atualizar_parcelas.append({'id': parcela.id, **alteracoes})
+
+            if conta is not None:
+                alteracoes = _alteracoes(Conta, conta, {
+                    **padrao_conta, **FinanciamentoService._dados_conta_parcela(financiamento, dict(linha, id=parcela.id))
+                })
+                if alteracoes:
+                    atualizar_contas.append({'id': conta.id, **alteracoes})
+                    meses.update((conta.mes_referencia, alteracoes.get('mes_referencia')))
+
+        # Remoções (desfazer o vínculo parcela → conta antes: FKs circulares)
+        desvincular = [{'id': parcela_id, 'conta_id': None} for parcela_id in ids_removidos]
+        if desvincular:
+            db.session.execute(update(FinanciamentoParcela), desvincular)
+        if atualizar_parcelas:
+            db.session.execute(update(FinanciamentoParcela), _agrupar_por_colunas(atualizar_parcelas))
+        if remover_contas:
+            meses.update(conta.mes_referencia for conta in remover_contas)
+            db.session.execute(
+                delete(Conta)
+                .where(Conta.id.in_([conta.id for conta in remover_contas]))
+                .execution_options(resumo_competencia_marcado=True, synchronize_session=False)
+            )
+        if ids_removidos:
+            db.session.execute(
+                delete(FinanciamentoParcela)
+                .where(FinanciamentoParcela.id.in_(ids_removidos))
+                .execution_options(synchronize_session=False)
+            )
+        if atualizar_contas:
+            db.session.execute(
+                update(Conta).execution_options(resumo_competencia_marcado=True),
+                _agrupar_por_colunas(atualizar_contas)
+            )
+        ResumoCompetenciaService.marcar_meses(meses)
 
-        conta_existente = Conta.query.filter_by(financiamento_parcela_id=parcela.id).first()
-        mes_referencia = parcela.data_vencimento.replace(day=1)
+        if inserir:
+            db.session.execute(insert(FinanciamentoParcela), inserir)
 
-        if conta_existente:
-            conta_existente.valor = parcela.valor_previsto_total
-            conta_existente.data_vencimento = parcela.data_vencimento
-            conta_existente.mes_referencia = mes_referencia
-            conta_existente.numero_parcela = parcela.numero_parcela
-            conta_existente.total_parcelas = financiamento.prazo_total_meses
-            conta_existente.financiamento_parcela_id = parcela.id
-        else:
-            conta_existente = Conta(
-                item_despesa_id=financiamento.item_despesa_id,
-                financiamento_parcela_id=parcela.id,
-                mes_referencia=mes_referencia,
-                descricao=f'{financiamento.nome} - Parcela {parcela.numero_parcela}/{financiamento.prazo_total_meses}',
-                valor=parcela.valor_previsto_total,
-                data_vencimento=parcela.data_vencimento,
-                data_pagamento=parcela.data_vencimento if parcela.status == 'pago' else None,
-                status_pagamento='Pago' if parcela.status == 'pago' else 'Pendente',
-                numero_parcela=parcela.numero_parcela,
-                total_parcelas=financiamento.prazo_total_meses,
-                observacoes=f'Financiamento {financiamento.sistema_amortizacao}'
-            )
-            db.session.add(conta_existente)
+        # Contas das parcelas novas e das mantidas sem conta
+        contas_inseridas = 0
+        if financiamento.item_despesa_id:
+            sem_conta = {
+                numero: novas[numero] for numero, parcela in existentes.items() if parcela.id not in mantidas
+            }
+            sem_conta.update({linha['numero_parcela']: linha for linha in inserir})
+            if sem_conta:
+                # IDs gerados, em uma consulta (RETURNING em lote não preserva a ordem em todos os bancos)
+                ids_parcelas = dict(
+                    db.session.query(FinanciamentoParcela.numero_parcela, FinanciamentoParcela.id)
+                    .filter(FinanciamentoParcela.financiamento_id == financiamento.id)
+                )
+                parcelas = [dict(linha, id=ids_parcelas[numero]) for numero, linha in sem_conta.items()]
+                contas = FinanciamentoService._inserir_contas_parcelas(financiamento, parcelas)
+                db.session.execute(
+                    update(FinanciamentoParcela),
+                    [{'id': parcela['id'], 'conta_id': contas[parcela['id']]} for parcela in parcelas]
+                )
+                contas_inseridas = len(parcelas)
 
-        if parcela.status == 'pago':
-            conta_existente.status_pagamento = 'Pago'
-            conta_existente.data_pagamento = parcela.data_vencimento
-        else:
-            conta_existente.status_pagamento = 'Pendente'
-            conta_existente.data_pagamento = None
+        db.session.commit()
 
-        db.session.flush()
-        parcela.conta_id = conta_existente.id
+        return {
+            'parcelas_inseridas': len(inserir),
+            'parcelas_atualizadas': len(atualizar_parcelas),
+            'parcelas_removidas': len(ids_removidos),
+            'parcelas_inalteradas': len(existentes) - len(atualizar_parcelas),
+            'contas_inseridas': contas_inseridas,
+            'contas_atualizadas': len(atualizar_contas),
+            'contas_removidas': len(remover_contas),
+        }
 
     @staticmethod
-    def _gerar_parcelas_sac(financiamento):
+    def calcular_cronograma(financiamento):
         """
-        Sistema de Amortização Constante (SAC) com Modelo de Fases
-
-        FASE 1: Parcelas antes de amortização extraordinária
-        - Amortização fixa (saldo / prazo)
-        - Juros decrescentes sobre saldo devedor
-
-        EVENTO: Amortização extraordinária (reduzir_parcela ou reduzir_prazo)
+        Calcula o cronograma completo do financiamento sem gravar nada
 
-        FASE 2: Parcelas após amortização
-        - Tipo 'reduzir_parcela': Recalcula amortização fixa = novo_saldo / parcelas_restantes
-        - Tipo 'reduzir_prazo': Mantém amortização fixa, reduz número de parcelas
+        Carrega as amortizações extras em uma consulta; série do indexador
+        (SerieIndexador) e vigências de seguro (VigenciaTimeline) vêm do cache.
+        O cálculo é delegado ao CronogramaFinanciamento.
 
-        Aplica TR/indexador se configurado (independente de fases)
+        Returns:
+            dict: Cronograma colunar ({coluna: list})
         """
-        valor_financiado = financiamento.valor_financiado
-        prazo = financiamento.prazo_total_meses
-        taxa_mensal = financiamento.taxa_juros_mensal
-        indexador = financiamento.indexador_saldo
-
-        # Buscar amortizações extraordinárias para aplicar durante a geração
-        amortizacoes = FinanciamentoAmortizacaoExtra.query.filter_by(
-            financiamento_id=financiamento.id
-        ).order_by(FinanciamentoAmortizacaoExtra.data).all()
-
-        # Amortização constante inicial (FASE 1)
-        amortizacao_fixa = valor_financiado / Decimal(str(prazo))
-        saldo_devedor = valor_financiado
-        data_vencimento = financiamento.data_primeira_parcela
-
-        # Controle de fases
-        amortizacao_aplicada = None
-        parcelas_geradas = 0
-
-        for num_parcela in range(1, prazo + 1):
-            # DETECÇÃO DE EVENTO: Verificar se há amortização antes desta parcela
-            for amort in amortizacoes:
-                if (amortizacao_aplicada != amort and
-                    amort.data < data_vencimento and
-                    parcelas_geradas > 0):  # Só aplica se já gerou pelo menos 1 parcela
-
-                    # TRANSIÇÃO DE FASE: Aplicar amortização extraordinária
-                    saldo_devedor = saldo_devedor - amort.valor
-
-                    if saldo_devedor < 0:
-                        saldo_devedor = Decimal('0')
-                        break
-
-                    # Recalcular amortização fixa baseado no tipo
-                    parcelas_restantes = prazo - num_parcela + 1
-
-                    if amort.tipo == 'reduzir_parcela':
-                        # FASE 2A: Recalcula amortização fixa
-                        amortizacao_fixa = saldo_devedor / Decimal(str(parcelas_restantes))
-                    elif amort.tipo == 'reduzir_prazo':
-                        # FASE 2B: Mantém amortização, reduz prazo
-                        # Amortização fixa permanece a mesma
-                        # O número de parcelas será ajustado quando saldo zerar
-                        pass
-
-                    amortizacao_aplicada = amort
-
-            # Se saldo zerou, parar de gerar parcelas
-            if saldo_devedor <= Decimal('0.01'):
-                break
-
-            # Buscar TR/indexador se configurado (aplica no saldo ANTES de calcular a parcela)
-            taxa_indexador = Decimal('0')
-            if indexador:
-                taxa_indexador = FinanciamentoService._obter_indexador(indexador, data_vencimento)
-
-            # Corrigir saldo devedor com indexador (TR faz saldo CRESCER)
-            # Importante: isso só acontece UMA VEZ por mês, no início do período
-            saldo_corrigido = saldo_devedor * (Decimal('1') + taxa_indexador / Decimal('100'))
-
-            # Calcular juros sobre saldo corrigido
-            # IMPORTANTE: taxa_mensal já é decimal (ex: 0.006827), não dividir por 100!
-            juros = saldo_corrigido * taxa_mensal
-
-            # Usar amortização fixa atual (pode ter sido recalculada após amortização)
-            amortizacao = amortizacao_fixa
-
-            # Proteção: Se amortização é maior que saldo, ajustar (última parcela)
-            if amortizacao > saldo_corrigido:
-                amortizacao = saldo_corrigido
-
-            # Buscar seguro por vigência
-            vigencia_seguro = financiamento.obter_seguro_por_data(data_vencimento)
-
-            if not vigencia_seguro:
-                raise ValueError(
-                    f"Seguro não configurado para a data {data_vencimento.strftime('%d/%m/%Y')}. "
-                    f"Cadastre uma vigência de seguro antes de gerar as parcelas."
-                )
-
-            valor_seguro_parcela = vigencia_seguro.valor_mensal
-
-            # Taxa administrativa (valor fixo mensal)
-            valor_taxa_adm = financiamento.taxa_administracao_fixa
-
-            # Compor parcela
-            valor_previsto_total = amortizacao + juros + valor_seguro_parcela + valor_taxa_adm
-
-            # Calcular saldo após pagamento (subtrai amortização do saldo CORRIGIDO)
-            saldo_apos_pagamento = saldo_corrigido - amortizacao
-
-            # Criar parcela
-            parcela = FinanciamentoParcela(
-                financiamento_id=financiamento.id,
-                numero_parcela=num_parcela,
-                data_vencimento=data_vencimento,
-                valor_amortizacao=amortizacao,
-                valor_juros=juros,
-                valor_seguro=valor_seguro_parcela,
-                valor_taxa_adm=valor_taxa_adm,
-                valor_previsto_total=valor_previsto_total,
-                saldo_devedor_apos_pagamento=saldo_apos_pagamento if saldo_apos_pagamento > Decimal('0.01') else Decimal('0'),
-                status='pendente'
-            )
-
-            db.session.add(parcela)
-            db.session.flush()
-            FinanciamentoService._criar_conta_da_parcela(financiamento, parcela)
+        # Indexador e amortizações extras só entram no cálculo SAC
+        serie_indexador = None
+        amortizacoes = []
+        if financiamento.sistema_amortizacao == 'SAC':
+            amortizacoes = [
+                (a.data, a.valor, a.tipo)
+                for a in FinanciamentoAmortizacaoExtra.query.filter_by(
+                    financiamento_id=financiamento.id
+                ).order_by(FinanciamentoAmortizacaoExtra.data)
+            ]
+            if financiamento.indexador_saldo:
+                serie_indexador = SerieIndexador.do_indexador(financiamento.indexador_saldo)
+
+        return CronogramaFinanciamento.calcular(**FinanciamentoService._argumentos_cronograma(
+            financiamento, serie_indexador, VigenciaTimeline.do_financiamento(financiamento.id), amortizacoes
+        ))
 
-            parcelas_geradas += 1
+    @staticmethod
+    def _argumentos_cronograma(financiamento, serie_indexador, vigencias_seguro, amortizacoes):
+        """Argumentos de CronogramaFinanciamento.calcular para o contrato"""
+        return {
+            'sistema': financiamento.sistema_amortizacao,
+            'valor_financiado': financiamento.valor_financiado,
+            'prazo': financiamento.prazo_total_meses,
+            'taxa_mensal': financiamento.taxa_juros_mensal,
+            'data_primeira_parcela': financiamento.data_primeira_parcela,
+            'taxa_adm': financiamento.taxa_administracao_fixa,
+            'serie_indexador': serie_indexador,
+            'vigencias_seguro': vigencias_seguro,
+            'amortizacoes': amortizacoes,
+        }
 
-            # Atualizar saldo para próxima iteração
-            # IMPORTANTE: passa o saldo SEM correção, pois a TR será aplicada no próximo mês
-            saldo_devedor = saldo_apos_pagamento
-            data_vencimento = data_vencimento + relativedelta(months=1)
+    # ========================================================================
+    # REINDEXAÇÃO EM LOTE
+    # ========================================================================
 
     @staticmethod
-    def _gerar_parcelas_price(financiamento):
+    def reindexar(nome_indexador, a_partir_de, processos=None):
         """
-        Tabela PRICE
+        Recalcula as parcelas pendentes de todos os financiamentos corrigidos
+        pelo indexador, a partir do mês alterado
+
+        Caminho rápido para um novo valor de indexador, em vez de
+        regenerar-parcelas contrato a contrato (apagar e reinserir tudo):
+        - Contratos, amortizações extras, vigências e parcelas pendentes em
+          uma consulta cada
+        - Cronogramas calculados por CronogramaFinanciamento em um
+          ProcessPoolExecutor (cálculo Decimal, limitado por CPU) a partir de
+          REINDEXACAO_MIN_CONTRATOS_PARALELO contratos
+        - Só as parcelas pendentes com vencimento >= mês e valores alterados
+          são gravadas: UPDATE em lote por id nas parcelas e nas contas vinculadas
+        - Parcelas pagas ou anteriores ao mês não são tocadas
+
+        O indexador só corrige o saldo no SAC; contratos PRICE/SIMPLES não são
+        afetados. Contratos sem vigência de seguro ou cujo cronograma
+        recalculado não cobre mais as parcelas pendentes ficam de fora, com o
+        motivo em 'erro' (usar regenerar-parcelas).
+
+        Args:
+            nome_indexador (str): Nome do indexador (TR, IPCA...)
+            a_partir_de (date): Primeiro mês com valor alterado
+            processos (int, opcional): Processos de cálculo (1 = no próprio processo)
 
-        Parcela fixa (amortização + juros)
-        Juros decrescentes, amortização crescente
-        Seguro obtido via lookup de vigência por data
+        Returns:
+            dict: {'indexador', 'a_partir_de', 'processos', 'parcelas_atualizadas',
+                   'contas_atualizadas', 'ms_calculo', 'ms_escrita', 'ms_total',
+                   'financiamentos': [{'financiamento_id', 'nome', 'parcelas_pendentes',
+                                       'parcelas_atualizadas', 'ms_calculo', 'erro'}]}
         """
-        valor_financiado = financiamento.valor_financiado
-        prazo = financiamento.prazo_total_meses
-        taxa_mensal = financiamento.taxa_juros_mensal
+        import logging
+        logger = logging.getLogger(__name__)
 
-        # Calcular parcela fixa (PMT)
-        # PMT = PV * i * (1+i)^n / ((1+i)^n - 1)
-        if taxa_mensal == Decimal('0'):
-            pmt = valor_financiado / Decimal(str(prazo))
+        inicio_total = time.perf_counter()
+        mes = a_partir_de.replace(day=1)
+
+        financiamentos = Financiamento.query.filter(
+            Financiamento.indexador_saldo == nome_indexador,
+            Financiamento.sistema_amortizacao == 'SAC',
+            Financiamento.ativo == True
+        ).order_by(Financiamento.id).all()
+        ids = [f.id for f in financiamentos]
+
+        amortizacoes = {financiamento_id: [] for financiamento_id in ids}
+        pendentes = {financiamento_id: {} for financiamento_id in ids}
+        if ids:
+            for a in FinanciamentoAmortizacaoExtra.query.filter(
+                FinanciamentoAmortizacaoExtra.financiamento_id.in_(ids)
+            ).order_by(FinanciamentoAmortizacaoExtra.data):
+                amortizacoes[a.financiamento_id].append((a.data, a.valor, a.tipo))
+
+            for parcela in db.session.query(
+                FinanciamentoParcela.id,
+                FinanciamentoParcela.financiamento_id,
+                FinanciamentoParcela.numero_parcela,
+                FinanciamentoParcela.data_vencimento,
+                FinanciamentoParcela.conta_id,
+                *(getattr(FinanciamentoParcela, campo) for campo in CAMPOS_VALORES_PARCELA)
+            ).filter(
+                FinanciamentoParcela.financiamento_id.in_(ids),
+                FinanciamentoParcela.status == 'pendente',
+                FinanciamentoParcela.data_vencimento >= mes
+            ):
+                pendentes[parcela.financiamento_id][parcela.numero_parcela] = parcela
+
+        # Entradas serializáveis: série como dict, vigências como namedtuples
+        serie = SerieIndexador.do_indexador(nome_indexador).como_dict()
+        vigencias = VigenciaTimeline.dos_financiamentos(ids)
+        contratos = [
+            (f.id, FinanciamentoService._argumentos_cronograma(f, serie, vigencias[f.id], amortizacoes[f.id]))
+            for f in financiamentos if pendentes[f.id]
+        ]
+
+        processos = min(processos or REINDEXACAO_PROCESSOS, len(contratos)) or 1
+        if len(contratos) < REINDEXACAO_MIN_CONTRATOS_PARALELO:
+            processos = 1
+
+        inicio_calculo = time.perf_counter()
+        if processos > 1:
+            with ProcessPoolExecutor(max_workers=processos) as pool:
+                calculados = list(pool.map(
+                    calcular_contrato, contratos, chunksize=max(1, len(contratos) // (processos * 4))
+                ))
         else:
-            fator = (Decimal('1') + taxa_mensal) ** Decimal(str(prazo))
-            pmt = valor_financiado * taxa_mensal * fator / (fator - Decimal('1'))
-
-        saldo_devedor = valor_financiado
-        data_vencimento = financiamento.data_primeira_parcela
-
-        for num_parcela in range(1, prazo + 1):
-            # Juros sobre saldo
-            juros = saldo_devedor * taxa_mensal
-
-            # Amortização = PMT - Juros
-            amortizacao = pmt - juros
-
-            # Buscar seguro por vigência
-            vigencia_seguro = financiamento.obter_seguro_por_data(data_vencimento)
-
-            if not vigencia_seguro:
-                raise ValueError(
-                    f"Seguro não configurado para a data {data_vencimento.strftime('%d/%m/%Y')}. "
-                    f"Cadastre uma vigência de seguro antes de gerar as parcelas."
-                )
-
-            valor_seguro_parcela = vigencia_seguro.valor_mensal
-
-            # Taxa administrativa (valor fixo mensal)
-            valor_taxa_adm = financiamento.taxa_administracao_fixa
-
-            # Valor total com seguros e taxas
-            valor_previsto_total = pmt + valor_seguro_parcela + valor_taxa_adm
-
-            # Saldo após pagamento
-            saldo_apos_pagamento = saldo_devedor - amortizacao
-
-            # Criar parcela
-            parcela = FinanciamentoParcela(
-                financiamento_id=financiamento.id,
-                numero_parcela=num_parcela,
-                data_vencimento=data_vencimento,
-                valor_amortizacao=amortizacao,
-                valor_juros=juros,
-                valor_seguro=valor_seguro_parcela,
-                valor_taxa_adm=valor_taxa_adm,
-                valor_previsto_total=valor_previsto_total,
-                saldo_devedor_apos_pagamento=saldo_apos_pagamento if saldo_apos_pagamento > Decimal('0.01') else Decimal('0'),
-                status='pendente'
-            )
-
-            db.session.add(parcela)
-            db.session.flush()
-            FinanciamentoService._criar_conta_da_parcela(financiamento, parcela)
-
-            # Atualizar
-            saldo_devedor = saldo_apos_pagamento
-            data_vencimento = data_vencimento + relativedelta(months=1)
+            calculados = [calcular_contrato(contrato) for contrato in contratos]
+        ms_calculo = (time.perf_counter() - inicio_calculo) * 1000
+
+        nomes = {f.id: f.nome for f in financiamentos}
+        relatorio = []
+        parcelas = []
+        contas = []
+        meses = set()
+        for financiamento_id, cronograma, erro, ms in calculados:
+            atuais = pendentes[financiamento_id]
+            item = {
+                'financiamento_id': financiamento_id,
+                'nome': nomes[financiamento_id],
+                'parcelas_pendentes': len(atuais),
+                'parcelas_atualizadas': 0,
+                'ms_calculo': round(ms, 2),
+                'erro': erro,
+            }
+            relatorio.append(item)
+            if cronograma is None:
+                continue
+
+            novas = {linha['numero_parcela']: linha for linha in CronogramaFinanciamento.linhas(cronograma)}
+            if not set(atuais) <= set(novas):
+                item['erro'] = 'Cronograma recalculado não cobre as parcelas pendentes; use regenerar-parcelas'
+                continue
+
+            for numero, parcela in atuais.items():
+                nova = novas[numero]
+                if all(_centavos(nova[campo]) == _centavos(getattr(parcela, campo)) for campo in CAMPOS_VALORES_PARCELA):
+                    continue
+                parcelas.append({'id': parcela.id, **{campo: nova[campo] for campo in CAMPOS_VALORES_PARCELA}})
+                if parcela.conta_id:
+                    contas.append({'id': parcela.conta_id, 'valor': nova['valor_previsto_total']})
+                    meses.add(parcela.data_vencimento)
+                item['parcelas_atualizadas'] += 1
+
+        inicio_escrita = time.perf_counter()
+        if parcelas:
+            db.session.execute(update(FinanciamentoParcela), parcelas)
+        if contas:
+            ResumoCompetenciaService.marcar_meses(meses)
+            db.session.execute(update(Conta).execution_options(resumo_competencia_marcado=True), contas)
+        db.session.commit()
+        ms_escrita = (time.perf_counter() - inicio_escrita) * 1000
+
+        resultado = {
+            'indexador': nome_indexador,
+            'a_partir_de': mes,
+            'processos': processos,
+            'parcelas_atualizadas': len(parcelas),
+            'contas_atualizadas': len(contas),
+            'ms_calculo': round(ms_calculo, 2),
+            'ms_escrita': round(ms_escrita, 2),
+            'ms_total': round((time.perf_counter() - inicio_total) * 1000, 2),
+            'financiamentos': relatorio,
+        }
+        logger.info(
+            f"[REINDEXAR] {nome_indexador} a partir de {mes}: {len(contratos)} contratos, "
+            f"{len(parcelas)} parcelas em {resultado['ms_total']} ms ({processos} processos)"
+        )
+        return resultado
 
     @staticmethod
-    def _gerar_parcelas_simples(financiamento):
+    def _inserir_contas_parcelas(financiamento, parcelas):
         """
-        Juros Simples
-
-        Juros fixos sobre valor inicial em todas as parcelas
-        Amortização constante
-        Seguro obtido via lookup de vigência por data
-        """
-        valor_financiado = financiamento.valor_financiado
-        prazo = financiamento.prazo_total_meses
-        taxa_mensal = financiamento.taxa_juros_mensal
-
-        # Juros fixos por mês
-        juros_mensais = valor_financiado * taxa_mensal
+        Cria em lote as Contas (despesas) de parcelas que ainda não têm conta
 
-        # Amortização constante
-        amortizacao = valor_financiado / Decimal(str(prazo))
+        Args:
+            financiamento (Financiamento): Financiamento com item_despesa_id
+            parcelas (list[dict]): id, numero_parcela, data_vencimento,
+                valor_previsto_total e status de cada parcela
 
-        saldo_devedor = valor_financiado
-        data_vencimento = financiamento.data_primeira_parcela
+        Returns:
+            dict: {parcela_id: conta_id} das contas do financiamento
+        """
+        contas = [FinanciamentoService._dados_conta_parcela(financiamento, parcela) for parcela in parcelas]
 
-        for num_parcela in range(1, prazo + 1):
-            # Buscar seguro por vigência
-            vigencia_seguro = financiamento.obter_seguro_por_data(data_vencimento)
+        ResumoCompetenciaService.marcar_meses({conta['mes_referencia'] for conta in contas})
+        db.session.execute(insert(Conta).execution_options(resumo_competencia_marcado=True), contas)
 
-            if not vigencia_seguro:
-                raise ValueError(
-                    f"Seguro não configurado para a data {data_vencimento.strftime('%d/%m/%Y')}. "
-                    f"Cadastre uma vigência de seguro antes de gerar as parcelas."
+        return dict(
+            db.session.query(Conta.financiamento_parcela_id, Conta.id).filter(
+                Conta.financiamento_parcela_id.in_(
+                    select(FinanciamentoParcela.id).where(
+                        FinanciamentoParcela.financiamento_id == financiamento.id
+                    )
                 )
-
-            valor_seguro_parcela = vigencia_seguro.valor_mensal
-
-            # Taxa administrativa (valor fixo mensal)
-            valor_taxa_adm = financiamento.taxa_administracao_fixa
-
-            valor_previsto_total = amortizacao + juros_mensais + valor_seguro_parcela + valor_taxa_adm
-
-            saldo_apos_pagamento = saldo_devedor - amortizacao
-
-            parcela = FinanciamentoParcela(
-                financiamento_id=financiamento.id,
-                numero_parcela=num_parcela,
-                data_vencimento=data_vencimento,
-                valor_amortizacao=amortizacao,
-                valor_juros=juros_mensais,
-                valor_seguro=valor_seguro_parcela,
-                valor_taxa_adm=valor_taxa_adm,
-                valor_previsto_total=valor_previsto_total,
-                saldo_devedor_apos_pagamento=saldo_apos_pagamento if saldo_apos_pagamento > Decimal('0.01') else Decimal('0'),
-                status='pendente'
             )
-
-            db.session.add(parcela)
-            db.session.flush()
-            FinanciamentoService._criar_conta_da_parcela(financiamento, parcela)
-
-            saldo_devedor = saldo_apos_pagamento
-            data_vencimento = data_vencimento + relativedelta(months=1)
+        )
 
     @staticmethod
-    def _obter_indexador(nome_indexador, data_referencia):
-        """
-        Busca valor do indexador para o mês
-
-        Args:
-            nome_indexador (str): Nome do indexador (TR, IPCA, etc)
-            data_referencia (date): Data de referência
-
-        Returns:
-            Decimal: Valor do indexador (0 se não encontrado)
-        """
-        data_mes = data_referencia.replace(day=1)
-
-        indexador = IndexadorMensal.query.filter_by(
-            nome=nome_indexador,
-            data_referencia=data_mes
-        ).first()
-
-        return indexador.valor if indexador else Decimal('0')
+    def _dados_conta_parcela(financiamento, parcela):
+        """Colunas da Conta (despesa) de uma parcela (dict com id, numero_parcela, data_vencimento, valor_previsto_total e status)"""
+        pago = parcela['status'] == 'pago'
+        return {
+            'item_despesa_id': financiamento.item_despesa_id,
+            'financiamento_parcela_id': parcela['id'],
+            'mes_referencia': parcela['data_vencimento'].replace(day=1),
+            'descricao': f"{financiamento.nome} - Parcela {parcela['numero_parcela']}/{financiamento.prazo_total_meses}",
+            'valor': parcela['valor_previsto_total'],
+            'data_vencimento': parcela['data_vencimento'],
+            'data_pagamento': parcela['data_vencimento'] if pago else None,
+            'status_pagamento': 'Pago' if pago else 'Pendente',
+            'numero_parcela': parcela['numero_parcela'],
+            'total_parcelas': financiamento.prazo_total_meses,
+            'observacoes': f'Financiamento {financiamento.sistema_amortizacao}'
+        }
 
     # ========================================================================
     # REGISTRO DE PAGAMENTOS
@@ -1374,8 +1458,7 @@ class FinanciamentoService:
         novo_saldo = financiamento.saldo_devedor_atual
 
         # Taxa de juros mensal
-        taxa_anual = financiamento.taxa_juros_nominal_anual / Decimal('100')
-        taxa_mensal = (Decimal('1') + taxa_anual) ** (Decimal('1') / Decimal('12')) - Decimal('1')
+        taxa_mensal = FinanciamentoService._calcular_taxa_mensal(financiamento.taxa_juros_nominal_anual)
 
         if tipo == 'reduzir_prazo':
             FinanciamentoService._recalcular_reduzir_prazo(
@@ -1394,64 +1477,17 @@ class FinanciamentoService:
         Recalcula juros e seguro baseados no novo saldo
         Se seguro for percentual, será recalculado automaticamente
         """
-        sistema = financiamento.sistema_amortizacao
-        saldo_devedor = novo_saldo
-
-        for parcela in parcelas_pendentes:
-            # Calcular juros sobre novo saldo
-            juros = saldo_devedor * taxa_mensal
-
-            # Calcular amortização baseada no sistema
-            if sistema == 'SAC':
-                # Amortização constante = saldo / parcelas restantes
-                num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
-            elif sistema == 'PRICE':
-                # Recalcular PMT com novo saldo e parcelas restantes
-                n = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                if taxa_mensal > 0:
-                    pmt = saldo_devedor * (taxa_mensal * (1 + taxa_mensal) ** n) / ((1 + taxa_mensal) ** n - 1)
-                else:
-                    pmt = saldo_devedor / Decimal(str(n))
-                amortizacao = pmt - juros
-            else:  # SIMPLES
-                num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
-                amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
-
-            # ========================================================================
-            # 🔥 CORREÇÃO CRÍTICA: Buscar seguro por VIGÊNCIA baseada na DATA da parcela
-            # NÃO usar modelo antigo (seguro_tipo, valor_seguro_mensal)
-            # ========================================================================
-            from backend.services.seguro_vigencia_service import SeguroVigenciaService
-
-            vigencia = SeguroVigenciaService.obter_vigencia_por_data(
-                financiamento_id=financiamento.id,
-                data_referencia=parcela.data_vencimento
-            )
-
-            if not vigencia:
-                raise ValueError(
-                    f'Nenhuma vigência de seguro encontrada para a data {parcela.data_vencimento.strftime("%Y-%m-%d")}. '
-                    f'Cadastre uma vigência válida antes de recalcular após amortização.'
-                )
-
-            valor_seguro = vigencia.valor_mensal
-
-            # Taxa administrativa (mantida)
-            valor_taxa_adm = parcela.valor_taxa_adm or Decimal('0')
-
-            # Atualizar parcela
-            parcela.valor_amortizacao = amortizacao
-            parcela.valor_juros = juros
-            parcela.valor_seguro = valor_seguro
-            parcela.valor_taxa_adm = valor_taxa_adm
-            parcela.valor_previsto_total = amortizacao + juros + valor_seguro + valor_taxa_adm
-            parcela.saldo_devedor_antes_pagamento = saldo_devedor
-            parcela.saldo_devedor_apos_pagamento = saldo_devedor - amortizacao
-
-            # Atualizar saldo para próxima iteração
-            saldo_devedor = saldo_devedor - amortizacao
+        # Reencadeamento em tempo linear (CronogramaFinanciamento.recalcular);
+        # seguro por VIGÊNCIA na data de cada parcela, taxa administrativa mantida
+        recalculado = CronogramaFinanciamento.recalcular(
+            financiamento.sistema_amortizacao,
+            novo_saldo,
+            [(p.numero_parcela, p.data_vencimento, p.valor_taxa_adm or Decimal('0')) for p in parcelas_pendentes],
+            taxa_mensal,
+            VigenciaTimeline.do_financiamento(financiamento.id)
+        )
 
+        FinanciamentoService._aplicar_recalculo(parcelas_pendentes, recalculado)
         db.session.flush()
 
     @staticmethod
@@ -1462,80 +1498,222 @@ class FinanciamentoService:
         Calcula quantas parcelas podem ser eliminadas
         Recalcula as parcelas restantes com o novo saldo
         """
-        sistema = financiamento.sistema_amortizacao
-
-        # Calcular valor da parcela (mantém o valor original de amortização + juros)
-        if parcelas_pendentes:
-            parcela_referencia = parcelas_pendentes[0]
-            valor_amortizacao_original = parcela_referencia.valor_amortizacao
-        else:
-            return
-
-        # Calcular quantas parcelas podem ser quitadas com o novo saldo
-        saldo_devedor = novo_saldo
-        parcelas_para_manter = []
-
-        for parcela in parcelas_pendentes:
-            # Calcular juros sobre saldo atual
-            juros = saldo_devedor * taxa_mensal
-
-            # Usar mesma amortização original
-            amortizacao = valor_amortizacao_original
-
-            # Se o saldo é menor que a amortização, essa é a última parcela
-            if saldo_devedor <= amortizacao:
-                amortizacao = saldo_devedor
-                juros = saldo_devedor * taxa_mensal
+        # Mantém a amortização da primeira parcela pendente até quitar o saldo
+        # (CronogramaFinanciamento.recalcular_prazo); seguro por VIGÊNCIA na data
+        # de cada parcela, taxa administrativa mantida
+        recalculado = CronogramaFinanciamento.recalcular_prazo(
+            novo_saldo,
+            [(p.numero_parcela, p.data_vencimento, p.valor_taxa_adm or Decimal('0')) for p in parcelas_pendentes],
+            parcelas_pendentes[0].valor_amortizacao,
+            taxa_mensal,
+            VigenciaTimeline.do_financiamento(financiamento.id)
+        )
+        mantidas = len(recalculado['numero_parcela'])
+        FinanciamentoService._aplicar_recalculo(parcelas_pendentes, recalculado)
 
-            # ========================================================================
-            # 🔥 CORREÇÃO CRÍTICA: Buscar seguro por VIGÊNCIA baseada na DATA da parcela
-            # NÃO usar modelo antigo (seguro_tipo, valor_seguro_mensal)
-            # ========================================================================
-            from backend.services.seguro_vigencia_service import SeguroVigenciaService
+        # Deletar parcelas excedentes (as mantidas são um prefixo das pendentes)
+        for parcela in parcelas_pendentes[mantidas:]:
+            db.session.delete(parcela)
 
-            vigencia = SeguroVigenciaService.obter_vigencia_por_data(
-                financiamento_id=financiamento.id,
-                data_referencia=parcela.data_vencimento
-            )
+        # Atualizar prazo remanescente no financiamento
+        financiamento.prazo_remanescente_meses = mantidas
 
-            if not vigencia:
-                raise ValueError(
-                    f'Nenhuma vigência de seguro encontrada para a data {parcela.data_vencimento.strftime("%Y-%m-%d")}. '
-                    f'Cadastre uma vigência válida antes de recalcular após amortização.'
-                )
+        db.session.flush()
 
-            valor_seguro = vigencia.valor_mensal
+    @staticmethod
+    def _aplicar_recalculo(parcelas_pendentes, recalculado):
+        """Copia para as parcelas (na ordem) os valores do cronograma recalculado"""
+        for parcela, valores in zip(parcelas_pendentes, CronogramaFinanciamento.linhas(recalculado)):
+            for campo in CAMPOS_VALORES_PARCELA:
+                setattr(parcela, campo, valores[campo])
 
-            # Taxa administrativa (mantida)
-            valor_taxa_adm = parcela.valor_taxa_adm or Decimal('0')
+    # ========================================================================
+    # SIMULAÇÃO DE AMORTIZAÇÕES (somente leitura)
+    # ========================================================================
 
-            # Atualizar parcela
-            parcela.valor_amortizacao = amortizacao
-            parcela.valor_juros = juros
-            parcela.valor_seguro = valor_seguro
-            parcela.valor_taxa_adm = valor_taxa_adm
-            parcela.valor_previsto_total = amortizacao + juros + valor_seguro + valor_taxa_adm
-            parcela.saldo_devedor_antes_pagamento = saldo_devedor
-            parcela.saldo_devedor_apos_pagamento = saldo_devedor - amortizacao
+    @staticmethod
+    def simular_amortizacoes(financiamento_id, cenarios):
+        """
+        Simula amortizações extraordinárias sem gravar nada
 
-            parcelas_para_manter.append(parcela)
+        Cada cenário é avaliado como registrar_amortizacao_extra o faria
+        (saldo soberano menos o valor; parcelas pendentes com vencimento >= data
+        recalculadas por reduzir_parcela ou reduzir_prazo), mas sobre as
+        parcelas pendentes carregadas em memória uma única vez. Os cenários são
+        calculados em um ProcessPoolExecutor mantido entre requisições a partir
+        de SIMULACAO_MIN_CENARIOS_PARALELO cenários.
 
-            # Atualizar saldo
-            saldo_devedor = saldo_devedor - amortizacao
+        Args:
+            financiamento_id (int): ID do financiamento
+            cenarios (list[dict]): até SIMULACAO_MAX_CENARIOS itens com
+                - data (str ou date): Data da amortização
+                - valor (float): Valor da amortização
+                - tipo (str): 'reduzir_parcela' ou 'reduzir_prazo'
+                - rotulo (str, opcional)
 
-            # Se quitou tudo, para
-            if saldo_devedor <= Decimal('0.01'):
-                break
+        Returns:
+            dict: {'financiamento_id', 'saldo_devedor_atual', 'atual', 'processos',
+                   'ms_calculo', 'ms_total', 'cenarios': [{'rotulo', 'data', 'valor',
+                   'tipo', 'total_juros', 'economia_juros', 'prazo_remanescente_meses',
+                   'parcelas_eliminadas', 'valor_primeira_parcela', 'data_ultima_parcela',
+                   'curva', 'ms_calculo', 'erro'}]}
+            'atual' resume as parcelas pendentes sem amortização; 'curva' é
+            colunar (numero_parcela, data_vencimento, valor_previsto_total,
+            saldo_devedor_apos_pagamento) sobre todas as parcelas pendentes.
 
-        # Deletar parcelas excedentes
-        parcelas_para_deletar = [p for p in parcelas_pendentes if p not in parcelas_para_manter]
-        for parcela in parcelas_para_deletar:
-            db.session.delete(parcela)
+        Raises:
+            ValueError: Financiamento inexistente ou cenário inválido
+        """
+        inicio_total = time.perf_counter()
 
-        # Atualizar prazo remanescente no financiamento
-        financiamento.prazo_remanescente_meses = len(parcelas_para_manter)
+        financiamento = db.session.get(Financiamento, financiamento_id)
+        if not financiamento:
+            raise ValueError('Financiamento não encontrado')
+        if not cenarios:
+            raise ValueError('Informe ao menos um cenário')
+        if len(cenarios) > SIMULACAO_MAX_CENARIOS:
+            raise ValueError(f'Máximo de {SIMULACAO_MAX_CENARIOS} cenários por simulação')
+        if financiamento.saldo_devedor_atual is None:
+            raise ValueError('Financiamento sem saldo devedor atual; regenere as parcelas antes de simular')
+
+        saldo_atual = financiamento.saldo_devedor_atual
+        entradas = []
+        for posicao, cenario in enumerate(cenarios, 1):
+            data_amort = cenario.get('data')
+            if isinstance(data_amort, str):
+                data_amort = datetime.strptime(data_amort, '%Y-%m-%d').date()
+            try:
+                valor = Decimal(str(cenario.get('valor') or 0))
+            except InvalidOperation:
+                raise ValueError(f'Cenário {posicao}: valor inválido')
+            if not valor.is_finite():
+                raise ValueError(f'Cenário {posicao}: valor inválido')
+            tipo = cenario.get('tipo')
+
+            if data_amort is None:
+                raise ValueError(f'Cenário {posicao}: data é obrigatória')
+            if tipo not in ('reduzir_parcela', 'reduzir_prazo'):
+                raise ValueError(f'Cenário {posicao}: tipo deve ser "reduzir_parcela" ou "reduzir_prazo"')
+            if valor <= 0 or valor > saldo_atual:
+                raise ValueError(f'Cenário {posicao}: valor deve ser positivo e até o saldo devedor atual')
+            entradas.append((cenario.get('rotulo') or f'Cenário {posicao}', data_amort, valor, tipo))
+
+        pendentes = db.session.query(
+            FinanciamentoParcela.numero_parcela,
+            FinanciamentoParcela.data_vencimento,
+            FinanciamentoParcela.valor_taxa_adm,
+            FinanciamentoParcela.valor_amortizacao,
+            FinanciamentoParcela.valor_juros,
+            FinanciamentoParcela.valor_previsto_total,
+            FinanciamentoParcela.saldo_devedor_apos_pagamento
+        ).filter(
+            FinanciamentoParcela.financiamento_id == financiamento.id,
+            FinanciamentoParcela.status == 'pendente'
+        ).order_by(FinanciamentoParcela.numero_parcela).all()
+        vencimentos = [p.data_vencimento for p in pendentes]
+        juros_atuais = sum((p.valor_juros for p in pendentes), Decimal('0'))
+
+        taxa_mensal = FinanciamentoService._calcular_taxa_mensal(financiamento.taxa_juros_nominal_anual)
+        vigencias = VigenciaTimeline.do_financiamento(financiamento.id)
+
+        # Parcelas pendentes mantidas (vencimento < data) ficam como estão
+        lotes = []
+        mantidas = []
+        for indice, (_, data_amort, valor, tipo) in enumerate(entradas):
+            corte = bisect_left(vencimentos, data_amort)
+            mantidas.append(corte)
+            recalcular = pendentes[corte:]
+            if not recalcular or (tipo == 'reduzir_prazo' and not financiamento.amortizacao_mensal_atual):
+                continue
+            lotes.append((indice, {
+                'tipo': tipo,
+                'sistema': financiamento.sistema_amortizacao,
+                'saldo': saldo_atual - valor,
+                'parcelas': [(p.numero_parcela, p.data_vencimento, p.valor_taxa_adm or Decimal('0'))
+                             for p in recalcular],
+                'amortizacao': recalcular[0].valor_amortizacao,
+                'taxa_mensal': taxa_mensal,
+                'vigencias_seguro': vigencias,
+            }))
+
+        processos = min(SIMULACAO_PROCESSOS, len(lotes)) or 1
+        if len(lotes) < SIMULACAO_MIN_CENARIOS_PARALELO:
+            processos = 1
+
+        inicio_calculo = time.perf_counter()
+        calculados = None
+        if processos > 1:
+            try:
+                calculados = list(_obter_pool_simulacao().map(simular_amortizacao, lotes))
+            except BrokenProcessPool:
+                _descartar_pool_simulacao()
+                processos = 1
+        if calculados is None:
+            calculados = [simular_amortizacao(lote) for lote in lotes]
+        ms_calculo = (time.perf_counter() - inicio_calculo) * 1000
+
+        resultados = {indice: (cronograma, erro, ms) for indice, cronograma, erro, ms in calculados}
+        relatorio = []
+        for indice, (rotulo, data_amort, valor, tipo) in enumerate(entradas):
+            if indice in resultados:
+                cronograma, erro, ms = resultados[indice]
+            elif mantidas[indice] == len(pendentes):
+                cronograma, erro, ms = None, 'Nenhuma parcela pendente a partir da data da amortização', 0.0
+            else:
+                # registrar_amortizacao_extra precisa da amortização mensal atual para reduzir_prazo
+                cronograma, erro, ms = None, 'Amortização mensal atual não definida; use reduzir_parcela', 0.0
+            item = {
+                'rotulo': rotulo,
+                'data': data_amort,
+                'valor': float(valor),
+                'tipo': tipo,
+                'ms_calculo': round(ms, 2),
+                'erro': erro,
+            }
+            relatorio.append(item)
+            if cronograma is None:
+                continue
+
+            anteriores = pendentes[:mantidas[indice]]
+            # Em centavos, como as parcelas seriam gravadas
+            total_juros = sum((p.valor_juros for p in anteriores), Decimal('0')) + sum(
+                (_centavos(juros) for juros in cronograma['valor_juros']), Decimal('0')
+            )
+            prazo = len(anteriores) + len(cronograma['numero_parcela'])
+            item.update({
+                'total_juros': float(round(total_juros, 2)),
+                'economia_juros': float(round(juros_atuais - total_juros, 2)),
+                'prazo_remanescente_meses': prazo,
+                'parcelas_eliminadas': len(pendentes) - prazo,
+                'valor_primeira_parcela': float(round(cronograma['valor_previsto_total'][0], 2)),
+                'data_ultima_parcela': cronograma['data_vencimento'][-1],
+                'curva': {
+                    'numero_parcela': [p.numero_parcela for p in anteriores] + cronograma['numero_parcela'],
+                    'data_vencimento': vencimentos[:len(anteriores)] + cronograma['data_vencimento'],
+                    'valor_previsto_total': [
+                        float(round(v, 2)) for v in
+                        [p.valor_previsto_total for p in anteriores] + cronograma['valor_previsto_total']
+                    ],
+                    'saldo_devedor_apos_pagamento': [
+                        float(round(max(v, Decimal('0')), 2)) for v in
+                        [p.saldo_devedor_apos_pagamento for p in anteriores] + cronograma['saldo_devedor_apos_pagamento']
+                    ],
+                },
+            })
 
-        db.session.flush()
+        return {
+            'financiamento_id': financiamento.id,
+            'saldo_devedor_atual': float(saldo_atual),
+            'atual': {
+                'total_juros': float(round(juros_atuais, 2)),
+                'prazo_remanescente_meses': len(pendentes),
+                'data_ultima_parcela': vencimentos[-1] if vencimentos else None,
+            },
+            'processos': processos,
+            'ms_calculo': round(ms_calculo, 2),
+            'ms_total': round((time.perf_counter() - inicio_total) * 1000, 2),
+            'cenarios': relatorio,
+        }
 
     # ========================================================================
     # RELATÓRIOS E DEMONSTRATIVOS
@@ -1546,6 +1724,8 @@ class FinanciamentoService:
         """
         Gera demonstrativo anual similar ao da CAIXA
 
+        Servido da ProjecaoFinanciamento (resumo por ano/mês pré-agregado, em cache).
+
         Args:
             financiamento_id (int): ID do financiamento
             ano (int): Ano
@@ -1553,45 +1733,11 @@ class FinanciamentoService:
         Returns:
             dict: Demonstrativo consolidado
         """
-        financiamento = Financiamento.query.get(financiamento_id)
-        if not financiamento:
+        projecao = ProjecaoFinanciamento.obter(financiamento_id)
+        if projecao is None:
             raise ValueError('Financiamento não encontrado')
 
-        data_inicio = date(ano, 1, 1)
-        data_fim = date(ano, 12, 31)
-
-        parcelas = FinanciamentoParcela.query.filter(
-            FinanciamentoParcela.financiamento_id == financiamento_id,
-            FinanciamentoParcela.data_vencimento >= data_inicio,
-            FinanciamentoParcela.data_vencimento <= data_fim
-        ).order_by(FinanciamentoParcela.data_vencimento).all()
-
-        # Agrupar por mês
-        resumo_mensal = {}
-        for parcela in parcelas:
-            mes = parcela.data_vencimento.month
-            if mes not in resumo_mensal:
-                resumo_mensal[mes] = {
-                    'amortizacao': Decimal('0'),
-                    'juros': Decimal('0'),
-                    'seguro': Decimal('0'),
-                    'taxa_adm': Decimal('0'),
-                    'total_previsto': Decimal('0'),
-                    'total_pago': Decimal('0')
-                }
-
-            resumo_mensal[mes]['amortizacao'] += parcela.valor_amortizacao
-            resumo_mensal[mes]['juros'] += parcela.valor_juros
-            resumo_mensal[mes]['seguro'] += parcela.valor_seguro
-            resumo_mensal[mes]['taxa_adm'] += parcela.valor_taxa_adm
-            resumo_mensal[mes]['total_previsto'] += parcela.valor_previsto_total
-            resumo_mensal[mes]['total_pago'] += parcela.valor_pago
-
-        return {
-            'financiamento': financiamento.to_dict(),
-            'ano': ano,
-            'resumo_mensal': {mes: {k: float(v) for k, v in dados.items()} for mes, dados in resumo_mensal.items()}
-        }
+        return projecao.demonstrativo(ano)
 
     @staticmethod
     def sincronizar_contas(financiamento_id):
@@ -1604,9 +1750,6 @@ class FinanciamentoService:
         Args:
             financiamento_id (int): ID do financiamento
         """
-        from datetime import datetime
-        from dateutil.relativedelta import relativedelta
-
         financiamento = Financiamento.query.get(financiamento_id)
         if not financiamento:
             raise ValueError('Financiamento não encontrado')
@@ -1615,67 +1758,65 @@ class FinanciamentoService:
             # Se não tem item_despesa vinculado, não criar contas
             return
 
-        # Buscar todas as parcelas
+        # Buscar todas as parcelas e as contas já vinculadas (uma consulta cada)
         parcelas = FinanciamentoParcela.query.filter_by(
             financiamento_id=financiamento_id
         ).order_by(FinanciamentoParcela.numero_parcela).all()
 
+        contas = {
+            conta.financiamento_parcela_id: conta
+            for conta in Conta.query.filter(
+                Conta.financiamento_parcela_id.in_(
+                    select(FinanciamentoParcela.id).where(
+                        FinanciamentoParcela.financiamento_id == financiamento_id
+                    )
+                )
+            )
+        }
+
+        sem_conta = []
         for parcela in parcelas:
-            FinanciamentoService._criar_conta_da_parcela(financiamento, parcela)
-            continue
-            conta_existente = Conta.query.filter_by(financiamento_parcela_id=parcela.id).first()
-            if not conta_existente:
-                conta_existente = Conta.query.filter(
-                    Conta.item_despesa_id == financiamento.item_despesa_id,
-                    Conta.numero_parcela == parcela.numero_parcela,
-                    Conta.total_parcelas == financiamento.prazo_total_meses
-                ).first()
-
-            # Calcular mês de referência (mesma lógica do consórcio)
-            mes_referencia = parcela.data_vencimento.replace(day=1)
-
-            if conta_existente:
-                # Atualizar conta existente
-                conta_existente.valor = parcela.valor_previsto_total
-                conta_existente.data_vencimento = parcela.data_vencimento
-                conta_existente.mes_referencia = mes_referencia
-                conta_existente.financiamento_parcela_id = parcela.id
-                parcela.conta_id = conta_existente.id
-
-                # Sincronizar status de pagamento
-                if parcela.status == 'pago' and not conta_existente.data_pagamento:
-                    conta_existente.status_pagamento = 'Pago'
-                    conta_existente.data_pagamento = parcela.data_vencimento
-                elif parcela.status == 'pendente':
-                    conta_existente.status_pagamento = 'Pendente'
-                    conta_existente.data_pagamento = None
+            conta = contas.get(parcela.id)
+            if conta is None:
+                sem_conta.append(parcela)
+                continue
+
+            conta.valor = parcela.valor_previsto_total
+            conta.data_vencimento = parcela.data_vencimento
+            conta.mes_referencia = parcela.data_vencimento.replace(day=1)
+            conta.numero_parcela = parcela.numero_parcela
+            conta.total_parcelas = financiamento.prazo_total_meses
+
+            if parcela.status == 'pago':
+                conta.status_pagamento = 'Pago'
+                conta.data_pagamento = parcela.data_vencimento
             else:
-                # Criar nova conta
-                nova_conta = Conta(
-                    item_despesa_id=financiamento.item_despesa_id,
-                    financiamento_parcela_id=parcela.id,
-                    mes_referencia=mes_referencia,
-                    descricao=f'{financiamento.nome} - Parcela {parcela.numero_parcela}/{financiamento.prazo_total_meses}',
-                    valor=parcela.valor_previsto_total,
-                    data_vencimento=parcela.data_vencimento,
-                    data_pagamento=parcela.data_vencimento if parcela.status == 'pago' else None,
-                    status_pagamento='Pago' if parcela.status == 'pago' else 'Pendente',
-                    numero_parcela=parcela.numero_parcela,
-                    total_parcelas=financiamento.prazo_total_meses,
-                    observacoes=f'Financiamento {financiamento.sistema_amortizacao} - ' +
-                               f'Amortização: R$ {float(parcela.valor_amortizacao):.2f}, ' +
-                               f'Juros: R$ {float(parcela.valor_juros):.2f}'
-                )
-                db.session.add(nova_conta)
-                db.session.flush()
-                parcela.conta_id = nova_conta.id
+                conta.status_pagamento = 'Pendente'
+                conta.data_pagamento = None
+
+            parcela.conta_id = conta.id
+
+        # Parcelas sem conta: criar todas em um INSERT
+        if sem_conta:
+            contas = FinanciamentoService._inserir_contas_parcelas(financiamento, [
+                {
+                    'id': parcela.id,
+                    'numero_parcela': parcela.numero_parcela,
+                    'data_vencimento': parcela.data_vencimento,
+                    'valor_previsto_total': parcela.valor_previsto_total,
+                    'status': parcela.status
+                }
+                for parcela in sem_conta
+            ])
+            for parcela in sem_conta:
+                parcela.conta_id = contas[parcela.id]
 
         db.session.commit()
 
     @staticmethod
     def get_evolucao_saldo(financiamento_id):
         """
-        Retorna evolução do saldo devedor
+        Retorna evolução do saldo devedor (da ProjecaoFinanciamento, em cache)
 
         Args:
             financiamento_id (int): ID do financiamento
@@ -1683,17 +1824,5 @@ class FinanciamentoService:
         Returns:
             dict: Evolução do saldo
         """
-        parcelas = FinanciamentoParcela.query.filter_by(
-            financiamento_id=financiamento_id
-        ).order_by(FinanciamentoParcela.numero_parcela).all()
-
-        evolucao = []
-        for parcela in parcelas:
-            evolucao.append({
-                'numero_parcela': parcela.numero_parcela,
-                'data_vencimento': parcela.data_vencimento.strftime('%Y-%m-%d'),
-                'saldo_devedor': float(parcela.saldo_devedor_apos_pagamento) if parcela.saldo_devedor_apos_pagamento else 0,
-                'status': parcela.status
-            })
-
-        return evolucao
+        projecao = ProjecaoFinanciamento.obter(financiamento_id)
+        return projecao.evolucao() if projecao is not None else []
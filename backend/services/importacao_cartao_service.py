@@ -20,18 +20,137 @@ REGRAS INVIOLÁVEIS:
 """
 
 import re
-import csv
+import hashlib
 import io
+import itertools
+import time
 import uuid
 from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func
+from sqlalchemy import and_, insert, or_
 
 try:
     from backend.models import db, ItemDespesa, LancamentoAgregado, ItemAgregado
+    from backend.services.fatura_cartao_service import FaturaCartaoService
+    from backend.services.resumo_competencia_service import ResumoCompetenciaService
+    from backend.services.upload_sessao_service import UploadSessaoService, _detectar_delimitador
 except ImportError:
     from models import db, ItemDespesa, LancamentoAgregado, ItemAgregado
+    from services.fatura_cartao_service import FaturaCartaoService
+    from services.resumo_competencia_service import ResumoCompetenciaService
+    from services.upload_sessao_service import UploadSessaoService, _detectar_delimitador
+
+
+# Colunas gravadas por lançamento importado (INSERT em lote)
+COLUNAS_LANCAMENTO = (
+    'descricao',
+    'descricao_original',
+    'descricao_original_normalizada',
+    'descricao_exibida',
+    'valor',
+    'data_compra',
+    'mes_fatura',
+    'numero_parcela',
+    'total_parcelas',
+    'cartao_id',
+    'categoria_id',
+    'item_agregado_id',
+    'compra_id',
+    'assinatura_compra',
+    'is_importado',
+    'origem_importacao',
+    'is_recorrente',
+    'item_despesa_id',
+)
+
+# Linhas por INSERT em lote (executemany; no PostgreSQL o SQLAlchemy agrupa em VALUES múltiplos)
+TAMANHO_LOTE_INSERCAO = 500
+
+# Valores por cláusula IN na verificação de duplicados
+TAMANHO_LOTE_CONSULTA = 500
+
+# Namespace do compra_id determinístico (UUID v5 da assinatura da compra)
+NAMESPACE_COMPRA = uuid.UUID('6f1c2b8e-4d0a-5c3e-9b7f-2a8d1e4c6b90')
+
+# Sufixo de parcelamento no fim da descrição: "N/T" ou "N DE T"
+# ("PARCELA N/T" e "PARC N/T" terminam em N/T e caem na mesma alternativa)
+PADRAO_PARCELA = re.compile(r'(\d{1,2})(?:/|\s+DE\s+)(\d{1,2})$', re.IGNORECASE)
+
+# Coluna de parcela mapeada explicitamente (ex: "1/12")
+PADRAO_PARCELA_MAPEADA = re.compile(r'(\d+)/(\d+)')
+
+# Formatos de data aceitos no CSV (mutuamente exclusivos: a ordem não altera o resultado)
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+# Posições (dia, mês, ano) e separadores da forma fixa (10 caracteres) de cada formato
+_FATIAS_DATA = {
+    '%Y-%m-%d': ((8, 10), (5, 7), (0, 4), ((4, '-'), (7, '-'))),
+    '%d/%m/%Y': ((0, 2), (3, 5), (6, 10), ((2, '/'), (5, '/'))),
+    '%d-%m-%Y': ((0, 2), (3, 5), (6, 10), ((2, '-'), (5, '-'))),
+}
+
+# Datas válidas observadas antes de fixar o formato do arquivo
+AMOSTRA_FORMATO_DATA = 20
+
+
+class DetectorFormatoData:
+    """
+    Fixa o formato de data do arquivo a partir das primeiras linhas válidas
+
+    Até AMOSTRA_FORMATO_DATA datas válidas, cada valor passa pela cascata de
+    FORMATOS_DATA; depois, o formato mais frequente é tentado primeiro, por
+    fatiamento direto da string (sem strptime). Valores fora da forma fixa
+    (ex: "5/9/2025") continuam aceitos pela cascata.
+    """
+
+    def __init__(self, formatos=FORMATOS_DATA, amostra=AMOSTRA_FORMATO_DATA):
+        self.formatos = formatos
+        self.amostra = amostra
+        self.formato = None
+        self.contagem = {}
+
+    def _fatiar(self, texto):
+        """Data na forma fixa do formato detectado (None se não se aplica)"""
+        (d0, d1), (m0, m1), (a0, a1), separadores = _FATIAS_DATA[self.formato]
+        if len(texto) != 10 or any(texto[i] != sep for i, sep in separadores):
+            return None
+        dia, mes, ano = texto[d0:d1], texto[m0:m1], texto[a0:a1]
+        if not (dia.isdecimal() and mes.isdecimal() and ano.isdecimal()):
+            return None
+        try:
+            return date(int(ano), int(mes), int(dia))
+        except ValueError:
+            return None
+
+    def converter(self, texto):
+        """
+        Converte o texto em date
+
+        Returns:
+            date | None: None se nenhum formato aceitar o valor
+        """
+        if not isinstance(texto, str):
+            return None
+
+        if self.formato in _FATIAS_DATA:
+            data = self._fatiar(texto)
+            if data is not None:
+                return data
+
+        for formato in self.formatos:
+            try:
+                data = datetime.strptime(texto, formato).date()
+            except ValueError:
+                continue
+
+            if self.formato is None:
+                self.contagem[formato] = self.contagem.get(formato, 0) + 1
+                if sum(self.contagem.values()) >= self.amostra:
+                    self.formato = max(self.contagem, key=self.contagem.get)
+            return data
+
+        return None
 
 
 class ImportacaoCartaoService:
@@ -48,7 +167,7 @@ class ImportacaoCartaoService:
         """
         Normaliza descrição e extrai informações de parcelamento
 
-        Formatos reconhecidos:
+        Formatos reconhecidos (PADRAO_PARCELA, pré-compilado):
         - NN/TT
         - N/T
         - NN DE TT
@@ -63,16 +182,9 @@ class ImportacaoCartaoService:
         """
         descricao = descricao_bruta.strip()
 
-        # Padrões de parcelamento (em ordem de especificidade)
-        padroes = [
-            r'(\d{1,2})/(\d{1,2})$',  # 12/12 ou 1/3
-            r'(\d{1,2})\s+DE\s+(\d{1,2})$',  # 12 DE 12 ou 1 DE 3
-            r'PARCELA\s+(\d{1,2})/(\d{1,2})$',  # PARCELA 1/12
-            r'PARC\s+(\d{1,2})/(\d{1,2})$',  # PARC 1/12
-        ]
-
-        for padrao in padroes:
-            match = re.search(padrao, descricao, re.IGNORECASE)
+        # Sufixo de parcelamento sempre termina em dígito
+        if descricao[-1:].isdigit():
+            match = PADRAO_PARCELA.search(descricao)
             if match:
                 numero_parcela = int(match.group(1))
                 total_parcelas = int(match.group(2))
@@ -96,20 +208,13 @@ class ImportacaoCartaoService:
         Returns:
             str: Delimitador detectado
         """
-        sniffer = csv.Sniffer()
-        amostra = '\n'.join(conteudo_csv.split('\n')[:5])  # Primeiras 5 linhas
-
-        try:
-            dialeto = sniffer.sniff(amostra, delimiters=';,\t')
-            return dialeto.delimiter
-        except:
-            # Fallback: ponto-e-vírgula (padrão brasileiro)
-            return ';'
+        # Mesma detecção do upload em streaming (primeiras 5 linhas)
+        return _detectar_delimitador('\n'.join(conteudo_csv.split('\n')[:5]))
 
     @staticmethod
     def ler_csv(arquivo_csv):
         """
-        Lê arquivo CSV e retorna cabeçalho + linhas
+        Lê cabeçalho + amostra do CSV em streaming (não carrega o arquivo inteiro)
 
         Args:
             arquivo_csv: FileStorage do Flask ou conteúdo string
@@ -117,25 +222,18 @@ class ImportacaoCartaoService:
         Returns:
             tuple: (delimitador, colunas, linhas_amostra)
         """
-        # Ler conteúdo
         if hasattr(arquivo_csv, 'read'):
-            conteudo = arquivo_csv.read().decode('utf-8', errors='ignore')
-            arquivo_csv.seek(0)  # Resetar para leitura posterior
+            origem = getattr(arquivo_csv, 'stream', arquivo_csv)
         else:
-            conteudo = arquivo_csv
+            origem = io.BytesIO(arquivo_csv.encode('utf-8'))
 
-        # Detectar delimitador
-        delimitador = ImportacaoCartaoService.detectar_delimitador(conteudo)
+        delimitador, leitor = UploadSessaoService.ler_csv(origem)
 
-        # Ler CSV
-        leitor = csv.reader(io.StringIO(conteudo), delimiter=delimitador)
-
-        linhas = list(leitor)
-        if not linhas:
+        colunas = next(leitor, None)
+        if colunas is None:
             raise ValueError("CSV vazio")
 
-        colunas = linhas[0]
-        linhas_amostra = linhas[1:6]  # Primeiras 5 linhas de dados
+        linhas_amostra = list(itertools.islice(leitor, 5))  # Primeiras 5 linhas de dados
 
         return delimitador, colunas, linhas_amostra
 
@@ -155,14 +253,71 @@ class ImportacaoCartaoService:
         Returns:
             ItemDespesa ou None: Despesa fixa encontrada, ou None
         """
-        despesa_fixa = ItemDespesa.query.filter(
+        item_despesa_id = ImportacaoCartaoService.carregar_despesas_fixas(cartao_id).get(
+            descricao_normalizada.lower()
+        )
+        return db.session.get(ItemDespesa, item_despesa_id) if item_despesa_id else None
+
+    @staticmethod
+    def carregar_despesas_fixas(cartao_id):
+        """
+        Carrega, em uma consulta, as despesas fixas do cartão indexadas pelo nome
+
+        Critério de reconhecimento de despesa fixa (reconhecer_despesa_fixa),
+        para consultar cada linha do CSV em memória.
+
+        Args:
+            cartao_id (int): ID do cartão
+
+        Returns:
+            dict: {nome em minúsculas: ItemDespesa.id}
+        """
+        despesas = db.session.query(ItemDespesa.id, ItemDespesa.nome).filter(
             ItemDespesa.recorrente == True,
             ItemDespesa.meio_pagamento == 'cartao',
             ItemDespesa.cartao_id == cartao_id,
-            func.lower(ItemDespesa.nome) == descricao_normalizada.lower()
-        ).first()
+        ).order_by(ItemDespesa.id).all()
 
-        return despesa_fixa
+        por_nome = {}
+        for item_despesa_id, nome in despesas:
+            por_nome.setdefault((nome or '').lower(), item_despesa_id)
+        return por_nome
+
+    # ========================================================================
+    # ASSINATURA DA COMPRA (IDEMPOTÊNCIA DA REIMPORTAÇÃO)
+    # ========================================================================
+
+    @staticmethod
+    def assinatura_compra(cartao_id, descricao_normalizada, data_primeira_parcela,
+                          valor_parcela, total_parcelas, ocorrencia=1):
+        """
+        Impressão digital determinística de uma compra importada
+
+        O mesmo extrato (ou o do mês seguinte, com a próxima parcela da mesma
+        compra) gera a mesma assinatura, e portanto as mesmas chaves.
+
+        Args:
+            cartao_id (int): ID do cartão
+            descricao_normalizada (str): Descrição sem parcelamento
+            data_primeira_parcela (date): Data da compra original (1ª parcela)
+            valor_parcela (Decimal): Valor da parcela
+            total_parcelas (int): Total de parcelas
+            ocorrencia (int): Ordem da compra entre compras idênticas do mesmo
+                arquivo (duas compras iguais no mesmo dia não se anulam)
+
+        Returns:
+            str: SHA-256 em hexadecimal (64 caracteres)
+        """
+        partes = [
+            str(cartao_id),
+            ' '.join((descricao_normalizada or '').upper().split()),
+            data_primeira_parcela.isoformat(),
+            str(Decimal(str(valor_parcela)).quantize(Decimal('0.01'))),
+            str(total_parcelas),
+        ]
+        if ocorrencia > 1:
+            partes.append(str(ocorrencia))
+        return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
 
     # ========================================================================
     # GERAÇÃO DE PARCELAS
@@ -181,7 +336,8 @@ class ImportacaoCartaoService:
         categoria_id,
         item_agregado_id,
         competencia_base,
-        compra_id=None
+        compra_id=None,
+        assinatura_compra=None
     ):
         """
         Gera todas as parcelas (passadas, atual, futuras) de uma compra
@@ -198,13 +354,17 @@ class ImportacaoCartaoService:
             categoria_id (int): Categoria da despesa
             item_agregado_id (int): Categoria do cartão (opcional)
             competencia_base (date): Competência escolhida pelo usuário (YYYY-MM-01)
-            compra_id (str): UUID da compra (se None, gera novo)
+            compra_id (str): UUID da compra (se None, derivado da assinatura ou novo)
+            assinatura_compra (str): Assinatura da compra (ver assinatura_compra)
 
         Returns:
             list: Lista de dicts representando parcelas
         """
         if not compra_id:
-            compra_id = str(uuid.uuid4())
+            if assinatura_compra:
+                compra_id = str(uuid.uuid5(NAMESPACE_COMPRA, assinatura_compra))
+            else:
+                compra_id = str(uuid.uuid4())
 
         parcelas = []
 
@@ -232,6 +392,7 @@ class ImportacaoCartaoService:
                 'categoria_id': categoria_id,
                 'item_agregado_id': item_agregado_id,
                 'compra_id': compra_id,
+                'assinatura_compra': assinatura_compra,
                 'is_importado': True,
                 'origem_importacao': 'csv'
             }
@@ -245,19 +406,70 @@ class ImportacaoCartaoService:
     # ========================================================================
 
     @staticmethod
-    def processar_linhas_mapeadas(linhas_mapeadas, cartao_id, competencia_alvo):
+    def mapear_linhas(linhas_csv, mapeamento, categoria_id, item_agregado_id=None, ajustes=None):
+        """
+        Converte linhas cruas do CSV em linhas mapeadas, sob demanda
+
+        Args:
+            linhas_csv (iterable): Linhas do CSV (listas de str), sem o cabeçalho
+            mapeamento (dict): {'data_compra', 'descricao', 'valor', 'parcela'} → índice da coluna
+            categoria_id (int): Categoria padrão das linhas
+            item_agregado_id (int): Categoria do cartão padrão (opcional)
+            ajustes (dict): {índice da linha: {'categoria_id', 'item_agregado_id', 'descricao_exibida'}}
+
+        Yields:
+            dict: Linha no formato aceito por processar_linhas_mapeadas
+        """
+        ajustes = {int(indice): ajuste for indice, ajuste in (ajustes or {}).items()}
+        colunas = {
+            campo: int(indice) for campo, indice in mapeamento.items()
+            if indice not in (None, '')
+        }
+
+        for indice, linha in enumerate(linhas_csv):
+            mapeada = {
+                campo: linha[coluna] if coluna < len(linha) else None
+                for campo, coluna in colunas.items()
+            }
+            mapeada.setdefault('parcela', '1/1')
+            mapeada['categoria_id'] = categoria_id
+            mapeada['item_agregado_id'] = item_agregado_id
+
+            ajuste = ajustes.get(indice)
+            if ajuste:
+                mapeada.update({
+                    campo: valor for campo, valor in ajuste.items()
+                    if campo in ('categoria_id', 'item_agregado_id', 'descricao_exibida')
+                })
+
+            yield mapeada
+
+    @staticmethod
+    def processar_linhas_mapeadas(linhas_mapeadas, cartao_id, competencia_alvo,
+                                  despesas_fixas=None, ocorrencias=None, detector_data=None):
         """
         Processa linhas já mapeadas e gera lançamentos
 
         Args:
-            linhas_mapeadas (list): Lista de dicts com campos mapeados
+            linhas_mapeadas (iterable): Dicts com campos mapeados (lista ou gerador)
             cartao_id (int): ID do cartão
             competencia_alvo (date): Mês de competência (YYYY-MM-01)
+            despesas_fixas (dict): Resultado de carregar_despesas_fixas (carregado se None)
+            ocorrencias (dict): Contador de compras idênticas, compartilhado
+                entre chamadas quando o arquivo é processado em blocos
+            detector_data (DetectorFormatoData): Formato de data do arquivo
+                (compartilhado entre blocos; novo se None)
 
         Returns:
             list: Lista de lançamentos prontos para persistência
         """
         lancamentos = []
+        if despesas_fixas is None:
+            despesas_fixas = ImportacaoCartaoService.carregar_despesas_fixas(cartao_id)
+        if ocorrencias is None:
+            ocorrencias = {}  # assinatura base → compras idênticas já vistas no arquivo
+        if detector_data is None:
+            detector_data = DetectorFormatoData()
 
         for linha in linhas_mapeadas:
             # Extrair campos
@@ -272,16 +484,8 @@ class ImportacaoCartaoService:
             if not all([data_compra_str, descricao_bruta, valor_str, categoria_id]):
                 continue  # Pular linha inválida
 
-            # Parsear data (tentar múltiplos formatos)
-            data_compra = None
-            formatos_data = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']
-
-            for formato in formatos_data:
-                try:
-                    data_compra = datetime.strptime(data_compra_str, formato).date()
-                    break
-                except (ValueError, TypeError):
-                    continue
+            # Parsear data (formato fixado pelas primeiras linhas do arquivo)
+            data_compra = detector_data.converter(data_compra_str)
 
             if not data_compra:
                 continue  # Data inválida - pular linha
@@ -297,15 +501,27 @@ class ImportacaoCartaoService:
 
             # Se parcela foi mapeada explicitamente no CSV, usar
             if parcela_str and parcela_str != '1/1':
-                match = re.match(r'(\d+)/(\d+)', parcela_str)
+                match = PADRAO_PARCELA_MAPEADA.match(parcela_str)
                 if match:
                     numero_parcela = int(match.group(1))
                     total_parcelas = int(match.group(2))
 
-            # Reconhecer despesa fixa
-            despesa_fixa = ImportacaoCartaoService.reconhecer_despesa_fixa(descricao_normalizada, cartao_id)
-            is_recorrente = despesa_fixa is not None
-            item_despesa_id = despesa_fixa.id if despesa_fixa else None
+            # Reconhecer despesa fixa (pré-carregadas por nome)
+            item_despesa_id = despesas_fixas.get(descricao_normalizada.lower())
+            is_recorrente = item_despesa_id is not None
+
+            # Assinatura: mesma compra → mesmas chaves em qualquer reimportação
+            data_primeira_parcela = data_compra - relativedelta(months=numero_parcela - 1)
+            assinatura_base = ImportacaoCartaoService.assinatura_compra(
+                cartao_id, descricao_normalizada, data_primeira_parcela, valor, total_parcelas
+            )
+            ocorrencias[assinatura_base] = ocorrencias.get(assinatura_base, 0) + 1
+            assinatura = assinatura_base
+            if ocorrencias[assinatura_base] > 1:
+                assinatura = ImportacaoCartaoService.assinatura_compra(
+                    cartao_id, descricao_normalizada, data_primeira_parcela, valor, total_parcelas,
+                    ocorrencia=ocorrencias[assinatura_base]
+                )
 
             # Gerar todas as parcelas (passadas, atual, futuras)
             parcelas = ImportacaoCartaoService.gerar_parcelas(
@@ -320,7 +536,8 @@ class ImportacaoCartaoService:
                 categoria_id=categoria_id,
                 item_agregado_id=item_agregado_id,
                 competencia_base=competencia_alvo,  # Usar competência escolhida pelo usuário
-                compra_id=None  # Será gerado automaticamente
+                compra_id=None,  # Derivado da assinatura
+                assinatura_compra=assinatura
             )
 
             # Adicionar flag de recorrência
@@ -332,58 +549,110 @@ class ImportacaoCartaoService:
 
         return lancamentos
 
+    @staticmethod
+    def chaves_existentes(lancamentos):
+        """
+        Busca, em consultas por conjunto, as chaves já gravadas que colidem
+        com os lançamentos informados
+
+        - (compra_id, numero_parcela): idempotência da importação (compra_id é
+          derivado da assinatura da compra, então cobre a reimportação)
+        - (item_despesa_id, mes_fatura) recorrentes: 1 lançamento da despesa
+          fixa por fatura (uq_lanc_recorrente_item_mes)
+
+        Returns:
+            tuple: (set de (compra_id, numero_parcela), set de (item_despesa_id, mes_fatura))
+        """
+        compras = set()
+        recorrentes = set()
+
+        compra_ids = sorted({lanc['compra_id'] for lanc in lancamentos if lanc.get('compra_id')})
+        itens = sorted({lanc['item_despesa_id'] for lanc in lancamentos
+                        if lanc.get('is_recorrente') and lanc.get('item_despesa_id')})
+        meses = sorted({lanc['mes_fatura'] for lanc in lancamentos if lanc.get('is_recorrente')})
+
+        for inicio in range(0, max(len(compra_ids), 1), TAMANHO_LOTE_CONSULTA):
+            lote_compras = compra_ids[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+            condicoes = []
+            if lote_compras:
+                condicoes.append(LancamentoAgregado.compra_id.in_(lote_compras))
+            if inicio == 0 and itens:
+                condicoes.append(and_(
+                    LancamentoAgregado.is_recorrente == True,
+                    LancamentoAgregado.item_despesa_id.in_(itens),
+                    LancamentoAgregado.mes_fatura.in_(meses),
+                ))
+            if not condicoes:
+                break
+
+            linhas = db.session.query(
+                LancamentoAgregado.compra_id,
+                LancamentoAgregado.numero_parcela,
+                LancamentoAgregado.is_recorrente,
+                LancamentoAgregado.item_despesa_id,
+                LancamentoAgregado.mes_fatura,
+            ).filter(or_(*condicoes)).all()
+
+            for compra_id, numero_parcela, is_recorrente, item_despesa_id, mes_fatura in linhas:
+                if compra_id:
+                    compras.add((compra_id, numero_parcela))
+                if is_recorrente and item_despesa_id:
+                    recorrentes.add((item_despesa_id, mes_fatura))
+
+        return compras, recorrentes
+
     @staticmethod
     def persistir_lancamentos(lancamentos):
         """
         Persiste lançamentos com garantia de idempotência
 
-        Idempotência: (compra_id + numero_parcela) é único
+        Idempotência: (compra_id + numero_parcela) é único. Duplicados (no
+        banco ou dentro do próprio arquivo) são verificados em memória contra
+        uma única busca por conjunto; os novos são gravados com INSERT em
+        lote (executemany) de TAMANHO_LOTE_INSERCAO linhas.
+
+        Se a fatura já tem o lançamento recorrente da despesa fixa, a linha é
+        gravada como compra comum (is_recorrente=False), mantendo o vínculo
+        item_despesa_id.
+
+        O executado das faturas e o consumo por categoria acompanham o INSERT
+        em lote (delta); planejado/estouro das faturas existentes dos meses
+        importados são recalculados uma única vez, no commit.
 
         Args:
             lancamentos (list): Lista de dicts de lançamentos
 
         Returns:
-            dict: {'inseridos': int, 'duplicados': int, 'erros': []}
+            dict: {'inseridos': int, 'duplicados': int, 'erros': [],
+                   'lotes': [{'linhas': int, 'ms': float}]}
         """
-        inseridos = 0
         duplicados = 0
         erros = []
+        novos = []
+
+        compras_vistas, recorrentes_vistos = ImportacaoCartaoService.chaves_existentes(lancamentos)
 
         for lanc in lancamentos:
             try:
                 # Verificar se já existe (idempotência)
-                existe = LancamentoAgregado.query.filter_by(
-                    compra_id=lanc['compra_id'],
-                    numero_parcela=lanc['numero_parcela']
-                ).first()
+                chave_compra = (lanc['compra_id'], lanc['numero_parcela'])
+                chave_recorrente = (lanc.get('item_despesa_id'), lanc['mes_fatura'])
+                is_recorrente = bool(lanc.get('is_recorrente', False))
 
-                if existe:
+                if chave_compra in compras_vistas:
                     duplicados += 1
                     continue  # Pular duplicado
 
-                # Criar novo lançamento
-                novo_lanc = LancamentoAgregado(
-                    descricao=lanc['descricao'],
-                    descricao_original=lanc['descricao_original'],
-                    descricao_original_normalizada=lanc['descricao_original_normalizada'],
-                    descricao_exibida=lanc['descricao_exibida'],
-                    valor=lanc['valor'],
-                    data_compra=lanc['data_compra'],
-                    mes_fatura=lanc['mes_fatura'],
-                    numero_parcela=lanc['numero_parcela'],
-                    total_parcelas=lanc['total_parcelas'],
-                    cartao_id=lanc['cartao_id'],
-                    categoria_id=lanc['categoria_id'],
-                    item_agregado_id=lanc.get('item_agregado_id'),
-                    compra_id=lanc['compra_id'],
-                    is_importado=lanc['is_importado'],
-                    origem_importacao=lanc['origem_importacao'],
-                    is_recorrente=lanc.get('is_recorrente', False),
-                    item_despesa_id=lanc.get('item_despesa_id')
-                )
+                if is_recorrente and chave_recorrente in recorrentes_vistos:
+                    is_recorrente = False  # Recorrente da fatura já existe
+
+                linha = {coluna: lanc.get(coluna) for coluna in COLUNAS_LANCAMENTO}
+                linha['is_recorrente'] = is_recorrente
 
-                db.session.add(novo_lanc)
-                inseridos += 1
+                compras_vistas.add(chave_compra)
+                if is_recorrente:
+                    recorrentes_vistos.add(chave_recorrente)
+                novos.append(linha)
 
             except Exception as e:
                 erros.append({
@@ -391,15 +660,30 @@ class ImportacaoCartaoService:
                     'erro': str(e)
                 })
 
-        # Commit atômico
+        # INSERT em lote + commit atômico
+        lotes = []
         try:
+            if novos:
+                ResumoCompetenciaService.marcar_meses({linha['mes_fatura'] for linha in novos})
+                FaturaCartaoService.agendar(
+                    {(linha['cartao_id'], linha['mes_fatura']) for linha in novos}, criar=False
+                )
+            for inicio in range(0, len(novos), TAMANHO_LOTE_INSERCAO):
+                lote = novos[inicio:inicio + TAMANHO_LOTE_INSERCAO]
+                t0 = time.perf_counter()
+                db.session.execute(
+                    insert(LancamentoAgregado).execution_options(resumo_competencia_marcado=True),
+                    lote
+                )
+                lotes.append({'linhas': len(lote), 'ms': round((time.perf_counter() - t0) * 1000, 2)})
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Erro ao persistir: {str(e)}")
 
         return {
-            'inseridos': inseridos,
+            'inseridos': len(novos),
             'duplicados': duplicados,
-            'erros': erros
+            'erros': erros,
+            'lotes': lotes
         }
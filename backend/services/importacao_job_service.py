@@ -0,0 +1,236 @@
+"""
+Serviço de Jobs de Importação - Importação de fatura fora da requisição HTTP
+
+Arquivos grandes (exportações de vários anos, vários cartões) estouravam o
+timeout do worker e seguravam o lock de escrita do SQLite durante toda a
+requisição. No modo job, /processar apenas enfileira e devolve o job_id; uma
+thread de fundo executa o pipeline em blocos de TAMANHO_BLOCO_JOB linhas,
+com um commit por bloco, e /jobs/<id> consulta o progresso.
+
+Observações:
+- O estado dos jobs fica em arquivos JSON em JOB_DIR (dentro do diretório
+  das sessões de upload, compartilhado entre os workers do servidor):
+  /jobs/<id> responde em qualquer worker
+- Um escritor por vez: o SQLite aceita um escritor, então cada job executa
+  sob uma trava de arquivo (JOB_TRAVA) comum a todos os processos; jobs
+  simultâneos, do mesmo worker ou de workers diferentes, rodam em fila
+- O arquivo do upload é aberto ao enfileirar (UploadSessaoService.linhas):
+  um job ainda na fila quando o TTL da sessão vence continua lendo o arquivo
+- Um job interrompido por restart fica no último estado gravado
+- Um job com erro mantém os blocos já commitados; reimportar o mesmo arquivo
+  é seguro (idempotência pela assinatura da compra)
+"""
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from backend.models import db
+    from backend.services.importacao_cartao_service import ImportacaoCartaoService, DetectorFormatoData
+    from backend.services.upload_sessao_service import UploadSessaoService, UPLOAD_SESSAO_DIR
+except ImportError:
+    from models import db
+    from services.importacao_cartao_service import ImportacaoCartaoService, DetectorFormatoData
+    from services.upload_sessao_service import UploadSessaoService, UPLOAD_SESSAO_DIR
+
+# Linhas do CSV processadas (e commitadas) por bloco
+TAMANHO_BLOCO_JOB = 2000
+
+# Threads de importação por processo (a trava de arquivo serializa entre processos)
+IMPORTACAO_JOB_WORKERS = 1
+
+# Tempo que um job finalizado continua consultável
+JOB_RETENCAO_MINUTOS = 60
+
+# Estado dos jobs (um JSON por job) e trava do escritor, visíveis a todos os workers
+JOB_DIR = os.path.join(UPLOAD_SESSAO_DIR, 'jobs')
+JOB_TRAVA = os.path.join(JOB_DIR, 'escritor.lock')
+
+_executor = ThreadPoolExecutor(max_workers=IMPORTACAO_JOB_WORKERS, thread_name_prefix='importacao')
+_lock = threading.Lock()
+
+
+def _caminho_job(job_id):
+    return os.path.join(JOB_DIR, job_id + '.json')
+
+
+def _gravar_job(job):
+    """Grava o estado do job (substituição atômica: leitores nunca veem meio arquivo)"""
+    caminho = _caminho_job(job['job_id'])
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as saida:
+        json.dump(job, saida)
+    os.replace(temporario, caminho)
+
+
+def _ler_job(job_id):
+    try:
+        with open(_caminho_job(job_id), encoding='utf-8') as entrada:
+            return json.load(entrada)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _trava_escritor():
+    """Trava exclusiva de JOB_TRAVA (liberada também se o processo morrer)"""
+    with open(JOB_TRAVA, 'a+b') as arquivo:
+        if fcntl:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    arquivo.seek(0)
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK desiste após ~10s; continuar esperando
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ImportacaoJobService:
+    """
+    Fila de jobs de importação de fatura de cartão
+    """
+
+    @staticmethod
+    def iniciar(app, cartao_id, competencia, linhas, upload_id=None):
+        """
+        Enfileira uma importação
+
+        Args:
+            app: Aplicação Flask (o job roda em app_context próprio)
+            cartao_id (int): ID do cartão
+            competencia (date): Competência alvo (YYYY-MM-01)
+            linhas (iterable): Linhas mapeadas (lista ou gerador preguiçoso)
+            upload_id (str): Sessão de upload a remover ao concluir (opcional)
+
+        Returns:
+            dict: Estado inicial do job
+        """
+        ImportacaoJobService.limpar_finalizados()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'pendente',
+            'cartao_id': cartao_id,
+            'competencia': competencia.isoformat(),
+            'linhas_lidas': 0,
+            'linhas_invalidas': 0,
+            'inseridos': 0,
+            'duplicados': 0,
+            'erros': 0,
+            'blocos': 0,
+            'linhas_por_segundo': 0.0,
+            'criado_em': time.time(),
+            'iniciado_em': None,
+            'concluido_em': None,
+            'mensagem': None,
+        }
+        os.makedirs(JOB_DIR, exist_ok=True)
+        _gravar_job(job)
+
+        _executor.submit(ImportacaoJobService._executar, app, job_id, cartao_id, competencia, linhas, upload_id)
+        return ImportacaoJobService.obter(job_id)
+
+    @staticmethod
+    def obter(job_id):
+        """Estado do job, gravado por qualquer worker (None se inexistente)"""
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id) or len(job_id) != 32:
+            return None
+        return _ler_job(job_id)
+
+    @staticmethod
+    def limpar_finalizados():
+        """Descarta jobs finalizados há mais de JOB_RETENCAO_MINUTOS"""
+        if not os.path.isdir(JOB_DIR):
+            return
+        limite = time.time() - JOB_RETENCAO_MINUTOS * 60
+        for nome in os.listdir(JOB_DIR):
+            if not nome.endswith('.json'):
+                continue
+            job = _ler_job(nome[:-len('.json')])
+            if job is not None and job['concluido_em'] is not None and job['concluido_em'] < limite:
+                try:
+                    os.remove(os.path.join(JOB_DIR, nome))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _atualizar(job_id, **campos):
+        # Só a thread que executa o job grava o arquivo dele
+        with _lock:
+            job = _ler_job(job_id)
+            job.update(campos)
+            if job['iniciado_em'] is not None:
+                decorrido = (job['concluido_em'] or time.time()) - job['iniciado_em']
+                if decorrido > 0:
+                    job['linhas_por_segundo'] = round(job['linhas_lidas'] / decorrido, 1)
+            _gravar_job(job)
+
+    @staticmethod
+    def _executar(app, job_id, cartao_id, competencia, linhas, upload_id):
+        """Executa o pipeline em blocos, com commit por bloco (um job por vez entre processos)"""
+        with _trava_escritor(), app.app_context():
+            ImportacaoJobService._atualizar(job_id, status='executando', iniciado_em=time.time())
+            try:
+                despesas_fixas = ImportacaoCartaoService.carregar_despesas_fixas(cartao_id)
+                ocorrencias = {}  # Compartilhado entre blocos (compras idênticas no arquivo)
+                detector_data = DetectorFormatoData()  # Formato de data fixado uma vez por arquivo
+                totais = {'linhas_lidas': 0, 'linhas_invalidas': 0, 'inseridos': 0,
+                          'duplicados': 0, 'erros': 0, 'blocos': 0}
+
+                iterador = iter(linhas)
+                while True:
+                    bloco = list(itertools.islice(iterador, TAMANHO_BLOCO_JOB))
+                    if not bloco:
+                        break
+
+                    lancamentos = ImportacaoCartaoService.processar_linhas_mapeadas(
+                        bloco, cartao_id, competencia,
+                        despesas_fixas=despesas_fixas, ocorrencias=ocorrencias,
+                        detector_data=detector_data
+                    )
+                    # Cada linha válida gera uma assinatura de compra distinta
+                    validas = len({lanc['assinatura_compra'] for lanc in lancamentos})
+                    resultado = ImportacaoCartaoService.persistir_lancamentos(lancamentos)
+
+                    totais['linhas_lidas'] += len(bloco)
+                    totais['linhas_invalidas'] += len(bloco) - validas
+                    totais['inseridos'] += resultado['inseridos']
+                    totais['duplicados'] += resultado['duplicados']
+                    totais['erros'] += len(resultado['erros'])
+                    totais['blocos'] += 1
+                    ImportacaoJobService._atualizar(job_id, **totais)
+
+                if upload_id:
+                    UploadSessaoService.remover(upload_id)
+
+                ImportacaoJobService._atualizar(job_id, status='concluido', concluido_em=time.time())
+
+            except Exception as e:
+                db.session.rollback()
+                ImportacaoJobService._atualizar(
+                    job_id, status='erro', mensagem=str(e), concluido_em=time.time()
+                )
+            finally:
+                db.session.remove()
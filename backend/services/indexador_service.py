@@ -0,0 +1,127 @@
+"""
+Serviço de Indexadores - Cache das séries mensais (TR, IPCA, etc.)
+
+Cálculos de financiamento consultavam IndexadorMensal mês a mês (uma
+consulta por parcela por contrato). A SerieIndexador carrega a série inteira
+de um indexador em uma consulta e a guarda em cache no processo, como um
+array indexado pelo mês; a busca de um mês é aritmética de índice.
+
+Invalidação:
+- Rotas de indexadores (criar/atualizar/deletar) invalidam explicitamente
+- Eventos da sessão registram os indexadores tocados por escritas em
+  IndexadorMensal; a série deles é descartada no flush e novamente no
+  commit (uma recarga entre o flush e o commit leria a série antiga)
+- Escritas em lote em IndexadorMensal descartam o cache inteiro
+- Rollback descarta as séries com escritas descartadas
+- INDEXADOR_SERIE_TTL_SEGUNDOS limita a defasagem entre processos (workers)
+"""
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+try:
+    from backend.models import db, IndexadorMensal
+    from backend.utils.sessao_orm import CacheTTL, InvalidacaoCache, valor_e_anterior
+except ImportError:
+    from models import db, IndexadorMensal
+    from utils.sessao_orm import CacheTTL, InvalidacaoCache, valor_e_anterior
+
+
+# Validade de uma série em cache (outros processos não invalidam este)
+INDEXADOR_SERIE_TTL_SEGUNDOS = 300
+
+
+class SerieIndexador:
+    """
+    Série mensal de um indexador, em um array compacto indexado pelo mês
+
+    valores[i] é o percentual do mês inicio + i (None se não cadastrado).
+    """
+
+    _cache = CacheTTL(INDEXADOR_SERIE_TTL_SEGUNDOS)
+
+    def __init__(self, nome, pontos):
+        """
+        Args:
+            nome (str): Nome do indexador
+            pontos (list[tuple[date, Decimal]]): (data_referencia, valor) de cada mês
+        """
+        self.nome = nome
+        self.inicio = None
+        self.valores = []
+
+        pontos = sorted(pontos)
+        if not pontos:
+            return
+
+        self.inicio = pontos[0][0].replace(day=1)
+        self.valores = [None] * (self._posicao(pontos[-1][0]) + 1)
+        for data_referencia, valor in pontos:
+            self.valores[self._posicao(data_referencia)] = valor
+
+    def _posicao(self, data):
+        return (data.year - self.inicio.year) * 12 + (data.month - self.inicio.month)
+
+    def get(self, mes, padrao=None):
+        """
+        Percentual do indexador no mês de uma data (mesma interface de dict.get)
+
+        Args:
+            mes (date): Qualquer dia do mês
+            padrao: Retorno quando o mês não está cadastrado
+        """
+        if self.inicio is None:
+            return padrao
+        posicao = self._posicao(mes)
+        if posicao < 0 or posicao >= len(self.valores):
+            return padrao
+        valor = self.valores[posicao]
+        return padrao if valor is None else valor
+
+    def percentual(self, mes):
+        """Percentual do mês (0 se não cadastrado)"""
+        return self.get(mes, Decimal('0'))
+
+    def como_dict(self):
+        """{primeiro dia do mês: percentual} dos meses cadastrados (serializável entre processos)"""
+        if self.inicio is None:
+            return {}
+        return {
+            self.inicio + relativedelta(months=posicao): valor
+            for posicao, valor in enumerate(self.valores) if valor is not None
+        }
+
+    @staticmethod
+    def do_indexador(nome):
+        """Retorna a série do indexador (do cache ou carregada em uma consulta)"""
+        serie = SerieIndexador._cache.obter(nome)
+        if serie is not None:
+            return serie
+
+        return SerieIndexador._cache.guardar(nome, SerieIndexador(nome, db.session.query(
+            IndexadorMensal.data_referencia, IndexadorMensal.valor
+        ).filter(
+            IndexadorMensal.nome == nome
+        ).all()))
+
+    @staticmethod
+    def invalidar(nome=None):
+        """Descarta a série de um indexador (ou de todos, se None)"""
+        if nome is None:
+            SerieIndexador._cache.clear()
+        else:
+            SerieIndexador._cache.pop(nome, None)
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que invalidam o cache.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        _invalidacao.registrar(db.session)
+
+
+_invalidacao = InvalidacaoCache(
+    'serie_indexador', (IndexadorMensal,), lambda indexador: valor_e_anterior(indexador, 'nome'),
+    SerieIndexador.invalidar, por_chave=True
+)
@@ -0,0 +1,220 @@
+"""
+Serviço de Vigências de Orçamento - Orçamento vigente por categoria do cartão
+
+"Qual o orçamento ativo do item X no mês M" era uma consulta de faixa sobre
+vigencia_inicio/vigencia_fim por item e por mês (planejado da fatura,
+alertas locais e globais). A OrcamentoTimeline carrega as vigências ativas
+de todas as categorias de um cartão em uma consulta e as mantém em cache no
+processo; a resolução é uma busca binária sobre vigencia_inicio.
+
+Regra de resolução: entre os orçamentos ativos com vigencia_inicio <= mês e
+vigencia_fim nula ou >= mês, vale o de maior vigencia_inicio (empate: maior id).
+
+Invalidação:
+- Eventos da sessão registram os cartões tocados por escritas em
+  OrcamentoAgregado; o cache deles é descartado no flush e novamente no commit
+- Alterações em ItemAgregado e escritas em lote invalidam tudo
+- Rollback descarta o cache dos cartões com escritas descartadas
+- ORCAMENTO_TIMELINE_TTL_SEGUNDOS limita a defasagem entre processos (workers)
+"""
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from decimal import Decimal
+
+try:
+    from backend.models import db, ItemAgregado, OrcamentoAgregado
+    from backend.utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache, valor_e_anterior
+except ImportError:
+    from models import db, ItemAgregado, OrcamentoAgregado
+    from utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache, valor_e_anterior
+
+
+# Validade de uma linha do tempo em cache (outros processos não invalidam este)
+ORCAMENTO_TIMELINE_TTL_SEGUNDOS = 300
+
+# Retrato imutável de um orçamento (seguro para guardar em cache entre sessões)
+OrcamentoVigente = namedtuple(
+    'OrcamentoVigente',
+    'id item_agregado_id vigencia_inicio vigencia_fim valor_teto'
+)
+
+
+class OrcamentoTimeline:
+    """
+    Vigências de orçamento das categorias (ItemAgregado) de um cartão
+
+    Carregada uma vez por cartão (uma consulta) e mantida em cache no processo.
+    """
+
+    _cache = CacheTTL(ORCAMENTO_TIMELINE_TTL_SEGUNDOS)
+    _cartao_do_item = {}
+
+    def __init__(self, cartao_id, itens, orcamentos):
+        """
+        Args:
+            cartao_id (int): ID do cartão
+            itens (iterable[int]): IDs de todas as categorias do cartão
+            orcamentos (list[OrcamentoVigente]): Orçamentos ativos (qualquer ordem)
+        """
+        self.cartao_id = cartao_id
+        self.itens = sorted(set(itens))
+        self._por_item = {item_id: [] for item_id in self.itens}
+        for orcamento in sorted(orcamentos, key=lambda o: (o.vigencia_inicio, o.id)):
+            self._por_item.setdefault(orcamento.item_agregado_id, []).append(orcamento)
+        self._inicios = {
+            item_id: [o.vigencia_inicio for o in lista] for item_id, lista in self._por_item.items()
+        }
+
+    def vigente(self, item_agregado_id, mes):
+        """
+        Orçamento vigente do item no mês
+
+        Args:
+            item_agregado_id (int): ID do ItemAgregado
+            mes (date): Primeiro dia do mês
+
+        Returns:
+            OrcamentoVigente ou None
+        """
+        orcamentos = self._por_item.get(item_agregado_id)
+        if not orcamentos:
+            return None
+        for i in range(bisect_right(self._inicios[item_agregado_id], mes) - 1, -1, -1):
+            orcamento = orcamentos[i]
+            if orcamento.vigencia_fim is None or orcamento.vigencia_fim >= mes:
+                return orcamento
+        return None
+
+    def total(self, mes):
+        """Soma dos orçamentos vigentes no mês de todas as categorias do cartão (Decimal)"""
+        total = Decimal('0')
+        for item_id in self.itens:
+            orcamento = self.vigente(item_id, mes)
+            if orcamento:
+                total += orcamento.valor_teto
+        return total
+
+    @staticmethod
+    def do_cartao(cartao_id):
+        """Retorna a linha do tempo do cartão (do cache ou carregada em uma consulta)"""
+        return OrcamentoTimeline.dos_cartoes([cartao_id])[cartao_id]
+
+    @staticmethod
+    def dos_cartoes(cartao_ids):
+        """
+        Linhas do tempo de vários cartões (os ausentes do cache em uma única consulta)
+
+        Returns:
+            dict: {cartao_id: OrcamentoTimeline}
+        """
+        cartao_ids = set(cartao_ids)
+        agora = time.monotonic()
+        validas = {}
+        for cartao_id in cartao_ids:
+            timeline = OrcamentoTimeline._cache.obter(cartao_id, agora)
+            if timeline is not None:
+                validas[cartao_id] = timeline
+
+        faltantes = cartao_ids - set(validas)
+        if faltantes:
+            itens = {cartao_id: [] for cartao_id in faltantes}
+            orcamentos = {cartao_id: [] for cartao_id in faltantes}
+            for item_id, cartao_id, orcamento_id, inicio, fim, valor_teto in db.session.query(
+                ItemAgregado.id,
+                ItemAgregado.item_despesa_id,
+                OrcamentoAgregado.id,
+                OrcamentoAgregado.vigencia_inicio,
+                OrcamentoAgregado.vigencia_fim,
+                OrcamentoAgregado.valor_teto
+            ).outerjoin(
+                OrcamentoAgregado,
+                (OrcamentoAgregado.item_agregado_id == ItemAgregado.id) & (OrcamentoAgregado.ativo == True)
+            ).filter(
+                ItemAgregado.item_despesa_id.in_(faltantes)
+            ).all():
+                itens[cartao_id].append(item_id)
+                if orcamento_id is not None:
+                    orcamentos[cartao_id].append(
+                        OrcamentoVigente(orcamento_id, item_id, inicio, fim, valor_teto)
+                    )
+
+            for cartao_id in faltantes:
+                timeline = OrcamentoTimeline(cartao_id, itens[cartao_id], orcamentos[cartao_id])
+                OrcamentoTimeline._cache.guardar(cartao_id, timeline)
+                validas[cartao_id] = timeline
+                for item_id in timeline.itens:
+                    OrcamentoTimeline._cartao_do_item[item_id] = cartao_id
+
+        return validas
+
+    @staticmethod
+    def resolver(pares):
+        """
+        Resolve o orçamento vigente de vários (item, mês) de uma vez
+
+        Usado por projeções e alertas: no máximo duas consultas (itens ainda
+        não vistos e vigências dos cartões fora do cache), nenhuma se o
+        cache estiver quente.
+
+        Args:
+            pares (iterable[tuple[int, date]]): (item_agregado_id, mês)
+
+        Returns:
+            dict: {(item_agregado_id, mês): OrcamentoVigente ou None}
+        """
+        pares = [(item_id, mes.replace(day=1)) for item_id, mes in pares]
+
+        desconhecidos = {item_id for item_id, _ in pares} - set(OrcamentoTimeline._cartao_do_item)
+        if desconhecidos:
+            for item_id, cartao_id in db.session.query(
+                ItemAgregado.id, ItemAgregado.item_despesa_id
+            ).filter(ItemAgregado.id.in_(desconhecidos)).all():
+                OrcamentoTimeline._cartao_do_item[item_id] = cartao_id
+
+        cartao_do_item = OrcamentoTimeline._cartao_do_item
+        timelines = OrcamentoTimeline.dos_cartoes({
+            cartao_do_item[item_id] for item_id, _ in pares if item_id in cartao_do_item
+        })
+
+        resultado = {}
+        for item_id, mes in pares:
+            timeline = timelines.get(cartao_do_item.get(item_id))
+            resultado[(item_id, mes)] = timeline.vigente(item_id, mes) if timeline else None
+        return resultado
+
+    @staticmethod
+    def invalidar(cartao_id=None):
+        """Descarta a linha do tempo de um cartão (ou de todos, se None)"""
+        if cartao_id is None:
+            OrcamentoTimeline._cache.clear()
+            OrcamentoTimeline._cartao_do_item.clear()
+        else:
+            OrcamentoTimeline._cache.pop(cartao_id, None)
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que invalidam o cache em qualquer escrita de orçamento.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        _invalidacao.registrar(db.session)
+
+
+def _cartoes_afetados(obj):
+    if isinstance(obj, ItemAgregado):
+        return INVALIDAR_TUDO  # Categoria criada/movida/removida: mapa item → cartão muda
+    cartoes = set()
+    for item_id in valor_e_anterior(obj, 'item_agregado_id'):
+        cartao_id = OrcamentoTimeline._cartao_do_item.get(item_id)
+        if cartao_id is None:
+            return INVALIDAR_TUDO  # Item fora do cache (ou ligado só pelo relacionamento)
+        cartoes.add(cartao_id)
+    return cartoes
+
+
+_invalidacao = InvalidacaoCache(
+    'orcamento_timeline', (OrcamentoAgregado, ItemAgregado), _cartoes_afetados,
+    OrcamentoTimeline.invalidar, por_chave=True
+)
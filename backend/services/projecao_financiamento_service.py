@@ -0,0 +1,259 @@
+"""
+Serviço de Projeção de Financiamentos - Parcelas em colunas, com cache e ETag
+
+buscar_financiamento, o demonstrativo anual e a evolução do saldo carregavam
+todos os FinanciamentoParcela como objetos ORM (mais consultas count()) e
+montavam os dicts a cada requisição. A ProjecaoFinanciamento carrega as
+parcelas em uma consulta de colunas, já no formato de FinanciamentoParcela.to_dict(),
+pré-agrega o demonstrativo por ano/mês e fica em cache no processo por
+financiamento. As rotas servem fatias dela (parcelas paginadas, um ano,
+a evolução do saldo).
+
+etag: hash do conteúdo (parcelas, contrato, vigências de seguro e
+amortizações extras). Igual entre processos para os mesmos dados; com
+If-None-Match a rota responde 304 sem serializar nada.
+
+Invalidação:
+- Eventos da sessão registram os financiamentos tocados por escritas em
+  Financiamento, FinanciamentoParcela, FinanciamentoSeguroVigencia e
+  FinanciamentoAmortizacaoExtra; o cache deles é descartado no flush e
+  novamente no commit
+- Escritas em lote nesses modelos descartam o cache inteiro
+- Rollback descarta o cache dos financiamentos com escritas descartadas
+- PROJECAO_FINANCIAMENTO_TTL_SEGUNDOS limita a defasagem entre processos (workers)
+"""
+import hashlib
+from decimal import Decimal
+
+from sqlalchemy import select
+
+try:
+    from backend.models import (db, Financiamento, FinanciamentoParcela,
+                                FinanciamentoSeguroVigencia, FinanciamentoAmortizacaoExtra)
+    from backend.utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache
+except ImportError:
+    from models import (db, Financiamento, FinanciamentoParcela,
+                        FinanciamentoSeguroVigencia, FinanciamentoAmortizacaoExtra)
+    from utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache
+
+
+# Validade de uma entrada do cache (outros processos não invalidam este)
+PROJECAO_FINANCIAMENTO_TTL_SEGUNDOS = 300
+
+# Colunas da projeção (mesmas chaves de FinanciamentoParcela.to_dict)
+COLUNAS_PROJECAO = (
+    'id',
+    'financiamento_id',
+    'numero_parcela',
+    'data_vencimento',
+    'valor_amortizacao',
+    'valor_juros',
+    'valor_seguro',
+    'valor_taxa_adm',
+    'valor_subsidio',
+    'valor_fgts_utilizado',
+    'valor_juros_mora',
+    'valor_multa',
+    'valor_atualizacao_monetaria',
+    'valor_iof_complementar',
+    'valor_previsto_total',
+    'valor_pago',
+    'dif_apurada',
+    'saldo_devedor_apos_pagamento',
+    'status',
+)
+
+# Demonstrativo anual: chave do resumo mensal → coluna somada
+CAMPOS_DEMONSTRATIVO = (
+    ('amortizacao', 'valor_amortizacao'),
+    ('juros', 'valor_juros'),
+    ('seguro', 'valor_seguro'),
+    ('taxa_adm', 'valor_taxa_adm'),
+    ('total_previsto', 'valor_previsto_total'),
+    ('total_pago', 'valor_pago'),
+)
+
+# Modelo → atributo com o id do financiamento afetado
+CAMPOS_FINANCIAMENTO = {
+    Financiamento: 'id',
+    FinanciamentoParcela: 'financiamento_id',
+    FinanciamentoSeguroVigencia: 'financiamento_id',
+    FinanciamentoAmortizacaoExtra: 'financiamento_id',
+}
+
+
+class ProjecaoFinanciamento:
+    """
+    Parcelas de um financiamento em colunas, prontas para servir
+    """
+
+    _cache = CacheTTL(PROJECAO_FINANCIAMENTO_TTL_SEGUNDOS)
+
+    def __init__(self, financiamento_id, contrato, colunas, resumo_anual, etag):
+        """
+        Args:
+            financiamento_id (int): ID do financiamento
+            contrato (dict): Financiamento.to_dict()
+            colunas (dict): {coluna de COLUNAS_PROJECAO: list} em ordem de numero_parcela
+            resumo_anual (dict): {ano: {mês: {chave de CAMPOS_DEMONSTRATIVO: float}}}
+            etag (str): Hash do conteúdo
+        """
+        self.financiamento_id = financiamento_id
+        self.contrato = contrato
+        self.colunas = colunas
+        self.resumo_anual = resumo_anual
+        self.etag = etag
+        self.total_parcelas = len(colunas['id'])
+        self.parcelas_pagas = colunas['status'].count('pago')
+
+    def parcelas(self, offset=0, limit=None):
+        """Fatia das parcelas (dicts no formato de FinanciamentoParcela.to_dict)"""
+        fim = None if limit is None else offset + limit
+        return [
+            dict(zip(COLUNAS_PROJECAO, valores))
+            for valores in zip(*(self.colunas[c][offset:fim] for c in COLUNAS_PROJECAO))
+        ]
+
+    def demonstrativo(self, ano):
+        """Demonstrativo do ano (mesmo formato de get_demonstrativo_anual)"""
+        return {
+            'financiamento': self.contrato,
+            'ano': ano,
+            'resumo_mensal': self.resumo_anual.get(ano, {})
+        }
+
+    def evolucao(self):
+        """Evolução do saldo devedor parcela a parcela (mesmo formato de get_evolucao_saldo)"""
+        return [
+            {
+                'numero_parcela': numero,
+                'data_vencimento': vencimento,
+                'saldo_devedor': saldo or 0,
+                'status': status
+            }
+            for numero, vencimento, saldo, status in zip(
+                self.colunas['numero_parcela'],
+                self.colunas['data_vencimento'],
+                self.colunas['saldo_devedor_apos_pagamento'],
+                self.colunas['status']
+            )
+        ]
+
+    @staticmethod
+    def obter(financiamento_id):
+        """
+        Projeção do financiamento (do cache ou calculada)
+
+        Returns:
+            ProjecaoFinanciamento ou None se o financiamento não existir
+        """
+        projecao = ProjecaoFinanciamento._cache.obter(financiamento_id)
+        if projecao is not None:
+            return projecao
+
+        projecao = ProjecaoFinanciamento.calcular(financiamento_id)
+        if projecao is not None:
+            ProjecaoFinanciamento._cache.guardar(financiamento_id, projecao)
+        return projecao
+
+    @staticmethod
+    def calcular(financiamento_id):
+        """
+        Monta a projeção: parcelas, vigências e amortizações em uma consulta de colunas cada
+        """
+        financiamento = db.session.get(Financiamento, financiamento_id)
+        if not financiamento:
+            return None
+        contrato = financiamento.to_dict()
+
+        colunas = {coluna: [] for coluna in COLUNAS_PROJECAO}
+        somas = {}
+        for parcela in db.session.execute(
+            select(*(getattr(FinanciamentoParcela, c) for c in COLUNAS_PROJECAO))
+            .where(FinanciamentoParcela.financiamento_id == financiamento_id)
+            .order_by(FinanciamentoParcela.numero_parcela)
+        ):
+            vencimento = parcela.data_vencimento
+            mes = somas.setdefault(vencimento.year, {}).setdefault(
+                vencimento.month, {chave: Decimal('0') for chave, _ in CAMPOS_DEMONSTRATIVO}
+            )
+            for chave, coluna in CAMPOS_DEMONSTRATIVO:
+                mes[chave] += getattr(parcela, coluna) or Decimal('0')
+
+            for coluna in COLUNAS_PROJECAO:
+                valor = getattr(parcela, coluna)
+                if coluna == 'data_vencimento':
+                    valor = valor.strftime('%Y-%m-%d')
+                elif coluna == 'saldo_devedor_apos_pagamento':
+                    valor = float(valor) if valor else None
+                elif coluna.startswith('valor_') or coluna == 'dif_apurada':
+                    valor = float(valor or 0)
+                colunas[coluna].append(valor)
+
+        resumo_anual = {
+            ano: {mes: {chave: float(v) for chave, v in dados.items()} for mes, dados in sorted(meses.items())}
+            for ano, meses in somas.items()
+        }
+
+        # Vigências e amortizações entram no etag (buscar_financiamento as expõe)
+        vigencias = db.session.execute(
+            select(
+                FinanciamentoSeguroVigencia.id,
+                FinanciamentoSeguroVigencia.competencia_inicio,
+                FinanciamentoSeguroVigencia.data_encerramento,
+                FinanciamentoSeguroVigencia.valor_mensal,
+                FinanciamentoSeguroVigencia.vigencia_ativa,
+                FinanciamentoSeguroVigencia.observacoes
+            ).where(FinanciamentoSeguroVigencia.financiamento_id == financiamento_id)
+            .order_by(FinanciamentoSeguroVigencia.id)
+        ).all()
+        amortizacoes = db.session.execute(
+            select(
+                FinanciamentoAmortizacaoExtra.id,
+                FinanciamentoAmortizacaoExtra.data,
+                FinanciamentoAmortizacaoExtra.valor,
+                FinanciamentoAmortizacaoExtra.tipo
+            ).where(FinanciamentoAmortizacaoExtra.financiamento_id == financiamento_id)
+            .order_by(FinanciamentoAmortizacaoExtra.id)
+        ).all()
+
+        conteudo = repr((
+            sorted(contrato.items()),
+            [colunas[c] for c in COLUNAS_PROJECAO],
+            [tuple(v) for v in vigencias],
+            [tuple(a) for a in amortizacoes],
+        ))
+        etag = hashlib.blake2b(conteudo.encode(), digest_size=16).hexdigest()
+
+        return ProjecaoFinanciamento(financiamento_id, contrato, colunas, resumo_anual, etag)
+
+    @staticmethod
+    def invalidar(financiamento_ids=None):
+        """Descarta a projeção dos financiamentos informados (ou de todos, se None)"""
+        if financiamento_ids is None:
+            ProjecaoFinanciamento._cache.clear()
+            return
+        for financiamento_id in financiamento_ids:
+            ProjecaoFinanciamento._cache.pop(financiamento_id, None)
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que invalidam o cache.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        _invalidacao.registrar(db.session)
+
+
+def _financiamento_afetado(obj):
+    financiamento_id = getattr(obj, CAMPOS_FINANCIAMENTO[type(obj)], None)
+    if financiamento_id is None and not isinstance(obj, Financiamento):
+        return INVALIDAR_TUDO  # Filho ligado só pelo relacionamento: id ainda não atribuído
+    return {financiamento_id}
+
+
+_invalidacao = InvalidacaoCache(
+    'projecao_financiamento', tuple(CAMPOS_FINANCIAMENTO), _financiamento_afetado,
+    ProjecaoFinanciamento.invalidar
+)
@@ -14,8 +14,10 @@ from decimal import Decimal
 
 try:
     from backend.models import db, ItemReceita, ReceitaOrcamento, ReceitaRealizada, ContaPatrimonio
+    from backend.utils.competencia import filtro_ano
 except ImportError:
     from models import db, ItemReceita, ReceitaOrcamento, ReceitaRealizada, ContaPatrimonio
+    from utils.competencia import filtro_ano
 
 
 class ReceitaService:
@@ -462,17 +464,14 @@ class ReceitaService:
         Returns:
             dict: Resumo por mês e por tipo
         """
-        data_inicio = date(ano, 1, 1)
-        data_fim = date(ano, 12, 31)
-
+        # Filtro por faixa (indexável); extract() apenas no agrupamento
         # Buscar orçamentos (PREVISTO base)
         orcamentos = db.session.query(
             extract('month', ReceitaOrcamento.mes_referencia).label('mes'),
             ItemReceita.tipo,
             func.sum(ReceitaOrcamento.valor_esperado).label('total_previsto')
         ).join(ItemReceita).filter(
-            ReceitaOrcamento.mes_referencia >= data_inicio,
-            ReceitaOrcamento.mes_referencia <= data_fim
+            filtro_ano(ReceitaOrcamento.mes_referencia, ano)
         ).group_by('mes', ItemReceita.tipo).all()
 
         # Buscar realizadas (REALIZADO)
@@ -481,8 +480,7 @@ class ReceitaService:
             func.coalesce(ItemReceita.tipo, 'PONTUAL').label('tipo'),
             func.sum(ReceitaRealizada.valor_recebido).label('total_recebido')
         ).outerjoin(ItemReceita, ReceitaRealizada.item_receita_id == ItemReceita.id).filter(
-            ReceitaRealizada.mes_referencia >= data_inicio,
-            ReceitaRealizada.mes_referencia <= data_fim
+            filtro_ano(ReceitaRealizada.mes_referencia, ano)
         ).group_by('mes', 'tipo').all()
 
         # Complemento do previsto: realizadas sem orçamento (ex: consórcios / pontuais)
@@ -491,8 +489,7 @@ class ReceitaService:
             func.coalesce(ItemReceita.tipo, 'PONTUAL').label('tipo'),
             func.sum(ReceitaRealizada.valor_recebido).label('total_recebido')
         ).outerjoin(ItemReceita, ReceitaRealizada.item_receita_id == ItemReceita.id).filter(
-            ReceitaRealizada.mes_referencia >= data_inicio,
-            ReceitaRealizada.mes_referencia <= data_fim,
+            filtro_ano(ReceitaRealizada.mes_referencia, ano),
             ReceitaRealizada.orcamento_id.is_(None)
         ).group_by('mes', 'tipo').all()
 
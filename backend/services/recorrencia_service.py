@@ -0,0 +1,534 @@
+"""
+Serviço de Recorrência - Materialização de despesas recorrentes
+
+Gera as execuções (Conta ou LancamentoAgregado) das despesas recorrentes e
+garante as faturas virtuais dos cartões ativos.
+
+A materialização roda fora do caminho das requisições GET:
+- Job agendado (backend/scheduler.py) e script backend/jobs/materializar_recorrencias.py
+- Sob demanda: POST /api/despesas/materializar
+
+Cada ItemDespesa guarda em materializado_ate o último mês já materializado
+(watermark); cada execução gera apenas o delta entre esse mês e o alvo.
+Editar um campo que define as execuções (CAMPOS_RECORRENCIA: valor,
+vencimento, tipo de recorrência, meio de pagamento/cartão, reativação...)
+descarta o watermark no flush: a próxima materialização refaz a janela
+inteira (idempotente: só insere o que falta).
+"""
+from datetime import date, datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_, event, insert, or_
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from backend.models import db, ItemDespesa, Conta, LancamentoAgregado
+    from backend.services.fatura_cartao_service import FaturaCartaoService
+    from backend.services.resumo_competencia_service import ResumoCompetenciaService
+    from backend.utils.competencia import primeiro_dia
+except ImportError:
+    from models import db, ItemDespesa, Conta, LancamentoAgregado
+    from services.fatura_cartao_service import FaturaCartaoService
+    from services.resumo_competencia_service import ResumoCompetenciaService
+    from utils.competencia import primeiro_dia
+
+
+# Horizonte padrão da materialização (meses à frente do mês atual)
+HORIZONTE_MESES_PADRAO = 12
+
+# Campos do ItemDespesa que definem quais execuções existem e com que valores;
+# alterá-los descarta o watermark (materializado_ate)
+CAMPOS_RECORRENCIA = (
+    'valor',
+    'data_vencimento',
+    'mes_competencia',
+    'tipo_recorrencia',
+    'recorrente',
+    'ativo',
+    'meio_pagamento',
+    'cartao_id',
+    'item_agregado_id',
+    'categoria_id',
+)
+
+
+# ============================================================================
+# GERADORES DE EXECUÇÃO (por ItemDespesa)
+# ============================================================================
+
+def _inserir_em_lote(modelo, linhas, campo_competencia):
+    """
+    INSERT em lote (executemany) das linhas geradas, sem round-trip por linha
+
+    Os meses afetados são marcados no resumo por competência, já que
+    escritas em lote não passam pelo flush da sessão.
+    """
+    if not linhas:
+        return
+    ResumoCompetenciaService.marcar_meses({linha[campo_competencia] for linha in linhas})
+    db.session.execute(
+        insert(modelo).execution_options(resumo_competencia_marcado=True),
+        linhas
+    )
+
+
+def gerar_execucao_despesa_recorrente(item_despesa_id, meses_futuros=1, mes_referencia=None):
+    """
+    Orquestrador único de recorrência:
+    - Se meio_pagamento == 'cartao' → gera LancamentoAgregado
+    - Caso contrário → gera Conta
+
+    IMPORTANTE: esta função NÃO faz commit; o caller controla a transação.
+    """
+    item = ItemDespesa.query.get(item_despesa_id)
+    if not item:
+        raise ValueError('ItemDespesa não encontrado')
+    if not item.recorrente:
+        return []
+
+    if item.meio_pagamento == 'cartao':
+        if not item.cartao_id:
+            return []
+        return gerar_lancamentos_cartao_recorrente(item.id, meses_futuros=meses_futuros, mes_referencia=mes_referencia)
+
+    return gerar_contas_despesa_recorrente(item.id, meses_futuros=meses_futuros, mes_referencia=mes_referencia)
+
+
+def normalizar_dias_semana(dias):
+    """
+    Recebe lista ou string e retorna lista padronizada sem acentos:
+    ['segunda','terca','quarta','quinta','sexta','sabado','domingo']
+    """
+    if not dias:
+        return []
+    if isinstance(dias, str):
+        try:
+            import json
+            parsed = json.loads(dias)
+            if isinstance(parsed, list):
+                dias = parsed
+            else:
+                dias = [d.strip() for d in dias.split(",") if d.strip()]
+        except Exception:
+            dias = [d.strip() for d in dias.split(",") if d.strip()]
+    nomes = {
+        'segunda': 'segunda', 'seg': 'segunda', '1': 'segunda',
+        'terca': 'terca', 'ter': 'terca', '2': 'terca',
+        'quarta': 'quarta', 'qua': 'quarta', '3': 'quarta',
+        'quinta': 'quinta', 'qui': 'quinta', '4': 'quinta',
+        'sexta': 'sexta', 'sex': 'sexta', '5': 'sexta',
+        'sabado': 'sabado', 'sab': 'sabado', '6': 'sabado',
+        'domingo': 'domingo', 'dom': 'domingo', '0': 'domingo'
+    }
+    resultado = []
+    for d in dias:
+        chave = str(d).strip().lower()
+        if chave in nomes:
+            resultado.append(nomes[chave])
+    return resultado
+
+def gerar_contas_despesa_recorrente(item_despesa_id, meses_futuros=12, mes_referencia=None):
+    """
+    Gera contas reais para despesas recorrentes (mensal, anual, semanal, a_cada_2_semanas ou dias_semana).
+
+    Calcula todas as datas da janela em memória, busca as já existentes em uma
+    consulta e insere as faltantes em lote. O índice único
+    uq_conta_item_vencimento impede duplicatas em gerações concorrentes.
+
+    Returns:
+        list[dict]: Linhas de Conta inseridas
+    """
+    item = ItemDespesa.query.get(item_despesa_id)
+    if not item:
+        raise ValueError('ItemDespesa nao encontrado')
+    if not item.recorrente:
+        raise ValueError('ItemDespesa nao e recorrente')
+    if not item.data_vencimento:
+        raise ValueError('ItemDespesa recorrente precisa ter data_vencimento')
+
+    tipo_recorrencia = item.tipo_recorrencia or 'mensal'
+    data_inicio = item.data_vencimento
+    inicio_geracao = data_inicio.replace(day=1)
+    mes_ref_base = mes_referencia.replace(day=1) if mes_referencia else None
+    inicio_janela = max(inicio_geracao, mes_ref_base) if mes_ref_base else inicio_geracao
+    data_fim_base = (inicio_janela + relativedelta(months=meses_futuros)) - timedelta(days=1)
+
+    # Datas candidatas calculadas em memória; existência verificada em lote no final
+    candidatas = {}
+
+    def criar_conta(data_venc, descricao_custom=None):
+        candidatas.setdefault(data_venc, descricao_custom or item.nome)
+
+    if tipo_recorrencia == 'mensal':
+        data_venc = data_inicio
+        while data_venc < inicio_janela:
+            data_venc += relativedelta(months=1)
+        while data_venc <= data_fim_base:
+            criar_conta(data_venc)
+            data_venc += relativedelta(months=1)
+
+    elif tipo_recorrencia == 'anual':
+        data_ref = data_inicio
+        while data_ref < inicio_janela:
+            data_ref += relativedelta(years=1)
+        while data_ref <= data_fim_base:
+            criar_conta(data_ref)
+            data_ref += relativedelta(years=1)
+
+    elif tipo_recorrencia == 'semanal' or tipo_recorrencia.startswith('semanal_') or tipo_recorrencia == 'a_cada_2_semanas':
+        intervalo = 1 if tipo_recorrencia == "semanal" else 2
+        dia_semana_alvo = None
+        if tipo_recorrencia.startswith("semanal_"):
+            partes = tipo_recorrencia.split("_")
+            if len(partes) > 1:
+                try:
+                    intervalo = int(partes[1])
+                except Exception:
+                    intervalo = max(intervalo, 1)
+            if len(partes) > 2:
+                try:
+                    dia_semana_alvo = int(partes[2])
+                except Exception:
+                    dia_semana_alvo = None
+
+        # Cadência ancorada no início da recorrência (não no início da janela),
+        # para que a geração incremental (watermark) mantenha as mesmas datas
+        data_atual = data_inicio
+        if dia_semana_alvo is not None:
+            dias_ate_alvo = (dia_semana_alvo - data_atual.weekday()) % 7
+            data_atual += timedelta(days=dias_ate_alvo)
+        while data_atual < inicio_janela:
+            data_atual += timedelta(weeks=intervalo)
+
+        while data_atual <= data_fim_base:
+            if data_atual >= inicio_geracao:
+                criar_conta(data_atual, descricao_custom=f"{item.nome} - {data_atual.strftime('%d/%m')}")
+            data_atual += timedelta(weeks=intervalo)
+
+    elif tipo_recorrencia == 'dias_semana':
+        dias_lista = normalizar_dias_semana(getattr(item, 'dias_semana', None))
+        frequencia = getattr(item, 'frequencia_semanal', '') or 'toda_semana'
+        mapa_num = {
+            'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6
+        }
+        dias_alvo = [mapa_num[d] for d in dias_lista if d in mapa_num]
+        data_atual = inicio_janela
+        while data_atual <= data_fim_base:
+            if dias_alvo and data_atual.weekday() in dias_alvo:
+                if frequencia == 'alternado' and data_atual.isocalendar()[1] % 2 != 0:
+                    data_atual += timedelta(days=1)
+                    continue
+                criar_conta(data_atual, descricao_custom=f"{item.nome} - {data_atual.strftime('%d/%m')}")
+            data_atual += timedelta(days=1)
+
+    if not candidatas:
+        return []
+
+    # Idempotência: uma consulta para as contas já existentes na janela
+    existentes = {
+        d for (d,) in db.session.query(Conta.data_vencimento).filter(
+            Conta.item_despesa_id == item_despesa_id,
+            Conta.data_vencimento >= min(candidatas),
+            Conta.data_vencimento <= max(candidatas)
+        ).all()
+    }
+
+    contas_criadas = [
+        {
+            'item_despesa_id': item_despesa_id,
+            'mes_referencia': data_venc.replace(day=1),
+            'descricao': descricao,
+            'valor': item.valor,
+            'data_vencimento': data_venc,
+            'status_pagamento': 'Pendente',
+            'observacoes': item.descricao or ''
+        }
+        for data_venc, descricao in candidatas.items()
+        if data_venc not in existentes
+    ]
+    _inserir_em_lote(Conta, contas_criadas, 'mes_referencia')
+
+    return contas_criadas
+
+
+def gerar_lancamentos_cartao_recorrente(item_despesa_id, meses_futuros=12, mes_referencia=None):
+    """
+    Gera lançamentos automaticamente para despesas recorrentes pagas via cartão de crédito.
+    
+    Diferença da geração de Conta:
+    - Gera LancamentoAgregado ao invés de Conta
+    - Aparece na fatura do cartão
+    - Classificado como "Despesas Fixas"
+    
+    Garante idempotência: 1 recorrência = 1 lançamento/mês
+    (verificação em lote + índice único uq_lanc_recorrente_item_mes)
+    """
+    item = ItemDespesa.query.get(item_despesa_id)
+    if not item:
+        raise ValueError('ItemDespesa não encontrado')
+    if not item.recorrente:
+        raise ValueError('ItemDespesa não é recorrente')
+    if item.meio_pagamento != 'cartao':
+        raise ValueError('ItemDespesa não é pago via cartão')
+    if not item.cartao_id:
+        raise ValueError('ItemDespesa recorrente pago via cartão precisa ter cartao_id')
+    if not item.categoria_id:
+        raise ValueError('ItemDespesa recorrente precisa ter categoria_id')
+
+    tipo_recorrencia = item.tipo_recorrencia or 'mensal'
+
+    # Fallback obrigatório para conseguir inferir mes_fatura quando não há data_vencimento/mes_competencia
+    if item.data_vencimento:
+        data_base = item.data_vencimento
+    elif item.mes_competencia:
+        if isinstance(item.mes_competencia, str):
+            # Aceitar "YYYY-MM" ou "YYYY-MM-DD"
+            try:
+                data_base = datetime.strptime(item.mes_competencia + '-01', '%Y-%m-%d').date()
+            except ValueError:
+                data_base = datetime.strptime(item.mes_competencia, '%Y-%m-%d').date()
+        else:
+            data_base = item.mes_competencia
+    else:
+        data_base = date.today()
+
+    data_inicio = data_base
+    inicio_geracao = data_inicio.replace(day=1)
+    mes_ref_base = mes_referencia.replace(day=1) if mes_referencia else None
+    inicio_janela = max(inicio_geracao, mes_ref_base) if mes_ref_base else inicio_geracao
+    data_fim_base = (inicio_janela + relativedelta(months=meses_futuros)) - timedelta(days=1)
+    
+    # Competências candidatas calculadas em memória (1 lançamento por mês)
+    candidatas = {}
+
+    def criar_lancamento(data_compra):
+        candidatas.setdefault(data_compra.replace(day=1), data_compra)
+
+    # Gerar lançamentos conforme tipo de recorrência (apenas mensal por enquanto)
+    if tipo_recorrencia == 'mensal':
+        data_ref = data_inicio
+        while data_ref < inicio_janela:
+            data_ref += relativedelta(months=1)
+        while data_ref <= data_fim_base:
+            criar_lancamento(data_ref)
+            data_ref += relativedelta(months=1)
+    
+    elif tipo_recorrencia == 'anual':
+        data_ref = data_inicio
+        while data_ref < inicio_janela:
+            data_ref += relativedelta(years=1)
+        while data_ref <= data_fim_base:
+            criar_lancamento(data_ref)
+            data_ref += relativedelta(years=1)
+
+    if not candidatas:
+        return []
+
+    # Idempotência: uma consulta para os meses já lançados na janela
+    existentes = {
+        m for (m,) in db.session.query(LancamentoAgregado.mes_fatura).filter(
+            LancamentoAgregado.item_despesa_id == item_despesa_id,
+            LancamentoAgregado.is_recorrente == True,
+            LancamentoAgregado.mes_fatura >= min(candidatas),
+            LancamentoAgregado.mes_fatura <= max(candidatas)
+        ).all()
+    }
+
+    lancamentos_criados = [
+        {
+            'cartao_id': item.cartao_id,
+            'item_agregado_id': item.item_agregado_id,  # Opcional - categoria do cartão
+            'categoria_id': item.categoria_id,  # Categoria analítica obrigatória
+            'descricao': item.nome,
+            'valor': item.valor,
+            'data_compra': data_compra,
+            'mes_fatura': mes_fatura,
+            'numero_parcela': 1,
+            'total_parcelas': 1,
+            'observacoes': item.descricao or '',
+            'is_recorrente': True,  # Marca como recorrente para aparecer em "Despesas Fixas"
+            'item_despesa_id': item_despesa_id  # Referência à despesa recorrente
+        }
+        for mes_fatura, data_compra in candidatas.items()
+        if mes_fatura not in existentes
+    ]
+    _inserir_em_lote(LancamentoAgregado, lancamentos_criados, 'mes_fatura')
+    # Executado/consumo acompanham o INSERT em lote; planejado/estouro das
+    # faturas existentes recalculados uma vez no flush/commit do caller
+    FaturaCartaoService.agendar(
+        {(linha['cartao_id'], linha['mes_fatura']) for linha in lancamentos_criados}, criar=False
+    )
+
+    return lancamentos_criados
+
+
+# ============================================================================
+# MATERIALIZADOR (watermark por ItemDespesa)
+# ============================================================================
+
+def _meses_entre(inicio, fim):
+    """Quantidade de meses de inicio até fim (ambos primeiro dia do mês), inclusive"""
+    return (fim.year - inicio.year) * 12 + (fim.month - inicio.month) + 1
+
+
+def _antes_do_flush(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, ItemDespesa) or obj.materializado_ate is None:
+            continue
+        estado = sa_inspect(obj)
+        if estado.attrs.materializado_ate.history.has_changes():
+            continue  # O próprio materializador avançou o watermark
+        if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_RECORRENCIA):
+            obj.materializado_ate = None
+
+
+def _inicio_recorrencia(item):
+    """
+    Primeiro mês da recorrência, com o mesmo fallback dos geradores:
+    data_vencimento → mes_competencia → mês atual
+    """
+    if item.data_vencimento:
+        return item.data_vencimento.replace(day=1)
+    if item.mes_competencia:
+        return primeiro_dia(item.mes_competencia)
+    return date.today().replace(day=1)
+
+
+class RecorrenciaService:
+    """
+    Materializador idempotente de despesas recorrentes e faturas de cartão
+    """
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra o listener de sessão que descarta o watermark de itens editados.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        if not event.contains(db.session, 'before_flush', _antes_do_flush):
+            event.listen(db.session, 'before_flush', _antes_do_flush)
+
+    @staticmethod
+    def materializar(ate=None, item_ids=None):
+        """
+        Materializa recorrências e faturas até o mês alvo (inclusive)
+
+        Para cada ItemDespesa recorrente gera somente os meses após
+        materializado_ate; cartões ativos ganham as faturas virtuais do mês
+        atual em diante. Tudo em uma única transação (um commit no final).
+
+        Args:
+            ate (date|str|None): Mês alvo (padrão: mês atual + HORIZONTE_MESES_PADRAO)
+            item_ids (list[int]|None): Restringir a estes ItemDespesa
+
+        Returns:
+            dict: {'ate', 'itens', 'contas', 'lancamentos', 'faturas', 'erros'}
+        """
+        mes_atual = date.today().replace(day=1)
+        alvo = primeiro_dia(ate) if ate else mes_atual + relativedelta(months=HORIZONTE_MESES_PADRAO)
+
+        try:
+            return RecorrenciaService._materializar_transacao(alvo, mes_atual, item_ids)
+        except IntegrityError:
+            # Outra geração concorrente inseriu as mesmas linhas (índices únicos):
+            # refazer com o estado atual, que agora as enxerga como existentes
+            return RecorrenciaService._materializar_transacao(alvo, mes_atual, item_ids)
+
+    @staticmethod
+    def _materializar_transacao(alvo, mes_atual, item_ids=None):
+        """Uma passada completa do materializador, em uma única transação"""
+        resultado = {
+            'ate': alvo.strftime('%Y-%m'),
+            'itens': 0,
+            'contas': 0,
+            'lancamentos': 0,
+            'faturas': 0,
+            'erros': []
+        }
+
+        pendentes = ItemDespesa.query.filter(
+            or_(ItemDespesa.materializado_ate.is_(None), ItemDespesa.materializado_ate < alvo),
+            or_(
+                and_(ItemDespesa.tipo != 'Agregador', ItemDespesa.recorrente == True),
+                and_(ItemDespesa.tipo == 'Agregador', ItemDespesa.ativo == True)
+            )
+        )
+        if item_ids:
+            pendentes = pendentes.filter(ItemDespesa.id.in_(item_ids))
+
+        try:
+            for item in pendentes.order_by(ItemDespesa.id).all():
+                item_id = item.id
+                try:
+                    # Savepoint por item: um erro no meio descarta só as linhas dele
+                    with db.session.begin_nested():
+                        if item.tipo == 'Agregador':
+                            faturas = RecorrenciaService._materializar_faturas(item, alvo, mes_atual)
+                            contagem = {'faturas': faturas}
+                        else:
+                            criados = RecorrenciaService._materializar_item(item, alvo)
+                            chave = 'lancamentos' if item.meio_pagamento == 'cartao' else 'contas'
+                            contagem = {chave: len(criados)}
+                        item.materializado_ate = alvo
+                    for chave, quantidade in contagem.items():
+                        resultado[chave] += quantidade
+                    resultado['itens'] += 1
+                except ValueError as e:
+                    # Configuração incompleta (ex: recorrente sem data_vencimento):
+                    # não avança o watermark, os demais itens seguem
+                    resultado['erros'].append({'item_despesa_id': item_id, 'erro': str(e)})
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return resultado
+
+    @staticmethod
+    def _materializar_item(item, alvo):
+        """Gera o delta (materializado_ate, alvo] de uma despesa recorrente"""
+        if item.materializado_ate:
+            inicio_delta = item.materializado_ate.replace(day=1) + relativedelta(months=1)
+        else:
+            inicio_delta = None
+
+        inicio_janela = max(_inicio_recorrencia(item), inicio_delta) if inicio_delta else _inicio_recorrencia(item)
+        if inicio_janela > alvo:
+            return []
+
+        return gerar_execucao_despesa_recorrente(
+            item.id,
+            meses_futuros=_meses_entre(inicio_janela, alvo),
+            mes_referencia=inicio_delta
+        )
+
+    @staticmethod
+    def _materializar_faturas(cartao, alvo, mes_atual):
+        """Garante as faturas virtuais do cartão do mês atual (ou do watermark) até o alvo"""
+        inicio = mes_atual
+        if cartao.materializado_ate:
+            inicio = max(inicio, cartao.materializado_ate.replace(day=1) + relativedelta(months=1))
+        if inicio > alvo:
+            return 0
+
+        # Uma consulta para as faturas já existentes no intervalo
+        existentes = {
+            c for (c,) in db.session.query(Conta.cartao_competencia).filter(
+                Conta.item_despesa_id == cartao.id,
+                Conta.is_fatura_cartao == True,
+                Conta.cartao_competencia >= inicio,
+                Conta.cartao_competencia <= alvo
+            ).all()
+        }
+
+        # Faturas faltantes criadas em conjunto no flush/commit da transação
+        faltantes = [
+            competencia for competencia in (
+                inicio + relativedelta(months=n) for n in range(_meses_entre(inicio, alvo))
+            ) if competencia not in existentes
+        ]
+        FaturaCartaoService.agendar((cartao.id, competencia) for competencia in faltantes)
+        return len(faltantes)
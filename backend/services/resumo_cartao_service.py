@@ -0,0 +1,189 @@
+"""
+Serviço de Resumo do Cartão - Orçado x gasto por categoria, com cache
+
+A página do cartão buscava, para cada ItemAgregado, o orçamento do mês e
+todos os LancamentoAgregado da categoria, somando em Python. Aqui o resumo
+sai de uma única consulta agrupada (categorias + soma dos lançamentos), com o
+orçamento vigente de cada categoria resolvido pela OrcamentoTimeline (a mesma
+regra do planejado da fatura e dos alertas), e fica em cache no processo por
+(cartão, competência).
+
+Invalidação:
+- Eventos da sessão registram os meses tocados por escritas em
+  LancamentoAgregado; o cache desses meses é descartado no flush e
+  novamente no commit
+- Alterações em OrcamentoAgregado (uma vigência cobre vários meses),
+  ItemAgregado e GrupoAgregador e escritas em lote descartam o cache inteiro
+- Rollback descarta o cache dos meses com escritas descartadas
+- RESUMO_CARTAO_TTL_SEGUNDOS limita a defasagem entre processos (workers)
+
+Cada invalidação também avança a versão dos dados do mês (versao), usada
+por quem deriva informação dos mesmos dados (ex: feed de alertas) para
+saber se precisa recalcular.
+"""
+from sqlalchemy import func, select
+
+try:
+    from backend.models import (db, ItemAgregado, GrupoAgregador, OrcamentoAgregado, LancamentoAgregado,
+                                ConsumoAgregado)
+    from backend.services.orcamento_vigencia_service import OrcamentoTimeline
+    from backend.utils.competencia import primeiro_dia as _primeiro_dia
+    from backend.utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache, valor_e_anterior
+except ImportError:
+    from models import (db, ItemAgregado, GrupoAgregador, OrcamentoAgregado, LancamentoAgregado,
+                        ConsumoAgregado)
+    from services.orcamento_vigencia_service import OrcamentoTimeline
+    from utils.competencia import primeiro_dia as _primeiro_dia
+    from utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache, valor_e_anterior
+
+
+# Validade de uma entrada do cache (outros processos não invalidam este)
+RESUMO_CARTAO_TTL_SEGUNDOS = 300
+
+# Modelo → atributo que define o mês do resumo afetado
+CAMPOS_MES = {
+    LancamentoAgregado: 'mes_fatura',
+}
+
+# Alterações nestes modelos afetam todos os meses
+MODELOS_INVALIDAM_TUDO = (OrcamentoAgregado, ItemAgregado, GrupoAgregador)
+
+
+class ResumoCartaoService:
+    """
+    Resumo mensal do cartão (orçado, gasto e saldo por categoria)
+    """
+
+    _cache = CacheTTL(RESUMO_CARTAO_TTL_SEGUNDOS)
+    _versao_geral = 0
+    _versoes = {}
+
+    @staticmethod
+    def versao(competencia):
+        """Versão dos dados de cartão do mês (avança a cada invalidação que o atinge)"""
+        return ResumoCartaoService._versao_geral, ResumoCartaoService._versoes.get(_primeiro_dia(competencia), 0)
+
+    @staticmethod
+    def obter(cartao_id, competencia):
+        """
+        Resumo do cartão na competência (do cache ou calculado)
+
+        Args:
+            cartao_id (int): ID do cartão (ItemDespesa tipo Agregador)
+            competencia (date): Qualquer dia do mês
+
+        Returns:
+            dict: {'total_orcado': float, 'total_gasto': float, 'itens': [dict]}
+        """
+        chave = (cartao_id, _primeiro_dia(competencia))
+        resumo = ResumoCartaoService._cache.obter(chave)
+        if resumo is not None:
+            return resumo
+        return ResumoCartaoService._cache.guardar(chave, ResumoCartaoService.calcular(*chave))
+
+    @staticmethod
+    def calcular(cartao_id, mes):
+        """
+        Calcula o resumo com uma consulta agrupada
+
+        - Gasto da categoria: ConsumoAgregado do item no mês (mantido por delta)
+        - Orçamento: o vigente do item no mês (OrcamentoTimeline)
+        - Total gasto: todos os lançamentos do cartão no mês (com ou sem categoria)
+        """
+        itens_cartao = select(ItemAgregado.id).where(
+            ItemAgregado.item_despesa_id == cartao_id,
+            ItemAgregado.ativo == True
+        )
+
+        gastos = select(
+            ConsumoAgregado.item_agregado_id,
+            ConsumoAgregado.total
+        ).where(
+            ConsumoAgregado.mes == mes,
+            ConsumoAgregado.item_agregado_id.in_(itens_cartao)
+        ).subquery()
+
+        total_cartao = select(func.sum(LancamentoAgregado.valor)).where(
+            LancamentoAgregado.cartao_id == cartao_id,
+            LancamentoAgregado.mes_fatura == mes
+        ).scalar_subquery()
+
+        linhas = db.session.execute(
+            select(
+                ItemAgregado.id,
+                ItemAgregado.nome,
+                ItemAgregado.descricao,
+                gastos.c.total,
+                total_cartao
+            ).select_from(ItemAgregado)
+            .outerjoin(gastos, gastos.c.item_agregado_id == ItemAgregado.id)
+            .where(ItemAgregado.item_despesa_id == cartao_id, ItemAgregado.ativo == True)
+            .order_by(ItemAgregado.id)
+        ).all()
+
+        if linhas:
+            total_gasto = linhas[0][4]
+        else:
+            total_gasto = db.session.execute(select(total_cartao)).scalar()
+
+        timeline = OrcamentoTimeline.do_cartao(cartao_id)
+        itens = []
+        total_orcado = 0
+        for item_id, nome, descricao, gasto, _ in linhas:
+            orcamento = timeline.vigente(item_id, mes)
+            orcamento_id = orcamento.id if orcamento else None
+            valor_orcado = float(orcamento.valor_teto) if orcamento else 0
+            valor_gasto = float(gasto) if gasto is not None else 0
+
+            total_orcado += valor_orcado
+
+            itens.append({
+                'id': item_id,
+                'nome': nome,
+                'descricao': descricao,
+                'valor_orcado': valor_orcado,
+                'valor_gasto': valor_gasto,
+                'saldo': valor_orcado - valor_gasto,
+                'percentual_utilizado': round((valor_gasto / valor_orcado * 100) if valor_orcado > 0 else 0, 2),
+                'orcamento_id': orcamento_id
+            })
+
+        return {
+            'total_orcado': total_orcado,
+            'total_gasto': float(total_gasto or 0),
+            'itens': itens
+        }
+
+    @staticmethod
+    def invalidar(meses=None):
+        """Descarta o resumo dos meses informados (ou de todos, se None)"""
+        if meses is None:
+            ResumoCartaoService._cache.clear()
+            ResumoCartaoService._versao_geral += 1
+            return
+        meses = {_primeiro_dia(m) for m in meses if m is not None}
+        for mes in meses:
+            ResumoCartaoService._versoes[mes] = ResumoCartaoService._versoes.get(mes, 0) + 1
+        for chave in [c for c in ResumoCartaoService._cache if c[1] in meses]:
+            ResumoCartaoService._cache.pop(chave, None)
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que invalidam o cache.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        _invalidacao.registrar(db.session)
+
+
+def _meses_afetados(obj):
+    if isinstance(obj, MODELOS_INVALIDAM_TUDO):
+        return INVALIDAR_TUDO
+    return {_primeiro_dia(mes) for mes in valor_e_anterior(obj, CAMPOS_MES[type(obj)]) if mes is not None}
+
+
+_invalidacao = InvalidacaoCache(
+    'resumo_cartao', tuple(CAMPOS_MES) + MODELOS_INVALIDAM_TUDO, _meses_afetados,
+    ResumoCartaoService.invalidar
+)
@@ -0,0 +1,450 @@
+"""
+Serviço de Resumo por Competência - Tabela materializada do dashboard
+
+Mantém a tabela ResumoCompetencia (um registro por mês) para que o dashboard
+leia os totais mensais com uma única consulta por faixa de meses, em vez de
+reagregar Conta, LancamentoAgregado, ReceitaOrcamento e ReceitaRealizada a
+cada carregamento de página.
+
+Manutenção incremental:
+- Eventos da sessão registram os meses tocados por qualquer escrita
+  (despesas, receitas, cartões, financiamentos, importação...)
+- No commit, apenas os meses afetados são recalculados
+- Escritas em massa (muitos meses) apenas invalidam os registros; o mês é
+  rematerializado na próxima leitura
+- UPDATE/DELETE em lote devem marcar os meses (marcar_meses ou
+  marcar_meses_contas) e rodar com resumo_competencia_marcado=True; um lote
+  sem marcação descarta o resumo inteiro
+"""
+from datetime import datetime
+from decimal import Decimal
+import json
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import event, func, or_
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from backend.models import (db, Conta, ItemDespesa, ItemAgregado, OrcamentoAgregado,
+                                LancamentoAgregado, ReceitaOrcamento, ReceitaRealizada,
+                                ResumoCompetencia)
+    from backend.services.cartao_service import CartaoService
+    from backend.utils.competencia import primeiro_dia as _primeiro_dia, filtro_competencia
+except ImportError:
+    from models import (db, Conta, ItemDespesa, ItemAgregado, OrcamentoAgregado,
+                        LancamentoAgregado, ReceitaOrcamento, ReceitaRealizada,
+                        ResumoCompetencia)
+    from services.cartao_service import CartaoService
+    from utils.competencia import primeiro_dia as _primeiro_dia, filtro_competencia
+
+
+# Modelo → atributos que definem o mês de competência afetado
+CAMPOS_COMPETENCIA = {
+    Conta: ('mes_referencia', 'cartao_competencia'),
+    LancamentoAgregado: ('mes_fatura',),
+    OrcamentoAgregado: ('mes_referencia',),
+    ReceitaOrcamento: ('mes_referencia',),
+    ReceitaRealizada: ('mes_referencia',),
+}
+
+# Alterações nestes atributos afetam meses indeterminados → invalidar tudo
+CAMPOS_INVALIDAM_TUDO = {
+    ItemDespesa: ('categoria_id',),
+    ItemAgregado: ('ativo', 'item_despesa_id'),
+}
+
+# Acima deste número de meses afetados no mesmo commit, apenas invalidar
+LIMITE_RECALCULO_IMEDIATO = 12
+
+_CHAVE_MESES = 'resumo_competencia_meses'
+_CHAVE_TUDO = 'resumo_competencia_tudo'
+
+
+def _meses_do_objeto(obj, campos, incluir_historico=True):
+    """Retorna os meses (atual e anterior, se alterado) de um objeto da sessão"""
+    meses = set()
+    estado = sa_inspect(obj)
+    for campo in campos:
+        atual = getattr(obj, campo, None)
+        if atual is not None:
+            meses.add(_primeiro_dia(atual))
+        if incluir_historico:
+            historico = estado.attrs[campo].history
+            for anterior in historico.deleted or ():
+                if anterior is not None:
+                    meses.add(_primeiro_dia(anterior))
+    return meses
+
+
+def _antes_do_flush(session, flush_context, instances):
+    meses = session.info.setdefault(_CHAVE_MESES, set())
+
+    for obj in session.new:
+        for modelo, campos in CAMPOS_COMPETENCIA.items():
+            if isinstance(obj, modelo):
+                meses.update(_meses_do_objeto(obj, campos, incluir_historico=False))
+
+    for obj in session.deleted:
+        for modelo, campos in CAMPOS_COMPETENCIA.items():
+            if isinstance(obj, modelo):
+                meses.update(_meses_do_objeto(obj, campos))
+        if isinstance(obj, tuple(CAMPOS_INVALIDAM_TUDO)):
+            session.info[_CHAVE_TUDO] = True
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        for modelo, campos in CAMPOS_COMPETENCIA.items():
+            if isinstance(obj, modelo):
+                meses.update(_meses_do_objeto(obj, campos))
+        for modelo, campos in CAMPOS_INVALIDAM_TUDO.items():
+            if isinstance(obj, modelo):
+                estado = sa_inspect(obj)
+                if any(estado.attrs[c].history.has_changes() for c in campos):
+                    session.info[_CHAVE_TUDO] = True
+
+
+def _execucao_orm(orm_execute_state):
+    """UPDATE/DELETE/INSERT em lote não passam pelo flush → invalidar tudo"""
+    if orm_execute_state.is_select:
+        return
+    if orm_execute_state.execution_options.get('resumo_competencia_marcado'):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if mapper.class_ in CAMPOS_COMPETENCIA or mapper.class_ in CAMPOS_INVALIDAM_TUDO:
+        orm_execute_state.session.info[_CHAVE_TUDO] = True
+
+
+def _antes_do_commit(session):
+    session.flush()
+    meses = session.info.pop(_CHAVE_MESES, set())
+    tudo = session.info.pop(_CHAVE_TUDO, False)
+
+    if tudo:
+        ResumoCompetencia.query.delete(synchronize_session=False)
+        return
+
+    meses.discard(None)
+    if not meses:
+        return
+
+    if len(meses) > LIMITE_RECALCULO_IMEDIATO:
+        ResumoCompetenciaService.invalidar_meses(meses)
+        return
+
+    try:
+        valores = {mes: ResumoCompetenciaService.calcular_mes(mes) for mes in sorted(meses)}
+    except Exception:
+        # Nunca bloquear a escrita original: o mês será recalculado na leitura
+        ResumoCompetenciaService.invalidar_meses(meses)
+        return
+
+    for mes, valores_mes in valores.items():
+        ResumoCompetenciaService._gravar(mes, valores_mes)
+    session.flush()
+
+
+def _apos_rollback(session):
+    session.info.pop(_CHAVE_MESES, None)
+    session.info.pop(_CHAVE_TUDO, None)
+
+
+class ResumoCompetenciaService:
+    """
+    Serviço de leitura e manutenção do resumo mensal materializado
+    """
+
+    # ========================================================================
+    # REGISTRO DOS EVENTOS DE MANUTENÇÃO
+    # ========================================================================
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que mantêm o resumo atualizado.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        alvos = (
+            ('before_flush', _antes_do_flush),
+            ('do_orm_execute', _execucao_orm),
+            ('before_commit', _antes_do_commit),
+            ('after_rollback', _apos_rollback),
+        )
+        for nome, funcao in alvos:
+            if not event.contains(db.session, nome, funcao):
+                event.listen(db.session, nome, funcao)
+
+    @staticmethod
+    def marcar_meses(meses):
+        """
+        Marca meses como afetados na transação atual.
+
+        Usado por escritas em lote executadas com
+        execution_options(resumo_competencia_marcado=True).
+        """
+        alvo = db.session.info.setdefault(_CHAVE_MESES, set())
+        alvo.update(_primeiro_dia(m) for m in meses if m is not None)
+
+    @staticmethod
+    def marcar_meses_contas(*condicoes):
+        """
+        Marca os meses das contas que atendem às condições.
+
+        Chamar antes de um UPDATE/DELETE em lote dessas contas executado com
+        execution_options(resumo_competencia_marcado=True).
+        """
+        meses = set()
+        for mes_referencia, cartao_competencia in db.session.query(
+            Conta.mes_referencia, Conta.cartao_competencia
+        ).filter(*condicoes).distinct():
+            meses.update((mes_referencia, cartao_competencia))
+        ResumoCompetenciaService.marcar_meses(meses)
+
+    # ========================================================================
+    # LEITURA
+    # ========================================================================
+
+    @staticmethod
+    def obter_mes(competencia):
+        """
+        Retorna o ResumoCompetencia do mês (materializa se ainda não existir)
+        """
+        mes = _primeiro_dia(competencia)
+        return ResumoCompetenciaService.obter_intervalo(mes, mes)[mes]
+
+    @staticmethod
+    def obter_intervalo(mes_inicio, mes_fim):
+        """
+        Retorna {mes: ResumoCompetencia} para todos os meses do intervalo (inclusive)
+
+        Uma única consulta por faixa em idx_resumo_comp_mes; meses ausentes são
+        calculados e gravados (flush) em um savepoint.
+
+        NÃO faz commit; o caller controla a transação (as rotas do dashboard
+        commitam ao fim da requisição).
+        """
+        inicio = _primeiro_dia(mes_inicio)
+        fim = _primeiro_dia(mes_fim)
+
+        meses = []
+        mes = inicio
+        while mes <= fim:
+            meses.append(mes)
+            mes = mes + relativedelta(months=1)
+
+        registros = ResumoCompetencia.query.filter(
+            ResumoCompetencia.mes_referencia >= inicio,
+            ResumoCompetencia.mes_referencia <= fim
+        ).all()
+        por_mes = {r.mes_referencia: r for r in registros}
+
+        faltantes = [m for m in meses if m not in por_mes]
+        if faltantes:
+            try:
+                with db.session.begin_nested():
+                    for m in faltantes:
+                        por_mes[m] = ResumoCompetenciaService.recalcular_mes(m)
+            except IntegrityError:
+                # Outra requisição materializou o mesmo mês: o savepoint
+                # descarta só a materialização, não a transação do caller
+                registros = ResumoCompetencia.query.filter(
+                    ResumoCompetencia.mes_referencia >= inicio,
+                    ResumoCompetencia.mes_referencia <= fim
+                ).all()
+                por_mes = {r.mes_referencia: r for r in registros}
+
+        return por_mes
+
+    # ========================================================================
+    # MANUTENÇÃO
+    # ========================================================================
+
+    @staticmethod
+    def invalidar_meses(meses):
+        """
+        Remove os resumos dos meses informados (serão recalculados na leitura)
+
+        NÃO faz commit; o caller controla a transação.
+        """
+        meses = {_primeiro_dia(m) for m in meses if m is not None}
+        if not meses:
+            return 0
+        return ResumoCompetencia.query.filter(
+            ResumoCompetencia.mes_referencia.in_(meses)
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def recalcular_mes(competencia):
+        """
+        Recalcula e persiste (flush) o resumo de um mês
+
+        NÃO faz commit; o caller controla a transação.
+        """
+        mes = _primeiro_dia(competencia)
+        resumo = ResumoCompetenciaService._gravar(mes, ResumoCompetenciaService.calcular_mes(mes))
+        db.session.flush()
+        return resumo
+
+    @staticmethod
+    def _gravar(mes, valores):
+        resumo = ResumoCompetencia.query.filter_by(mes_referencia=mes).first()
+        if not resumo:
+            resumo = ResumoCompetencia(mes_referencia=mes)
+            db.session.add(resumo)
+
+        resumo.total_despesas_comuns = valores['total_despesas_comuns']
+        resumo.total_faturas = valores['total_faturas']
+        resumo.faturas_previsto = valores['faturas_previsto']
+        resumo.faturas_executado = valores['faturas_executado']
+        resumo.receitas_realizadas = valores['receitas_realizadas']
+        resumo.receitas_previstas = valores['receitas_previstas']
+        resumo.categorias_json = json.dumps(
+            {str(k): float(v) for k, v in valores['categorias'].items()}
+        )
+        resumo.atualizado_em = datetime.utcnow()
+        return resumo
+
+    @staticmethod
+    def reconstruir(mes_inicio=None, mes_fim=None):
+        """
+        Descarta e recalcula todos os resumos (ou os da faixa informada)
+
+        Returns:
+            int: quantidade de meses recalculados
+        """
+        query = ResumoCompetencia.query
+        if mes_inicio:
+            query = query.filter(ResumoCompetencia.mes_referencia >= _primeiro_dia(mes_inicio))
+        if mes_fim:
+            query = query.filter(ResumoCompetencia.mes_referencia <= _primeiro_dia(mes_fim))
+        query.delete(synchronize_session=False)
+
+        limites = db.session.query(
+            func.min(Conta.mes_referencia), func.max(Conta.mes_referencia)
+        ).one()
+        inicio = _primeiro_dia(mes_inicio) if mes_inicio else _primeiro_dia(limites[0])
+        fim = _primeiro_dia(mes_fim) if mes_fim else _primeiro_dia(limites[1])
+        if not inicio or not fim:
+            db.session.commit()
+            return 0
+
+        total = 0
+        mes = inicio
+        while mes <= fim:
+            ResumoCompetenciaService.recalcular_mes(mes)
+            total += 1
+            mes = mes + relativedelta(months=1)
+
+        db.session.commit()
+        return total
+
+    # ========================================================================
+    # CÁLCULO (FONTE DA VERDADE = TABELAS TRANSACIONAIS)
+    # ========================================================================
+
+    @staticmethod
+    def calcular_mes(competencia):
+        """
+        Calcula os totais de um mês direto das tabelas transacionais
+
+        Mesma regra de /api/despesas e do dashboard:
+        - Despesas comuns: Conta.valor
+        - Faturas de cartão: executado se paga, previsto se pendente
+        - Receitas: realizadas + previstas ainda não confirmadas
+
+        Returns:
+            dict com os totais do mês (Decimal) e somas por categoria
+        """
+        inicio = _primeiro_dia(competencia)
+
+        # 1. Despesas comuns (não-cartão)
+        despesas_comuns = db.session.query(
+            func.coalesce(func.sum(Conta.valor), 0)
+        ).filter(
+            filtro_competencia(Conta.mes_referencia, inicio),
+            or_(
+                Conta.is_fatura_cartao == False,
+                Conta.is_fatura_cartao.is_(None)
+            )
+        ).scalar()
+
+        # 2. Faturas de cartão
+        faturas = Conta.query.filter(
+            Conta.is_fatura_cartao == True,
+            filtro_competencia(Conta.mes_referencia, inicio)
+        ).all()
+
+        totais = CartaoService.calcular_totais_faturas(
+            competencias=[f.cartao_competencia for f in faturas],
+            cartao_ids=[f.item_despesa_id for f in faturas]
+        )
+
+        total_faturas = Decimal('0')
+        faturas_previsto = Decimal('0')
+        faturas_executado = Decimal('0')
+        for fatura in faturas:
+            if fatura.cartao_competencia and fatura.item_despesa_id:
+                previsto, executado = totais.get(
+                    (fatura.item_despesa_id, fatura.cartao_competencia.replace(day=1)),
+                    (Decimal('0'), Decimal('0'))
+                )
+            else:
+                # Fallback: usar campos do banco (pode estar zerado)
+                previsto = Decimal(str(fatura.valor_planejado or fatura.valor or 0))
+                executado = Decimal(str(fatura.valor_executado or fatura.valor or 0))
+
+            faturas_previsto += previsto
+            faturas_executado += executado
+            total_faturas += executado if fatura.status_pagamento == 'Pago' else previsto
+
+        # 3. Receitas (realizadas + previstas não confirmadas)
+        ids_orcamentos_realizados = [
+            o[0] for o in db.session.query(ReceitaRealizada.orcamento_id).filter(
+                filtro_competencia(ReceitaRealizada.mes_referencia, inicio),
+                ReceitaRealizada.orcamento_id.isnot(None)
+            ).distinct().all()
+        ]
+
+        receitas_realizadas = db.session.query(
+            func.coalesce(func.sum(ReceitaRealizada.valor_recebido), 0)
+        ).filter(
+            filtro_competencia(ReceitaRealizada.mes_referencia, inicio)
+        ).scalar()
+
+        query_previstas = db.session.query(
+            func.coalesce(func.sum(ReceitaOrcamento.valor_esperado), 0)
+        ).filter(
+            filtro_competencia(ReceitaOrcamento.mes_referencia, inicio)
+        )
+        if ids_orcamentos_realizados:
+            query_previstas = query_previstas.filter(~ReceitaOrcamento.id.in_(ids_orcamentos_realizados))
+        receitas_previstas = query_previstas.scalar()
+
+        # 4. Despesas por categoria (via ItemDespesa)
+        categorias = dict(
+            db.session.query(
+                ItemDespesa.categoria_id,
+                func.sum(Conta.valor)
+            ).join(
+                ItemDespesa, Conta.item_despesa_id == ItemDespesa.id
+            ).filter(
+                filtro_competencia(Conta.mes_referencia, inicio),
+                ItemDespesa.categoria_id.isnot(None)
+            ).group_by(
+                ItemDespesa.categoria_id
+            ).all()
+        )
+
+        return {
+            'total_despesas_comuns': Decimal(str(despesas_comuns or 0)),
+            'total_faturas': total_faturas,
+            'faturas_previsto': faturas_previsto,
+            'faturas_executado': faturas_executado,
+            'receitas_realizadas': Decimal(str(receitas_realizadas or 0)),
+            'receitas_previstas': Decimal(str(receitas_previstas or 0)),
+            'categorias': {k: Decimal(str(v or 0)) for k, v in categorias.items()},
+        }
@@ -11,11 +11,154 @@ REGRAS DE NEGÓCIO (CANÔNICAS):
 """
 
 from backend.models import db, FinanciamentoSeguroVigencia
+from backend.utils.sessao_orm import CacheTTL, INVALIDAR_TUDO, InvalidacaoCache, valor_e_anterior
+from bisect import bisect_right
+from collections import namedtuple
 from datetime import date, timedelta
 from decimal import Decimal
+import logging
+import time
 from sqlalchemy import and_
 
 
+# Validade de uma linha do tempo em cache (outros processos não invalidam este)
+VIGENCIA_TIMELINE_TTL_SEGUNDOS = 300
+
+# Retrato imutável de uma vigência (seguro para guardar em cache entre sessões)
+VigenciaSeguro = namedtuple(
+    'VigenciaSeguro',
+    'id competencia_inicio data_encerramento valor_mensal vigencia_ativa'
+)
+
+
+class VigenciaTimeline:
+    """
+    Linha do tempo das vigências de seguro de um financiamento
+
+    Carregada uma vez por financiamento (uma consulta) e mantida em cache no
+    processo. A busca por data é binária sobre competencia_inicio, em vez de
+    uma consulta por parcela.
+
+    Invalidação:
+    - criar_vigencia / _encerrar_vigencia_anterior invalidam explicitamente
+    - Eventos da sessão registram os financiamentos tocados por escritas de
+      vigência (ex: edição via rota); o cache deles é descartado no flush e
+      novamente no commit
+    - Escritas em lote de vigências descartam o cache inteiro
+    - Rollback descarta o cache dos financiamentos com escritas descartadas
+    - VIGENCIA_TIMELINE_TTL_SEGUNDOS limita a defasagem entre processos (workers)
+    """
+
+    _cache = CacheTTL(VIGENCIA_TIMELINE_TTL_SEGUNDOS)
+
+    def __init__(self, vigencias):
+        """
+        Args:
+            vigencias (list[VigenciaSeguro]): Vigências do financiamento (qualquer ordem)
+        """
+        self.vigencias = sorted(vigencias, key=lambda v: (v.competencia_inicio, v.id or 0))
+        self._inicios = [v.competencia_inicio for v in self.vigencias]
+
+    def vigente_em(self, data_referencia):
+        """
+        Retorna a vigência válida na data (mesma regra de obter_vigencia_por_data)
+
+        A vigência de maior competencia_inicio <= data, desconsiderando as
+        encerradas antes da data.
+
+        Returns:
+            VigenciaSeguro ou None
+        """
+        for i in range(bisect_right(self._inicios, data_referencia) - 1, -1, -1):
+            vigencia = self.vigencias[i]
+            if vigencia.data_encerramento is None or vigencia.data_encerramento >= data_referencia:
+                return vigencia
+        return None
+
+    @staticmethod
+    def do_financiamento(financiamento_id):
+        """Retorna a linha do tempo do financiamento (do cache ou carregada em uma consulta)"""
+        return VigenciaTimeline.dos_financiamentos([financiamento_id])[financiamento_id]
+
+    @staticmethod
+    def dos_financiamentos(financiamento_ids):
+        """
+        Linhas do tempo de vários financiamentos (os ausentes do cache em uma única consulta)
+
+        Returns:
+            dict: {financiamento_id: VigenciaTimeline}
+        """
+        financiamento_ids = set(financiamento_ids)
+        agora = time.monotonic()
+        validas = {}
+        for financiamento_id in financiamento_ids:
+            timeline = VigenciaTimeline._cache.obter(financiamento_id, agora)
+            if timeline is not None:
+                validas[financiamento_id] = timeline
+
+        faltantes = financiamento_ids - set(validas)
+        if faltantes:
+            vigencias = {financiamento_id: [] for financiamento_id in faltantes}
+            for v in FinanciamentoSeguroVigencia.query.filter(
+                FinanciamentoSeguroVigencia.financiamento_id.in_(faltantes)
+            ):
+                vigencias[v.financiamento_id].append(VigenciaSeguro(
+                    v.id, v.competencia_inicio, v.data_encerramento, v.valor_mensal, v.vigencia_ativa
+                ))
+
+            for financiamento_id in faltantes:
+                timeline = VigenciaTimeline(vigencias[financiamento_id])
+                timeline._alertar_duplicadas(financiamento_id)
+                VigenciaTimeline._cache.guardar(financiamento_id, timeline)
+                validas[financiamento_id] = timeline
+
+        return validas
+
+    @staticmethod
+    def invalidar(financiamento_id=None):
+        """Descarta a linha do tempo de um financiamento (ou de todos, se None)"""
+        if financiamento_id is None:
+            VigenciaTimeline._cache.clear()
+        else:
+            VigenciaTimeline._cache.pop(financiamento_id, None)
+
+    @staticmethod
+    def registrar_eventos():
+        """
+        Registra os listeners de sessão que invalidam o cache em qualquer escrita de vigência.
+
+        Idempotente: pode ser chamado a cada create_app().
+        """
+        _invalidacao.registrar(db.session)
+
+    def _alertar_duplicadas(self, financiamento_id):
+        """Loga warning se houver mais de uma vigência ativa na mesma competência"""
+        competencias_ativas = {}
+        for v in self.vigencias:
+            if v.vigencia_ativa:
+                competencias_ativas.setdefault(v.competencia_inicio.strftime('%Y-%m'), []).append(v.id)
+
+        for comp, ids in competencias_ativas.items():
+            if len(ids) > 1:
+                logging.warning(
+                    f"[VIGÊNCIA DUPLICADA] Financiamento {financiamento_id} "
+                    f"tem {len(ids)} vigências ativas na competência {comp}: {ids}. "
+                    f"Isso pode causar cálculos incorretos!"
+                )
+
+
+def _financiamentos_da_vigencia(vigencia):
+    if vigencia.financiamento_id is None:
+        return INVALIDAR_TUDO  # Ligada só pelo relacionamento: id ainda não atribuído
+    return valor_e_anterior(vigencia, 'financiamento_id')
+
+
+_invalidacao = InvalidacaoCache(
+    'vigencia_timeline', (FinanciamentoSeguroVigencia,), _financiamentos_da_vigencia,
+    VigenciaTimeline.invalidar, por_chave=True
+)
+
+
 class SeguroVigenciaService:
 
     @staticmethod
@@ -63,6 +206,7 @@ class SeguroVigenciaService:
 
         db.session.add(nova_vigencia)
         db.session.flush()
+        VigenciaTimeline.invalidar(financiamento_id)
 
         return nova_vigencia
 
@@ -99,12 +243,16 @@ class SeguroVigenciaService:
             vigencia_anterior.data_encerramento = data_encerramento
 
             db.session.flush()
+            VigenciaTimeline.invalidar(financiamento_id)
 
     @staticmethod
     def obter_vigencia_por_data(financiamento_id, data_referencia):
         """
         Retorna a vigência válida para uma data específica
 
+        Usa a VigenciaTimeline do financiamento (busca em memória). Cálculos
+        de cronograma devem usar a timeline diretamente, sem carregar o ORM.
+
         Lógica:
         1. Buscar vigências onde competencia_inicio <= data_referencia
         2. Se vigência tem data_encerramento, verificar se data_referencia <= data_encerramento
@@ -119,46 +267,8 @@ class SeguroVigenciaService:
         Data 2025-06-15 → retorna A
         Data 2026-06-15 → retorna B
         """
-
-        # Buscar todas as vigências do financiamento
-        vigencias_candidatas = FinanciamentoSeguroVigencia.query.filter(
-            and_(
-                FinanciamentoSeguroVigencia.financiamento_id == financiamento_id,
-                FinanciamentoSeguroVigencia.competencia_inicio <= data_referencia,
-                db.or_(
-                    FinanciamentoSeguroVigencia.data_encerramento == None,
-                    FinanciamentoSeguroVigencia.data_encerramento >= data_referencia
-                )
-            )
-        ).order_by(
-            FinanciamentoSeguroVigencia.competencia_inicio.desc()
-        ).all()
-
-        # ====================================================================
-        # VALIDAÇÃO DEFENSIVA: Detectar duplicação de vigências ativas
-        # ====================================================================
-        if len(vigencias_candidatas) > 1:
-            # Verificar se há múltiplas vigências ativas na mesma competência
-            competencias_ativas = {}
-            for v in vigencias_candidatas:
-                if v.vigencia_ativa:
-                    competencia_mes = v.competencia_inicio.strftime('%Y-%m')
-                    if competencia_mes not in competencias_ativas:
-                        competencias_ativas[competencia_mes] = []
-                    competencias_ativas[competencia_mes].append(v.id)
-
-            # Logar warning se detectar duplicação
-            for comp, ids in competencias_ativas.items():
-                if len(ids) > 1:
-                    import logging
-                    logging.warning(
-                        f"[VIGÊNCIA DUPLICADA] Financiamento {financiamento_id} "
-                        f"tem {len(ids)} vigências ativas na competência {comp}: {ids}. "
-                        f"Isso pode causar cálculos incorretos!"
-                    )
-
-        vigencia = vigencias_candidatas[0] if vigencias_candidatas else None
-        return vigencia
+        vigencia = VigenciaTimeline.do_financiamento(financiamento_id).vigente_em(data_referencia)
+        return db.session.get(FinanciamentoSeguroVigencia, vigencia.id) if vigencia else None
 
     @staticmethod
     def listar_vigencias(financiamento_id, apenas_ativas=False):
@@ -1,11 +1,45 @@
 from __future__ import annotations
 
-from sqlalchemy import text
+from itertools import groupby
+
+from sqlalchemy import and_, case, delete, func, literal, select, text, update
 
 try:
-    from backend.models import db
+    from backend.models import (
+        db, Conta, ConsumoAgregado, LancamentoAgregado, MovimentoFinanceiro, OrcamentoAgregado,
+        ReceitaOrcamento, ResumoCompetencia, SaldoBancarioMensal,
+    )
 except ImportError:
-    from models import db
+    from models import (
+        db, Conta, ConsumoAgregado, LancamentoAgregado, MovimentoFinanceiro, OrcamentoAgregado,
+        ReceitaOrcamento, ResumoCompetencia, SaldoBancarioMensal,
+    )
+
+# Índices de competência adicionados depois da criação de bancos existentes
+INDICES_COMPETENCIA = (
+    (Conta, 'idx_conta_mes_fatura_cartao'),
+    (LancamentoAgregado, 'idx_lanc_agregado_cartao_fatura'),
+    (ReceitaOrcamento, 'idx_rec_orc_competencia'),
+    (MovimentoFinanceiro, 'idx_movimento_conta_data'),
+    (OrcamentoAgregado, 'idx_orc_agregado_vigencia'),
+)
+
+# Índices únicos de idempotência da geração de recorrências e da importação CSV
+INDICES_UNICOS_RECORRENCIA = (
+    (Conta, 'uq_conta_item_vencimento'),
+    (LancamentoAgregado, 'uq_lanc_recorrente_item_mes'),
+    (LancamentoAgregado, 'uq_lanc_assinatura_parcela'),
+)
+
+# Entre duplicatas de um índice único, a mantida: menor valor, depois menor id
+# (mesma regra da migração add_unique_recorrencia)
+PREFERENCIA_DUPLICADAS = {
+    Conta: case((Conta.__table__.c.status_pagamento == 'Pago', 0), else_=1),
+}
+
+
+def _indice(modelo, nome_indice):
+    return next(i for i in modelo.__table__.indexes if i.name == nome_indice)
 
 
 def _sqlite_has_column(conn, table: str, column: str) -> bool:
@@ -22,6 +56,44 @@ def _sqlite_has_table(conn, table: str) -> bool:
     return bool(row and row[0] == table)
 
 
+def _remover_duplicadas(conn, modelo, indice) -> int:
+    """
+    Mantém uma linha por chave do índice único, reaponta as FKs para ela e
+    apaga as demais. Retorna o número de linhas removidas.
+    """
+    tabela = modelo.__table__
+    colunas = list(indice.columns)
+    condicoes = [coluna.isnot(None) for coluna in colunas]  # NULLs não colidem
+    if indice.dialect_options['sqlite']['where'] is not None:
+        condicoes.append(indice.dialect_options['sqlite']['where'])
+
+    grupos = select(*colunas).where(*condicoes).group_by(*colunas).having(func.count() > 1).subquery()
+    linhas = conn.execute(
+        select(tabela.c.id, *colunas)
+        .select_from(tabela.join(grupos, and_(*(coluna == grupos.c[coluna.name] for coluna in colunas))))
+        .where(*condicoes)
+        .order_by(*colunas, PREFERENCIA_DUPLICADAS.get(modelo, literal(0)), tabela.c.id)
+    ).all()
+
+    referencias = [
+        fk.parent
+        for outra in db.metadata.sorted_tables
+        for fk in outra.foreign_keys
+        if fk.column is tabela.c.id
+        and _sqlite_has_table(conn, outra.name)
+        and _sqlite_has_column(conn, outra.name, fk.parent.name)
+    ]
+
+    removidas = 0
+    for _, grupo in groupby(linhas, key=lambda linha: tuple(linha[1:])):
+        mantida, *duplicadas = [linha[0] for linha in grupo]
+        for coluna in referencias:
+            conn.execute(update(coluna.table).where(coluna.in_(duplicadas)).values({coluna.name: mantida}))
+        conn.execute(delete(tabela).where(tabela.c.id.in_(duplicadas)))
+        removidas += len(duplicadas)
+    return removidas
+
+
 def ensure_sqlite_schema_compat() -> None:
     """
     Garante compatibilidade de schema em SQLite quando o banco existe
@@ -65,3 +137,77 @@ def ensure_sqlite_schema_compat() -> None:
         if _sqlite_has_table(conn, 'conta'):
             if not _sqlite_has_column(conn, 'conta', 'conta_bancaria_id'):
                 conn.execute(text('ALTER TABLE conta ADD COLUMN conta_bancaria_id INTEGER'))
+
+        # =====================================================================
+        # Despesas recorrentes (watermark da materialização)
+        # =====================================================================
+        if _sqlite_has_table(conn, 'item_despesa'):
+            if not _sqlite_has_column(conn, 'item_despesa', 'materializado_ate'):
+                conn.execute(text('ALTER TABLE item_despesa ADD COLUMN materializado_ate DATE'))
+
+        # =====================================================================
+        # Importação CSV de cartão (assinatura da compra)
+        # =====================================================================
+        if _sqlite_has_table(conn, 'lancamento_agregado'):
+            if not _sqlite_has_column(conn, 'lancamento_agregado', 'assinatura_compra'):
+                conn.execute(text('ALTER TABLE lancamento_agregado ADD COLUMN assinatura_compra VARCHAR(64)'))
+
+        # =====================================================================
+        # Tabelas derivadas (materializações de leitura)
+        # =====================================================================
+        if _sqlite_has_table(conn, 'conta'):
+            if not _sqlite_has_table(conn, 'resumo_competencia'):
+                ResumoCompetencia.__table__.create(conn)
+
+        if _sqlite_has_table(conn, 'movimento_financeiro'):
+            if not _sqlite_has_table(conn, 'saldo_bancario_mensal'):
+                SaldoBancarioMensal.__table__.create(conn)
+                # Checkpoints do extrato a partir dos movimentos existentes
+                try:
+                    from backend.services.conta_bancaria_service import ContaBancariaService
+                except ImportError:
+                    from services.conta_bancaria_service import ContaBancariaService
+                ContaBancariaService.reconstruir_checkpoints(conexao=conn)
+
+        if _sqlite_has_table(conn, 'lancamento_agregado'):
+            if not _sqlite_has_table(conn, 'consumo_agregado'):
+                ConsumoAgregado.__table__.create(conn)
+                # Consumo por categoria e executado das faturas a partir dos lançamentos
+                try:
+                    from backend.services.fatura_cartao_service import FaturaCartaoService
+                except ImportError:
+                    from services.fatura_cartao_service import FaturaCartaoService
+                FaturaCartaoService.reconstruir(conexao=conn)
+
+        # =====================================================================
+        # Índices de competência (filtros por faixa de mes_referencia)
+        # =====================================================================
+        for modelo, nome_indice in INDICES_COMPETENCIA:
+            if _sqlite_has_table(conn, modelo.__tablename__):
+                _indice(modelo, nome_indice).create(conn, checkfirst=True)
+
+        # =====================================================================
+        # Índices únicos da geração de recorrências e da importação CSV
+        # (duplicatas antigas são removidas antes, como na migração
+        # add_unique_recorrencia, para o schema não divergir do Alembic)
+        # =====================================================================
+        lancamentos_removidos = 0
+        for modelo, nome_indice in INDICES_UNICOS_RECORRENCIA:
+            if not _sqlite_has_table(conn, modelo.__tablename__):
+                continue
+            indice = _indice(modelo, nome_indice)
+            removidas = _remover_duplicadas(conn, modelo, indice)
+            if removidas:
+                print(f"[AVISO] {removidas} registro(s) duplicado(s) removido(s) de "
+                      f"{modelo.__tablename__} para criar {nome_indice}")
+                conn.execute(delete(ResumoCompetencia.__table__))
+                if modelo is LancamentoAgregado:
+                    lancamentos_removidos += removidas
+            indice.create(conn, checkfirst=True)
+
+        if lancamentos_removidos and _sqlite_has_table(conn, 'consumo_agregado'):
+            try:
+                from backend.services.fatura_cartao_service import FaturaCartaoService
+            except ImportError:
+                from services.fatura_cartao_service import FaturaCartaoService
+            FaturaCartaoService.reconstruir(conexao=conn)
@@ -0,0 +1,261 @@
+"""
+Serviço de Sessão de Upload - Arquivos CSV de fatura mantidos no servidor
+
+O upload é lido em blocos (memória limitada ao bloco atual + amostra):
+- Delimitador detectado no primeiro bloco
+- Linhas entregues sob demanda ao csv.reader
+- Contagem de linhas na mesma passada em que o arquivo é gravado em disco
+
+O arquivo fica em uma sessão curta (UPLOAD_SESSAO_TTL_MINUTOS) identificada
+por upload_id; /processar relê as linhas do disco em vez de receber todas
+as linhas de volta do navegador em JSON.
+"""
+import codecs
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+# Diretório das sessões (compartilhado entre workers do mesmo servidor)
+UPLOAD_SESSAO_DIR = os.getenv(
+    'UPLOAD_SESSAO_DIR',
+    os.path.join(tempfile.gettempdir(), 'controle_financeiro_uploads')
+)
+
+# Tempo de vida de uma sessão de upload
+UPLOAD_SESSAO_TTL_MINUTOS = 30
+
+# Tamanho máximo do arquivo aceito
+UPLOAD_CSV_MAX_BYTES = 20 * 1024 * 1024
+
+# Bloco de leitura do upload
+TAMANHO_BLOCO = 64 * 1024
+
+# Linhas de dados devolvidas como amostra
+LINHAS_AMOSTRA = 5
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _caminhos(upload_id):
+    base = os.path.join(UPLOAD_SESSAO_DIR, upload_id)
+    return base + '.csv', base + '.json'
+
+
+def _linhas_texto(primeiro_bloco, origem, destino=None):
+    """
+    Decodifica o upload em blocos, grava os bytes em destino (se houver) e
+    entrega as linhas de texto (com o '\\n') uma a uma ao csv.reader
+
+    Raises:
+        ValueError: Se o arquivo exceder UPLOAD_CSV_MAX_BYTES
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8-sig')(errors='ignore')
+    total_bytes = 0
+    resto = ''
+    bloco = primeiro_bloco
+
+    while bloco:
+        total_bytes += len(bloco)
+        if total_bytes > UPLOAD_CSV_MAX_BYTES:
+            raise ValueError(
+                f'Arquivo excede o limite de {UPLOAD_CSV_MAX_BYTES // (1024 * 1024)} MB'
+            )
+        if destino is not None:
+            destino.write(bloco)
+
+        partes = (resto + decodificador.decode(bloco)).split('\n')
+        resto = partes.pop()
+        for parte in partes:
+            yield parte + '\n'
+
+        bloco = origem.read(TAMANHO_BLOCO)
+
+    resto += decodificador.decode(b'', final=True)
+    if resto:
+        yield resto
+
+
+def _detectar_delimitador(amostra):
+    """Delimitador das primeiras linhas (;, vírgula, tab), padrão ';'"""
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=';,\t').delimiter
+    except csv.Error:
+        # Fallback: ponto-e-vírgula (padrão brasileiro)
+        return ';'
+
+
+def _linhas_dados(entrada, delimitador):
+    """Linhas não vazias após o cabeçalho; fecha o arquivo ao terminar"""
+    with entrada:
+        leitor = csv.reader(entrada, delimiter=delimitador)
+        next(leitor, None)  # Cabeçalho
+        for linha in leitor:
+            if linha:
+                yield linha
+
+
+class UploadSessaoService:
+    """
+    Sessões curtas de upload de CSV (arquivo em disco + metadados)
+    """
+
+    @staticmethod
+    def ler_csv(arquivo, destino=None):
+        """
+        Leitor de CSV em streaming
+
+        Args:
+            arquivo: Objeto com read(n) em bytes
+            destino: Arquivo binário onde copiar os bytes lidos (opcional)
+
+        Returns:
+            tuple: (delimitador, leitor) - leitor é um csv.reader preguiçoso
+        """
+        primeiro_bloco = arquivo.read(TAMANHO_BLOCO)
+        amostra = '\n'.join(
+            primeiro_bloco.decode('utf-8-sig', errors='ignore').split('\n')[:5]
+        )  # Primeiras 5 linhas
+        delimitador = _detectar_delimitador(amostra)
+        return delimitador, csv.reader(_linhas_texto(primeiro_bloco, arquivo, destino), delimiter=delimitador)
+
+    @staticmethod
+    def criar(arquivo, nome_arquivo=None):
+        """
+        Lê o upload em streaming e o guarda em uma nova sessão
+
+        Args:
+            arquivo: Objeto com read(n) em bytes (FileStorage.stream do Flask)
+            nome_arquivo (str): Nome original (apenas informativo)
+
+        Returns:
+            dict: {'upload_id', 'delimitador', 'colunas', 'linhas_amostra',
+                   'total_linhas', 'expira_em'}
+
+        Raises:
+            ValueError: CSV vazio ou acima do tamanho máximo
+        """
+        os.makedirs(UPLOAD_SESSAO_DIR, exist_ok=True)
+        UploadSessaoService.limpar_expiradas()
+
+        upload_id = uuid.uuid4().hex
+        caminho_csv, caminho_meta = _caminhos(upload_id)
+
+        colunas = None
+        linhas_amostra = []
+        total_linhas = 0
+        try:
+            with open(caminho_csv, 'wb') as destino:
+                delimitador, leitor = UploadSessaoService.ler_csv(arquivo, destino)
+                for linha in leitor:
+                    if colunas is None:
+                        colunas = linha
+                        continue
+                    if not linha:
+                        continue
+                    total_linhas += 1
+                    if len(linhas_amostra) < LINHAS_AMOSTRA:
+                        linhas_amostra.append(linha)
+
+            if colunas is None:
+                raise ValueError("CSV vazio")
+        except Exception:
+            UploadSessaoService.remover(upload_id)
+            raise
+
+        criado_em = time.time()
+        metadados = {
+            'upload_id': upload_id,
+            'nome_arquivo': nome_arquivo,
+            'delimitador': delimitador,
+            'colunas': colunas,
+            'total_linhas': total_linhas,
+            'criado_em': criado_em,
+        }
+        with open(caminho_meta, 'w', encoding='utf-8') as saida:
+            json.dump(metadados, saida, ensure_ascii=False)
+
+        return {
+            'upload_id': upload_id,
+            'delimitador': delimitador,
+            'colunas': colunas,
+            'linhas_amostra': linhas_amostra,
+            'total_linhas': total_linhas,
+            'expira_em': int(criado_em + UPLOAD_SESSAO_TTL_MINUTOS * 60),
+        }
+
+    @staticmethod
+    def obter(upload_id):
+        """
+        Metadados da sessão (None se inexistente ou expirada)
+        """
+        if not upload_id or not _UPLOAD_ID.match(str(upload_id)):
+            return None
+
+        caminho_csv, caminho_meta = _caminhos(upload_id)
+        try:
+            with open(caminho_meta, encoding='utf-8') as entrada:
+                metadados = json.load(entrada)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - metadados['criado_em'] > UPLOAD_SESSAO_TTL_MINUTOS * 60 or \
+                not os.path.exists(caminho_csv):
+            UploadSessaoService.remover(upload_id)
+            return None
+
+        return metadados
+
+    @staticmethod
+    def linhas(upload_id):
+        """
+        Linhas de dados (sem o cabeçalho) da sessão, lidas do disco sob demanda
+
+        O arquivo é aberto já na chamada (não no primeiro next): um job
+        enfileirado continua lendo mesmo se a sessão expirar antes de ele rodar.
+
+        Returns:
+            iterator[list[str]]
+
+        Raises:
+            ValueError: Sessão inexistente ou expirada
+        """
+        metadados = UploadSessaoService.obter(upload_id)
+        if metadados is None:
+            raise ValueError('Sessão de upload expirada ou inexistente. Envie o arquivo novamente.')
+
+        caminho_csv, _ = _caminhos(upload_id)
+        entrada = open(caminho_csv, encoding='utf-8-sig', errors='ignore', newline='')
+        return _linhas_dados(entrada, metadados['delimitador'])
+
+    @staticmethod
+    def remover(upload_id):
+        """Apaga os arquivos da sessão (ignora se já não existirem)"""
+        if not upload_id or not _UPLOAD_ID.match(str(upload_id)):
+            return
+        for caminho in _caminhos(upload_id):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    @staticmethod
+    def limpar_expiradas():
+        """Remove os arquivos de sessões mais antigas que o TTL"""
+        if not os.path.isdir(UPLOAD_SESSAO_DIR):
+            return 0
+
+        limite = time.time() - UPLOAD_SESSAO_TTL_MINUTOS * 60
+        removidos = 0
+        for nome in os.listdir(UPLOAD_SESSAO_DIR):
+            caminho = os.path.join(UPLOAD_SESSAO_DIR, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+                    removidos += 1
+            except OSError:
+                pass
+        return removidos
@@ -7,11 +7,13 @@ from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 
 try:
-    from backend.models import db, Veiculo, VeiculoFinanciamento, Categoria, DespesaPrevista, IndexadorMensal
+    from backend.models import db, Veiculo, VeiculoFinanciamento, Categoria, DespesaPrevista
     from backend.services.categoria_default import get_categoria_padrao_veiculos
+    from backend.services.indexador_service import SerieIndexador
 except ImportError:
-    from models import db, Veiculo, VeiculoFinanciamento, Categoria, DespesaPrevista, IndexadorMensal
+    from models import db, Veiculo, VeiculoFinanciamento, Categoria, DespesaPrevista
     from services.categoria_default import get_categoria_padrao_veiculos
+    from services.indexador_service import SerieIndexador
 
 
 TIPO_EVENTO_PARCELA = 'PARCELA_FINANCIAMENTO'
@@ -49,9 +51,7 @@ def _categoria_padrao_financiamento_id() -> int | None:
 def _obter_indexador_percentual(nome: str | None, data_ref: date) -> Decimal:
     if not nome:
         return Decimal('0')
-    data_mes = _primeiro_dia_mes(data_ref)
-    idx = IndexadorMensal.query.filter_by(nome=nome, data_referencia=data_mes).first()
-    return idx.valor if idx and idx.valor is not None else Decimal('0')
+    return SerieIndexador.do_indexador(nome).percentual(data_ref)
 
 
 def _existe_parcela_na_competencia(veiculo_id: int, competencia: date) -> bool:
@@ -0,0 +1,74 @@
+"""
+Helpers de filtro por competência (mês de referência)
+
+Todas as colunas de competência do sistema (Conta.mes_referencia,
+LancamentoAgregado.mes_fatura, ReceitaRealizada.mes_referencia...) guardam o
+primeiro dia do mês. Filtrar com extract('month')/extract('year') ou
+strftime('%Y-%m') aplica uma função sobre a coluna e impede o uso dos índices
+(SQLite e PostgreSQL fazem varredura completa da tabela).
+
+Estes helpers geram predicados de faixa semiaberta [inicio, fim), que usam
+os índices existentes sobre a coluna e funcionam igual em SQLite e PostgreSQL.
+"""
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_
+
+
+def primeiro_dia(valor):
+    """
+    Normaliza date/datetime/'YYYY-MM'/'YYYY-MM-DD' para o primeiro dia do mês
+
+    Returns:
+        date ou None
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if isinstance(valor, str):
+        texto = valor[:10]
+        if len(texto) == 7:
+            texto += '-01'
+        valor = datetime.strptime(texto, '%Y-%m-%d').date()
+    return valor.replace(day=1)
+
+
+def intervalo_competencia(competencia, meses=1):
+    """
+    Retorna (inicio, fim) da competência, com fim exclusivo
+
+    Args:
+        competencia: date/datetime/str do mês
+        meses (int): Quantidade de meses cobertos pela faixa
+
+    Returns:
+        tuple(date, date)
+    """
+    inicio = primeiro_dia(competencia)
+    return inicio, inicio + relativedelta(months=meses)
+
+
+def filtro_competencia(coluna, competencia, meses=1):
+    """
+    Predicado indexável: coluna dentro do mês de competência
+
+    Substitui extract('month', coluna) == m AND extract('year', coluna) == a
+    e func.strftime('%Y-%m', coluna) == 'YYYY-MM'.
+
+    Exemplo:
+        Conta.query.filter(filtro_competencia(Conta.mes_referencia, date(2025, 5, 1)))
+    """
+    inicio, fim = intervalo_competencia(competencia, meses)
+    return and_(coluna >= inicio, coluna < fim)
+
+
+def filtro_competencia_mes_ano(coluna, mes, ano):
+    """Atalho de filtro_competencia para rotas que recebem mês e ano separados"""
+    return filtro_competencia(coluna, date(ano, mes, 1))
+
+
+def filtro_ano(coluna, ano):
+    """Predicado indexável: coluna dentro do ano (substitui extract('year', coluna) == ano)"""
+    return filtro_competencia(coluna, date(ano, 1, 1), meses=12)
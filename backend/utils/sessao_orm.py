@@ -0,0 +1,225 @@
+"""
+Helpers dos listeners de sessão que mantêm valores derivados por delta
+
+- valores_anteriores / registrar_historico: valores de um objeto como estavam
+  no banco antes do flush (o delta de uma edição é novo - anterior)
+- executar_e_ler_atingidas: executa um UPDATE/DELETE/INSERT em lote (que não
+  passa pelo flush) e devolve as chaves das linhas atingidas, para recalcular
+  só elas em vez de varrer a tabela inteira
+- CacheTTL / InvalidacaoCache: cache em processo com validade e os listeners
+  que o invalidam a cada escrita dos modelos de origem
+"""
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy import inspect as sa_inspect
+
+# Ids por consulta ao reler as linhas atingidas por um UPDATE em lote
+LOTE_IDS = 500
+
+
+def valores_anteriores(obj, campos):
+    """Tupla dos campos como estavam no banco antes do flush"""
+    estado = sa_inspect(obj)
+    valores = []
+    for campo in campos:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores.append(historico.deleted[0])
+        elif historico.unchanged:
+            valores.append(historico.unchanged[0])
+        else:
+            valores.append(getattr(obj, campo))
+    return tuple(valores)
+
+
+def _carregar_valor_anterior(obj, valor, anterior, iniciador):
+    """Listener de 'set' com active_history: garante o valor antigo no histórico"""
+
+
+def registrar_historico(modelo, campos):
+    """
+    Carrega o valor antigo dos campos ao atribuir (active_history), para que
+    valores_anteriores funcione mesmo com o atributo expirado. Idempotente.
+    """
+    for campo in campos:
+        atributo = getattr(modelo, campo)
+        if not event.contains(atributo, 'set', _carregar_valor_anterior):
+            event.listen(atributo, 'set', _carregar_valor_anterior, active_history=True)
+
+
+def _ler_chaves(conexao, colunas, condicao):
+    consulta = select(*colunas).distinct()
+    if condicao is not None:
+        consulta = consulta.where(condicao)
+    return set(conexao.execute(consulta).tuples())
+
+
+def executar_e_ler_atingidas(orm_execute_state, colunas):
+    """
+    Executa o comando em lote interceptado em do_orm_execute e devolve as
+    combinações de `colunas` das linhas atingidas.
+
+    - UPDATE/DELETE: linhas do WHERE (ou dos ids, no UPDATE em lote por chave
+      primária), lidas antes; no UPDATE, relidas depois pelos ids (as colunas
+      podem ter mudado)
+    - INSERT sem parâmetros (INSERT ... SELECT): linhas de id maior que o
+      último antes do comando
+
+    Args:
+        colunas: Colunas da tabela do modelo (ex: (tabela.c.cartao_id, ...))
+
+    Returns:
+        tuple: (resultado do comando, set[tuple])
+    """
+    conexao = orm_execute_state.session.connection()
+    tabela = orm_execute_state.bind_mapper.local_table
+
+    if orm_execute_state.is_insert:
+        ultimo_id = conexao.execute(select(func.max(tabela.c.id))).scalar()
+        resultado = orm_execute_state.invoke_statement()
+        return resultado, _ler_chaves(conexao, colunas, tabela.c.id > ultimo_id if ultimo_id is not None else None)
+
+    parametros = orm_execute_state.parameters
+    if isinstance(parametros, dict):
+        parametros = [parametros]
+    if parametros and all('id' in linha for linha in parametros):
+        condicao = tabela.c.id.in_([linha['id'] for linha in parametros])  # Em lote por chave primária
+    else:
+        condicao = orm_execute_state.statement.whereclause
+
+    chaves = _ler_chaves(conexao, colunas, condicao)
+    ids = []
+    if orm_execute_state.is_update:
+        consulta = select(tabela.c.id)
+        if condicao is not None:
+            consulta = consulta.where(condicao)
+        ids = conexao.execute(consulta).scalars().all()
+
+    resultado = orm_execute_state.invoke_statement()
+    for inicio in range(0, len(ids), LOTE_IDS):
+        chaves |= _ler_chaves(conexao, colunas, tabela.c.id.in_(ids[inicio:inicio + LOTE_IDS]))
+    return resultado, chaves
+
+
+# ============================================================================
+# CACHE EM PROCESSO INVALIDADO PELA SESSÃO
+# ============================================================================
+
+# Retorno do extrator de chaves: o objeto afeta entradas indeterminadas
+INVALIDAR_TUDO = object()
+
+
+class CacheTTL(dict):
+    """
+    Cache em processo: chave → (instante, valor)
+
+    A validade (ttl_segundos) limita a defasagem entre processos (workers):
+    as escritas de outro processo não invalidam este.
+    """
+
+    def __init__(self, ttl_segundos):
+        super().__init__()
+        self.ttl_segundos = ttl_segundos
+
+    def obter(self, chave, agora=None):
+        """Valor em cache (None se ausente ou vencido)"""
+        entrada = self.get(chave)
+        agora = agora if agora is not None else time.monotonic()
+        if entrada is not None and agora - entrada[0] < self.ttl_segundos:
+            return entrada[1]
+        return None
+
+    def guardar(self, chave, valor):
+        self[chave] = (time.monotonic(), valor)
+        return valor
+
+
+class InvalidacaoCache:
+    """
+    Listeners de sessão que invalidam um cache a cada escrita dos modelos
+
+    - before_flush: as chaves dos objetos novos/alterados/excluídos são
+      invalidadas já (uma recarga entre o flush e o commit leria dados
+      antigos) e guardadas na sessão
+    - do_orm_execute: escrita em lote (não passa pelo flush) → tudo
+    - after_commit / after_rollback: invalida de novo as chaves guardadas
+      (o que foi recarregado com dados da transação)
+    """
+
+    def __init__(self, nome, modelos, chaves, invalidar, por_chave=False):
+        """
+        Args:
+            nome (str): Prefixo das entradas em session.info
+            modelos (tuple): Modelos cujas escritas afetam o cache
+            chaves: f(obj) → chaves afetadas pelo objeto (None é ignorado)
+                ou INVALIDAR_TUDO
+            invalidar: Descarte do cache; chamado sem argumentos para tudo
+            por_chave (bool): invalidar(chave) uma vez por chave, em vez de
+                invalidar(set_de_chaves)
+        """
+        self.modelos = tuple(modelos)
+        self._chaves = chaves
+        self._invalidar = invalidar
+        self._por_chave = por_chave
+        self._chave_sessao = f'{nome}_chaves'
+        self._chave_tudo = f'{nome}_tudo'
+
+    def registrar(self, session):
+        """Registra os listeners na sessão (idempotente)"""
+        alvos = (
+            ('before_flush', self._antes_do_flush),
+            ('do_orm_execute', self._execucao_orm),
+            ('after_commit', self._apos_commit),
+            ('after_rollback', self._apos_commit),
+        )
+        for nome, funcao in alvos:
+            if not event.contains(session, nome, funcao):
+                event.listen(session, nome, funcao)
+
+    def _descartar(self, chaves=None):
+        if chaves is None:
+            self._invalidar()
+        elif self._por_chave:
+            for chave in chaves:
+                self._invalidar(chave)
+        else:
+            self._invalidar(chaves)
+
+    def _antes_do_flush(self, session, flush_context, instances):
+        chaves = set()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, self.modelos):
+                continue
+            afetadas = self._chaves(obj)
+            if afetadas is INVALIDAR_TUDO:
+                session.info[self._chave_tudo] = True
+            else:
+                chaves.update(afetadas)
+
+        chaves.discard(None)
+        if chaves:
+            session.info.setdefault(self._chave_sessao, set()).update(chaves)
+            self._descartar(chaves)
+        if session.info.get(self._chave_tudo):
+            self._descartar()
+
+    def _execucao_orm(self, orm_execute_state):
+        if orm_execute_state.is_select:
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, self.modelos):
+            orm_execute_state.session.info[self._chave_tudo] = True
+            self._descartar()
+
+    def _apos_commit(self, session):
+        chaves = session.info.pop(self._chave_sessao, None)
+        if session.info.pop(self._chave_tudo, False):
+            self._descartar()
+        elif chaves:
+            self._descartar(chaves)
+
+
+def valor_e_anterior(obj, campo):
+    """Valor atual do campo e o anterior, se alterado nesta sessão"""
+    return {getattr(obj, campo, None), *(sa_inspect(obj).attrs[campo].history.deleted or ())}
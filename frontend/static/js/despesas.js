@@ -5,6 +5,7 @@
 const API_URL = '/api/despesas';
 const API_CONTAS_URL = '/api/despesas/contas';  // Endpoint para contas a pagar (execução)
 const CATEGORIAS_URL = '/api/categorias';
+const LIMITE_PAGINA_DESPESAS = 200;  // Despesas por página (paginação por cursor)
 let despesaEditando = null;
 let despesas = [];
 let categorias = [];
@@ -182,6 +183,24 @@ async function carregarCategoriasCartao(cartaoId) {
     }
 }
 
+/**
+ * Solicita ao backend a materialização das recorrências até o mês seguinte
+ * ao navegado (o GET de despesas é somente leitura)
+ */
+async function materializarRecorrencias(ano, mes) {
+    const proximo = new Date(ano, mes, 1);  // mes (1-12) como índice = mês seguinte
+    const ate = `${proximo.getFullYear()}-${String(proximo.getMonth() + 1).padStart(2, '0')}`;
+    try {
+        await fetch(`${API_URL}/materializar`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ate })
+        });
+    } catch (error) {
+        console.error('Erro ao materializar recorrências:', error);
+    }
+}
+
 /**
  * Carrega todas as despesas da API
  */
@@ -189,25 +208,40 @@ async function carregarDespesas() {
     try {
         // Pegar mês selecionado no filtro de competência (formato: MM/YYYY)
         const filtroCompetencia = document.getElementById('filtro-competencia').value;
-        let url = API_URL;
+        const params = new URLSearchParams({ limit: LIMITE_PAGINA_DESPESAS });
 
         if (filtroCompetencia) {
-            // Converter MM/YYYY para YYYY-MM
+            // Converter MM/YYYY para YYYY-MM (janela de um mês: mes_inicio = mes_fim)
             const [mes, ano] = filtroCompetencia.split('/');
             const mesFormatado = `${ano}-${mes}`;
-            url = `${API_URL}?mes_referencia=${mesFormatado}`;
+            params.set('mes_inicio', mesFormatado);
+            params.set('mes_fim', mesFormatado);
             console.log(`[DEBUG] Carregando despesas para: ${mesFormatado}`);
+
+            // Garantir recorrências/faturas até o mês navegado + 1 (idempotente)
+            await materializarRecorrencias(Number(ano), Number(mes));
         }
 
-        const response = await fetch(url);
-        const data = await response.json();
+        // Páginas do mês navegado, seguindo o proximo_cursor até o fim
+        const carregadas = [];
+        let cursor = null;
+        do {
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            const response = await fetch(`${API_URL}?${params}`);
+            const data = await response.json();
 
-        if (!data.success) {
-            mostrarErro('Erro ao carregar despesas: ' + data.error);
-            return;
-        }
+            if (!data.success) {
+                mostrarErro('Erro ao carregar despesas: ' + data.error);
+                return;
+            }
+
+            carregadas.push(...data.data);
+            cursor = data.paginacao ? data.paginacao.proximo_cursor : null;
+        } while (cursor);
 
-        despesas = data.data;
+        despesas = carregadas;
         aplicarFiltros();
 
     } catch (error) {
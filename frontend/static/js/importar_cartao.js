@@ -11,7 +11,10 @@ const estado = {
     categorias: [],
     categoriasCartao: [],
     csvData: null,
-    linhasMapeadas: []
+    mapeamento: null,
+    linhasMapeadas: [],
+    categoriaPadrao: null,
+    itemAgregadoPadrao: null
 };
 
 // ============================================================================
@@ -261,6 +264,8 @@ function validarMapeamento() {
         return;
     }
 
+    estado.mapeamento = mapa;
+
     // Processar linhas
     estado.linhasMapeadas = estado.csvData.linhas_amostra.map(linha => {
         return {
@@ -274,7 +279,7 @@ function validarMapeamento() {
         };
     });
 
-    alert(`Mapeamento validado! ${estado.linhasMapeadas.length} linhas processadas.`);
+    alert(`Mapeamento validado! ${estado.csvData.total_linhas} linhas serão importadas.`);
     document.getElementById('btnStep4').disabled = false;
 }
 
@@ -287,7 +292,27 @@ async function renderizarPrevia() {
 
     const container = document.getElementById('previaContainer');
 
-    let html = '<table><thead><tr>';
+    // Demais linhas do arquivo (fora da amostra) usam a categoria padrão
+    let html = `
+        <div style="display:grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-bottom:20px">
+            <div class="form-group">
+                <label>Categoria padrão (demais linhas) <span style="color:red">*</span></label>
+                <select onchange="estado.categoriaPadrao = this.value ? parseInt(this.value) : null">
+                    <option value="">Selecione</option>
+                    ${estado.categorias.map(cat => `<option value="${cat.id}">${cat.nome}</option>`).join('')}
+                </select>
+            </div>
+            <div class="form-group">
+                <label>Cat. Cartão padrão</label>
+                <select onchange="estado.itemAgregadoPadrao = this.value ? parseInt(this.value) : null">
+                    <option value="">Nenhuma</option>
+                    ${estado.categoriasCartao.map(cat => `<option value="${cat.id}">${cat.nome}</option>`).join('')}
+                </select>
+            </div>
+        </div>
+    `;
+
+    html += '<table><thead><tr>';
     html += '<th>Data</th><th>Descrição</th><th>Valor</th><th>Categoria *</th><th>Cat. Cartão</th>';
     html += '</tr></thead><tbody>';
 
@@ -322,9 +347,12 @@ async function renderizarPrevia() {
 
 async function finalizarImportacao() {
     // Validar categorias
-    const faltaCategoria = estado.linhasMapeadas.some(l => !l.categoria_id);
+    const haLinhasForaDaAmostra = estado.csvData.total_linhas > estado.linhasMapeadas.length;
+    const faltaCategoria = estado.categoriaPadrao
+        ? false
+        : haLinhasForaDaAmostra || estado.linhasMapeadas.some(l => !l.categoria_id);
     if (faltaCategoria) {
-        alert('Todas as linhas devem ter uma categoria selecionada');
+        alert('Selecione a categoria padrão ou uma categoria para cada linha');
         return;
     }
 
@@ -335,11 +363,31 @@ async function finalizarImportacao() {
     const [mes, ano] = competenciaInput.split('/');
     const competencia = `${ano}-${mes}-01`;
 
-    const payload = {
-        cartao_id: cartaoId,
-        competencia: competencia,
-        linhas: estado.linhasMapeadas
-    };
+    // Linhas ficam no servidor (sessão de upload): enviar só mapeamento e ajustes da amostra
+    const ajustes = {};
+    estado.linhasMapeadas.forEach((linha, idx) => {
+        const ajuste = { descricao_exibida: linha.descricao_exibida };
+        if (linha.categoria_id) ajuste.categoria_id = linha.categoria_id;
+        if (linha.item_agregado_id) ajuste.item_agregado_id = linha.item_agregado_id;
+        ajustes[idx] = ajuste;
+    });
+
+    const payload = estado.csvData.upload_id
+        ? {
+            cartao_id: cartaoId,
+            competencia: competencia,
+            upload_id: estado.csvData.upload_id,
+            mapeamento: estado.mapeamento,
+            categoria_id: estado.categoriaPadrao || estado.linhasMapeadas[0].categoria_id,
+            item_agregado_id: estado.itemAgregadoPadrao,
+            ajustes: ajustes,
+            assincrono: true  // Processado em segundo plano (ver aguardarJob)
+        }
+        : {
+            cartao_id: cartaoId,
+            competencia: competencia,
+            linhas: estado.linhasMapeadas
+        };
 
     console.log('Payload de importação:', payload); // Debug
 
@@ -350,7 +398,12 @@ async function finalizarImportacao() {
             body: JSON.stringify(payload)
         });
 
-        const data = await response.json();
+        let data = await response.json();
+
+        if (data.success && data.job_id) {
+            proximaEtapa(5);  // Progresso exibido na etapa de resultado
+            data = await aguardarJob(data.status_url);
+        }
 
         if (data.success) {
             document.getElementById('resultadoContainer').innerHTML = `
@@ -359,6 +412,7 @@ async function finalizarImportacao() {
                     <p>Lançamentos inseridos: <strong>${data.inseridos}</strong></p>
                     <p>Duplicados ignorados: <strong>${data.duplicados}</strong></p>
                     ${data.erros.length > 0 ? `<p>Erros: <strong>${data.erros.length}</strong></p>` : ''}
+                    ${data.linhas_invalidas > 0 ? `<p>Linhas inválidas ignoradas: <strong>${data.linhas_invalidas}</strong></p>` : ''}
                 </div>
             `;
             proximaEtapa(5);
@@ -369,3 +423,39 @@ async function finalizarImportacao() {
         alert(`Erro na importação: ${error.message}`);
     }
 }
+
+// Acompanha o job de importação até concluir (mostrando o progresso)
+async function aguardarJob(statusUrl) {
+    const container = document.getElementById('resultadoContainer');
+
+    while (true) {
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+
+        if (!data.success) {
+            return data;
+        }
+
+        const job = data.job;
+        if (job.status === 'concluido') {
+            return {
+                success: true,
+                inseridos: job.inseridos,
+                duplicados: job.duplicados,
+                erros: new Array(job.erros),
+                linhas_invalidas: job.linhas_invalidas
+            };
+        }
+        if (job.status === 'erro') {
+            return { success: false, message: job.mensagem };
+        }
+
+        container.innerHTML = `
+            <div class="result-message">
+                Importando... ${job.linhas_lidas} de ${estado.csvData.total_linhas} linhas
+                (${job.linhas_por_segundo} linhas/s)
+            </div>
+        `;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
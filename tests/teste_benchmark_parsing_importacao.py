@@ -0,0 +1,140 @@
+"""
+TESTE: Custo de parsing por linha na importação de fatura (benchmark)
+
+Cenário:
+1. Gerar uma fatura sintética de 100.000 linhas (descrições com e sem
+   parcelamento, datas em um formato fixo por arquivo)
+2. Comparar normalizar_descricao (PADRAO_PARCELA pré-compilado) com a
+   implementação anterior (4 regex por linha) - resultados idênticos
+3. Comparar DetectorFormatoData com a cascata de strptime anterior -
+   resultados idênticos
+4. Medir o pipeline completo (processar_linhas_mapeadas, sem banco)
+5. Imprimir o custo em µs/linha de cada etapa (acompanhar entre versões)
+"""
+import sys
+sys.path.insert(0, 'backend')
+
+import random
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from backend.services.importacao_cartao_service import ImportacaoCartaoService, DetectorFormatoData
+
+TOTAL_LINHAS = 100_000
+
+random.seed(42)
+
+
+# ============================================================================
+# IMPLEMENTAÇÕES ANTERIORES (referência)
+# ============================================================================
+
+def normalizar_descricao_anterior(descricao_bruta):
+    descricao = descricao_bruta.strip()
+    padroes = [
+        r'(\d{1,2})/(\d{1,2})$',
+        r'(\d{1,2})\s+DE\s+(\d{1,2})$',
+        r'PARCELA\s+(\d{1,2})/(\d{1,2})$',
+        r'PARC\s+(\d{1,2})/(\d{1,2})$',
+    ]
+    for padrao in padroes:
+        match = re.search(padrao, descricao, re.IGNORECASE)
+        if match:
+            return descricao[:match.start()].strip(), int(match.group(1)), int(match.group(2))
+    return descricao, 1, 1
+
+
+def converter_data_anterior(texto):
+    for formato in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+# ============================================================================
+# FATURA SINTÉTICA
+# ============================================================================
+
+LOJAS = ['MERCADO CENTRAL', 'POSTO SHELL', 'IFOOD *RESTAURANTE', 'AMAZON MKTPLACE',
+         'UBER *TRIP', 'FARMACIA SAO JOAO', 'NETFLIX.COM', 'LOJA 123']
+SUFIXOS = ['', '', '', ' 01/12', ' 3/10', ' 2 DE 6', ' PARCELA 04/12', ' PARC 1/3', ' 10 de 10', ' 123/45']
+
+
+def gerar_linhas(formato_data):
+    inicio = date(2023, 1, 1)
+    linhas = []
+    for i in range(TOTAL_LINHAS):
+        data_compra = inicio + timedelta(days=random.randrange(900))
+        texto_data = data_compra.strftime(formato_data)
+        if i % 997 == 0:
+            texto_data = f'{data_compra.day}/{data_compra.month}/{data_compra.year}'  # Sem zeros
+        elif i % 1499 == 0:
+            texto_data = '31/02/2025'  # Inválida
+        linhas.append({
+            'data_compra': texto_data,
+            'descricao': f'  {random.choice(LOJAS)}{random.choice(SUFIXOS)} ',
+            'valor': f'{random.randrange(100, 100000) / 100:.2f}'.replace('.', ','),
+            'parcela': '1/1',
+            'categoria_id': 1,
+        })
+    return linhas
+
+
+def medir(funcao, valores):
+    inicio = time.perf_counter()
+    resultado = [funcao(v) for v in valores]
+    return resultado, (time.perf_counter() - inicio) * 1_000_000 / len(valores)
+
+
+print("\n" + "="*80)
+print(f"TESTE: Benchmark de parsing da importação ({TOTAL_LINHAS} linhas)")
+print("="*80)
+
+falhas = 0
+
+# Descrições
+linhas = gerar_linhas('%d/%m/%Y')
+descricoes = [linha['descricao'] for linha in linhas]
+esperado, us_anterior = medir(normalizar_descricao_anterior, descricoes)
+obtido, us_atual = medir(ImportacaoCartaoService.normalizar_descricao, descricoes)
+divergentes = sum(1 for a, b in zip(esperado, obtido) if a != b)
+print(f"\n[1] normalizar_descricao: {us_anterior:.2f} → {us_atual:.2f} µs/linha")
+print(f"    {'[OK]' if not divergentes else '[ERRO]'} {divergentes} resultado(s) divergente(s)")
+falhas += divergentes > 0
+
+# Datas (um arquivo por formato)
+for i, formato in enumerate(('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'), start=2):
+    datas = [linha['data_compra'] for linha in gerar_linhas(formato)]
+    esperado, us_anterior = medir(converter_data_anterior, datas)
+    detector = DetectorFormatoData()
+    obtido, us_atual = medir(detector.converter, datas)
+    divergentes = sum(1 for a, b in zip(esperado, obtido) if a != b)
+    print(f"\n[{i}] datas {formato} (detectado: {detector.formato}): "
+          f"{us_anterior:.2f} → {us_atual:.2f} µs/linha")
+    print(f"    {'[OK]' if not divergentes and detector.formato == formato else '[ERRO]'} "
+          f"{divergentes} resultado(s) divergente(s)")
+    falhas += divergentes > 0 or detector.formato != formato
+
+# Pipeline completo (sem banco: despesas fixas vazias)
+inicio = time.perf_counter()
+lancamentos = ImportacaoCartaoService.processar_linhas_mapeadas(
+    linhas, cartao_id=1, competencia_alvo=date(2025, 9, 1), despesas_fixas={}
+)
+us_pipeline = (time.perf_counter() - inicio) * 1_000_000 / TOTAL_LINHAS
+validas = len({lanc['assinatura_compra'] for lanc in lancamentos})
+invalidas = sum(1 for linha in linhas if converter_data_anterior(linha['data_compra']) is None)
+print(f"\n[5] processar_linhas_mapeadas: {us_pipeline:.2f} µs/linha "
+      f"({validas} linhas válidas, {len(lancamentos)} parcelas)")
+print(f"    {'[OK]' if validas == TOTAL_LINHAS - invalidas else '[ERRO]'} {invalidas} linha(s) inválida(s) descartada(s)")
+falhas += validas != TOTAL_LINHAS - invalidas
+
+print("\n" + "="*80)
+if falhas:
+    print(f"[ERRO] {falhas} verificação(ões) falharam")
+    print("="*80)
+    exit(1)
+print("[OK] Parsing equivalente à implementação anterior")
+print("="*80)
@@ -0,0 +1,239 @@
+"""
+TESTE: Recálculo de parcelas pendentes em tempo linear (benchmark)
+
+Cenário:
+1. Contrato de 420 meses com 20 amortizações extraordinárias (uma a cada
+   21 meses); a cada amortização as parcelas pendentes são recalculadas a
+   partir do novo saldo
+2. Comparar CronogramaFinanciamento.recalcular com os laços anteriores
+   (parcelas restantes recontadas a cada parcela, O(n²)) para SAC, PRICE e
+   SIMPLES, nos dois caminhos (reduzir_parcela e recalcular_parcelas_futuras)
+   - resultados idênticos em centavos
+3. Medir o fluxo completo com banco: registrar as 20 amortizações
+   (reduzir_parcela) em um financiamento SAC de 420 meses e conferir o
+   reencadeamento do saldo
+4. Imprimir o tempo de cada etapa (acompanhar entre versões)
+"""
+import sys
+sys.path.insert(0, 'backend')
+
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from dateutil.relativedelta import relativedelta
+
+from backend.app import create_app
+from backend.models import db, FinanciamentoParcela
+from backend.services.cronograma_financiamento import CronogramaFinanciamento
+from backend.services.seguro_vigencia_service import VigenciaTimeline, VigenciaSeguro
+
+PRAZO = 420
+AMORTIZACOES = 20
+VALOR_FINANCIADO = Decimal('500000.00')
+TAXA_MENSAL = Decimal('0.007974')
+TAXA_ADM = Decimal('25.00')
+VALOR_AMORTIZACAO = Decimal('8000.00')
+PRIMEIRA_PARCELA = date(2025, 2, 10)
+CENTAVO = Decimal('0.01')
+
+VIGENCIAS = VigenciaTimeline([
+    VigenciaSeguro(1, date(2025, 1, 1), None, Decimal('188.00'), False),
+    VigenciaSeguro(2, date(2030, 1, 1), None, Decimal('164.50'), False),
+    VigenciaSeguro(3, date(2040, 1, 1), None, Decimal('121.10'), True),
+])
+
+
+# ============================================================================
+# IMPLEMENTAÇÕES ANTERIORES (referência)
+# ============================================================================
+
+def reduzir_parcela_anterior(sistema, parcelas_pendentes, novo_saldo, taxa_mensal):
+    saldo_devedor = novo_saldo
+    for parcela in parcelas_pendentes:
+        juros = saldo_devedor * taxa_mensal
+        if sistema == 'SAC':
+            num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
+        elif sistema == 'PRICE':
+            n = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            if taxa_mensal > 0:
+                pmt = saldo_devedor * (taxa_mensal * (1 + taxa_mensal) ** n) / ((1 + taxa_mensal) ** n - 1)
+            else:
+                pmt = saldo_devedor / Decimal(str(n))
+            amortizacao = pmt - juros
+        else:
+            num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
+
+        valor_seguro = VIGENCIAS.vigente_em(parcela.data_vencimento).valor_mensal
+        valor_taxa_adm = parcela.valor_taxa_adm or Decimal('0')
+        parcela.valor_amortizacao = amortizacao
+        parcela.valor_juros = juros
+        parcela.valor_seguro = valor_seguro
+        parcela.valor_previsto_total = amortizacao + juros + valor_seguro + valor_taxa_adm
+        parcela.saldo_devedor_apos_pagamento = saldo_devedor - amortizacao
+        saldo_devedor = saldo_devedor - amortizacao
+
+
+def recalcular_futuras_anterior(sistema, parcelas_pendentes, saldo_devedor, taxa_mensal):
+    for parcela in parcelas_pendentes:
+        juros = saldo_devedor * taxa_mensal
+        if sistema == 'SAC':
+            num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
+        elif sistema == 'PRICE':
+            n = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            if taxa_mensal > 0:
+                fator = (Decimal('1') + taxa_mensal) ** Decimal(str(n))
+                pmt = saldo_devedor * taxa_mensal * fator / (fator - Decimal('1'))
+            else:
+                pmt = saldo_devedor / Decimal(str(n))
+            amortizacao = pmt - juros
+        else:
+            num_parcelas_restantes = len([p for p in parcelas_pendentes if p.numero_parcela >= parcela.numero_parcela])
+            amortizacao = saldo_devedor / Decimal(str(num_parcelas_restantes))
+            juros = VALOR_FINANCIADO * taxa_mensal
+
+        valor_seguro = VIGENCIAS.vigente_em(parcela.data_vencimento).valor_mensal
+        parcela.valor_amortizacao = amortizacao
+        parcela.valor_juros = juros
+        parcela.valor_seguro = valor_seguro
+        parcela.valor_previsto_total = amortizacao + juros + valor_seguro + TAXA_ADM
+        parcela.saldo_devedor_apos_pagamento = saldo_devedor - amortizacao
+        saldo_devedor = saldo_devedor - amortizacao
+
+
+# ============================================================================
+# CENÁRIO
+# ============================================================================
+
+def parcelas_do_contrato():
+    return [
+        SimpleNamespace(numero_parcela=n, data_vencimento=PRIMEIRA_PARCELA + relativedelta(months=n - 1),
+                        valor_taxa_adm=TAXA_ADM)
+        for n in range(1, PRAZO + 1)
+    ]
+
+
+def rodadas():
+    """(parcelas pendentes, saldo) após cada amortização extraordinária"""
+    saldo = VALOR_FINANCIADO
+    amortizacao_fixa = VALOR_FINANCIADO / PRAZO
+    for k in range(1, AMORTIZACOES + 1):
+        primeira_pendente = k * (PRAZO // (AMORTIZACOES + 1))
+        saldo = VALOR_FINANCIADO - amortizacao_fixa * (primeira_pendente - 1) - VALOR_AMORTIZACAO * k
+        yield parcelas_do_contrato()[primeira_pendente - 1:], saldo
+
+
+def em_centavos(valores):
+    return [Decimal(str(v)).quantize(CENTAVO) for v in valores]
+
+
+def comparar(sistema, caminho):
+    """Roda as 20 rodadas nos dois motores; retorna (divergências, ms anterior, ms atual)"""
+    divergencias = 0
+    ms_anterior = ms_atual = 0.0
+    for pendentes, saldo in rodadas():
+        inicio = time.perf_counter()
+        if caminho == 'reduzir_parcela':
+            reduzir_parcela_anterior(sistema, pendentes, saldo, TAXA_MENSAL)
+        else:
+            recalcular_futuras_anterior(sistema, pendentes, saldo, TAXA_MENSAL)
+        ms_anterior += (time.perf_counter() - inicio) * 1000
+
+        inicio = time.perf_counter()
+        recalculado = CronogramaFinanciamento.recalcular(
+            sistema, saldo,
+            [(p.numero_parcela, p.data_vencimento, p.valor_taxa_adm) for p in pendentes],
+            TAXA_MENSAL, VIGENCIAS,
+            juros_fixos=VALOR_FINANCIADO * TAXA_MENSAL if caminho == 'futuras' and sistema == 'SIMPLES' else None
+        )
+        ms_atual += (time.perf_counter() - inicio) * 1000
+
+        for campo in ('valor_amortizacao', 'valor_juros', 'valor_seguro',
+                      'valor_previsto_total', 'saldo_devedor_apos_pagamento'):
+            esperado = em_centavos(getattr(p, campo) for p in pendentes)
+            if esperado != em_centavos(recalculado[campo]):
+                divergencias += 1
+    return divergencias, ms_anterior, ms_atual
+
+
+print("\n" + "="*80)
+print(f"TESTE: Benchmark do recálculo de parcelas ({PRAZO} meses, {AMORTIZACOES} amortizações)")
+print("="*80)
+
+falhas = 0
+etapa = 1
+
+restantes = CronogramaFinanciamento.parcelas_restantes([1, 2, 2, 3, 5])
+print(f"\n[{etapa}] parcelas_restantes com números repetidos: {restantes}")
+print(f"    {'[OK]' if restantes == [5, 4, 4, 2, 1] else '[ERRO]'} mesma contagem do filtro numero >= atual")
+falhas += restantes != [5, 4, 4, 2, 1]
+
+for caminho in ('reduzir_parcela', 'futuras'):
+    for sistema in ('SAC', 'PRICE', 'SIMPLES'):
+        etapa += 1
+        divergencias, ms_anterior, ms_atual = comparar(sistema, caminho)
+        print(f"\n[{etapa}] {caminho} {sistema}: {ms_anterior:.1f} → {ms_atual:.1f} ms "
+              f"({ms_anterior / ms_atual:.1f}x)")
+        print(f"    {'[OK]' if not divergencias else '[ERRO]'} {divergencias} coluna(s) divergente(s)")
+        falhas += divergencias > 0
+
+# Fluxo completo com banco: 20 amortizações reduzir_parcela em um SAC de 420 meses
+app = create_app('testing')
+with app.app_context():
+    db.create_all()
+    from backend.services.financiamento_service import FinanciamentoService
+
+    financiamento = FinanciamentoService.criar_financiamento({
+        'nome': 'Benchmark 420',
+        'sistema_amortizacao': 'SAC',
+        'valor_financiado': float(VALOR_FINANCIADO),
+        'prazo_total_meses': PRAZO,
+        'taxa_juros_nominal_anual': 9.5,
+        'data_contrato': '2025-01-10',
+        'data_primeira_parcela': PRIMEIRA_PARCELA.isoformat(),
+        'taxa_administracao_fixa': float(TAXA_ADM),
+        'vigencias_seguro': [{'competencia_inicio': '2025-01', 'valor_mensal': 188.00}]
+    })
+
+    datas = [
+        PRIMEIRA_PARCELA + relativedelta(months=k * (PRAZO // (AMORTIZACOES + 1)), days=-5)
+        for k in range(1, AMORTIZACOES + 1)
+    ]
+    inicio = time.perf_counter()
+    for data_amortizacao in datas:
+        FinanciamentoService.registrar_amortizacao_extra(financiamento.id, {
+            'data': data_amortizacao.isoformat(),
+            'valor': float(VALOR_AMORTIZACAO),
+            'tipo': 'reduzir_parcela'
+        })
+    ms_fluxo = (time.perf_counter() - inicio) * 1000
+
+    # Parcelas recalculadas pela última amortização: saldo reencadeado até zerar
+    parcelas = FinanciamentoParcela.query.filter_by(
+        financiamento_id=financiamento.id
+    ).order_by(FinanciamentoParcela.numero_parcela).all()
+    ultimas = [p for p in parcelas if p.data_vencimento >= datas[-1]]
+    quebras = sum(
+        1 for anterior, parcela in zip(ultimas, ultimas[1:])
+        if abs(anterior.saldo_devedor_apos_pagamento - parcela.valor_amortizacao
+               - parcela.saldo_devedor_apos_pagamento) > CENTAVO
+    )
+    residual = abs(parcelas[-1].saldo_devedor_apos_pagamento)
+    etapa += 1
+    print(f"\n[{etapa}] registrar_amortizacao_extra x{AMORTIZACOES} (SAC {PRAZO} meses): {ms_fluxo:.0f} ms "
+          f"({ms_fluxo / AMORTIZACOES:.1f} ms/amortização)")
+    print(f"    {'[OK]' if len(parcelas) == PRAZO and residual <= CENTAVO and not quebras else '[ERRO]'} "
+          f"{len(parcelas)} parcelas, saldo final {residual}, {quebras} quebra(s) de encadeamento")
+    falhas += len(parcelas) != PRAZO or residual > CENTAVO or quebras > 0
+
+print("\n" + "="*80)
+if falhas:
+    print(f"[ERRO] {falhas} verificação(ões) falharam")
+    print("="*80)
+    exit(1)
+print("[OK] Recálculo linear equivalente à implementação anterior")
+print("="*80)
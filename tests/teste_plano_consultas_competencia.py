@@ -0,0 +1,130 @@
+"""
+TESTE: Consultas por competência usam índice (regressão de plano de consulta)
+
+Cenário:
+1. Montar as consultas quentes do dashboard/cartões/receitas com os filtros
+   de faixa de backend/utils/competencia.py
+2. Rodar EXPLAIN QUERY PLAN (SQLite) em cada uma
+3. Verificar que o plano usa um índice (SEARCH ... USING INDEX) e não faz
+   varredura completa da tabela (SCAN <tabela>)
+4. Verificar que o padrão antigo extract()/strftime() de fato não usa índice
+"""
+import sys
+sys.path.insert(0, 'backend')
+
+from datetime import date
+
+from sqlalchemy import func, extract, text
+
+from backend.app import create_app
+from backend.models import db, Conta, LancamentoAgregado, ReceitaOrcamento, ReceitaRealizada, IndexadorMensal
+from backend.utils.competencia import filtro_competencia, filtro_ano
+
+app = create_app('testing')
+
+COMPETENCIA = date(2025, 5, 1)
+
+
+def plano(query):
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da query"""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    linhas = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def usa_indice(detalhes, tabela):
+    busca = any(d.startswith(f'SEARCH {tabela} ') and 'INDEX' in d for d in detalhes)
+    varredura = any(d == f'SCAN {tabela}' for d in detalhes)
+    return busca and not varredura
+
+
+with app.app_context():
+    db.create_all()
+
+    print("\n" + "="*80)
+    print("TESTE: Plano de Consultas por Competência")
+    print("="*80)
+
+    if db.engine.dialect.name != 'sqlite':
+        print("\n[SKIP] EXPLAIN QUERY PLAN deste teste é específico de SQLite")
+        exit(0)
+
+    consultas = {
+        'dashboard: despesas comuns do mês': (
+            'conta',
+            db.session.query(func.sum(Conta.valor)).filter(
+                filtro_competencia(Conta.mes_referencia, COMPETENCIA),
+                Conta.is_fatura_cartao == False
+            )
+        ),
+        'dashboard: faturas de cartão do mês': (
+            'conta',
+            Conta.query.filter(
+                Conta.is_fatura_cartao == True,
+                filtro_competencia(Conta.mes_referencia, COMPETENCIA)
+            )
+        ),
+        'cartões: executado da fatura (por cartão)': (
+            'lancamento_agregado',
+            db.session.query(func.sum(LancamentoAgregado.valor)).filter(
+                LancamentoAgregado.cartao_id == 1,
+                filtro_competencia(LancamentoAgregado.mes_fatura, COMPETENCIA)
+            )
+        ),
+        'cartões: gasto da categoria': (
+            'lancamento_agregado',
+            db.session.query(func.sum(LancamentoAgregado.valor)).filter(
+                LancamentoAgregado.item_agregado_id == 1,
+                filtro_competencia(LancamentoAgregado.mes_fatura, COMPETENCIA)
+            )
+        ),
+        'receitas: realizadas do mês': (
+            'receita_realizada',
+            db.session.query(func.sum(ReceitaRealizada.valor_recebido)).filter(
+                filtro_competencia(ReceitaRealizada.mes_referencia, COMPETENCIA)
+            )
+        ),
+        'receitas: previstas do mês': (
+            'receita_orcamento',
+            db.session.query(func.sum(ReceitaOrcamento.valor_esperado)).filter(
+                filtro_competencia(ReceitaOrcamento.mes_referencia, COMPETENCIA)
+            )
+        ),
+        'indexadores: filtro por ano': (
+            'indexador_mensal',
+            IndexadorMensal.query.filter(
+                IndexadorMensal.nome == 'TR',
+                filtro_ano(IndexadorMensal.data_referencia, 2025)
+            )
+        ),
+    }
+
+    falhas = 0
+    for i, (nome, (tabela, query)) in enumerate(consultas.items(), start=1):
+        detalhes = plano(query)
+        ok = usa_indice(detalhes, tabela)
+        if not ok:
+            falhas += 1
+        print(f"\n[{i}] {nome}")
+        for d in detalhes:
+            print(f"    {d}")
+        print(f"    {'[OK] usa índice' if ok else '[ERRO] varredura completa'}")
+
+    # Padrão antigo: função sobre a coluna impede o uso do índice
+    antigo = db.session.query(func.sum(ReceitaRealizada.valor_recebido)).filter(
+        extract('month', ReceitaRealizada.mes_referencia) == COMPETENCIA.month,
+        extract('year', ReceitaRealizada.mes_referencia) == COMPETENCIA.year
+    )
+    detalhes_antigo = plano(antigo)
+    print(f"\n[{len(consultas) + 1}] Referência: extract(month/year) (padrão antigo)")
+    for d in detalhes_antigo:
+        print(f"    {d}")
+    print(f"    {'[OK] faz varredura (esperado)' if not usa_indice(detalhes_antigo, 'receita_realizada') else '[AVISO] usou índice'}")
+
+    print("\n" + "="*80)
+    if falhas:
+        print(f"[ERRO] {falhas} consulta(s) sem uso de índice")
+        print("="*80)
+        exit(1)
+    print("[OK] Todas as consultas por competência usam índice")
+    print("="*80)
@@ -0,0 +1,125 @@
+"""
+TESTE: Watermark da materialização de recorrências (materializado_ate)
+
+Cenário:
+1. Despesa recorrente mensal materializada até um mês alvo
+2. Editar o vencimento para trás (back-dating) e o valor da despesa
+3. Verificar que o watermark foi descartado e que a nova materialização
+   gera os meses anteriores que faltavam (sem duplicar os existentes)
+4. Reativar uma despesa recorrente inativada: watermark descartado
+5. Item com erro no meio da materialização não deixa linhas parciais
+"""
+import sys
+sys.path.insert(0, 'backend')
+
+from datetime import date
+from decimal import Decimal
+
+from backend.app import create_app
+from backend.models import db, Categoria, ItemDespesa, Conta
+from backend.services import recorrencia_service
+from backend.services.recorrencia_service import RecorrenciaService
+
+app = create_app('testing')
+
+ALVO = date(2025, 6, 1)
+
+
+def vencimentos(item_id):
+    return [
+        d for (d,) in db.session.query(Conta.data_vencimento)
+        .filter(Conta.item_despesa_id == item_id)
+        .order_by(Conta.data_vencimento)
+    ]
+
+
+with app.app_context():
+    db.create_all()
+
+    print("\n" + "="*80)
+    print("TESTE: Watermark da Materialização de Recorrências")
+    print("="*80)
+
+    falhas = []
+
+    categoria = Categoria(nome='Moradia')
+    db.session.add(categoria)
+    db.session.flush()
+
+    aluguel = ItemDespesa(
+        nome='Aluguel', tipo='Simples', categoria_id=categoria.id, valor=Decimal('1000'),
+        data_vencimento=date(2025, 4, 10), recorrente=True, tipo_recorrencia='mensal'
+    )
+    db.session.add(aluguel)
+    db.session.commit()
+
+    # 1. Materialização inicial: abr-jun
+    RecorrenciaService.materializar(ate=ALVO)
+    print(f"\n[1] Materializado até {aluguel.materializado_ate}: {vencimentos(aluguel.id)}")
+    if aluguel.materializado_ate != ALVO or len(vencimentos(aluguel.id)) != 3:
+        falhas.append('materialização inicial')
+
+    # 2. Back-dating e novo valor: watermark descartado no flush
+    aluguel.data_vencimento = date(2025, 1, 10)
+    aluguel.valor = Decimal('1100')
+    db.session.commit()
+    print(f"\n[2] Após editar vencimento/valor: materializado_ate = {aluguel.materializado_ate}")
+    if aluguel.materializado_ate is not None:
+        falhas.append('watermark não descartado na edição')
+
+    # 3. Nova materialização gera jan-mar sem duplicar abr-jun
+    RecorrenciaService.materializar(ate=ALVO)
+    meses = [d.month for d in vencimentos(aluguel.id)]
+    print(f"\n[3] Após rematerializar: meses {meses}")
+    if meses != [1, 2, 3, 4, 5, 6]:
+        falhas.append('meses anteriores ao watermark não gerados')
+    novos = Conta.query.filter(Conta.item_despesa_id == aluguel.id, Conta.data_vencimento < date(2025, 4, 1)).all()
+    if any(c.valor != Decimal('1100') for c in novos):
+        falhas.append('meses gerados sem o valor novo')
+
+    # 4. Reativação descarta o watermark
+    aluguel.ativo = False
+    db.session.commit()
+    RecorrenciaService.materializar(ate=ALVO)
+    aluguel.ativo = True
+    db.session.commit()
+    print(f"\n[4] Após reativar: materializado_ate = {aluguel.materializado_ate}")
+    if aluguel.materializado_ate is not None:
+        falhas.append('watermark não descartado na reativação')
+
+    # 5. Erro no meio do item: savepoint descarta as linhas já inseridas
+    luz = ItemDespesa(
+        nome='Luz', tipo='Simples', categoria_id=categoria.id, valor=Decimal('200'),
+        data_vencimento=date(2025, 1, 15), recorrente=True, tipo_recorrencia='mensal'
+    )
+    db.session.add(luz)
+    db.session.commit()
+
+    gerar_original = recorrencia_service.gerar_execucao_despesa_recorrente
+
+    def gerar_e_falhar(item_despesa_id, **kwargs):
+        linhas = gerar_original(item_despesa_id, **kwargs)
+        if item_despesa_id == luz.id:
+            raise ValueError('falha simulada após inserir')
+        return linhas
+
+    recorrencia_service.gerar_execucao_despesa_recorrente = gerar_e_falhar
+    try:
+        resultado = RecorrenciaService.materializar(ate=ALVO)
+    finally:
+        recorrencia_service.gerar_execucao_despesa_recorrente = gerar_original
+
+    parciais = vencimentos(luz.id)
+    print(f"\n[5] Erros: {resultado['erros']}; contas da Luz: {parciais}")
+    if parciais or luz.materializado_ate is not None:
+        falhas.append('linhas parciais de item com erro')
+    if vencimentos(aluguel.id)[-1] != date(2025, 6, 10):
+        falhas.append('itens sem erro afetados pelo savepoint')
+
+    print("\n" + "="*80)
+    if falhas:
+        print(f"[ERRO] {', '.join(falhas)}")
+        print("="*80)
+        exit(1)
+    print("[OK] Watermark descartado em edições/reativação e itens com erro sem linhas parciais")
+    print("="*80)